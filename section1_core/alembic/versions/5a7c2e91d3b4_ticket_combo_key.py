@@ -0,0 +1,67 @@
+"""ticket combo_key + unique (draw_date, combo_key)
+
+Revision ID: 5a7c2e91d3b4
+Revises: 1cd468049b32
+Create Date: 2026-10-19 10:12:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5a7c2e91d3b4'
+down_revision: Union[str, Sequence[str], None] = '1cd468049b32'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _combo_key(regs, pb) -> str:
+    r = sorted(int(x) for x in regs)
+    return f"{r[0]}-{r[1]}-{r[2]}-{r[3]}-{r[4]}|{int(pb)}"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    insp = sa.inspect(bind)
+    if "tickets" not in insp.get_table_names():
+        return
+
+    if "combo_key" not in {c["name"] for c in insp.get_columns("tickets")}:
+        with op.batch_alter_table("tickets") as batch:
+            batch.add_column(sa.Column("combo_key", sa.String(length=20), nullable=True))
+
+    # Backfill: duplicados legacy (mismo draw_date + combinación) quedan con NULL salvo el id más bajo
+    taken = {
+        (str(d), k) for d, k in bind.execute(sa.text(
+            "SELECT draw_date, combo_key FROM tickets WHERE combo_key IS NOT NULL"
+        ))
+    }
+    updates = []
+    rows = bind.execute(sa.text(
+        "SELECT id, draw_date, n1, n2, n3, n4, n5, powerball FROM tickets WHERE combo_key IS NULL ORDER BY id"
+    )).fetchall()
+    for tid, d, n1, n2, n3, n4, n5, pb in rows:
+        try:
+            key = _combo_key([n1, n2, n3, n4, n5], pb)
+        except (TypeError, ValueError):
+            continue
+        if (str(d), key) in taken:
+            continue
+        taken.add((str(d), key))
+        updates.append({"id": int(tid), "k": key})
+    if updates:
+        bind.execute(sa.text("UPDATE tickets SET combo_key = :k WHERE id = :id"), updates)
+
+    if "ux_tickets_draw_date_combo_key" not in {ix["name"] for ix in insp.get_indexes("tickets")}:
+        op.create_index("ux_tickets_draw_date_combo_key", "tickets", ["draw_date", "combo_key"], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ux_tickets_draw_date_combo_key", table_name="tickets")
+    with op.batch_alter_table("tickets") as batch:
+        batch.drop_column("combo_key")
@@ -0,0 +1,195 @@
+"""
+Calendar cube: agregados precomputados por día del calendario (MM-DD), día de semana y mes.
+
+Un "slot" es el día del año en un año bisiesto (0..365), así que 366 slots cubren todos los MM-DD.
+Por slot se guardan:
+  - frecuencia de cada blanca (1..69) y de cada powerball (1..26)
+  - cantidad de sorteos
+  - suma y suma de cuadrados de la suma de blancas (media/desviación)
+El mismo pase llena los agregados por día de semana (0=lunes..6=domingo); los de mes se derivan
+sumando los slots del mes.
+
+Todo se construye en un pase vectorizado (np.add.at / np.bincount) y se puede mantener de forma
+incremental con add()/remove() cuando entran o cambian sorteos.
+"""
+from __future__ import annotations
+
+import threading
+from datetime import date
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+N_SLOTS = 366
+WHITE_MAX = 69
+PB_MAX = 26
+
+# offset (en año bisiesto) del primer día de cada mes
+_MONTH_OFFSET = np.array([0, 31, 60, 91, 121, 152, 182, 213, 244, 274, 305, 335], dtype=np.int64)
+_MONTH_DAYS = (31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+
+def calendar_slot(month: int, day: int) -> Optional[int]:
+    """Slot de MM-DD (29/02 incluido); None si el día no existe en ese mes (p.ej. 31/04)."""
+    month, day = int(month), int(day)
+    if not (1 <= month <= 12 and 1 <= day <= _MONTH_DAYS[month - 1]):
+        return None
+    return int(_MONTH_OFFSET[month - 1]) + day - 1
+
+
+class _Block:
+    """Contadores para un conjunto de slots (calendario o día de semana)."""
+
+    def __init__(self, n: int):
+        self.white = np.zeros((n, WHITE_MAX + 1), dtype=np.int64)
+        self.pb = np.zeros((n, PB_MAX + 1), dtype=np.int64)
+        self.count = np.zeros(n, dtype=np.int64)
+        self.sum_white = np.zeros(n, dtype=np.int64)
+        self.sumsq_white = np.zeros(n, dtype=np.int64)
+
+    def add(self, idx: np.ndarray, whites: np.ndarray, pbs: np.ndarray, sign: int) -> None:
+        n = self.count.shape[0]
+        np.add.at(self.white, (np.repeat(idx, whites.shape[1]), whites.ravel()), sign)
+        np.add.at(self.pb, (idx, pbs), sign)
+        sums = whites.sum(axis=1)
+        self.count += sign * np.bincount(idx, minlength=n)
+        self.sum_white += sign * np.bincount(idx, weights=sums, minlength=n).astype(np.int64)
+        self.sumsq_white += sign * np.bincount(idx, weights=sums * sums, minlength=n).astype(np.int64)
+
+    def insights(self, rows: Sequence[int]) -> Dict[str, Any]:
+        rows = list(rows)
+        count = int(self.count[rows].sum())
+        if count <= 0:
+            return {"count": 0, "white_frequency": [], "pb_frequency": [], "avg_sum_white": None}
+
+        wf = self.white[rows].sum(axis=0)
+        pf = self.pb[rows].sum(axis=0)
+        s = float(self.sum_white[rows].sum())
+        ss = float(self.sumsq_white[rows].sum())
+        mean = s / count
+        var = max(0.0, ss / count - mean * mean)
+
+        return {
+            "count": count,
+            "white_frequency": _freq_list(wf, "number"),
+            "pb_frequency": _freq_list(pf, "pb"),
+            "avg_sum_white": round(mean, 2),
+            "sum_white_stats": {"mean": round(mean, 2), "std": round(var ** 0.5, 2)},
+        }
+
+
+def _freq_list(vec: np.ndarray, key: str) -> List[Dict[str, int]]:
+    nz = np.nonzero(vec)[0]
+    # orden: frecuencia desc, número asc (estable)
+    order = nz[np.lexsort((nz, -vec[nz]))]
+    return [{key: int(n), "frequency": int(vec[n])} for n in order]
+
+
+class CalendarCube:
+    def __init__(self):
+        self.days = _Block(N_SLOTS)
+        self.weekdays = _Block(7)
+        self.version = 0
+        self._lock = threading.Lock()
+
+    # ---------- build / maintain ----------
+
+    @staticmethod
+    def _prepare(dates: Sequence[Any], whites: Any, pbs: Any) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        d = np.asarray(dates, dtype="datetime64[D]")
+        w = np.asarray(whites, dtype=np.int64).reshape(-1, 5)
+        p = np.asarray(pbs, dtype=np.int64).reshape(-1)
+        ok = ~np.isnat(d) & (w >= 1).all(axis=1) & (w <= WHITE_MAX).all(axis=1) & (p >= 1) & (p <= PB_MAX)
+        d, w, p = d[ok], w[ok], p[ok]
+
+        months = d.astype("datetime64[M]").astype(np.int64) % 12          # 0..11
+        dom = (d - d.astype("datetime64[M]")).astype(np.int64)             # 0..30
+        slots = _MONTH_OFFSET[months] + dom
+        weekday = (d.astype(np.int64) - 4) % 7                              # 1970-01-01 fue jueves -> 0=lunes
+        return slots, weekday, w, p
+
+    def _apply(self, dates, whites, pbs, sign: int) -> int:
+        slots, weekday, w, p = self._prepare(dates, whites, pbs)
+        if not len(slots):
+            return 0
+        with self._lock:
+            self.days.add(slots, w, p, sign)
+            self.weekdays.add(weekday, w, p, sign)
+            self.version += 1
+        return int(len(slots))
+
+    def add(self, dates, whites, pbs) -> int:
+        return self._apply(dates, whites, pbs, +1)
+
+    def remove(self, dates, whites, pbs) -> int:
+        return self._apply(dates, whites, pbs, -1)
+
+    @classmethod
+    def build(cls, dates, whites, pbs) -> "CalendarCube":
+        cube = cls()
+        cube.add(dates, whites, pbs)
+        return cube
+
+    # ---------- queries ----------
+
+    def by_date(self, month: int, day: int) -> Dict[str, Any]:
+        slot = calendar_slot(month, day)
+        # fecha imposible: ningún sorteo cae ahí (mismo resultado vacío que el filtro por día/mes)
+        return self.days.insights([] if slot is None else [slot])
+
+    def by_month(self, month: int) -> Dict[str, Any]:
+        start = int(_MONTH_OFFSET[int(month) - 1])
+        return self.days.insights(range(start, start + _MONTH_DAYS[int(month) - 1]))
+
+    def by_weekday(self, weekday: int) -> Dict[str, Any]:
+        """weekday: 0=lunes .. 6=domingo (date.weekday())."""
+        return self.weekdays.insights([int(weekday)])
+
+
+# ---------------------------------------------------------------------
+# Cache de proceso (una instancia por firma de la fuente de datos)
+# ---------------------------------------------------------------------
+_CUBE: Optional[CalendarCube] = None
+_CUBE_SIG: Optional[Hashable] = None
+_CUBE_LOCK = threading.Lock()
+
+
+def get_calendar_cube(signature: Hashable, loader: Callable[[], Tuple[Any, Any, Any]]) -> CalendarCube:
+    """
+    Devuelve el cubo para `signature`; si la firma cambió (p.ej. otro mtime del CSV) lo reconstruye
+    con loader() -> (dates, whites(N,5), pbs).
+    """
+    global _CUBE, _CUBE_SIG
+    if _CUBE is not None and _CUBE_SIG == signature:
+        return _CUBE
+    with _CUBE_LOCK:
+        if _CUBE is None or _CUBE_SIG != signature:
+            _CUBE = CalendarCube.build(*loader())
+            _CUBE_SIG = signature
+        return _CUBE
+
+
+def update_calendar_cube(
+    added: Sequence[Tuple[date, Sequence[int], int]],
+    removed: Sequence[Tuple[date, Sequence[int], int]] = (),
+    expected_signature: Optional[Hashable] = None,
+    new_signature: Optional[Hashable] = None,
+) -> bool:
+    """
+    Mantenimiento incremental tras una carga de sorteos: resta las versiones viejas (`removed`),
+    suma las nuevas (`added`) y adopta `new_signature` para no reconstruir en la siguiente petición.
+
+    Solo aplica si el cubo en memoria corresponde a `expected_signature` (el estado previo a la carga);
+    si no hay cubo o es de otra versión no hace nada y se reconstruirá perezosamente.
+    """
+    global _CUBE_SIG
+    with _CUBE_LOCK:
+        cube = _CUBE
+        if cube is None or (expected_signature is not None and _CUBE_SIG != expected_signature):
+            return False
+        for rows, fn in ((removed, cube.remove), (added, cube.add)):
+            if rows:
+                fn([r[0] for r in rows], [list(r[1]) for r in rows], [r[2] for r in rows])
+        if new_signature is not None:
+            _CUBE_SIG = new_signature
+        return True
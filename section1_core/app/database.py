@@ -1,7 +1,9 @@
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 
+from app import metrics
+
 # Compatibilidad: SQLAlchemy 2.x (DeclarativeBase) y 1.4 (declarative_base)
 try:
     from sqlalchemy.orm import DeclarativeBase  # SQLAlchemy 2.x
@@ -27,6 +29,15 @@ engine = create_engine(
     future=True,
 )
 
+# Consultas SQL ejecutadas (para /metrics); el listener solo suma un entero
+_DB_QUERIES = metrics.counter("db_queries_total", "Sentencias SQL ejecutadas por SQLAlchemy.")
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    _DB_QUERIES.inc()
+
+
 SessionLocal = sessionmaker(
     bind=engine,
     autocommit=False,
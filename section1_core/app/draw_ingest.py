@@ -0,0 +1,254 @@
+"""
+Ingesta incremental de sorteos: un solo pase ordenado cuando entra (o cambia) un draw.
+
+DrawIndex guarda los sorteos en columnas (fechas, blancas (n,5), PB) ordenadas por fecha y, derivados
+de ellas y mantenidos en el mismo pase:
+  - frecuencia de blancas (70,) y PB (27,)
+  - último índice en que salió cada número -> gaps (sorteos desde la última aparición)
+  - transiciones (70,70): blanca del sorteo t-1 -> blanca del sorteo t
+  - co-ocurrencias (70,70): pares de blancas en el mismo sorteo
+  - combo codes ordenados (recommender.combo_codes) -> "¿esta combinación ya salió?" por searchsorted
+
+El caso común (sorteo nuevo con fecha posterior a todas) es un append O(1) sobre los contadores.
+Cualquier otra cosa (fecha intermedia, reemplazo, borrado) invalida el índice y se reconstruye
+perezosamente en la siguiente lectura, en un pase vectorizado.
+
+on_new_draw(): registra hooks que corren después del commit con el DrawEvent (fechas añadidas/quitadas).
+"""
+from __future__ import annotations
+
+import logging
+import threading
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.recommender import combo_codes
+
+logger = logging.getLogger(__name__)
+
+WHITE_MAX = 69
+PB_MAX = 26
+
+DrawRow = Tuple[date, Sequence[int], int]
+
+
+class DrawIndex:
+    def __init__(self) -> None:
+        self.dates = np.empty(0, dtype="datetime64[D]")
+        self.whites = np.empty((0, 5), dtype=np.int16)
+        self.pbs = np.empty(0, dtype=np.int16)
+        self.white_freq = np.zeros(WHITE_MAX + 1, dtype=np.int64)
+        self.pb_freq = np.zeros(PB_MAX + 1, dtype=np.int64)
+        self.white_last = np.full(WHITE_MAX + 1, -1, dtype=np.int64)
+        self.pb_last = np.full(PB_MAX + 1, -1, dtype=np.int64)
+        self.transitions = np.zeros((WHITE_MAX + 1, WHITE_MAX + 1), dtype=np.int64)
+        self.cooccurrence = np.zeros((WHITE_MAX + 1, WHITE_MAX + 1), dtype=np.int64)
+        self.codes = np.empty(0, dtype=np.int64)
+        self.version = 0
+        self._lock = threading.Lock()
+
+    # ---------- build / maintain ----------
+
+    @staticmethod
+    def _prepare(dates: Sequence[Any], whites: Any, pbs: Any) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        d = np.asarray(dates, dtype="datetime64[D]")
+        w = np.sort(np.asarray(whites, dtype=np.int64).reshape(-1, 5), axis=1)
+        p = np.asarray(pbs, dtype=np.int64).reshape(-1)
+        ok = ~np.isnat(d) & (w >= 1).all(axis=1) & (w <= WHITE_MAX).all(axis=1) & (p >= 1) & (p <= PB_MAX)
+        d, w, p = d[ok], w[ok], p[ok]
+        order = np.argsort(d, kind="stable")
+        return d[order], w[order], p[order]
+
+    @classmethod
+    def build(cls, dates, whites, pbs) -> "DrawIndex":
+        idx = cls()
+        d, w, p = cls._prepare(dates, whites, pbs)
+        n = len(d)
+        idx.dates, idx.whites, idx.pbs = d, w.astype(np.int16), p.astype(np.int16)
+        if not n:
+            return idx
+
+        idx.white_freq = np.bincount(w.ravel(), minlength=WHITE_MAX + 1).astype(np.int64)
+        idx.pb_freq = np.bincount(p, minlength=PB_MAX + 1).astype(np.int64)
+
+        rows = np.repeat(np.arange(n), 5)
+        np.maximum.at(idx.white_last, w.ravel(), rows)
+        np.maximum.at(idx.pb_last, p, np.arange(n))
+
+        # pares (a, b) del mismo sorteo: 5x5 por fila menos la diagonal
+        a = np.repeat(w, 5, axis=1).ravel()
+        b = np.tile(w, (1, 5)).ravel()
+        keep = a != b
+        np.add.at(idx.cooccurrence, (a[keep], b[keep]), 1)
+
+        if n > 1:
+            prev = np.repeat(w[:-1], 5, axis=1).ravel()
+            nxt = np.tile(w[1:], (1, 5)).ravel()
+            np.add.at(idx.transitions, (prev, nxt), 1)
+
+        idx.codes = np.sort(combo_codes(w, p))
+        idx.version = 1
+        return idx
+
+    def append(self, draw_date: date, whites: Sequence[int], pb: int) -> bool:
+        """Agrega un sorteo posterior a todos los existentes. False si no aplica (el caller reconstruye)."""
+        d, w, p = self._prepare([draw_date], [list(whites)], [pb])
+        if not len(d):
+            return False
+        with self._lock:
+            if len(self.dates) and d[0] <= self.dates[-1]:
+                return False
+            i = len(self.dates)
+            ws = w[0]
+            self.white_freq[ws] += 1
+            self.pb_freq[p[0]] += 1
+            self.white_last[ws] = i
+            self.pb_last[p[0]] = i
+            self.cooccurrence[np.ix_(ws, ws)] += 1
+            self.cooccurrence[ws, ws] -= 1
+            if i:
+                self.transitions[np.ix_(self.whites[-1].astype(np.int64), ws)] += 1
+            code = combo_codes(w, p)
+            self.codes = np.insert(self.codes, np.searchsorted(self.codes, code), code)
+            self.dates = np.concatenate([self.dates, d])
+            self.whites = np.vstack([self.whites, w.astype(np.int16)])
+            self.pbs = np.concatenate([self.pbs, p.astype(np.int16)])
+            self.version += 1
+        return True
+
+    # ---------- queries ----------
+
+    def __len__(self) -> int:
+        return int(len(self.dates))
+
+    def white_gaps(self) -> np.ndarray:
+        """(70,) sorteos desde la última aparición; -1 = nunca salió."""
+        n = len(self.dates)
+        return np.where(self.white_last >= 0, n - 1 - self.white_last, -1)
+
+    def pb_gaps(self) -> np.ndarray:
+        n = len(self.dates)
+        return np.where(self.pb_last >= 0, n - 1 - self.pb_last, -1)
+
+    def contains(self, whites: Any, pbs: Any) -> np.ndarray:
+        """Máscara: cada (blancas, PB) ya salió en el histórico."""
+        w = np.asarray(whites, dtype=np.int64).reshape(-1, 5)
+        p = np.asarray(pbs, dtype=np.int64).reshape(-1)
+        codes = combo_codes(w, p)
+        if not len(self.codes):
+            return np.zeros(len(codes), dtype=bool)
+        pos = np.minimum(np.searchsorted(self.codes, codes), len(self.codes) - 1)
+        return self.codes[pos] == codes
+
+    def summary(self, top: int = 10) -> Dict[str, Any]:
+        """Vista JSON: frecuencias, gaps y los pares más comunes (transición / mismo sorteo)."""
+        def _top_pairs(m: np.ndarray, upper: bool) -> List[Dict[str, int]]:
+            mm = np.triu(m, 1) if upper else m
+            flat = mm.ravel()
+            k = int(min(top, np.count_nonzero(flat)))
+            if k <= 0:
+                return []
+            sel = np.argpartition(flat, -k)[-k:]
+            sel = sel[np.argsort(-flat[sel], kind="stable")]
+            a, b = np.divmod(sel, m.shape[1])
+            return [{"a": int(x), "b": int(y), "count": int(c)} for x, y, c in zip(a, b, flat[sel])]
+
+        n = len(self.dates)
+        return {
+            "count": int(n),
+            "version": int(self.version),
+            "first_date": str(self.dates[0]) if n else None,
+            "last_date": str(self.dates[-1]) if n else None,
+            "white_freq": {str(i): int(self.white_freq[i]) for i in range(1, WHITE_MAX + 1)},
+            "pb_freq": {str(i): int(self.pb_freq[i]) for i in range(1, PB_MAX + 1)},
+            "white_gaps": {str(i): int(g) for i, g in enumerate(self.white_gaps()) if i},
+            "pb_gaps": {str(i): int(g) for i, g in enumerate(self.pb_gaps()) if i},
+            "top_transitions": _top_pairs(self.transitions, upper=False),
+            "top_pairs": _top_pairs(self.cooccurrence, upper=True),
+        }
+
+
+# ---------------------------------------------------------------------
+# Cache de proceso (misma firma que el calendar cube: CSV mtime o DB count/max)
+# ---------------------------------------------------------------------
+_INDEX: Optional[DrawIndex] = None
+_INDEX_SIG: Optional[Hashable] = None
+_INDEX_LOCK = threading.Lock()
+
+
+def get_draw_index(signature: Hashable, loader: Callable[[], Tuple[Any, Any, Any]]) -> DrawIndex:
+    global _INDEX, _INDEX_SIG
+    if _INDEX is not None and _INDEX_SIG == signature:
+        return _INDEX
+    with _INDEX_LOCK:
+        if _INDEX is None or _INDEX_SIG != signature:
+            _INDEX = DrawIndex.build(*loader())
+            _INDEX_SIG = signature
+        return _INDEX
+
+
+def update_draw_index(
+    added: Sequence[DrawRow],
+    removed: Sequence[DrawRow] = (),
+    expected_signature: Optional[Hashable] = None,
+    new_signature: Optional[Hashable] = None,
+) -> str:
+    """
+    "appended": sorteos nuevos al final aplicados en el índice en memoria.
+    "invalidated": hubo reemplazos/fechas intermedias -> se reconstruye en la próxima lectura.
+    "skipped": no hay índice o es de otra versión de la fuente.
+    """
+    global _INDEX, _INDEX_SIG
+    with _INDEX_LOCK:
+        idx = _INDEX
+        if idx is None or (expected_signature is not None and _INDEX_SIG != expected_signature):
+            return "skipped"
+        if removed:
+            _INDEX, _INDEX_SIG = None, None
+            return "invalidated"
+        for d, ws, pb in sorted(added, key=lambda r: r[0]):
+            if not idx.append(d, ws, pb):
+                _INDEX, _INDEX_SIG = None, None
+                return "invalidated"
+        if new_signature is not None:
+            _INDEX_SIG = new_signature
+        return "appended"
+
+
+# ---------------------------------------------------------------------
+# Hooks "on new draw"
+# ---------------------------------------------------------------------
+@dataclass
+class DrawEvent:
+    source: str                                   # "draw_results" | "draws_upload" | "import_excel"
+    added: List[DrawRow] = field(default_factory=list)
+    removed: List[DrawRow] = field(default_factory=list)
+    tickets_rescored: int = 0
+    steps: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def dates(self) -> List[date]:
+        return sorted({r[0] for r in self.added} | {r[0] for r in self.removed})
+
+
+DrawHook = Callable[[DrawEvent], None]
+_HOOKS: List[DrawHook] = []
+
+
+def on_new_draw(fn: DrawHook) -> DrawHook:
+    """Registra `fn(event)`; corre después del commit, en orden de registro. Usable como decorador."""
+    if fn not in _HOOKS:
+        _HOOKS.append(fn)
+    return fn
+
+
+def run_draw_hooks(event: DrawEvent) -> None:
+    for fn in list(_HOOKS):
+        try:
+            fn(event)
+        except Exception:
+            # un hook roto no deshace una ingesta ya commiteada
+            logger.exception("on_new_draw hook %r failed", fn)
@@ -0,0 +1,41 @@
+"""
+Imports perezosos para librerías pesadas (pandas, numpy, ...).
+
+`pd = lazy_module("pandas")` se comporta como el módulo: el import real ocurre en el primer acceso a un
+atributo (pd.DataFrame, pd.read_csv, ...), así que importar app.main no paga su costo de arranque.
+"""
+from __future__ import annotations
+
+import importlib
+import threading
+from types import ModuleType
+from typing import Any, Optional
+
+
+class LazyModule:
+    __slots__ = ("_name", "_mod", "_lock")
+
+    def __init__(self, name: str):
+        self._name = name
+        self._mod: Optional[ModuleType] = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> ModuleType:
+        mod = self._mod
+        if mod is None:
+            with self._lock:
+                if self._mod is None:
+                    self._mod = importlib.import_module(self._name)
+                mod = self._mod
+        return mod
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._load(), attr)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._mod is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def lazy_module(name: str) -> LazyModule:
+    return LazyModule(name)
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import itertools
 import json
 import os
 import random
@@ -7,14 +8,14 @@ import re
 import tempfile
 import time
 from collections import Counter, defaultdict
+from contextlib import asynccontextmanager
 from datetime import date, datetime
 from io import BytesIO
 from pathlib import Path as FilePath
 from statistics import mean
-from typing import Any, Dict, List, Literal, Optional, Tuple
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Literal, Optional, Tuple
 from urllib.parse import quote_plus
 
-import pandas as pd
 from fastapi import (
     Body,
     Depends,
@@ -30,127 +31,39 @@ from fastapi import (
 from fastapi.responses import (
     HTMLResponse,
     JSONResponse,
+    PlainTextResponse,
     RedirectResponse,
     StreamingResponse,
 )
-from openpyxl.styles import Font, PatternFill
 from pydantic import BaseModel, ConfigDict
-from sqlalchemy import asc, desc, extract, func, text
+from sqlalchemy import asc, bindparam, desc, extract, func, text
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from starlette.middleware.cors import CORSMiddleware
 from starlette.middleware.gzip import GZipMiddleware
 
 # ✅ IMPORTS CORREGIDOS (estructura app/)
 from app.database import Base, SessionLocal, engine
-from app.models import DrawResult, Ticket
+from app.lazy_imports import lazy_module
+from app import metrics, ui_render
+from app.models import DrawResult, Ticket, ticket_combo_key
+from app.single_flight import DEFAULT_STALE_SECONDS, DEFAULT_TTL_SECONDS, SingleFlight, make_key
 
+# Librerías pesadas: se importan en el primer uso (arranque en frío rápido; ver scripts/import_budget.py)
+pd = lazy_module("pandas")
+np = lazy_module("numpy")
+calendar_cube = lazy_module("app.calendar_cube")
+draw_ingest = lazy_module("app.draw_ingest")
+recommender = lazy_module("app.recommender")
 
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
+if TYPE_CHECKING:
+    import numpy as np  # noqa: F811
+    import pandas as pd  # noqa: F811
+    from app.calendar_cube import CalendarCube
+    from app.draw_ingest import DrawIndex
 
 
 
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-
-
-
-app = FastAPI(title="Powerball API")
-
-@app.get("/")
-def root():
-    return {"status": "ok"}
-
-
-
-@app.get("/api/dashboard/summary")
-def dashboard_summary():
-    return {
-        "kpis": [
-            {"id": "k1", "label": "Registros", "value": 3},
-            {"id": "k2", "label": "Draws", "value": 35},
-            {"id": "k3", "label": "Estado", "value": "BACKEND"},
-        ],
-        "main": {
-            "title": "Zona de resultados",
-            "message": "Datos servidos por FastAPI local",
-        },
-        "side": {
-            "title": "Filtros / Acciones",
-            "message": "Backend conectado correctamente",
-        },
-    }
-
-@app.get("/api/history")
-def history():
-    return [
-        {"id": 1, "date": "2025-12-22", "draws": 12, "note": "Backend OK"},
-        {"id": 2, "date": "2025-12-21", "draws": 8, "note": "FastAPI conectado"},
-        {"id": 3, "date": "2025-12-20", "draws": 15, "note": "Sin STUB"},
-    ]
-
-
-
-
-
-app = FastAPI(title="Powerball API")
-
-# CORS para Vite
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["http://localhost:5173"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-@app.get("/")
-def root():
-    return {"status": "ok"}
-
-@app.get("/api/dashboard/summary")
-def dashboard_summary():
-    return {
-        "kpis": [
-            {"id": "k1", "label": "Registros", "value": 3},
-            {"id": "k2", "label": "Draws", "value": 35},
-            {"id": "k3", "label": "Estado", "value": "BACKEND"},
-        ],
-        "main": {
-            "title": "Zona de resultados",
-            "message": "Datos servidos por FastAPI local",
-        },
-        "side": {
-            "title": "Filtros / Acciones",
-            "message": "Backend conectado correctamente",
-        },
-    }
-
-@app.get("/api/history")
-def history():
-    return [
-        {"id": 1, "date": "2025-12-22", "draws": 12, "note": "Backend OK"},
-        {"id": 2, "date": "2025-12-21", "draws": 8, "note": "FastAPI conectado"},
-        {"id": 3, "date": "2025-12-20", "draws": 15, "note": "Sin STUB"},
-    ]
-
-
-
-# ---------------------------------------------------------------------
-# FastAPI app
-# ---------------------------------------------------------------------
-app = FastAPI(title="Powerball AI")
-
-app.add_middleware(GZipMiddleware, minimum_size=1000)
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-
 # ---------------------------------------------------------------------
 # DB dependency
 # ---------------------------------------------------------------------
@@ -223,10 +136,17 @@ def _parse_date_flexible(s: str, year: int | None = None) -> date:
     raise HTTPException(400, f"Formato de fecha inválido: '{s}'. Usa YYYY-MM-DD o MM-DD.")
 
 
+@asynccontextmanager
+async def _lifespan(_app: FastAPI):
+    _init_db()
+    yield
+
+
 app = FastAPI(
     title="Powerball + IA API",
     description="Backend para gestionar jugadas de Powerball.",
     version="1.2.0",
+    lifespan=_lifespan,
 )
 
 
@@ -276,6 +196,8 @@ def _df_to_xlsx_stream(
         existing.add(candidate)
         return candidate
 
+    from openpyxl.styles import Font
+
     with pd.ExcelWriter(buf, engine="openpyxl") as writer:
         used_names: set[str] = set()
         for sheet_name, df in sheets.items():
@@ -677,6 +599,130 @@ def _insights(draws_df: pd.DataFrame) -> Dict[str, Any]:
         "avg_sum_white": round(avg_sum, 2),
     }
 
+# ---------------------------
+# Calendar cube (insights por MM-DD / día de semana / mes)
+# ---------------------------
+def _draws_csv_path() -> str:
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    return POWERBALL_DRAWS_CSV if os.path.isabs(POWERBALL_DRAWS_CSV) else os.path.join(base_dir, POWERBALL_DRAWS_CSV)
+
+
+def _draws_source_signature(db: Optional[Session] = None) -> Tuple[Any, ...]:
+    """
+    Firma barata de la fuente que usa _load_draws: (mtime, tamaño) del CSV, o conteo/máximos de la DB más
+    la versión de draw_results (data_versions), que también cambia con correcciones in-place hechas en
+    cualquier worker.
+    """
+    csv_path = _draws_csv_path()
+    try:
+        st = os.stat(csv_path)
+        return ("csv", csv_path, st.st_mtime_ns, st.st_size)
+    except OSError:
+        pass
+    if db is None:
+        return ("none",)
+    n, max_id, max_date = db.query(func.count(DrawResult.id), func.max(DrawResult.id), func.max(DrawResult.draw_date)).one()
+    return ("db", int(n or 0), int(max_id or 0), str(max_date), ui_render.data_version(db, DrawResult.__tablename__))
+
+
+def _draws_arrays(db: Optional[Session] = None) -> Tuple[Any, Any, Any]:
+    """(dates, whites (N,5), pbs) de la misma fuente que _load_draws."""
+    df = _load_draws(db=db)
+    if df.empty:
+        return [], np.empty((0, 5), dtype=np.int64), []
+    return df["draw_date"].values, df[WHITE_COLS].to_numpy(dtype=np.int64), df["pb"].to_numpy(dtype=np.int64)
+
+
+def _calendar_cube(db: Optional[Session] = None) -> "CalendarCube":
+    # Sin CSV la firma es la de la DB y el loader cae a DrawResult (mismo fallback que _load_draws).
+    return calendar_cube.get_calendar_cube(_draws_source_signature(db), lambda: _draws_arrays(db))
+
+
+def _draw_index(db: Optional[Session] = None) -> "DrawIndex":
+    return draw_ingest.get_draw_index(_draws_source_signature(db), lambda: _draws_arrays(db))
+
+
+def _rescore_tickets_for_dates(db: Session, draws_by_date: Dict[date, Optional[DrawResult]]) -> int:
+    """
+    Recalcula matches/prize solo de los tickets de esas fechas (sin commit; va en la transacción del
+    caller). draws_by_date[d] = None -> el draw se borró: limpia los matches de esa fecha.
+    """
+    today = date.today()
+    touched = 0
+    dates = list(draws_by_date.keys())
+    for i in range(0, len(dates), 500):
+        chunk = dates[i:i + 500]
+        for t in db.query(Ticket).filter(Ticket.draw_date.in_(chunk)).yield_per(500):
+            dr = draws_by_date.get(t.draw_date)
+            try:
+                if dr is None:
+                    t.matched_regular_numbers = 0
+                    t.matched_powerball = False
+                    t.prize_amount = 0.0
+                else:
+                    # Compatibilidad pb/powerball para calculate_matches()
+                    if not hasattr(t, "powerball") and hasattr(t, "pb"):
+                        try:
+                            setattr(t, "powerball", getattr(t, "pb"))
+                        except Exception:
+                            pass
+                    calculate_matches(t, dr)
+                    # Status PAST si ya pasó
+                    if getattr(t, "draw_date", None) and t.draw_date <= today:
+                        t.status = "PAST"
+                touched += 1
+            except Exception:
+                # Ticket corrupto o inesperado: no rompe el proceso completo
+                continue
+    return touched
+
+
+def _after_draws_committed(
+    db: Session,
+    source: str,
+    added: List[Tuple[date, List[int], int]],
+    removed: List[Tuple[date, List[int], int]],
+    sig_before: Tuple[Any, ...],
+    mirrors_db: bool,
+    tickets_rescored: int = 0,
+) -> Dict[str, Any]:
+    """
+    Pipeline "on new draw", después del commit (la versión de datos de la UI ya subió con el flush):
+      1) calendar cube y DrawIndex: aplica el delta si la fuente reflejaba la DB antes de la carga y la
+         sigue reflejando después (fuente DB, o CSV re-exportado en esta misma operación)
+      2) si no se pudo aplicar el delta, los reconstruye aquí mismo: el tráfico post-sorteo encuentra
+         los caches calientes en lugar de reconstruirlos todos a la vez
+      3) hooks registrados con draw_ingest.on_new_draw
+    Los /insights/* cacheados en _INSIGHTS_FLIGHT se descartan antes de recalentar.
+    """
+    steps: Dict[str, Any] = {}
+    if not added and not removed:
+        return steps
+    _INSIGHTS_FLIGHT.invalidate()
+
+    if mirrors_db:
+        sig_after = _draws_source_signature(db)
+        steps["calendar_cube"] = "delta" if calendar_cube.update_calendar_cube(
+            added, removed, expected_signature=sig_before, new_signature=sig_after
+        ) else "skipped"
+        steps["draw_index"] = draw_ingest.update_draw_index(
+            added, removed, expected_signature=sig_before, new_signature=sig_after
+        )
+    else:
+        steps["calendar_cube"] = steps["draw_index"] = "source_unchanged"
+
+    try:
+        _calendar_cube(db)
+        _draw_index(db)
+        steps["warm"] = True
+    except HTTPException:
+        steps["warm"] = False
+
+    event = draw_ingest.DrawEvent(source=source, added=list(added), removed=list(removed),
+                                  tickets_rescored=int(tickets_rescored), steps=steps)
+    draw_ingest.run_draw_hooks(event)
+    return steps
+
 def _load_tickets(db: Optional[Session] = None) -> pd.DataFrame:
     """
     Carga tickets desde CSV (ruta absoluta) y, si no existe, hace fallback a DB (Ticket).
@@ -728,14 +774,57 @@ def draws_by_date(
     out2["draw_date"] = out2["draw_date"].dt.strftime("%Y-%m-%d")
     return {"count": int(len(out2)), "items": out2.to_dict(orient="records")}
 
+# Insights idénticos y concurrentes: una sola ejecución por (params, firma de la fuente). La firma lleva
+# la versión de draw_results, así que otros workers también ven las correcciones in-place.
+_INSIGHTS_FLIGHT = SingleFlight("insights")
+
+
+def _insights_single_flight(db: Session, name: str, fn: Callable[["CalendarCube"], Dict[str, Any]], **params):
+    def compute() -> Dict[str, Any]:
+        # Sesión propia: con stale > 0 esto corre en un hilo de fondo después de que get_db cerró `db`
+        own = SessionLocal()
+        try:
+            return fn(_calendar_cube(own))
+        finally:
+            own.close()
+
+    return _INSIGHTS_FLIGHT.do(
+        make_key(name, params),
+        compute,
+        version=_draws_source_signature(db),
+        ttl=DEFAULT_TTL_SECONDS,
+        stale=DEFAULT_STALE_SECONDS,
+    )
+
 @app.get("/insights/by-date")
 def insights_by_date(
     month: int = Query(..., ge=1, le=12),
     day: int = Query(..., ge=1, le=31),
+    db: Session = Depends(get_db),
 ):
-    df = _load_draws()
-    draws_day = _filter_draws_by_day(df, day=day, month=month)
-    return _insights(draws_day)
+    return _insights_single_flight(db, "by_date", lambda cube: cube.by_date(month, day), month=month, day=day)
+
+@app.get("/insights/by-weekday")
+def insights_by_weekday(
+    weekday: int = Query(..., ge=0, le=6, description="0=lunes .. 6=domingo"),
+    db: Session = Depends(get_db),
+):
+    return _insights_single_flight(db, "by_weekday", lambda cube: cube.by_weekday(weekday), weekday=weekday)
+
+@app.get("/insights/by-month")
+def insights_by_month(
+    month: int = Query(..., ge=1, le=12),
+    db: Session = Depends(get_db),
+):
+    return _insights_single_flight(db, "by_month", lambda cube: cube.by_month(month), month=month)
+
+@app.get("/insights/draw-index")
+def insights_draw_index(
+    top: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db),
+):
+    # Índice mantenido por la ingesta incremental (app/draw_ingest.py)
+    return _draw_index(db).summary(top=top)
 
 @app.get("/compare/by-date")
 def compare_by_date(
@@ -862,16 +951,48 @@ def _read_upload_to_df(file: UploadFile) -> pd.DataFrame:
 
 
 
-def _upsert_draws(db: Session, df: pd.DataFrame) -> Dict[str, int]:
+def _upsert_draws(
+    db: Session,
+    df: pd.DataFrame,
+    changes: Optional[Dict[str, list]] = None,
+    rescore_tickets: bool = False,
+) -> Dict[str, int]:
+    """
+    Inserta/actualiza DrawResult por draw_date.
+    Si se pasa `changes`, acumula ahí las filas (date, whites, pb) añadidas y las versiones previas
+    reemplazadas, para mantener el calendar cube / DrawIndex de forma incremental.
+    rescore_tickets=True recalcula los tickets de las fechas tocadas en la misma transacción.
+    """
     inserted = 0
     updated = 0
+    tickets_rescored = 0
 
     try:
-        for row in df.to_dict(orient="records"):
+        records = df.to_dict(orient="records")
+        # un SELECT por bloque de fechas en lugar de uno por fila
+        dates = sorted({r["date"] for r in records})
+        by_date: Dict[date, DrawResult] = {}
+        for i in range(0, len(dates), 500):
+            for dr in db.query(DrawResult).filter(DrawResult.draw_date.in_(dates[i:i + 500])):
+                by_date[dr.draw_date] = dr
+
+        for row in records:
             draw_date: date = row["date"]
+            new_row = (
+                draw_date,
+                [int(row[f"white{i}"]) for i in range(1, 6)],
+                int(row["powerball"]),
+            )
 
-            existing = db.query(DrawResult).filter(DrawResult.draw_date == draw_date).first()
+            existing = by_date.get(draw_date)
             if existing:
+                if changes is not None:
+                    changes["removed"].append((
+                        existing.draw_date,
+                        [existing.wn1, existing.wn2, existing.wn3, existing.wn4, existing.wn5],
+                        existing.winning_powerball,
+                    ))
+                    changes["added"].append(new_row)
                 existing.wn1 = int(row["white1"])
                 existing.wn2 = int(row["white2"])
                 existing.wn3 = int(row["white3"])
@@ -880,7 +1001,7 @@ def _upsert_draws(db: Session, df: pd.DataFrame) -> Dict[str, int]:
                 existing.winning_powerball = int(row["powerball"])
                 updated += 1
             else:
-                db.add(DrawResult(
+                by_date[draw_date] = DrawResult(
                     draw_date=draw_date,
                     wn1=int(row["white1"]),
                     wn2=int(row["white2"]),
@@ -888,15 +1009,25 @@ def _upsert_draws(db: Session, df: pd.DataFrame) -> Dict[str, int]:
                     wn4=int(row["white4"]),
                     wn5=int(row["white5"]),
                     winning_powerball=int(row["powerball"]),
-                ))
+                )
+                db.add(by_date[draw_date])
+                if changes is not None:
+                    changes["added"].append(new_row)
                 inserted += 1
 
+        if rescore_tickets and dates:
+            db.flush()
+            tickets_rescored = _rescore_tickets_for_dates(db, {d: by_date[d] for d in dates})
         db.commit()
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Error guardando draws en DB: {e}")
 
-    return {"inserted": inserted, "updated": updated, "total": int(len(df))}
+    return {"inserted": inserted, "updated": updated, "total": int(len(df)), "tickets_rescored": tickets_rescored}
+
+
+# firma del CSV tal como lo dejó la última exportación desde la DB (CSV == DB mientras coincida)
+_LAST_EXPORT_SIG: Optional[Tuple[Any, ...]] = None
 
 
 def _export_db_to_csv(db: Session) -> None:
@@ -920,6 +1051,9 @@ def _export_db_to_csv(db: Session) -> None:
     out["date"] = pd.to_datetime(out["date"]).dt.date.astype(str)
     out.to_csv(CSV_PATH, index=False)
 
+    global _LAST_EXPORT_SIG
+    _LAST_EXPORT_SIG = _draws_source_signature(db)
+
 
 def get_db():
     db = SessionLocal()
@@ -938,11 +1072,23 @@ def upload_draws(
     df_raw = _read_upload_to_df(file)
     df = _normalize_draws_df(df_raw)
 
-    stats = _upsert_draws(db, df)
+    sig_before = _draws_source_signature(db)
+    # fuente DB, o CSV que nosotros mismos exportamos desde la DB -> el cubo refleja la DB
+    cube_mirrors_db = sig_before[0] == "db" or sig_before == _LAST_EXPORT_SIG
+    changes: Dict[str, list] = {"added": [], "removed": []}
+    stats = _upsert_draws(db, df, changes=changes, rescore_tickets=True)
 
     if export_csv:
         _export_db_to_csv(db)
 
+    # Calendar cube / DrawIndex: aplicar el delta en lugar de reconstruir. Solo es exacto si la fuente
+    # reflejaba la DB antes de la carga y la sigue reflejando después.
+    ingest = _after_draws_committed(
+        db, "draws_upload", changes["added"], changes["removed"], sig_before,
+        mirrors_db=cube_mirrors_db and (sig_before[0] == "db" or export_csv),
+        tickets_rescored=stats["tickets_rescored"],
+    )
+
     return {
         "ok": True,
         "filename": file.filename,
@@ -952,6 +1098,8 @@ def upload_draws(
         "updated": stats["updated"],
         "exported_csv": bool(export_csv),
         "csv_path": str(CSV_PATH) if export_csv else None,
+        "tickets_rescored": stats["tickets_rescored"],
+        "ingest": ingest,
     }
 
 # ---------------------------
@@ -1046,18 +1194,8 @@ def insights_by_date_export_csv(
     day: int = Query(..., ge=1, le=31),
     db: Session = Depends(get_db),
 ):
-    # 1) Intento normal (CSV si existe)
-    try:
-        df = _load_draws()
-    except HTTPException:
-        df = pd.DataFrame()
-
-    # 2) Fallback real a DB si no hay datos
-    if df is None or df.empty:
-        df = _load_draws(db=db)
-
-    draws_day = _filter_draws_by_day(df, day=day, month=month)
-    ins = _insights(draws_day)
+    # CSV si existe; si no, DB (el cubo usa la misma fuente que _load_draws)
+    ins = _calendar_cube(db).by_date(month, day)
 
     # CSV en formato "long": category, metric, value, number, frequency
     rows: List[Dict[str, Any]] = []
@@ -1130,18 +1268,8 @@ def insights_by_date_export_xlsx(
     day: int = Query(..., ge=1, le=31),
     db: Session = Depends(get_db),
 ):
-    # 1) Intento normal (CSV si existe)
-    try:
-        df = _load_draws()
-    except HTTPException:
-        df = pd.DataFrame()
-
-    # 2) Fallback real a DB si no hay datos
-    if df is None or df.empty:
-        df = _load_draws(db=db)
-
-    draws_day = _filter_draws_by_day(df, day=day, month=month)
-    ins = _insights(draws_day)
+    # CSV si existe; si no, DB (el cubo usa la misma fuente que _load_draws)
+    ins = _calendar_cube(db).by_date(month, day)
 
     df_summary = pd.DataFrame([{
         "month": int(month),
@@ -1716,6 +1844,11 @@ def _set_compare_cache(key: str, value: dict) -> None:
     _COMPARE_CACHE[key] = (now, value)
 
 
+@metrics.register_collector
+def _compare_cache_samples():
+    return [("cache_entries", "gauge", "Entradas en caches de proceso.", {"cache": "compare"}, len(_COMPARE_CACHE))]
+
+
 # -------------------------
 #   CONFIG / CONSTANTS
 # -------------------------
@@ -1725,18 +1858,14 @@ PB_MIN, PB_MAX = 1, 26
 ALLOWED_TYPES = {"QUICK_PICK", "MANUAL"}
 ALLOWED_STATUS = {"PAST", "FUTURE"}
 
-# Estilos Excel
-FILL_AQUA = PatternFill(start_color="B7EDE6", end_color="B7EDE6", fill_type="solid")  # verde agua
-FILL_PB = PatternFill(start_color="FFD6D6", end_color="FFD6D6", fill_type="solid")    # rojo suave
-RED_FONT = Font(color="FF0000", bold=True)
+# Estilos Excel (openpyxl se importa solo al exportar)
+def _xlsx_highlight_styles():
+    from openpyxl.styles import Font, PatternFill
 
-# Crear tablas (idempotente)
-try:
-    Base.metadata.create_all(bind=engine)
-except Exception as e:
-    # No romper el arranque por DB no disponible (ej. en docs/tests)
-    # Si necesitas que sea hard-fail en prod, luego lo hacemos configurable.
-    print(f"[WARN] Base.metadata.create_all failed: {e}")
+    fill_aqua = PatternFill(start_color="B7EDE6", end_color="B7EDE6", fill_type="solid")  # verde agua
+    fill_pb = PatternFill(start_color="FFD6D6", end_color="FFD6D6", fill_type="solid")    # rojo suave
+    red_font = Font(color="FF0000", bold=True)
+    return fill_aqua, fill_pb, red_font
 
 
 
@@ -1760,6 +1889,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Latencia por ruta + status para /metrics (la más externa: mide también CORS y gzip)
+app.add_middleware(metrics.MetricsMiddleware)
 
 # -------------------------
 #        DB DEP
@@ -1812,8 +1943,8 @@ def validate_ticket_numbers(n1: int, n2: int, n3: int, n4: int, n5: int, pb: int
 
 
 def numbers_key(regs: List[int], pb: int) -> str:
-    r = sorted(int(x) for x in regs)
-    return f"{r[0]}-{r[1]}-{r[2]}-{r[3]}-{r[4]}|{int(pb)}"
+    # mismo formato que Ticket.combo_key
+    return ticket_combo_key(regs, pb)
 
 
 def _quote(v: Optional[str]) -> str:
@@ -1938,10 +2069,9 @@ def _ensure_indexes() -> None:
     - Otros motores: puede variar, por eso se encapsula en try/except.
     """
     stmts = [
-        "CREATE INDEX IF NOT EXISTS ix_ticket_status ON ticket(status)",
-        "CREATE INDEX IF NOT EXISTS ix_ticket_draw_date ON ticket(draw_date)",
-        "CREATE INDEX IF NOT EXISTS ix_ticket_type ON ticket(type)",
-        "CREATE INDEX IF NOT EXISTS ix_drawresult_draw_date ON draw_result(draw_date)",
+        # draw_date ya está indexado desde el modelo (tickets y draw_results)
+        "CREATE INDEX IF NOT EXISTS ix_ticket_status ON tickets(status)",
+        "CREATE INDEX IF NOT EXISTS ix_ticket_type ON tickets(type)",
     ]
 
     try:
@@ -1957,13 +2087,71 @@ def _ensure_indexes() -> None:
         pass
 
 
-@app.on_event("startup")
-def _on_startup():
+def _ensure_ticket_combo_key(batch_size: int = 5000) -> None:
+    """
+    DBs creadas antes de tickets.combo_key: agrega la columna, rellena las filas sin clave y crea el
+    índice único (draw_date, combo_key). Si ya hay duplicados legacy, solo el id más bajo de cada
+    grupo recibe clave (el resto queda NULL hasta limpiarlos desde /admin/duplicates).
+    """
+    try:
+        from sqlalchemy import inspect as sa_inspect
+
+        if "tickets" not in sa_inspect(engine).get_table_names():
+            return
+        cols = {c["name"] for c in sa_inspect(engine).get_columns("tickets")}
+        with engine.begin() as conn:
+            if "combo_key" not in cols:
+                conn.execute(text("ALTER TABLE tickets ADD COLUMN combo_key VARCHAR(20)"))
+
+            taken = {
+                (str(d), k)
+                for d, k in conn.execute(text("SELECT draw_date, combo_key FROM tickets WHERE combo_key IS NOT NULL"))
+            }
+            pending = conn.execute(text(
+                "SELECT id, draw_date, n1, n2, n3, n4, n5, powerball FROM tickets "
+                "WHERE combo_key IS NULL ORDER BY id"
+            )).fetchall()
+
+            updates: List[Dict[str, Any]] = []
+            for tid, d, n1, n2, n3, n4, n5, pb in pending:
+                try:
+                    key = ticket_combo_key([n1, n2, n3, n4, n5], pb)
+                except (TypeError, ValueError):
+                    continue
+                if (str(d), key) in taken:
+                    continue
+                taken.add((str(d), key))
+                updates.append({"id": int(tid), "k": key})
+
+            stmt = text("UPDATE tickets SET combo_key = :k WHERE id = :id")
+            for i in range(0, len(updates), batch_size):
+                conn.execute(stmt, updates[i:i + batch_size])
+
+            conn.execute(text(
+                "CREATE UNIQUE INDEX IF NOT EXISTS ux_tickets_draw_date_combo_key ON tickets(draw_date, combo_key)"
+            ))
+    except Exception as e:
+        print(f"[WARN] _ensure_ticket_combo_key failed: {e}")
+
+
+def _init_db() -> None:
+    """Schema + índices. Se llama desde el lifespan de la app, no al importar el módulo."""
+    # Crear tablas (idempotente)
+    try:
+        Base.metadata.create_all(bind=engine)
+    except Exception as e:
+        # No romper el arranque por DB no disponible (ej. en docs/tests)
+        print(f"[WARN] Base.metadata.create_all failed: {e}")
+
+    # Versión por tabla de tickets/draw_results (ETags de la UI, caches de sorteos)
+    ui_render.ensure_data_version(engine, (Ticket.__tablename__, DrawResult.__tablename__))
+
     # Upgrade: evitar trabajo innecesario en procesos donde no quieres tocar DB
     # (por ejemplo tests, builds, docs), si se desactiva con env.
     if os.getenv("DISABLE_DB_INDEXES", "").strip() in ("1", "true", "TRUE", "yes", "YES"):
         return
     _ensure_indexes()
+    _ensure_ticket_combo_key()
 
 
 # -------------------------
@@ -2237,55 +2425,49 @@ def _match_counts(base_regs: set, base_pb: int, t: Ticket) -> Tuple[int, bool]:
     return mr, mpb
 
 
-def _filter_tickets_for_ai(payload: Any, db: Session) -> List[Ticket]:
-    q = db.query(Ticket)
-
-    # Status
-    p_status = getattr(payload, "status", None)
-    if p_status:
-        q = q.filter(Ticket.status == p_status)
-
-    # Type: normalizamos usando tu helper (acepta QP/QUICKPICK/etc)
-    p_type = getattr(payload, "type", None)
-    if p_type:
-        ttype = _norm_type(p_type)
-        if ttype:
-            q = q.filter(Ticket.type == ttype)
-
-    # Fechas
-    p_start = getattr(payload, "start_date", None)
-    if p_start:
-        q = q.filter(Ticket.draw_date >= p_start)
-
-    p_end = getattr(payload, "end_date", None)
-    if p_end:
-        q = q.filter(Ticket.draw_date <= p_end)
+def _existing_keys_for_draw(db: Session, draw_date_val: date) -> set:
+    # combo_key persistido: una columna indexada, sin re-derivar la clave por fila
+    rows = db.query(Ticket.combo_key).filter(Ticket.draw_date == draw_date_val, Ticket.combo_key.isnot(None)).all()
+    return {r[0] for r in rows}
 
-    # Upgrade: evita traer columnas extra por relaciones/cargas pesadas (si existieran)
-    # (sin tocar el modelo, esto ya ayuda en algunos ORM setups)
-    return q.all()
 
+def _count_tickets_for_draw(db: Session, draw_date_val: date) -> int:
+    return int(db.query(func.count(Ticket.id)).filter(Ticket.draw_date == draw_date_val).scalar() or 0)
 
-def _existing_keys_for_draw(db: Session, draw_date_val: date) -> set:
-    # Upgrade: select solo columnas necesarias (reduce carga)
-    rows = (
-        db.query(Ticket.n1, Ticket.n2, Ticket.n3, Ticket.n4, Ticket.n5, getattr(Ticket, "pb", Ticket.powerball))
-        .filter(Ticket.draw_date == draw_date_val)
-        .all()
-    )
 
-    out = set()
-    for r in rows:
-        # r puede ser tuple (n1..n5,pb) o Row
-        try:
-            n1, n2, n3, n4, n5, pb = r
-        except Exception:
-            n1, n2, n3, n4, n5 = r[0], r[1], r[2], r[3], r[4]
-            pb = r[5] if len(r) > 5 else getattr(r, "pb", getattr(r, "powerball", None))
+def _bulk_insert_tickets_ignore_duplicates(db: Session, rows: List[Dict[str, Any]], batch_size: int = 1000) -> None:
+    """
+    INSERT ... ON CONFLICT (draw_date, combo_key) DO NOTHING en lotes (executemany).
+    SQLite/Postgres resuelven el dedupe en la DB; otros motores filtran contra las claves existentes.
+    Las filas deben traer combo_key (el evento ORM no corre en inserts Core).
+    """
+    if not rows:
+        return
+    dialect = db.get_bind().dialect.name
+    table = Ticket.__table__
 
-        out.add(numbers_key([int(n1), int(n2), int(n3), int(n4), int(n5)], int(pb)))
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        stmt = dialect_insert(table).on_conflict_do_nothing(index_elements=["draw_date", "combo_key"])
+    else:
+        seen: Dict[Any, set] = {}
+        filtered = []
+        for r in rows:
+            keys = seen.get(r["draw_date"])
+            if keys is None:
+                keys = seen[r["draw_date"]] = _existing_keys_for_draw(db, r["draw_date"])
+            if r["combo_key"] in keys:
+                continue
+            keys.add(r["combo_key"])
+            filtered.append(r)
+        rows = filtered
+        stmt = table.insert()
 
-    return out
+    for i in range(0, len(rows), batch_size):
+        db.execute(stmt, rows[i:i + batch_size])
 
 # ============================================================
 # ✅ FIX: FUNCIÓN QUE TE FALTABA (AI generator)
@@ -2301,33 +2483,23 @@ def recommend_from_history(req: RecommendRequest, db: Session) -> RecommendRespo
 
     # RNG reproducible si seed viene, sino random seguro
     seed_val = int(req.seed) if req.seed is not None else random.randrange(1, 10**9)
-    rng = random.Random(seed_val)
 
-    tickets = _filter_tickets_for_ai(req, db)
-
-    reg_counter = Counter()
-    pb_counter = Counter()
-
-    # Compatibilidad pb/powerball
-    for t in tickets:
-        try:
-            reg_counter.update([int(t.n1), int(t.n2), int(t.n3), int(t.n4), int(t.n5)])
-        except Exception:
-            pass
-        try:
-            pb_val = getattr(t, "pb", None)
-            if pb_val is None:
-                pb_val = getattr(t, "powerball", None)
-            if pb_val is not None:
-                pb_counter.update([int(pb_val)])
-        except Exception:
-            pass
+    # Frecuencias agregadas en SQL y cacheadas por firma de filtro
+    freq = recommender.get_frequency_model(
+        db,
+        status=getattr(req, "status", None) or None,
+        ttype=_norm_type(req.type) if getattr(req, "type", None) else None,
+        start_date=getattr(req, "start_date", None),
+        end_date=getattr(req, "end_date", None),
+    )
+    reg_counts = freq.reg_counts.copy()
+    pb_counts = freq.pb_counts.copy()
 
     # fallback uniforme si no hay historial
-    if not reg_counter:
-        reg_counter.update({n: 1 for n in range(REG_MIN, REG_MAX + 1)})
-    if not pb_counter:
-        pb_counter.update({n: 1 for n in range(PB_MIN, PB_MAX + 1)})
+    if not reg_counts[REG_MIN:].any():
+        reg_counts[REG_MIN:REG_MAX + 1] = 1
+    if not pb_counts[PB_MIN:].any():
+        pb_counts[PB_MIN:PB_MAX + 1] = 1
 
     # restricciones
     fixed_first = int(req.fixed_first) if req.fixed_first is not None else None
@@ -2367,7 +2539,7 @@ def recommend_from_history(req: RecommendRequest, db: Session) -> RecommendRespo
 
     # pools top
     top_pool_regulars = max(5, min(69, int(req.top_pool_regulars or 25)))
-    top_regs = [n for (n, _) in reg_counter.most_common(top_pool_regulars)]
+    top_regs = recommender.top_numbers(reg_counts, top_pool_regulars)
 
     # asegurar que fijos estén presentes en pool
     for x in ([fixed_first] if fixed_first is not None else []) + fixed_numbers:
@@ -2383,7 +2555,7 @@ def recommend_from_history(req: RecommendRequest, db: Session) -> RecommendRespo
         raise HTTPException(status_code=400, detail="No hay suficientes números regulares disponibles (revisa excludes)")
 
     top_pool_powerballs = max(1, min(26, int(req.top_pool_powerballs or 10)))
-    top_pbs = [n for (n, _) in pb_counter.most_common(top_pool_powerballs)]
+    top_pbs = recommender.top_numbers(pb_counts, top_pool_powerballs)
 
     if fixed_pb is not None and fixed_pb not in top_pbs:
         top_pbs.append(fixed_pb)
@@ -2395,69 +2567,22 @@ def recommend_from_history(req: RecommendRequest, db: Session) -> RecommendRespo
     if not top_pbs:
         raise HTTPException(status_code=400, detail="No hay powerballs disponibles (revisa exclude_powerballs)")
 
-    # weights precomputados (upgrade performance)
-    reg_weights = {n: max(1, int(reg_counter.get(n, 1))) for n in range(REG_MIN, REG_MAX + 1)}
-    pb_weights = {n: max(1, int(pb_counter.get(n, 1))) for n in range(PB_MIN, PB_MAX + 1)}
+    # weights: frecuencia (mín. 1) dentro del pool, 0 fuera (máscara)
+    reg_weights = np.zeros(REG_MAX + 1, dtype=np.float64)
+    reg_weights[top_regs] = np.maximum(reg_counts[top_regs], 1)
+    pb_weights = np.zeros(PB_MAX + 1, dtype=np.float64)
+    pb_weights[top_pbs] = np.maximum(pb_counts[top_pbs], 1)
 
-    def pick_regs() -> List[int]:
-        locked: List[int] = []
-        if fixed_first is not None:
-            locked.append(fixed_first)
-        for x in fixed_numbers:
-            if x not in locked:
-                locked.append(x)
-
-        chosen = list(locked)
-        pool = [n for n in top_regs if n not in chosen]
-
-        # sampling sin repetición: choices + remove es ok con pool pequeño
-        while len(chosen) < 5 and pool:
-            weights = [reg_weights[n] for n in pool]
-            n = rng.choices(pool, weights=weights, k=1)[0]
-            chosen.append(n)
-            pool.remove(n)
-
-        # si no completa, rellena con universo permitido
-        chosen = list(dict.fromkeys(chosen))
-        if len(chosen) < 5:
-            universe = [n for n in range(REG_MIN, REG_MAX + 1) if n not in exclude_numbers and n not in chosen]
-            rng.shuffle(universe)
-            chosen.extend(universe[: (5 - len(chosen))])
-
-        if len(chosen) != 5 or len(set(chosen)) != 5:
-            raise HTTPException(status_code=400, detail="No pude generar combinación válida con las restricciones dadas")
-        return chosen
-
-    def pick_pb() -> int:
-        if fixed_pb is not None:
-            return fixed_pb
-        weights = [pb_weights[n] for n in top_pbs]
-        return rng.choices(top_pbs, weights=weights, k=1)[0]
+    locked = ([fixed_first] if fixed_first is not None else []) + fixed_numbers
+    regs_arr, pbs_arr = recommender.sample_combos(reg_weights, pb_weights, k=k, seed=seed_val, locked=locked, fixed_pb=fixed_pb)
+    if len(regs_arr) == 0:
+        raise HTTPException(status_code=400, detail="No pude generar combinación válida con las restricciones dadas")
 
     combos: List[Dict[str, Any]] = []
-    seen = set()
-    attempts = 0
-    max_attempts = max(5000, k * 50)
-
-    while len(combos) < k and attempts < max_attempts:
-        attempts += 1
-
-        regs = pick_regs()
-        pb = pick_pb()
-
-        # (redundante pero seguro)
-        if pb in exclude_pbs:
-            continue
-
-        key = numbers_key(regs, pb)
-        if key in seen:
-            continue
-        seen.add(key)
-
+    for regs, pb in zip(regs_arr.tolist(), pbs_arr.tolist()):
         # output order: si fixed_first, mantenerlo primero
         if fixed_first is not None:
-            rest = sorted([x for x in regs if x != fixed_first])
-            out_regs = [fixed_first] + rest
+            out_regs = [fixed_first] + sorted(regs[1:])
         else:
             out_regs = sorted(regs)
 
@@ -2469,7 +2594,7 @@ def recommend_from_history(req: RecommendRequest, db: Session) -> RecommendRespo
                 "n4": int(out_regs[3]),
                 "n5": int(out_regs[4]),
                 "powerball": int(pb),
-                "key": key,
+                "key": numbers_key(regs, pb),
             }
         )
 
@@ -2675,75 +2800,44 @@ tr:hover td{ background: rgba(255,255,255,.03); }
 }
 """
 
-def render_app_page(*, title: str, active: str, body_html: str, right_pills_html: str = "") -> HTMLResponse:
+# Shell (CSS + sidebar + topbar) precomputado una vez por proceso; ver app/ui_render.py
+_APP_SHELL = ui_render.PageShell(
+    css=APP_CSS,
+    nav=(
+        ("/ui", "🏠 Dashboard", "home"),
+        ("/tickets/table", "📋 Tickets Table", "table"),
+        ("/ui/compare", "🧩 Compare", "compare"),
+        ("/ui/recommendations", "🤖 AI Recommendations", "ai"),
+        ("/docs", "📘 Swagger", "docs"),
+    ),
+    sidebar_note_html='Tip: escribe compare como <span class="code">10,16,29,33,69|22</span>.',
+)
+
+def render_app_page(
+    *, title: str, active: str, body_html: str, right_pills_html: str = "", etag: Optional[str] = None
+) -> HTMLResponse:
     """
     Renderiza una página HTML completa para la UI.
-    Upgrade: escape básico de title/active para evitar XSS accidental.
+    El shell viene precomputado (title escapado); solo se concatena right_pills + body.
     """
-    from html import escape
-
-    safe_title = escape(str(title))
-    safe_active = str(active or "").strip()
-
-    def nav_item(href: str, label: str, key: str) -> str:
-        cls = "active" if key == safe_active else ""
-        # label y href vienen hardcodeados aquí; si luego los haces dinámicos, escápalos.
-        return f'<a class="{cls}" href="{href}">{label}</a>'
-
-    html = f"""<!doctype html>
-<html>
-<head>
-  <meta charset="utf-8"/>
-  <meta name="viewport" content="width=device-width, initial-scale=1"/>
-  <title>{safe_title}</title>
-  <style>{APP_CSS}</style>
-</head>
-<body>
-  <div class="app">
-    <aside class="sidebar">
-      <div class="brand">
-        <div class="logo"></div>
-        <div>
-          <h1>Powerball AI</h1>
-          <p>Dashboard • SQLite • FastAPI</p>
-        </div>
-      </div>
-
-      <nav class="nav">
-        {nav_item("/ui", "🏠 Dashboard", "home")}
-        {nav_item("/tickets/table", "📋 Tickets Table", "table")}
-        {nav_item("/ui/compare", "🧩 Compare", "compare")}
-        {nav_item("/ui/recommendations", "🤖 AI Recommendations", "ai")}
-        {nav_item("/docs", "📘 Swagger", "docs")}
-      </nav>
-
-      <hr class="sep"/>
-      <div class="muted" style="font-size:12px; line-height:1.35;">
-        Tip: escribe compare como <span class="code">10,16,29,33,69|22</span>.
-      </div>
-    </aside>
-
-    <main class="main">
-      <div class="topbar">
-        <h2>{safe_title}</h2>
-        <div class="right">{right_pills_html}</div>
-      </div>
+    return _APP_SHELL.response(
+        title=title, active=active, body_html=body_html, right_pills_html=right_pills_html, etag=etag
+    )
 
-      {body_html}
-    </main>
-  </div>
-</body>
-</html>
-"""
 
-    # Upgrade: headers útiles para UI (no rompe)
-    return HTMLResponse(
-        content=html,
-        headers={
-            "Cache-Control": "no-store",
-            "X-Content-Type-Options": "nosniff",
-        },
-    )
+def _ui_data_version(db: Session) -> Tuple:
+    """Versión barata de tickets + draw_results para ETags de la UI."""
+    try:
+        t_n, t_max = db.query(func.count(Ticket.id), func.max(Ticket.id)).one()
+        d_n, d_max, d_last = db.query(
+            func.count(DrawResult.id), func.max(DrawResult.id), func.max(DrawResult.draw_date)
+        ).one()
+        version = ui_render.data_version(db, Ticket.__tablename__, DrawResult.__tablename__)
+    except Exception as e:
+        # ETag que nunca coincide: sin 304 hasta que la DB responda, pero nunca una página vieja
+        print(f"[WARN] _ui_data_version failed: {e}")
+        return ("err", time.time())
+    return (int(t_n or 0), int(t_max or 0), int(d_n or 0), int(d_max or 0), str(d_last or ""), version)
 
 
 # -------------------------
@@ -2778,6 +2872,12 @@ async def health():
     return {"ok": True, "service": "powerball_ai"}
 
 
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    # formato texto de Prometheus; con METRICS_MULTIPROC_DIR suma todos los workers
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
 @app.get("/admin/self_test")
 def admin_self_test(db: Session = Depends(get_db)):
     out: Dict[str, Any] = {"ok": True, "checks": {}}
@@ -2829,7 +2929,12 @@ def _safe_scalar_int(q, default: int = 0) -> int:
 
 
 @app.get("/ui", response_class=HTMLResponse)
-def ui_home(db: Session = Depends(get_db)):
+def ui_home(request: Request, db: Session = Depends(get_db)):
+    etag = ui_render.make_etag("ui_home", _APP_SHELL.etag, _ui_data_version(db))
+    cached = ui_render.not_modified(request, etag)
+    if cached is not None:
+        return cached
+
     total = _safe_scalar_int(db.query(func.count(Ticket.id)))
     future = _safe_scalar_int(db.query(func.count(Ticket.id)).filter(Ticket.status == "FUTURE"))
     past = _safe_scalar_int(db.query(func.count(Ticket.id)).filter(Ticket.status == "PAST"))
@@ -2906,7 +3011,7 @@ def ui_home(db: Session = Depends(get_db)):
       </div>
     """
 
-    return render_app_page(title="Dashboard", active="home", body_html=body, right_pills_html=right)
+    return render_app_page(title="Dashboard", active="home", body_html=body, right_pills_html=right, etag=etag)
 
 # -------------------------
 #    COMPARE VALIDATOR
@@ -2983,6 +3088,7 @@ def get_stats_summary(db: Session = Depends(get_db)):
 # ============================================================
 @app.get("/tickets/table", response_class=HTMLResponse)
 def tickets_table(
+    request: Request,
     status: Optional[str] = Query(default=None),
     type: Optional[str] = Query(default=None),
     order: Literal["asc", "desc"] = Query(default="asc"),
@@ -3027,6 +3133,16 @@ def tickets_table(
     # Compare: puede levantar HTTPException si es inválido
     compare_parsed = parse_compare(compare) if compare else None
 
+    # Conditional GET: misma firma de filtros + misma versión de datos -> 304 sin tocar la tabla
+    filter_sig = (
+        s, ttype, order, (compare or "").strip(), int(page), int(page_size), (key_contains or "").strip(),
+        str(sd or ""), str(ed or ""), bool(only_matches), int(min_match), sort_by,
+    )
+    etag = ui_render.make_etag("tickets_table", _APP_SHELL.etag, filter_sig, _ui_data_version(db))
+    cached = ui_render.not_modified(request, etag)
+    if cached is not None:
+        return cached
+
     # Último draw (si no hay compare)
     try:
         last_draw = db.query(DrawResult).order_by(DrawResult.draw_date.desc()).first()
@@ -3142,30 +3258,35 @@ def tickets_table(
             "</span>"
         )
 
-    rows = ""
-    shown = 0
+    # Celdas de números precomputadas por request (dependen solo de winners_set / winning_pb)
+    reg_cells = {n: td(n) for n in range(1, 70)}
+    pb_cells = {n: td(n, is_pb=True) for n in range(1, 27)}
 
-    for (t, regs, k, mr, mpb, total_balls) in items:
-        shown += 1
+    def row_values(item) -> Dict[str, str]:
+        t, regs, k, mr, mpb, total_balls = item
         tpb = _ticket_pb(t) or 0
-        combo_txt = f"{regs[0]} {regs[1]} {regs[2]} {regs[3]} {regs[4]} | PB {int(tpb)}"
-
-        rows += "<tr>"
-        rows += f"<td>{int(t.id)}</td>"
-        rows += f"<td>{esc(t.draw_date)}</td>"
-        rows += f"<td><span class='badge'>{esc(t.status)}</span></td>"
-        rows += f"<td><span class='badge'>{esc(t.type)}</span></td>"
-        rows += td(regs[0]); rows += td(regs[1]); rows += td(regs[2]); rows += td(regs[3]); rows += td(regs[4])
-        rows += td(int(tpb), is_pb=True)
-        rows += f"<td>{match_badge(mr, mpb, total_balls)}</td>"
-        rows += f"<td>${float(t.cost):.2f}</td>"
-        rows += f"<td><span class='code'>{esc(k)}</span></td>"
-        rows += f"<td><button class='btn' style='padding:7px 10px;' data-copy='{esc(combo_txt)}'>Copy</button></td>"
-        rows += "</tr>\n"
-
-    if shown == 0:
+        cells = [reg_cells.get(r) or td(r) for r in regs]
+        return {
+            "id": int(t.id),
+            "draw_date": esc(t.draw_date),
+            "status": esc(t.status),
+            "type": esc(t.type),
+            "regs": "".join(cells),
+            "pb": pb_cells.get(int(tpb)) or td(int(tpb), is_pb=True),
+            "match": match_badge(mr, mpb, total_balls),
+            "cost": f"{float(t.cost):.2f}",
+            "key": esc(k),
+            "copy": esc(f"{regs[0]} {regs[1]} {regs[2]} {regs[3]} {regs[4]} | PB {int(tpb)}"),
+        }
+
+    shown = len(items)
+    if shown:
+        rows_chunks = _TICKET_ROW_TEMPLATE.render_chunks(map(row_values, items))
+    else:
         # ✅ Fix: colspan correcto (la tabla tiene 14 columnas)
-        rows = "<tr><td colspan='14' class='muted' style='text-align:left; padding:14px;'>No hay resultados con estos filtros.</td></tr>"
+        rows_chunks = iter((
+            "<tr><td colspan='14' class='muted' style='text-align:left; padding:14px;'>No hay resultados con estos filtros.</td></tr>",
+        ))
 
     def qparam(k: str, v: Optional[str]) -> str:
         if v is None:
@@ -3279,7 +3400,7 @@ def tickets_table(
             </tr>
           </thead>
           <tbody>
-            {rows}
+            {_ROWS_SLOT}
           </tbody>
         </table>
       </div>
@@ -3352,7 +3473,33 @@ def tickets_table(
       <span class="pill">Page size: <b style="color:var(--text)">{int(page_size)}</b></span>
     """
 
-    return render_app_page(title="Tickets Table", active="table", body_html=body, right_pills_html=right)
+    # Streaming: shell + cabecera de tabla salen de inmediato; las filas van en chunks
+    body_head, body_tail = body.split(_ROWS_SLOT)
+    return _APP_SHELL.stream(
+        title="Tickets Table",
+        active="table",
+        right_pills_html=right,
+        body_chunks=itertools.chain((body_head,), rows_chunks, (body_tail,)),
+        etag=etag,
+    )
+
+
+_ROWS_SLOT = "\x00ROWS\x00"
+
+# Fila de /tickets/table: los valores llegan ya escapados/formateados (ver row_values)
+_TICKET_ROW_TEMPLATE = ui_render.RowTemplate(
+    "<tr>"
+    "<td>{id}</td>"
+    "<td>{draw_date}</td>"
+    "<td><span class='badge'>{status}</span></td>"
+    "<td><span class='badge'>{type}</span></td>"
+    "{regs}{pb}"
+    "<td>{match}</td>"
+    "<td>${cost}</td>"
+    "<td><span class='code'>{key}</span></td>"
+    "<td><button class='btn' style='padding:7px 10px;' data-copy='{copy}'>Copy</button></td>"
+    "</tr>\n"
+)
 
 
 # ============================================================
@@ -3373,23 +3520,8 @@ def create_ticket(payload: TicketCreate, db: Session = Depends(get_db)):
     # Key única para dedupe por draw_date
     key = numbers_key([payload.n1, payload.n2, payload.n3, payload.n4, payload.n5], int(payload.powerball))
 
-    # Upgrade: dedupe eficiente (no cargar todos los tickets de ese día)
-    exists_q = (
-        db.query(Ticket.id)
-        .filter(
-            Ticket.draw_date == payload.draw_date,
-            Ticket.n1 == int(payload.n1),
-            Ticket.n2 == int(payload.n2),
-            Ticket.n3 == int(payload.n3),
-            Ticket.n4 == int(payload.n4),
-            Ticket.n5 == int(payload.n5),
-        )
-    )
-    # Compatibilidad pb/powerball en modelo
-    pb_col = getattr(Ticket, "pb", None)
-    if pb_col is None:
-        pb_col = getattr(Ticket, "powerball")
-    exists_q = exists_q.filter(pb_col == int(payload.powerball))
+    # Upgrade: dedupe por índice (draw_date, combo_key); cualquier orden de blancas cuenta como duplicado
+    exists_q = db.query(Ticket.id).filter(Ticket.draw_date == payload.draw_date, Ticket.combo_key == key)
 
     if db.query(exists_q.exists()).scalar():
         raise HTTPException(status_code=409, detail="Ticket duplicado (misma combinación para ese draw_date).")
@@ -3422,7 +3554,12 @@ def create_ticket(payload: TicketCreate, db: Session = Depends(get_db)):
         calculate_matches(ticket, res)
 
     db.add(ticket)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        # carrera con otro insert: el índice único (draw_date, combo_key) tiene la última palabra
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Ticket duplicado (misma combinación para ese draw_date).")
     db.refresh(ticket)
     return ticket
 
@@ -3508,26 +3645,16 @@ def update_ticket(ticket_id: int = Path(..., ge=1), payload: TicketUpdate = Body
     if payload.cost is not None:
         t.cost = float(payload.cost)
 
-    # Upgrade: dedupe eficiente (no cargar todos los tickets del día)
-    dup_q = (
-        db.query(Ticket.id)
-        .filter(
+    # Upgrade: dedupe por índice (draw_date, combo_key). Sin autoflush: el flush de `t` chocaría
+    # con el índice único antes de poder responder 409.
+    with db.no_autoflush:
+        dup_q = db.query(Ticket.id).filter(
             Ticket.draw_date == t.draw_date,
             Ticket.id != t.id,
-            Ticket.n1 == int(t.n1),
-            Ticket.n2 == int(t.n2),
-            Ticket.n3 == int(t.n3),
-            Ticket.n4 == int(t.n4),
-            Ticket.n5 == int(t.n5),
+            Ticket.combo_key == numbers_key([n1, n2, n3, n4, n5], pb),
         )
-    )
-    pb_col = getattr(Ticket, "pb", None)
-    if pb_col is None:
-        pb_col = getattr(Ticket, "powerball")
-    dup_q = dup_q.filter(pb_col == int(pb))
-
-    if db.query(dup_q.exists()).scalar():
-        raise HTTPException(status_code=409, detail="Update crea duplicado (misma combinación para ese draw_date).")
+        if db.query(dup_q.exists()).scalar():
+            raise HTTPException(status_code=409, detail="Update crea duplicado (misma combinación para ese draw_date).")
 
     # Recalcular matches si hay draw result, sino reset
     res = db.query(DrawResult).filter(DrawResult.draw_date == t.draw_date).first()
@@ -3538,7 +3665,11 @@ def update_ticket(ticket_id: int = Path(..., ge=1), payload: TicketUpdate = Body
         setattr(t, "matched_powerball", False)
         setattr(t, "prize_amount", 0.0)
 
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Update crea duplicado (misma combinación para ese draw_date).")
     db.refresh(t)
     return t
 
@@ -3583,37 +3714,19 @@ def create_draw_result(payload: DrawResultCreate, db: Session = Depends(get_db))
         wn5=regs[4],
         winning_powerball=pb,
     )
+    sig_before = _draws_source_signature(db)
     db.add(dr)
+    db.flush()
+
+    # Draw + tickets de esa fecha en una sola transacción (tickets en streaming)
+    updated = _rescore_tickets_for_dates(db, {dr.draw_date: dr})
     db.commit()
     db.refresh(dr)
 
-    # Upgrade: tickets en streaming
-    tickets_q = db.query(Ticket).filter(Ticket.draw_date == payload.draw_date).yield_per(500)
-
-    today = date.today()
-    updated = 0
-
-    for t in tickets_q:
-        try:
-            # Compatibilidad pb/powerball para calculate_matches()
-            if not hasattr(t, "powerball") and hasattr(t, "pb"):
-                try:
-                    setattr(t, "powerball", getattr(t, "pb"))
-                except Exception:
-                    pass
-
-            calculate_matches(t, dr)
-
-            # Status PAST si ya pasó
-            if getattr(t, "draw_date", None) and t.draw_date <= today:
-                t.status = "PAST"
-
-            updated += 1
-        except Exception:
-            # Ticket corrupto o inesperado: no rompe el proceso completo
-            continue
-
-    db.commit()
+    _after_draws_committed(
+        db, "draw_results", [(dr.draw_date, regs, pb)], [], sig_before,
+        mirrors_db=sig_before[0] == "db", tickets_rescored=updated,
+    )
     return dr
 
 
@@ -3639,21 +3752,16 @@ def delete_draw_result(draw_date: str, year: int | None = None, db: Session = De
         raise HTTPException(status_code=404, detail="No existe draw_result para esa fecha")
 
     # Todo en una transacción lógica
+    sig_before = _draws_source_signature(db)
+    old_row = (dr.draw_date, [dr.wn1, dr.wn2, dr.wn3, dr.wn4, dr.wn5], dr.winning_powerball)
     db.delete(dr)
-
-    tickets_q = db.query(Ticket).filter(Ticket.draw_date == d).yield_per(500)
-
-    affected = 0
-    for t in tickets_q:
-        try:
-            t.matched_regular_numbers = 0
-            t.matched_powerball = False
-            t.prize_amount = 0.0
-            affected += 1
-        except Exception:
-            continue
-
+    affected = _rescore_tickets_for_dates(db, {d: None})
     db.commit()
+
+    _after_draws_committed(
+        db, "draw_results_delete", [], [old_row], sig_before,
+        mirrors_db=sig_before[0] == "db", tickets_rescored=affected,
+    )
     return {"ok": True, "deleted_draw_date": d.isoformat(), "affected_tickets": int(affected)}
 
 
@@ -3832,6 +3940,9 @@ async def import_excel(file: UploadFile = File(...), db: Session = Depends(get_d
     skipped = 0
     errors = 0
     error_samples: List[Dict[str, Any]] = []
+    sig_before = _draws_source_signature(db)
+    changes: Dict[str, list] = {"added": [], "removed": []}
+    touched: Dict[date, DrawResult] = {}
 
     for idx, row in enumerate(df.itertuples(index=False), start=0):
         try:
@@ -3873,6 +3984,8 @@ async def import_excel(file: UploadFile = File(...), db: Session = Depends(get_d
                     winning_powerball=int(pb),
                 )
                 db.add(dr)
+                changes["added"].append((draw_date_val, [int(n1), int(n2), int(n3), int(n4), int(n5)], int(pb)))
+                touched[draw_date_val] = dr
                 inserted += 1
             else:
                 same = (
@@ -3886,6 +3999,9 @@ async def import_excel(file: UploadFile = File(...), db: Session = Depends(get_d
                 if same:
                     skipped += 1
                 else:
+                    changes["removed"].append((dr.draw_date, [dr.wn1, dr.wn2, dr.wn3, dr.wn4, dr.wn5], dr.winning_powerball))
+                    changes["added"].append((draw_date_val, [int(n1), int(n2), int(n3), int(n4), int(n5)], int(pb)))
+                    touched[draw_date_val] = dr
                     dr.wn1 = int(n1)
                     dr.wn2 = int(n2)
                     dr.wn3 = int(n3)
@@ -3899,14 +4015,25 @@ async def import_excel(file: UploadFile = File(...), db: Session = Depends(get_d
             if len(error_samples) < 10:
                 error_samples.append({"row": int(idx), "error": str(e)})
 
+    rescored = 0
+    if touched:
+        db.flush()
+        rescored = _rescore_tickets_for_dates(db, touched)
     db.commit()
 
+    ingest = _after_draws_committed(
+        db, "import_excel", changes["added"], changes["removed"], sig_before,
+        mirrors_db=sig_before[0] == "db", tickets_rescored=rescored,
+    )
+
     out: Dict[str, Any] = {
         "ok": True,
         "inserted": int(inserted),
         "updated": int(updated),
         "skipped": int(skipped),
         "errors": int(errors),
+        "tickets_rescored": int(rescored),
+        "ingest": ingest,
     }
     if error_samples:
         out["error_samples"] = error_samples
@@ -4171,6 +4298,9 @@ def export_compare_group(
 
     # Excel con highlight
     buf = BytesIO()
+    from openpyxl.styles import Font
+
+    FILL_AQUA, FILL_PB, RED_FONT = _xlsx_highlight_styles()
     with pd.ExcelWriter(buf, engine="openpyxl") as writer:
         sheet = f"group_{group}"
         df.to_excel(writer, index=False, sheet_name=sheet)
@@ -4315,57 +4445,45 @@ def ai_save_recommendations(req: SaveRecommendationsRequest, db: Session = Depen
     )
     rec = recommend_from_history(gen_req, db)
 
-    # ✅ Dedupe en DB para ese draw_date
-    existing_keys = _existing_keys_for_draw(db, req.future_draw_date)
-
-    inserted = 0
-    skipped = 0
-
     # ✅ Compat: Ticket puede tener powerball o pb
-    ticket_has_pb = hasattr(Ticket, "pb")
+    pb_field = "pb" if hasattr(Ticket, "pb") else "powerball"
 
     save_type = _norm_type(req.save_type) or "QUICK_PICK"
     cost = float(req.cost_per_ticket or 2.0)
 
-    # ✅ Upgrade: chunked commit (evita transacción gigante en k grande)
-    commit_every = 500
-
-    for i, c in enumerate(rec.combos, start=1):
+    rows: List[Dict[str, Any]] = []
+    for c in rec.combos:
         regs = [int(c["n1"]), int(c["n2"]), int(c["n3"]), int(c["n4"]), int(c["n5"])]
         pb = int(c["powerball"])
         key = numbers_key(regs, pb)
 
-        if key in existing_keys:
-            skipped += 1
-            continue
-
         if req.normalize_on_save:
             regs = sorted(regs)
 
-        kw = dict(
-            draw_date=req.future_draw_date,
-            n1=int(regs[0]), n2=int(regs[1]), n3=int(regs[2]), n4=int(regs[3]), n5=int(regs[4]),
-            type=save_type,
-            cost=cost,
-            status="FUTURE",
-            matched_regular_numbers=0,
-            matched_powerball=False,
-            prize_amount=0.0,
-        )
-        if ticket_has_pb:
-            kw["pb"] = int(pb)
-        else:
-            kw["powerball"] = int(pb)
-
-        t = Ticket(**kw)
-        db.add(t)
-        inserted += 1
-        existing_keys.add(key)
+        rows.append({
+            "draw_date": req.future_draw_date,
+            "status": "FUTURE",
+            "n1": regs[0], "n2": regs[1], "n3": regs[2], "n4": regs[3], "n5": regs[4],
+            pb_field: pb,
+            "type": save_type,
+            "cost": cost,
+            "matched_regular_numbers": 0,
+            "matched_powerball": False,
+            "prize_amount": 0.0,
+            "combo_key": key,
+        })
 
-        if (i % commit_every) == 0:
-            db.commit()
+    # ✅ Bulk insert con dedupe en la DB (índice único draw_date+combo_key); los conteos salen de la DB
+    try:
+        before = _count_tickets_for_draw(db, req.future_draw_date)
+        _bulk_insert_tickets_ignore_duplicates(db, rows)
+        inserted = _count_tickets_for_draw(db, req.future_draw_date) - before
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error guardando recomendaciones: {e}")
 
-    db.commit()
+    skipped = len(rows) - inserted
 
     return SaveRecommendationsResponse(
         requested=int(req.k),
@@ -4379,8 +4497,24 @@ def ai_save_recommendations(req: SaveRecommendationsRequest, db: Session = Depen
 
 
 @app.get("/ui/recommendations", response_class=HTMLResponse)
-def ui_recommendations():
-    body = """
+def ui_recommendations(request: Request):
+    # Página 100% estática: se renderiza una vez por proceso y se revalida con ETag
+    global _UI_RECOMMENDATIONS_PAGE
+    if _UI_RECOMMENDATIONS_PAGE is None:
+        html = _APP_SHELL.render(title="AI Recommendations", active="ai", body_html=_ui_recommendations_body())
+        _UI_RECOMMENDATIONS_PAGE = (html, ui_render.make_etag("ui_recommendations", html))
+    html, etag = _UI_RECOMMENDATIONS_PAGE
+    cached = ui_render.not_modified(request, etag)
+    if cached is not None:
+        return cached
+    return HTMLResponse(content=html, headers={**ui_render.UI_HEADERS, "ETag": etag})
+
+
+_UI_RECOMMENDATIONS_PAGE: Optional[Tuple[str, str]] = None
+
+
+def _ui_recommendations_body() -> str:
+    return """
       <div class="card">
         <h3>AI Recommendations</h3>
         <p class="muted">Genera combinaciones por frecuencia histórica + restricciones opcionales. Guarda como FUTURE con dedupe.</p>
@@ -4720,7 +4854,6 @@ def ui_recommendations():
         })();
       </script>
     """
-    return render_app_page(title="AI Recommendations", active="ai", body_html=body)
 
 # ============================================================
 #   MAINTENANCE / ADMIN UTILITIES (UPGRADED)
@@ -4834,44 +4967,110 @@ def admin_normalize_all_ticket_numbers(db: Session = Depends(get_db)):
     }
 
 
+# Clave de duplicado calculada en SQL: draw_date + powerball + sumas de potencias 1..5 de las blancas.
+# Las 5 primeras sumas de potencias determinan el multiconjunto de 5 números (identidades de Newton),
+# así que equivale a "n1..n5 normalizados" sin ordenar en SQL y funciona igual en SQLite y Postgres.
+def _dup_partition_sql() -> str:
+    ns = [f"CAST(n{i} AS BIGINT)" for i in range(1, 6)]
+    sums = [" + ".join("*".join([n] * p) for n in ns) for p in range(1, 6)]
+    return "draw_date, powerball, " + ", ".join(f"({x})" for x in sums)
+
+
+_DUP_RANKED_SQL = f"""
+    SELECT id, draw_date, n1, n2, n3, n4, n5, powerball,
+           ROW_NUMBER() OVER (
+               PARTITION BY {_dup_partition_sql()}
+               ORDER BY CASE WHEN combo_key IS NULL THEN 1 ELSE 0 END, id
+           ) AS rn,
+           FIRST_VALUE(id) OVER (
+               PARTITION BY {_dup_partition_sql()}
+               ORDER BY CASE WHEN combo_key IS NULL THEN 1 ELSE 0 END, id
+           ) AS first_id
+    FROM tickets
+"""
+
+
+def _duplicate_stats(db: Session) -> Dict[str, int]:
+    row = db.execute(text(f"""
+        SELECT COUNT(*) AS processed,
+               COALESCE(SUM(CASE WHEN rn > 1 THEN 1 ELSE 0 END), 0) AS dups,
+               COALESCE(SUM(CASE WHEN rn = 2 THEN 1 ELSE 0 END), 0) AS grps
+        FROM ({_DUP_RANKED_SQL}) r
+    """)).one()
+    return {"processed": int(row[0]), "count": int(row[1]), "groups": int(row[2])}
+
+
 @app.get("/admin/duplicates")
-def admin_duplicates(db: Session = Depends(get_db)):
+def admin_duplicates(
+    limit: int = Query(200, ge=1, le=5000),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db),
+):
     """
-    Devuelve duplicados por (draw_date + key). No borra nada; solo reporta.
+    Devuelve duplicados por (draw_date + combinación normalizada). No borra nada; solo reporta.
     Upgrade:
-      - streaming
-      - compat powerball/pb
+      - set-based: una sola pasada con window functions en la DB (sin cargar tickets en Python)
+      - paginado (limit/offset); `count` es el total de duplicados, no solo la página
+      - se conserva el ticket con combo_key (o el id más bajo); el resto son duplicados
     """
-    seen: Dict[str, int] = {}
-    dups: List[Dict[str, Any]] = []
-
-    processed = 0
-    for t in db.query(Ticket).yield_per(500):
-        processed += 1
+    stats = _duplicate_stats(db)
+    rows = db.execute(
+        text(f"""
+            SELECT first_id, id, draw_date, n1, n2, n3, n4, n5, powerball
+            FROM ({_DUP_RANKED_SQL}) r
+            WHERE rn > 1
+            ORDER BY draw_date, first_id, id
+            LIMIT :limit OFFSET :offset
+        """),
+        {"limit": int(limit), "offset": int(offset)},
+    ).fetchall()
 
-        dd = getattr(t, "draw_date", None)
-        try:
-            pb_val = int(getattr(t, "powerball", getattr(t, "pb", 0)))
-        except Exception:
-            pb_val = 0
+    dups: List[Dict[str, Any]] = []
+    for first_id, dup_id, dd, n1, n2, n3, n4, n5, pb in rows:
+        dups.append({
+            "first_id": int(first_id),
+            "dup_id": int(dup_id),
+            "draw_date": str(dd)[:10] if dd else "",
+            "key": numbers_key([n1, n2, n3, n4, n5], pb),
+        })
 
-        try:
-            k = numbers_key([t.n1, t.n2, t.n3, t.n4, t.n5], pb_val)
-        except Exception:
-            # si hay algo corrupto, lo ignoramos
-            continue
+    return {
+        "ok": True,
+        "processed": stats["processed"],
+        "duplicates": dups,
+        "count": stats["count"],
+        "groups": stats["groups"],
+        "limit": int(limit),
+        "offset": int(offset),
+        "has_more": int(offset) + len(dups) < stats["count"],
+    }
 
-        dd_iso = dd.isoformat() if dd else ""
-        kk = f"{dd_iso}|{k}"
 
-        if kk in seen:
-            dups.append({
-                "first_id": int(seen[kk]),
-                "dup_id": int(getattr(t, "id", 0) or 0),
-                "draw_date": dd_iso,
-                "key": k,
-            })
-        else:
-            seen[kk] = int(getattr(t, "id", 0) or 0)
+@app.post("/admin/duplicates/cleanup")
+def admin_duplicates_cleanup(
+    dry_run: bool = Query(True, description="Si True solo cuenta; con dry_run=false borra los duplicados."),
+    batch_size: int = Query(1000, ge=1, le=10000),
+    db: Session = Depends(get_db),
+):
+    """
+    Borra duplicados conservando uno por grupo (el que tiene combo_key, o el id más bajo).
+    Los ids se resuelven con la misma consulta de ventana y se borran en lotes de `batch_size`.
+    """
+    stats = _duplicate_stats(db)
+    if dry_run:
+        return {"ok": True, "dry_run": True, "would_delete": stats["count"], "groups": stats["groups"],
+                "processed": stats["processed"]}
+
+    ids = [int(r[0]) for r in db.execute(text(f"SELECT id FROM ({_DUP_RANKED_SQL}) r WHERE rn > 1 ORDER BY id"))]
+    stmt = text("DELETE FROM tickets WHERE id IN :ids").bindparams(bindparam("ids", expanding=True))
+    deleted = 0
+    try:
+        for i in range(0, len(ids), batch_size):
+            deleted += int(db.execute(stmt, {"ids": ids[i:i + batch_size]}).rowcount or 0)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error borrando duplicados: {e}")
 
-    return {"ok": True, "processed": int(processed), "duplicates": dups, "count": int(len(dups))}
+    return {"ok": True, "dry_run": False, "deleted": deleted, "groups": stats["groups"],
+            "processed": stats["processed"]}
@@ -0,0 +1,385 @@
+"""
+Métricas estilo Prometheus (formato texto 0.0.4) sin dependencias: /metrics.
+
+Mismo módulo que section2_api/src/metrics.py (las dos apps se despliegan por separado); cambian los
+collectors del final: single-flight de /insights, caches del recommender y de /compare, draw index y
+el pool de SQLAlchemy (app.database registra el contador de consultas).
+
+- MetricsMiddleware (ASGI puro): latencia por ruta (plantilla de Starlette, "<unmatched>" si no hay
+  match) como histograma + requests por clase de status; stats preasignados por (method, ruta), sin
+  locks ni dicts de labels por request.
+- counter(name, help) / register_collector(fn): contadores de proceso y gauges evaluados al scrapear.
+
+Multiproceso (uvicorn --workers N): METRICS_MULTIPROC_DIR + METRICS_FLUSH_SECONDS (default 5); cada
+worker vuelca <dir>/metrics-<pid>.json y /metrics suma todos los archivos (gauges solo de workers vivos).
+"""
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS: Tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+UNMATCHED = "<unmatched>"
+_STATUS_CLASSES = ("other", "1xx", "2xx", "3xx", "4xx", "5xx")
+
+# (name, type, help, labels, value); type = "counter" | "gauge"
+Sample = Tuple[str, str, str, Dict[str, Any], float]
+Collector = Callable[[], Iterable[Sample]]
+
+
+class _RouteStats:
+    __slots__ = ("buckets", "count", "sum", "status")
+
+    def __init__(self, n_bounds: int) -> None:
+        self.buckets = [0] * (n_bounds + 1)  # no acumulados; el último es +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.status = [0] * len(_STATUS_CLASSES)
+
+
+class Counter:
+    __slots__ = ("name", "help", "value", "_lock")
+
+    def __init__(self, name: str, help: str) -> None:
+        self.name = name
+        self.help = help
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, n: float = 1.0) -> None:
+        with self._lock:
+            self.value += n
+
+
+class Registry:
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.bounds: Tuple[float, ...] = tuple(sorted(float(b) for b in buckets))
+        self._routes: Dict[str, Dict[str, _RouteStats]] = {}
+        self._counters: Dict[str, Counter] = {}
+        self._collectors: List[Collector] = []
+        self._lock = threading.Lock()
+        self.in_progress = 0
+        self._flusher: Optional[threading.Thread] = None
+
+    # ---------- registro ----------
+
+    def observe(self, method: str, route: str, status: int, seconds: float) -> None:
+        by_route = self._routes.get(method)
+        if by_route is None:
+            by_route = self._routes.setdefault(method, {})
+        st = by_route.get(route)
+        if st is None:
+            st = by_route.setdefault(route, _RouteStats(len(self.bounds)))
+        st.buckets[bisect_left(self.bounds, seconds)] += 1
+        st.count += 1
+        st.sum += seconds
+        cls = status // 100
+        st.status[cls if 1 <= cls <= 5 else 0] += 1
+
+    def counter(self, name: str, help: str = "") -> Counter:
+        with self._lock:
+            c = self._counters.get(name)
+            if c is None:
+                c = self._counters[name] = Counter(name, help)
+            return c
+
+    def register_collector(self, fn: Collector) -> Collector:
+        if fn not in self._collectors:
+            self._collectors.append(fn)
+        return fn
+
+    def reset(self) -> None:
+        """Vacía lo registrado (hijo de un fork: no heredar los números del padre)."""
+        self._routes = {}
+        for c in self._counters.values():
+            c.value = 0.0
+        self.in_progress = 0
+        self._flusher = None
+
+    # ---------- snapshot / multiproceso ----------
+
+    def _collected(self) -> List[Sample]:
+        out: List[Sample] = []
+        for fn in list(self._collectors):
+            try:
+                out.extend(fn())
+            except Exception:
+                # un collector roto no tumba /metrics
+                logger.exception("metrics collector %r failed", fn)
+        return out
+
+    def snapshot(self) -> Dict[str, Any]:
+        routes = [
+            [method, route, list(st.buckets), st.sum, st.count, list(st.status)]
+            for method, by_route in list(self._routes.items())
+            for route, st in list(by_route.items())
+        ]
+        samples: List[Sample] = [
+            ("http_requests_in_progress", "gauge", "Requests HTTP en curso.", {}, self.in_progress)
+        ]
+        samples += [(c.name, "counter", c.help, {}, c.value) for c in list(self._counters.values())]
+        samples += self._collected()
+        return {"pid": os.getpid(), "at": time.time(), "bounds": list(self.bounds),
+                "routes": routes, "samples": [list(s) for s in samples]}
+
+    def write_snapshot(self, directory: Path) -> None:
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"metrics-{os.getpid()}.json"
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.snapshot(), separators=(",", ":")), encoding="utf-8")
+        os.replace(tmp, path)
+
+    def start_flusher(self, directory: Path, every: float) -> None:
+        with self._lock:
+            if self._flusher is not None:
+                return
+
+            def loop() -> None:
+                while True:
+                    time.sleep(every)
+                    try:
+                        self.write_snapshot(directory)
+                    except Exception:
+                        logger.exception("no pude escribir el snapshot de métricas en %s", directory)
+
+            self._flusher = threading.Thread(target=loop, name="metrics-flush", daemon=True)
+            self._flusher.start()
+
+    # ---------- exposición ----------
+
+    def render(self) -> str:
+        directory = multiproc_dir()
+        if directory is None:
+            return _render([self.snapshot()])
+        self.write_snapshot(directory)
+        snaps = []
+        for f in sorted(directory.glob("metrics-*.json")):
+            try:
+                snaps.append(json.loads(f.read_text(encoding="utf-8")))
+            except (OSError, ValueError):
+                continue  # archivo a medio reemplazar o borrado entre glob y lectura
+        return _render(snaps)
+
+
+def _pid_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True  # existe pero es de otro usuario
+    return True
+
+
+def _escape(v: Any) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(pairs: Sequence[Tuple[str, Any]]) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _num(v: float) -> str:
+    f = float(v)
+    if f == float("inf"):
+        return "+Inf"
+    return str(int(f)) if f.is_integer() else repr(f)
+
+
+def _render(snaps: List[Dict[str, Any]]) -> str:
+    # histogramas: suma por (method, route) entre snapshots con los mismos buckets
+    bounds: Optional[List[float]] = None
+    hist: Dict[Tuple[str, str], List[Any]] = {}
+    families: Dict[str, Tuple[str, str]] = {}
+    values: Dict[str, Dict[Tuple[Tuple[str, Any], ...], float]] = {}
+
+    for snap in snaps:
+        alive = _pid_alive(int(snap.get("pid", 0)))
+        if bounds is None:
+            bounds = snap["bounds"]
+        if snap["bounds"] == bounds:
+            for method, route, buckets, total, count, status in snap["routes"]:
+                h = hist.get((method, route))
+                if h is None:
+                    h = hist[(method, route)] = [[0] * len(buckets), 0.0, 0, [0] * len(status)]
+                h[0] = [a + b for a, b in zip(h[0], buckets)]
+                h[1] += total
+                h[2] += count
+                h[3] = [a + b for a, b in zip(h[3], status)]
+        for name, kind, help_, labels, value in snap["samples"]:
+            if kind == "gauge" and not alive:
+                continue
+            families.setdefault(name, (kind, help_))
+            key = tuple(sorted(labels.items()))
+            fam = values.setdefault(name, {})
+            fam[key] = fam.get(key, 0.0) + float(value)
+
+    lines: List[str] = []
+    if hist:
+        lines += ["# HELP http_request_duration_seconds Latencia de requests HTTP por ruta.",
+                  "# TYPE http_request_duration_seconds histogram"]
+        for (method, route), (buckets, total, count, _) in sorted(hist.items()):
+            base = (("method", method), ("route", route))
+            acc = 0
+            for le, n in zip(list(bounds or []) + [float("inf")], buckets):
+                acc += n
+                lines.append(f"http_request_duration_seconds_bucket{_labels(base + (('le', _num(le)),))} {acc}")
+            lines.append(f"http_request_duration_seconds_sum{_labels(base)} {_num(total)}")
+            lines.append(f"http_request_duration_seconds_count{_labels(base)} {count}")
+        lines += ["# HELP http_requests_total Requests HTTP por ruta y clase de status.",
+                  "# TYPE http_requests_total counter"]
+        for (method, route), (_, _, _, status) in sorted(hist.items()):
+            for cls, n in zip(_STATUS_CLASSES, status):
+                if n:
+                    lines.append(f"http_requests_total{_labels((('method', method), ('route', route), ('status', cls)))} {n}")
+
+    for name in sorted(families):
+        kind, help_ = families[name]
+        if help_:
+            lines.append(f"# HELP {name} {_escape(help_)}")
+        lines.append(f"# TYPE {name} {kind}")
+        for key, v in sorted(values[name].items(), key=lambda kv: str(kv[0])):
+            lines.append(f"{name}{_labels(key)} {_num(v)}")
+    return "\n".join(lines) + "\n"
+
+
+# ---------------------------------------------------------------------
+# Registry de proceso
+# ---------------------------------------------------------------------
+REGISTRY = Registry()
+
+
+def multiproc_dir() -> Optional[Path]:
+    d = os.getenv("METRICS_MULTIPROC_DIR", "")
+    return Path(d) if d else None
+
+
+def counter(name: str, help: str = "") -> Counter:
+    return REGISTRY.counter(name, help)
+
+
+def register_collector(fn: Collector) -> Collector:
+    """Registra fn() -> [(name, type, help, labels, value)]; usable como decorador."""
+    return REGISTRY.register_collector(fn)
+
+
+def render() -> str:
+    return REGISTRY.render()
+
+
+def _flush_at_exit() -> None:
+    directory = multiproc_dir()
+    if directory is not None:
+        try:
+            REGISTRY.write_snapshot(directory)
+        except Exception:
+            pass
+
+
+atexit.register(_flush_at_exit)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=REGISTRY.reset)
+
+
+class MetricsMiddleware:
+    def __init__(self, app: Any, registry: Optional[Registry] = None) -> None:
+        self.app = app
+        self.registry = registry or REGISTRY
+        self.flush_seconds = float(os.getenv("METRICS_FLUSH_SECONDS", "") or 5.0)
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        reg = self.registry
+        if reg._flusher is None:
+            directory = multiproc_dir()
+            if directory is not None:
+                reg.start_flusher(directory, self.flush_seconds)
+        status = 500  # si la app revienta sin responder, cuenta como 5xx
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        reg.in_progress += 1
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            reg.in_progress -= 1
+            route = scope.get("route")
+            reg.observe(scope["method"], getattr(route, "path", None) or UNMATCHED, status,
+                        time.perf_counter() - t0)
+
+
+# ---------------------------------------------------------------------
+# Collectors de esta app (solo miran módulos ya importados: /metrics no carga nada nuevo)
+# ---------------------------------------------------------------------
+@register_collector
+def _single_flight_samples() -> List[Sample]:
+    from app.single_flight import all_flights
+
+    out: List[Sample] = []
+    for sf in all_flights():
+        st = sf.stats()
+        cache = {"cache": st["name"]}
+        out.append(("single_flight_entries", "gauge", "Resultados en cache por SingleFlight.", cache, st["entries"]))
+        out.append(("single_flight_in_flight", "gauge", "Cálculos en curso por SingleFlight.", cache, st["in_flight"]))
+        for result in ("computed", "coalesced", "hits", "stale", "errors"):
+            out.append(("single_flight_requests_total", "counter", "Llamadas a SingleFlight.do por resultado.",
+                        {"cache": st["name"], "result": result}, st[result]))
+    return out
+
+
+@register_collector
+def _recommender_samples() -> List[Sample]:
+    rec = sys.modules.get("app.recommender")
+    if rec is None:
+        return []
+    return [("cache_entries", "gauge", "Entradas en caches de proceso.", {"cache": "recommender_freq"},
+             len(rec._FREQ_CACHE))]
+
+
+@register_collector
+def _draw_index_samples() -> List[Sample]:
+    di = sys.modules.get("app.draw_ingest")
+    idx = getattr(di, "_INDEX", None)
+    if idx is None:
+        return []
+    return [
+        ("draw_index_draws", "gauge", "Sorteos en el DrawIndex en memoria.", {}, len(idx)),
+        ("draw_index_version", "gauge", "Versión del DrawIndex (sube con cada append).", {}, idx.version),
+    ]
+
+
+@register_collector
+def _db_pool_samples() -> List[Sample]:
+    from app.database import engine
+
+    pool = engine.pool
+    out: List[Sample] = []
+    for name, help_ in (("checkedout", "Conexiones del pool en uso."), ("checkedin", "Conexiones libres en el pool."),
+                        ("size", "Tamaño configurado del pool.")):
+        fn = getattr(pool, name, None)
+        if callable(fn):
+            out.append((f"db_pool_{name}", "gauge", help_, {}, fn()))
+    return out
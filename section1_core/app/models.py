@@ -1,3 +1,5 @@
+from typing import Iterable, Optional
+
 from sqlalchemy import (
     Column,
     Integer,
@@ -6,7 +8,10 @@ from sqlalchemy import (
     Date,
     DateTime,
     Boolean,
+    Index,
+    event,
     func,
+    inspect,
     text,
 )
 
@@ -31,8 +36,18 @@ class User(Base):
         return f"<User id={self.id} email={self.email}>"
 
 
+def ticket_combo_key(regs: Iterable[int], pb: int) -> str:
+    """Clave canónica de una combinación: blancas ordenadas + PB ("4-6-8-10-12|22")."""
+    r = sorted(int(x) for x in regs)
+    return f"{r[0]}-{r[1]}-{r[2]}-{r[3]}-{r[4]}|{int(pb)}"
+
+
 class Ticket(Base):
     __tablename__ = "tickets"
+    __table_args__ = (
+        # Dedupe en la DB: una combinación por draw_date (NULL = fila legacy sin clave)
+        Index("ux_tickets_draw_date_combo_key", "draw_date", "combo_key", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     draw_date = Column(Date, nullable=False, index=True)
@@ -61,6 +76,36 @@ class Ticket(Base):
     matched_powerball = Column(Boolean, nullable=False, server_default=text("0"))
     prize_amount = Column(Float, nullable=False, server_default=text("0.0"))
 
+    # ticket_combo_key(n1..n5, powerball); se mantiene automáticamente en insert/update ORM
+    combo_key = Column(String(20), nullable=True)
+
+
+def _combo_key_or_none(t: Ticket) -> Optional[str]:
+    try:
+        return ticket_combo_key([t.n1, t.n2, t.n3, t.n4, t.n5], t.powerball)
+    except (TypeError, ValueError):
+        return None
+
+
+_COMBO_COLS = ("n1", "n2", "n3", "n4", "n5", "powerball")
+
+
+@event.listens_for(Ticket, "before_insert")
+def _ticket_set_combo_key(mapper, connection, target: Ticket) -> None:
+    target.combo_key = _combo_key_or_none(target)
+
+
+@event.listens_for(Ticket, "before_update")
+def _ticket_update_combo_key(mapper, connection, target: Ticket) -> None:
+    # Solo si cambió la combinación. Las filas legacy duplicadas quedan con combo_key NULL a propósito
+    # (migración / _ensure_ticket_combo_key): rellenarla al actualizar otra columna (p.ej. el rescore)
+    # violaría ux_tickets_draw_date_combo_key.
+    if target.combo_key is None:
+        return
+    attrs = inspect(target).attrs
+    if any(attrs[c].history.has_changes() for c in _COMBO_COLS):
+        target.combo_key = _combo_key_or_none(target)
+
 
 class DrawResult(Base):
     __tablename__ = "draw_results"
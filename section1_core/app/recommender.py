@@ -0,0 +1,201 @@
+"""
+Recommender engine: frecuencias históricas (SQL) + muestreo vectorizado de combinaciones (NumPy).
+
+- history_frequencies(): cuenta blancas con un GROUP BY sobre n1..n5 vía UNION ALL y PB con otro
+  GROUP BY; nada de cargar tickets como objetos ORM.
+- get_frequency_model(): cachea esos vectores por firma de filtro (status/type/fechas) + versión de la
+  tabla (count, max id), con TTL para acotar cambios in-place desde otros procesos.
+- sample_combos(): genera todas las combinaciones en lote con Gumbel-top-k (equivale a muestrear sin
+  reemplazo proporcional al peso), con máscaras para excluidos/fijos, y deduplica con códigos enteros.
+  Mismo seed -> mismas combinaciones.
+"""
+from __future__ import annotations
+
+import math
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import func, select, union_all
+from sqlalchemy.orm import Session
+
+from app.models import Ticket
+
+REG_MAX = 69
+PB_MAX = 26
+
+FREQ_CACHE_TTL = 300.0
+_FREQ_CACHE_MAXSIZE = 64
+
+
+@dataclass(frozen=True)
+class FrequencyModel:
+    reg_counts: np.ndarray  # (70,) índice = número, [0] sin uso
+    pb_counts: np.ndarray   # (27,)
+    tickets: int
+
+
+# ---------------------------
+# Frecuencias (SQL)
+# ---------------------------
+def _ticket_filters(status: Optional[str], ttype: Optional[str],
+                    start_date: Optional[date], end_date: Optional[date]) -> list:
+    conds = []
+    if status:
+        conds.append(Ticket.status == status)
+    if ttype:
+        conds.append(Ticket.type == ttype)
+    if start_date:
+        conds.append(Ticket.draw_date >= start_date)
+    if end_date:
+        conds.append(Ticket.draw_date <= end_date)
+    return conds
+
+
+def history_frequencies(db: Session, status: Optional[str] = None, ttype: Optional[str] = None,
+                        start_date: Optional[date] = None, end_date: Optional[date] = None) -> FrequencyModel:
+    conds = _ticket_filters(status, ttype, start_date, end_date)
+
+    whites = union_all(*[
+        select(getattr(Ticket, f"n{i}").label("n")).where(*conds) for i in range(1, 6)
+    ]).subquery()
+    reg = np.zeros(REG_MAX + 1, dtype=np.int64)
+    for n, c in db.execute(select(whites.c.n, func.count()).group_by(whites.c.n)):
+        if n is not None and 1 <= int(n) <= REG_MAX:
+            reg[int(n)] = int(c)
+
+    pb = np.zeros(PB_MAX + 1, dtype=np.int64)
+    total = 0
+    for n, c in db.execute(select(Ticket.powerball, func.count()).where(*conds).group_by(Ticket.powerball)):
+        total += int(c)
+        if n is not None and 1 <= int(n) <= PB_MAX:
+            pb[int(n)] = int(c)
+
+    return FrequencyModel(reg_counts=reg, pb_counts=pb, tickets=total)
+
+
+_FREQ_CACHE: Dict[Tuple, Tuple[float, Tuple, FrequencyModel]] = {}
+_FREQ_LOCK = threading.Lock()
+
+
+def _tickets_version(db: Session) -> Tuple[int, int]:
+    n, max_id = db.execute(select(func.count(Ticket.id), func.max(Ticket.id))).one()
+    return int(n or 0), int(max_id or 0)
+
+
+def get_frequency_model(db: Session, status: Optional[str] = None, ttype: Optional[str] = None,
+                        start_date: Optional[date] = None, end_date: Optional[date] = None) -> FrequencyModel:
+    sig = (status or "", ttype or "", str(start_date or ""), str(end_date or ""))
+    version = _tickets_version(db)
+    now = time.time()
+    with _FREQ_LOCK:
+        hit = _FREQ_CACHE.get(sig)
+        if hit and hit[1] == version and (now - hit[0]) <= FREQ_CACHE_TTL:
+            return hit[2]
+
+    model = history_frequencies(db, status, ttype, start_date, end_date)
+    with _FREQ_LOCK:
+        if len(_FREQ_CACHE) >= _FREQ_CACHE_MAXSIZE and sig not in _FREQ_CACHE:
+            oldest = min(_FREQ_CACHE.items(), key=lambda kv: kv[1][0])[0]
+            _FREQ_CACHE.pop(oldest, None)
+        _FREQ_CACHE[sig] = (now, version, model)
+    return model
+
+
+def clear_frequency_cache() -> None:
+    with _FREQ_LOCK:
+        _FREQ_CACHE.clear()
+
+
+def top_numbers(counts: np.ndarray, size: int) -> List[int]:
+    """Los `size` números más frecuentes (solo los que aparecieron); empates por número ascendente."""
+    nums = np.nonzero(counts)[0]
+    nums = nums[nums > 0]
+    order = nums[np.argsort(-counts[nums], kind="stable")]
+    return [int(x) for x in order[:size]]
+
+
+# ---------------------------
+# Muestreo (NumPy)
+# ---------------------------
+# Código entero de una combinación: rango colex del 5-subconjunto (0..C(69,5)-1) * 27 + PB.
+_BINOM = np.array([[math.comb(n, r) for r in range(6)] for n in range(REG_MAX + 1)], dtype=np.int64)
+
+
+def combo_codes(regs: np.ndarray, pbs: np.ndarray) -> np.ndarray:
+    s = np.sort(regs, axis=1) - 1
+    rank = sum(_BINOM[s[:, i], i + 1] for i in range(5))
+    return rank * (PB_MAX + 1) + pbs
+
+
+def _log_weights(weights: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore"):
+        return np.where(weights > 0, np.log(np.maximum(weights, 1e-300)), -np.inf)
+
+
+def sample_combos(
+    reg_weights: np.ndarray,
+    pb_weights: np.ndarray,
+    k: int,
+    seed: int,
+    locked: Sequence[int] = (),
+    fixed_pb: Optional[int] = None,
+    max_draws: Optional[int] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    reg_weights: (70,) peso por blanca; 0 = fuera del pool/excluido. pb_weights: (27,).
+    locked: blancas fijas (van en todas las combinaciones). Devuelve (regs (n,5), pbs (n,)) únicas,
+    n <= k; regs trae primero los fijos en orden y luego el resto.
+    """
+    rng = np.random.default_rng(int(seed))
+    locked = [int(x) for x in locked]
+    m = 5 - len(locked)
+
+    lw = _log_weights(np.asarray(reg_weights, dtype=np.float64))
+    if locked:
+        lw[locked] = -np.inf
+    if m > 0 and np.isfinite(lw).sum() < m:
+        return np.empty((0, 5), dtype=np.int64), np.empty(0, dtype=np.int64)
+    lpb = _log_weights(np.asarray(pb_weights, dtype=np.float64))
+
+    max_draws = int(max_draws or max(5000, k * 50))
+    out_regs: List[np.ndarray] = []
+    out_pbs: List[np.ndarray] = []
+    seen = np.empty(0, dtype=np.int64)
+    have = 0
+    drawn = 0
+
+    while have < k and drawn < max_draws:
+        batch = min(max_draws - drawn, max(64, int((k - have) * 1.25) + 32))
+        drawn += batch
+
+        if m > 0:
+            # Gumbel-top-k: los m mayores de log(w) + Gumbel = muestra sin reemplazo ∝ w
+            keys = lw + rng.gumbel(size=(batch, REG_MAX + 1))
+            picks = np.argpartition(-keys, m - 1, axis=1)[:, :m]
+        else:
+            picks = np.empty((batch, 0), dtype=np.int64)
+        regs = np.hstack([np.broadcast_to(np.array(locked, dtype=np.int64), (batch, len(locked))), picks])
+
+        if fixed_pb is not None:
+            pbs = np.full(batch, int(fixed_pb), dtype=np.int64)
+        else:
+            pbs = np.argmax(lpb + rng.gumbel(size=(batch, PB_MAX + 1)), axis=1).astype(np.int64)
+
+        codes = combo_codes(regs, pbs)
+        _, first = np.unique(codes, return_index=True)
+        first.sort()                                   # conservar orden de generación
+        first = first[~np.isin(codes[first], seen)]
+        first = first[: k - have]
+        if len(first):
+            out_regs.append(regs[first])
+            out_pbs.append(pbs[first])
+            seen = np.concatenate([seen, codes[first]])
+            have += len(first)
+
+    if not out_regs:
+        return np.empty((0, 5), dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.vstack(out_regs), np.concatenate(out_pbs)
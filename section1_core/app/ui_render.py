@@ -0,0 +1,282 @@
+"""
+Capa de render para las páginas HTML de la UI (/ui, /tickets/table, /ui/recommendations).
+
+- PageShell: el "cascarón" (doctype, CSS, sidebar/nav, topbar) se arma una sola vez por proceso y por
+  (title, active); cada request solo concatena las partes precomputadas con el body.
+- RowTemplate: plantilla de fila compilada una vez (str.format_map en C) y renderizada en chunks, para
+  que StreamingResponse empiece a mandar la tabla sin construir todo el HTML en memoria.
+- ETag / conditional GET: make_etag() sobre la firma de filtros + versión de datos; not_modified()
+  responde 304 si el cliente ya tiene esa versión.
+- data_version(): contadores por tabla en data_versions; un listener del engine los sube una vez por
+  sentencia DML sobre tickets/draw_results, en la misma transacción (updates in-place y bulk, cualquier worker).
+"""
+from __future__ import annotations
+
+import hashlib
+import re
+from functools import lru_cache
+from html import escape
+from typing import Any, Dict, Iterable, Iterator, Mapping, Optional, Sequence, Tuple
+
+from fastapi import Request, Response
+from fastapi.responses import HTMLResponse, StreamingResponse
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+# Las páginas se revalidan siempre (ETag), pero el navegador puede reusar su copia con un 304
+UI_HEADERS: Dict[str, str] = {
+    "Cache-Control": "no-cache",
+    "X-Content-Type-Options": "nosniff",
+}
+
+ROW_CHUNK_SIZE = 200
+
+_BODY = "\x00BODY\x00"
+_RIGHT = "\x00RIGHT\x00"
+
+
+# ---------------------------
+# ETag / conditional GET
+# ---------------------------
+def make_etag(*parts: Any) -> str:
+    h = hashlib.sha1()
+    for p in parts:
+        h.update(repr(p).encode("utf-8"))
+        h.update(b"\x1f")
+    return f'W/"{h.hexdigest()[:24]}"'
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    inm = request.headers.get("if-none-match")
+    if not inm:
+        return False
+    if inm.strip() == "*":
+        return True
+    # Comparación débil: W/"x" == "x"
+    bare = etag[2:] if etag.startswith("W/") else etag
+    for tok in inm.split(","):
+        tok = tok.strip()
+        if tok.startswith("W/"):
+            tok = tok[2:]
+        if tok == bare:
+            return True
+    return False
+
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """Response 304 si If-None-Match coincide con `etag`; si no, None."""
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers={**UI_HEADERS, "ETag": etag})
+    return None
+
+
+# ---------------------------
+# Versión de datos (en la DB)
+# ---------------------------
+DATA_VERSION_TABLE = "data_versions"
+
+# INSERT/UPDATE/DELETE (incl. "INSERT OR IGNORE", "REPLACE") y la tabla afectada
+_DML_RE = re.compile(
+    r"^\s*(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|REPLACE\s+INTO|UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM)\s+[\"`\[]?(\w+)",
+    re.IGNORECASE,
+)
+
+
+def ensure_data_version(engine: Engine, tables: Sequence[str]) -> bool:
+    """
+    Crea data_versions (una fila por tabla de `tables`) y registra un listener after_cursor_execute que
+    sube la fila de la tabla una vez por sentencia DML exitosa sobre ella, en la misma transacción.
+    Cubre ORM, Core/bulk y text() en cualquier worker; un executemany de N filas cuenta como una sentencia.
+    """
+    watched = {t.lower(): t for t in tables}
+    try:
+        with engine.begin() as conn:
+            conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {DATA_VERSION_TABLE} "
+                "(name VARCHAR(32) PRIMARY KEY, version INTEGER NOT NULL DEFAULT 0)"
+            ))
+            for table in tables:
+                conn.execute(
+                    text(f"INSERT INTO {DATA_VERSION_TABLE} (name, version) SELECT :k, 0 "
+                         f"WHERE NOT EXISTS (SELECT 1 FROM {DATA_VERSION_TABLE} WHERE name = :k)"),
+                    {"k": table},
+                )
+                if engine.dialect.name == "sqlite":
+                    # DBs con los triggers FOR EACH ROW de la versión anterior
+                    for op in ("insert", "update", "delete"):
+                        conn.execute(text(f"DROP TRIGGER IF EXISTS trg_{table}_{op}_data_version"))
+    except Exception as e:
+        print(f"[WARN] ensure_data_version failed: {e}")
+        return False
+
+    bumps = {
+        key: f"UPDATE {DATA_VERSION_TABLE} SET version = version + 1 WHERE name = '{table}'"
+        for key, table in watched.items()
+    }
+
+    def _bump(conn, cursor, statement, parameters, context, executemany) -> None:
+        m = _DML_RE.match(statement)
+        if m is None:
+            return
+        sql = bumps.get(m.group(1).lower())
+        if sql is None or cursor.rowcount == 0:
+            return
+        # cursor aparte: el del statement puede tener filas pendientes (RETURNING)
+        cur = cursor.connection.cursor()
+        try:
+            cur.execute(sql)
+        finally:
+            cur.close()
+
+    if not event.contains(engine, "after_cursor_execute", _bump):
+        event.listen(engine, "after_cursor_execute", _bump)
+    return True
+
+
+def data_version(db: Session, *tables: str) -> int:
+    """Suma de las versiones de `tables` (todas si no se indica); los errores de la DB se propagan."""
+    sql = f"SELECT COALESCE(SUM(version), 0) FROM {DATA_VERSION_TABLE}"
+    params: Dict[str, Any] = {}
+    if tables:
+        names = [f":t{i}" for i in range(len(tables))]
+        sql += f" WHERE name IN ({', '.join(names)})"
+        params = {f"t{i}": t for i, t in enumerate(tables)}
+    return int(db.execute(text(sql), params).scalar() or 0)
+
+
+# ---------------------------
+# Shell precomputado
+# ---------------------------
+class PageShell:
+    """
+    Plantilla de página completa partida en (head, mid, tail) alrededor de right_pills y body.
+    css/nav son estáticos por proceso; etag identifica esa versión del shell.
+    """
+
+    def __init__(self, *, css: str, nav: Sequence[Tuple[str, str, str]], sidebar_note_html: str = ""):
+        self._css = css
+        self._nav = tuple(nav)
+        self._note = sidebar_note_html
+        self.etag = make_etag(css, self._nav, sidebar_note_html)
+        self._parts = lru_cache(maxsize=64)(self._build_parts)
+
+    def _build_parts(self, title: str, active: str) -> Tuple[str, str, str]:
+        safe_title = escape(str(title))
+        safe_active = str(active or "").strip()
+        nav = "\n        ".join(
+            # label y href vienen hardcodeados; si luego se hacen dinámicos, escaparlos.
+            f'<a class="{"active" if key == safe_active else ""}" href="{href}">{label}</a>'
+            for href, label, key in self._nav
+        )
+        html = f"""<!doctype html>
+<html>
+<head>
+  <meta charset="utf-8"/>
+  <meta name="viewport" content="width=device-width, initial-scale=1"/>
+  <title>{safe_title}</title>
+  <style>{self._css}</style>
+</head>
+<body>
+  <div class="app">
+    <aside class="sidebar">
+      <div class="brand">
+        <div class="logo"></div>
+        <div>
+          <h1>Powerball AI</h1>
+          <p>Dashboard • SQLite • FastAPI</p>
+        </div>
+      </div>
+
+      <nav class="nav">
+        {nav}
+      </nav>
+
+      <hr class="sep"/>
+      <div class="muted" style="font-size:12px; line-height:1.35;">
+        {self._note}
+      </div>
+    </aside>
+
+    <main class="main">
+      <div class="topbar">
+        <h2>{safe_title}</h2>
+        <div class="right">{_RIGHT}</div>
+      </div>
+
+      {_BODY}
+    </main>
+  </div>
+</body>
+</html>
+"""
+        head, rest = html.split(_RIGHT)
+        mid, tail = rest.split(_BODY)
+        return head, mid, tail
+
+    def parts(self, title: str, active: str) -> Tuple[str, str, str]:
+        return self._parts(str(title), str(active or ""))
+
+    def render(self, *, title: str, active: str, body_html: str, right_pills_html: str = "") -> str:
+        head, mid, tail = self.parts(title, active)
+        return "".join((head, right_pills_html, mid, body_html, tail))
+
+    def response(self, *, title: str, active: str, body_html: str, right_pills_html: str = "",
+                 etag: Optional[str] = None) -> HTMLResponse:
+        headers = dict(UI_HEADERS)
+        if etag:
+            headers["ETag"] = etag
+        return HTMLResponse(
+            content=self.render(title=title, active=active, body_html=body_html, right_pills_html=right_pills_html),
+            headers=headers,
+        )
+
+    def stream(self, *, title: str, active: str, right_pills_html: str, body_chunks: Iterable[str],
+               etag: Optional[str] = None) -> StreamingResponse:
+        """Igual que response(), pero el body llega como iterable de chunks (p.ej. filas de una tabla)."""
+        head, mid, tail = self.parts(title, active)
+
+        def gen() -> Iterator[bytes]:
+            yield (head + right_pills_html + mid).encode("utf-8")
+            for chunk in body_chunks:
+                if chunk:
+                    yield chunk.encode("utf-8")
+            yield tail.encode("utf-8")
+
+        headers = dict(UI_HEADERS)
+        if etag:
+            headers["ETag"] = etag
+        return StreamingResponse(gen(), media_type="text/html; charset=utf-8", headers=headers)
+
+
+# ---------------------------
+# Filas
+# ---------------------------
+class RowTemplate:
+    """Plantilla de fila estilo str.format ({campo}); los valores ya deben venir escapados."""
+
+    __slots__ = ("_fmt",)
+
+    def __init__(self, template: str):
+        # Valida los campos una vez (KeyError/ValueError al definir la plantilla, no por fila)
+        template.format_map(_AnyFields())
+        self._fmt = template.format_map
+
+    def render(self, values: Mapping[str, Any]) -> str:
+        return self._fmt(values)
+
+    def render_chunks(self, rows: Iterable[Mapping[str, Any]], chunk_size: int = ROW_CHUNK_SIZE) -> Iterator[str]:
+        buf = []
+        fmt = self._fmt
+        for values in rows:
+            buf.append(fmt(values))
+            if len(buf) >= chunk_size:
+                yield "".join(buf)
+                buf = []
+        if buf:
+            yield "".join(buf)
+
+
+class _AnyFields(dict):
+    def __missing__(self, key: str) -> str:
+        return ""
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from fastapi import FastAPI, Query, UploadFile, File, BackgroundTasks, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
 from fastapi.exceptions import RequestValidationError
 from typing import Optional
 import os
@@ -12,17 +12,18 @@ import traceback
 from src.export_first_position import (
     export_by_first_position,              # JSON
     export_first_position_xlsx,            # XLSX
-    list_draws_by_position,
-    list_draws_filtered,
-    list_draws_filtered_or,
-    list_draws_filtered_atleast,
+    export_all_positions,                  # JSON (5x69 + PB)
+    export_all_positions_xlsx,             # XLSX multi-hoja
     create_future_quickpicks,
     create_future_quickpicks_unique,
-    list_future_filtered,
-    list_future_filtered_or,
-    list_future_filtered_atleast,
     import_future_from_excel,
 )
+from src import async_db                   # history/future filter: async sobre hilos lectores
+from src import metrics
+from src.draw_source import get_draw_columns
+from src.serialization import list_response
+from src.single_flight import DEFAULT_STALE_SECONDS, DEFAULT_TTL_SECONDS, SingleFlight, make_key
+from src.simulate.router import router as simulate_router
 
 app = FastAPI(title="Powerball API")
 
@@ -43,6 +44,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Latencia por ruta + status para /metrics (la más externa: mide también CORS)
+app.add_middleware(metrics.MetricsMiddleware)
 
 
 def _safe_error_payload(
@@ -108,15 +111,41 @@ def root():
     return {"status": "ok"}
 
 
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    # formato texto de Prometheus; con METRICS_MULTIPROC_DIR suma todos los workers
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
 # -------------------------
 # Exports
 # -------------------------
+# Exports JSON idénticos y concurrentes se calculan una vez por versión de los sorteos
+_EXPORT_FLIGHT = SingleFlight("export")
+
+
+def _draws_version(source: str):
+    cols, _ = get_draw_columns(source)
+    return cols.version if cols is not None else None
+
+
+def _export_single_flight(name: str, fn, **params):
+    return _EXPORT_FLIGHT.do(
+        make_key(name, params),
+        lambda: fn(**params),
+        version=_draws_version(params["source"]),
+        ttl=DEFAULT_TTL_SECONDS,
+        stale=DEFAULT_STALE_SECONDS,
+        cacheable=lambda out: out.get("status") == "ok",
+    )
+
+
 @app.get("/api/export/first-position")
 def export_first_position(
     limit: int = Query(69, ge=1, le=69),
     source: str = Query("auto"),
 ):
-    return export_by_first_position(limit=limit, source=source)
+    return _export_single_flight("first_position", export_by_first_position, limit=limit, source=source)
 
 
 @app.get("/api/export/first-position.xlsx")
@@ -165,16 +194,72 @@ def export_first_position_excel(
     )
 
 
+@app.get("/api/export/all-positions")
+def export_all_positions_json(
+    source: str = Query("auto"),
+    date_from: Optional[str] = Query(None, description="YYYY-MM-DD (inclusive)"),
+    date_to: Optional[str] = Query(None, description="YYYY-MM-DD (inclusive)"),
+):
+    return _export_single_flight("all_positions", export_all_positions, source=source, date_from=date_from, date_to=date_to)
+
+
+@app.get("/api/export/all-positions.xlsx")
+def export_all_positions_excel(
+    background_tasks: BackgroundTasks,
+    source: str = Query("auto"),
+    date_from: Optional[str] = Query(None, description="YYYY-MM-DD (inclusive)"),
+    date_to: Optional[str] = Query(None, description="YYYY-MM-DD (inclusive)"),
+):
+    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".xlsx")
+    tmp_path = tmp.name
+    tmp.close()
+
+    try:
+        out_path = export_all_positions_xlsx(
+            source=source, date_from=date_from, date_to=date_to, output_path=tmp_path
+        )
+    except Exception as e:
+        try:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        except Exception:
+            pass
+
+        return JSONResponse(
+            status_code=500,
+            content=_safe_error_payload(
+                "EXPORT_ALL_POSITIONS_XLSX_FAILED",
+                "Failed to generate XLSX export.",
+                detail=str(e),
+            ),
+        )
+
+    def _cleanup(p: str):
+        try:
+            if p and os.path.exists(p):
+                os.remove(p)
+        except Exception:
+            pass
+
+    background_tasks.add_task(_cleanup, out_path)
+
+    return FileResponse(
+        path=out_path,
+        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        filename="powerball_all_positions_export.xlsx",
+    )
+
+
 # -------------------------
 # History
 # -------------------------
 @app.get("/api/history/by-position")
-def history_by_position(pos: int, num: int, limit: int = 5000):
-    return list_draws_by_position(pos, num, limit)
+async def history_by_position(pos: int, num: int, limit: int = 5000):
+    return await async_db.list_draws_by_position(pos, num, limit)
 
 
 @app.get("/api/history/filter")
-def history_filter(
+async def history_filter(
     white1: int | None = None,
     white2: int | None = None,
     white3: int | None = None,
@@ -188,8 +273,9 @@ def history_filter(
     direction: str = "asc",
     output: str = "json",
     limit: int = 5000,
+    cursor: str | None = None,
 ):
-    return list_draws_filtered(
+    result = await async_db.list_draws_filtered(
         white1=white1,
         white2=white2,
         white3=white3,
@@ -203,11 +289,13 @@ def history_filter(
         direction=direction,
         output=output,
         limit=limit,
+        cursor=cursor,
     )
+    return list_response(result)
 
 
 @app.get("/api/history/filter/or")
-def history_filter_or(
+async def history_filter_or(
     white1: int | None = None,
     white2: int | None = None,
     white3: int | None = None,
@@ -221,8 +309,9 @@ def history_filter_or(
     direction: str = "asc",
     output: str = "lines",
     limit: int = 5000,
+    cursor: str | None = None,
 ):
-    return list_draws_filtered_or(
+    result = await async_db.list_draws_filtered_or(
         white1=white1,
         white2=white2,
         white3=white3,
@@ -236,11 +325,13 @@ def history_filter_or(
         direction=direction,
         output=output,
         limit=limit,
+        cursor=cursor,
     )
+    return list_response(result)
 
 
 @app.get("/api/history/filter/atleast")
-def history_filter_atleast(
+async def history_filter_atleast(
     white1: int | None = None,
     white2: int | None = None,
     white3: int | None = None,
@@ -255,8 +346,9 @@ def history_filter_atleast(
     direction: str = "desc",
     output: str = "lines",
     limit: int = 5000,
+    cursor: str | None = None,
 ):
-    return list_draws_filtered_atleast(
+    result = await async_db.list_draws_filtered_atleast(
         white1=white1,
         white2=white2,
         white3=white3,
@@ -271,7 +363,9 @@ def history_filter_atleast(
         direction=direction,
         output=output,
         limit=limit,
+        cursor=cursor,
     )
+    return list_response(result)
 
 
 # -------------------------
@@ -292,7 +386,7 @@ def api_future_quickpick(
 
 
 @app.get("/api/future/filter")
-def api_future_filter(
+async def api_future_filter(
     white1: Optional[int] = None,
     white2: Optional[int] = None,
     white3: Optional[int] = None,
@@ -306,8 +400,9 @@ def api_future_filter(
     sort: str = "created_at",
     direction: str = "desc",
     limit: int = 200,
+    cursor: str | None = None,
 ):
-    return list_future_filtered(
+    result = await async_db.list_future_filtered(
         white1=white1,
         white2=white2,
         white3=white3,
@@ -321,11 +416,13 @@ def api_future_filter(
         sort=sort,
         direction=direction,
         limit=limit,
+        cursor=cursor,
     )
+    return list_response(result)
 
 
 @app.get("/api/future/filter/or")
-def api_future_filter_or(
+async def api_future_filter_or(
     white1: Optional[int] = None,
     white2: Optional[int] = None,
     white3: Optional[int] = None,
@@ -337,8 +434,9 @@ def api_future_filter_or(
     sort: str = "created_at",
     direction: str = "desc",
     limit: int = 200,
+    cursor: str | None = None,
 ):
-    return list_future_filtered_or(
+    result = await async_db.list_future_filtered_or(
         white1=white1,
         white2=white2,
         white3=white3,
@@ -350,11 +448,13 @@ def api_future_filter_or(
         sort=sort,
         direction=direction,
         limit=limit,
+        cursor=cursor,
     )
+    return list_response(result)
 
 
 @app.get("/api/future/filter/atleast")
-def api_future_filter_atleast(
+async def api_future_filter_atleast(
     white1: Optional[int] = None,
     white2: Optional[int] = None,
     white3: Optional[int] = None,
@@ -367,8 +467,9 @@ def api_future_filter_atleast(
     sort: str = "score",
     direction: str = "desc",
     limit: int = 200,
+    cursor: str | None = None,
 ):
-    return list_future_filtered_atleast(
+    result = await async_db.list_future_filtered_atleast(
         white1=white1,
         white2=white2,
         white3=white3,
@@ -381,7 +482,9 @@ def api_future_filter_atleast(
         sort=sort,
         direction=direction,
         limit=limit,
+        cursor=cursor,
     )
+    return list_response(result)
 
 
 @app.post("/api/future/import-excel")
@@ -428,3 +531,9 @@ def api_future_quickpick_unique(
         white5=white5,
         powerball=powerball,
     )
+
+
+# -------------------------
+# Simulation (Monte Carlo)
+# -------------------------
+app.include_router(simulate_router)
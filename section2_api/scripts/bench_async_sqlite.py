@@ -0,0 +1,177 @@
+"""
+Benchmark de carga: handlers history/future filter sync (threadpool) vs async (src/async_db.py).
+
+Arma una SQLite sintética (draws + future_draws, scripts/bench_data.py), y lanza `--clients` clientes concurrentes que hacen
+`--requests` peticiones cada uno con una mezcla de filtros (history/filter, /or, /atleast, by-position,
+future/filter). Se mide throughput y latencias p50/p95/p99 para:
+  - sync  : mismos endpoints como `def` sobre los list_* síncronos (el camino anterior: un hilo del
+            threadpool de Starlette por request, conexión nueva por request)
+  - async : los endpoints reales de main.py (`async def` + hilos lectores con conexión persistente)
+
+Por defecto todo corre en proceso (httpx.ASGITransport), así que ambos modos pagan el mismo costo de
+cliente. Con --url se mide un servidor ya levantado (p.ej. `uvicorn main:app --workers 1`).
+
+Usage:
+  python scripts/bench_async_sqlite.py                          # 200 clientes x 20 requests
+  python scripts/bench_async_sqlite.py --clients 400 --requests 10 --draws 5000 --readers 8
+  python scripts/bench_async_sqlite.py --url http://127.0.0.1:8000 --clients 200
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench_data import build_db  # noqa: E402  (mismo esquema draws/future_draws que la suite)
+
+
+def request_mix(rng: random.Random) -> Tuple[str, Dict[str, Any]]:
+    k = rng.random()
+    if k < 0.35:
+        return "/api/history/filter", {"white1": rng.randint(1, 30), "limit": 50}
+    if k < 0.55:
+        return "/api/history/filter/or", {"white2": rng.randint(5, 40), "white3": rng.randint(10, 50), "limit": 50}
+    if k < 0.70:
+        return "/api/history/filter/atleast", {"white1": rng.randint(1, 20), "white2": rng.randint(10, 40),
+                                               "powerball": rng.randint(1, 26), "limit": 50}
+    if k < 0.85:
+        return "/api/history/by-position", {"pos": rng.randint(1, 5), "num": rng.randint(1, 69), "limit": 50}
+    return "/api/future/filter", {"powerball": rng.randint(1, 26), "limit": 50}
+
+
+def sync_app():
+    """Los mismos endpoints como `def` sobre los list_* síncronos (camino previo a async_db)."""
+    from fastapi import FastAPI
+
+    from src import export_first_position as efp
+    from src.serialization import list_response
+
+    app = FastAPI()
+
+    @app.get("/api/history/filter")
+    def history_filter(white1: Optional[int] = None, limit: int = 5000):
+        return list_response(efp.list_draws_filtered(white1=white1, limit=limit))
+
+    @app.get("/api/history/filter/or")
+    def history_filter_or(white2: Optional[int] = None, white3: Optional[int] = None, limit: int = 5000):
+        return list_response(efp.list_draws_filtered_or(white2=white2, white3=white3, output="lines", limit=limit))
+
+    @app.get("/api/history/filter/atleast")
+    def history_filter_atleast(white1: Optional[int] = None, white2: Optional[int] = None,
+                               powerball: Optional[int] = None, limit: int = 5000):
+        return list_response(efp.list_draws_filtered_atleast(
+            white1=white1, white2=white2, powerball=powerball, sort="score", direction="desc",
+            output="lines", limit=limit))
+
+    @app.get("/api/history/by-position")
+    def history_by_position(pos: int, num: int, limit: int = 5000):
+        return efp.list_draws_by_position(pos, num, limit)
+
+    @app.get("/api/future/filter")
+    def future_filter(powerball: Optional[int] = None, limit: int = 200):
+        return list_response(efp.list_future_filtered(powerball=powerball, limit=limit))
+
+    return app
+
+
+async def run_load(client, clients: int, per_client: int, seed: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors = 0
+
+    async def one(cid: int) -> None:
+        nonlocal errors
+        rng = random.Random(seed * 1000 + cid)
+        for _ in range(per_client):
+            path, params = request_mix(rng)
+            t0 = time.perf_counter()
+            r = await client.get(path, params=params)
+            latencies.append(time.perf_counter() - t0)
+            if r.status_code != 200:
+                errors += 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(clients)))
+    wall = time.perf_counter() - t0
+    lat = sorted(latencies)
+
+    def pct(p: float) -> float:
+        return lat[min(len(lat) - 1, int(p * len(lat)))] * 1000.0
+
+    return {
+        "requests": len(lat),
+        "errors": errors,
+        "wall_s": wall,
+        "rps": len(lat) / wall if wall else 0.0,
+        "p50": pct(0.50),
+        "p95": pct(0.95),
+        "p99": pct(0.99),
+        "mean": statistics.fmean(lat) * 1000.0 if lat else 0.0,
+    }
+
+
+async def bench_in_process(args) -> Dict[str, Dict[str, Any]]:
+    import httpx
+
+    import main
+    from src import async_db
+    from src import export_first_position as efp
+
+    tmp = Path(tempfile.mkdtemp(prefix="bench_async_sqlite_"))
+    db = tmp / "powerball.db"
+    build_db(db, args.draws, args.future)
+    efp.DB_PATH = db
+    os.environ["DATABASE_URL"] = f"sqlite:///{db}"
+    async_db._READER = async_db.SQLiteReader(args.readers)
+
+    out: Dict[str, Dict[str, Any]] = {}
+    for name, app in (("sync", sync_app()), ("async", main.app)):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120.0) as client:
+            await run_load(client, min(args.clients, 20), 2, args.seed)  # warm-up (índices keyset, imports)
+            out[name] = await run_load(client, args.clients, args.requests, args.seed)
+    async_db.get_reader().close()
+    return out
+
+
+async def bench_url(args) -> Dict[str, Dict[str, Any]]:
+    import httpx
+
+    limits = httpx.Limits(max_connections=args.clients, max_keepalive_connections=args.clients)
+    async with httpx.AsyncClient(base_url=args.url, timeout=120.0, limits=limits) as client:
+        await run_load(client, min(args.clients, 20), 2, args.seed)
+        return {"server": await run_load(client, args.clients, args.requests, args.seed)}
+
+
+def main_cli() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--clients", type=int, default=200, help="Clientes concurrentes.")
+    ap.add_argument("--requests", type=int, default=20, help="Requests por cliente.")
+    ap.add_argument("--draws", type=int, default=3000, help="Filas sintéticas en draws.")
+    ap.add_argument("--future", type=int, default=20000, help="Filas sintéticas en future_draws.")
+    ap.add_argument("--readers", type=int, default=4, help="Hilos lectores de async_db.")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--url", default=None, help="Medir un servidor ya levantado en vez del modo en proceso.")
+    args = ap.parse_args()
+
+    results = asyncio.run(bench_url(args) if args.url else bench_in_process(args))
+    print(f"{args.clients} clients x {args.requests} requests")
+    print(f"   {'mode':<7} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for name, r in results.items():
+        print(f"   {name:<7} {r['rps']:9.1f} {r['p50']:9.1f} {r['p95']:9.1f} {r['p99']:9.1f} {r['errors']:7d}")
+    if "sync" in results and "async" in results and results["sync"]["rps"]:
+        print(f"   async/sync throughput: {results['async']['rps'] / results['sync']['rps']:.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
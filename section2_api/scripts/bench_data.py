@@ -0,0 +1,270 @@
+"""
+Generador de datos sintéticos para benchmarks (mismo esquema que producción).
+
+Una sola SQLite con las tablas de las dos apps, más los CSV que lee section1:
+  - draws, future_draws              (section2: import_excel_to_sqlite.py / export_first_position.py)
+  - draw_results, tickets, users     (section1: app.models, creadas con Base.metadata.create_all)
+  - powerball_draws.csv, tickets.csv (section1: _load_draws / _load_tickets en modo CSV)
+
+Los sorteos siguen el calendario real (lun/mié/sáb desde 1992-04-22): 1M sorteos llegan al año ~8400.
+Blancas únicas y ordenadas 1..69, PB 1..26. Los tickets caen en fechas de sorteo y traen
+matched_regular_numbers / matched_powerball / prize_amount calculados contra ese sorteo.
+Todo vectorizado con numpy por bloques: 1M sorteos + 10M tickets caben en memoria acotada.
+
+El dataset se cachea por (draws, tickets, future, seed) en --out (default <tmp>/powerball_bench):
+generar una vez, medir muchas.
+
+Usage:
+  python scripts/bench_data.py --draws 3000 --tickets 100000
+  python scripts/bench_data.py --draws 1000000 --tickets 10000000 --out /data/bench
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sqlite3
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from datetime import date
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+DEFAULT_OUT = Path(tempfile.gettempdir()) / "powerball_bench"
+
+CHUNK = 200_000
+FIRST_DRAW = date(1992, 4, 22)  # miércoles
+_STEPS = (3, 2, 2)              # mié -> sáb -> lun -> mié
+
+# premio por (blancas acertadas, PB acertado); el jackpot se deja fijo para no depender del pozo
+_PRIZES = {(5, 1): 20_000_000.0, (5, 0): 1_000_000.0, (4, 1): 50_000.0, (4, 0): 100.0, (3, 1): 100.0,
+           (3, 0): 7.0, (2, 1): 7.0, (1, 1): 4.0, (0, 1): 4.0}
+
+
+@dataclass(frozen=True)
+class Dataset:
+    draws: int
+    tickets: int
+    future: int
+    seed: int
+    db: str
+    draws_csv: str
+    tickets_csv: str
+
+    def describe(self) -> dict:
+        return {"draws": self.draws, "tickets": self.tickets, "future": self.future, "seed": self.seed}
+
+
+def draw_dates(n: int) -> np.ndarray:
+    steps = np.resize(np.asarray(_STEPS, dtype=np.int64), max(n - 1, 0))
+    offsets = np.concatenate([[0], np.cumsum(steps)]) if n else np.empty(0, dtype=np.int64)
+    return np.datetime64(FIRST_DRAW.isoformat(), "D") + offsets.astype("timedelta64[D]")
+
+
+def random_whites(rng: np.random.Generator, n: int) -> np.ndarray:
+    """(n, 5) blancas distintas 1..69 ordenadas por fila."""
+    out = np.empty((n, 5), dtype=np.int64)
+    for i in range(0, n, CHUNK):
+        k = min(CHUNK, n - i)
+        # 5 primeras columnas de una permutación por fila (argpartition sobre ruido uniforme)
+        picks = np.argpartition(rng.random((k, 69)), 5, axis=1)[:, :5] + 1
+        out[i:i + k] = np.sort(picks, axis=1)
+    return out
+
+
+def _iso(dates: np.ndarray) -> np.ndarray:
+    return np.datetime_as_string(dates, unit="D")
+
+
+def _chunks(n: int) -> Iterator[Tuple[int, int]]:
+    for i in range(0, n, CHUNK):
+        yield i, min(n, i + CHUNK)
+
+
+def _create_core_schema(db: Path) -> None:
+    """Tablas de section1 con su propio metadata (tickets con índice único, combo_key, defaults)."""
+    core = str(REPO_ROOT / "section1_core")
+    if core not in sys.path:
+        sys.path.insert(0, core)
+    from sqlalchemy import create_engine
+
+    from app.models import Base  # noqa: F401 (registra tablas en Base.metadata)
+
+    engine = create_engine(f"sqlite:///{db}", future=True)
+    try:
+        Base.metadata.create_all(bind=engine)
+    finally:
+        engine.dispose()
+
+
+def _create_api_schema(conn: sqlite3.Connection) -> None:
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS draws (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            draw_date TEXT,
+            white1 INTEGER, white2 INTEGER, white3 INTEGER, white4 INTEGER, white5 INTEGER,
+            powerball INTEGER,
+            power_play INTEGER
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS future_draws (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            draw_date TEXT,
+            white1 INTEGER, white2 INTEGER, white3 INTEGER, white4 INTEGER, white5 INTEGER,
+            powerball INTEGER,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            meta TEXT,
+            UNIQUE (white1, white2, white3, white4, white5, powerball)
+        )
+    """)
+
+
+def build_db(path: Path, n_draws: int, n_future: int, n_tickets: int = 0, seed: int = 7,
+             core: bool = False, csv_dir: Optional[Path] = None) -> None:
+    """
+    Llena `path` (que no debe existir o estar vacía). core=True agrega las tablas de section1;
+    csv_dir escribe además powerball_draws.csv / tickets.csv.
+    """
+    rng = np.random.default_rng(seed)
+    dates = draw_dates(n_draws)
+    iso = _iso(dates)
+    whites = random_whites(rng, n_draws)
+    pbs = rng.integers(1, 27, n_draws)
+    power_play = rng.choice(np.array([2, 3, 4, 5, 10]), n_draws)
+
+    if core:
+        _create_core_schema(path)
+    conn = sqlite3.connect(str(path))
+    try:
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute("PRAGMA synchronous=OFF")
+        _create_api_schema(conn)
+        for a, b in _chunks(n_draws):
+            conn.executemany(
+                "INSERT INTO draws (draw_date, white1, white2, white3, white4, white5, powerball, power_play) "
+                "VALUES (?,?,?,?,?,?,?,?)",
+                zip(iso[a:b].tolist(), *whites[a:b].T.tolist(), pbs[a:b].tolist(), power_play[a:b].tolist()),
+            )
+        fw = random_whites(rng, n_future)
+        fp = rng.integers(1, 27, n_future)
+        next_draw = (dates[-1] + np.timedelta64(2, "D")) if n_draws else np.datetime64("2026-01-05", "D")
+        conn.executemany(
+            "INSERT OR IGNORE INTO future_draws (draw_date, white1, white2, white3, white4, white5, powerball, meta) "
+            "VALUES (?,?,?,?,?,?,?,'{}')",
+            zip([str(next_draw)] * n_future, *fw.T.tolist(), fp.tolist()),
+        )
+
+        if core:
+            for a, b in _chunks(n_draws):
+                conn.executemany(
+                    "INSERT INTO draw_results (draw_date, wn1, wn2, wn3, wn4, wn5, winning_powerball) "
+                    "VALUES (?,?,?,?,?,?,?)",
+                    zip(iso[a:b].tolist(), *whites[a:b].T.tolist(), pbs[a:b].tolist()),
+                )
+            if n_draws:
+                _insert_tickets(conn, rng, n_tickets, iso, whites, pbs)
+        conn.commit()
+    finally:
+        conn.close()
+
+    if csv_dir is not None:
+        _write_draws_csv(csv_dir / "powerball_draws.csv", iso, whites, pbs)
+        if core and n_draws:
+            _write_tickets_csv(conn_path=path, out=csv_dir / "tickets.csv")
+
+
+def _insert_tickets(conn: sqlite3.Connection, rng: np.random.Generator, n: int,
+                    iso: np.ndarray, whites: np.ndarray, pbs: np.ndarray) -> None:
+    prize = np.zeros((6, 2), dtype=np.float64)
+    for (m, p), v in _PRIZES.items():
+        prize[m, p] = v
+    for a, b in _chunks(n):
+        k = b - a
+        di = rng.integers(0, len(iso), k)
+        tw = random_whites(rng, k)
+        tp = rng.integers(1, 27, k)
+        # aciertos: blancas del ticket presentes en las del sorteo (ambas ordenadas, 5x5 comparaciones)
+        matched = (tw[:, :, None] == whites[di][:, None, :]).any(axis=2).sum(axis=1)
+        mpb = (tp == pbs[di]).astype(np.int64)
+        keys = ["-".join(map(str, w)) + f"|{p}" for w, p in zip(tw.tolist(), tp.tolist())]
+        conn.executemany(
+            "INSERT OR IGNORE INTO tickets (draw_date, status, n1, n2, n3, n4, n5, powerball, type, cost, "
+            "matched_regular_numbers, matched_powerball, prize_amount, combo_key) "
+            "VALUES (?,'PAST',?,?,?,?,?,?,?,2.0,?,?,?,?)",
+            zip(iso[di].tolist(), *tw.T.tolist(), tp.tolist(),
+                np.where(rng.random(k) < 0.8, "QUICK_PICK", "MANUAL").tolist(),
+                matched.tolist(), mpb.tolist(), prize[matched, mpb].tolist(), keys),
+        )
+
+
+def _write_draws_csv(out: Path, iso: np.ndarray, whites: np.ndarray, pbs: np.ndarray) -> None:
+    with out.open("w", encoding="utf-8", newline="") as f:
+        f.write("draw_date,n1,n2,n3,n4,n5,pb\n")
+        for a, b in _chunks(len(iso)):
+            f.writelines(f"{d},{w[0]},{w[1]},{w[2]},{w[3]},{w[4]},{p}\n"
+                         for d, w, p in zip(iso[a:b].tolist(), whites[a:b].tolist(), pbs[a:b].tolist()))
+
+
+def _write_tickets_csv(conn_path: Path, out: Path) -> None:
+    # desde la tabla (no desde los arrays): mismo contenido que la DB, sin los duplicados ignorados
+    conn = sqlite3.connect(str(conn_path))
+    try:
+        cur = conn.execute("SELECT id, n1, n2, n3, n4, n5, powerball FROM tickets ORDER BY id")
+        with out.open("w", encoding="utf-8", newline="") as f:
+            f.write("ticket_id,n1,n2,n3,n4,n5,pb\n")
+            while True:
+                rows = cur.fetchmany(CHUNK)
+                if not rows:
+                    break
+                f.writelines("%d,%d,%d,%d,%d,%d,%d\n" % r for r in rows)
+    finally:
+        conn.close()
+
+
+def dataset_for(draws: int, tickets: int, future: int = 20_000, seed: int = 7,
+                out: Optional[Path] = None) -> Dataset:
+    """Rutas del dataset, sin generarlo."""
+    root = Path(out or DEFAULT_OUT) / f"d{draws}-t{tickets}-f{future}-s{seed}"
+    return Dataset(draws, tickets, future, seed, str(root / "powerball.db"),
+                   str(root / "powerball_draws.csv"), str(root / "tickets.csv"))
+
+
+def ensure_dataset(draws: int, tickets: int, future: int = 20_000, seed: int = 7,
+                   out: Optional[Path] = None, force: bool = False) -> Dataset:
+    """Genera (o reutiliza) el dataset en <out>/d<draws>-t<tickets>-f<future>-s<seed>/."""
+    ds = dataset_for(draws, tickets, future, seed, out)
+    root = Path(ds.db).parent
+    marker = root / "dataset.json"
+    if marker.exists() and not force:
+        return ds
+    root.mkdir(parents=True, exist_ok=True)
+    for name in ("powerball.db", "powerball_draws.csv", "tickets.csv", "dataset.json"):
+        (root / name).unlink(missing_ok=True)
+    build_db(root / "powerball.db", draws, future, tickets, seed=seed, core=True, csv_dir=root)
+    marker.write_text(json.dumps(asdict(ds), indent=2), encoding="utf-8")
+    return ds
+
+
+def main_cli() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--draws", type=int, default=3000, help="Sorteos históricos (1k..1M).")
+    ap.add_argument("--tickets", type=int, default=100_000, help="Tickets de section1 (10k..10M).")
+    ap.add_argument("--future", type=int, default=20_000, help="Filas en future_draws.")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--out", type=Path, default=DEFAULT_OUT, help="Directorio de cache de datasets.")
+    ap.add_argument("--force", action="store_true", help="Regenerar aunque exista.")
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    ds = ensure_dataset(args.draws, args.tickets, args.future, args.seed, args.out, args.force)
+    print(f"dataset {ds.describe()} -> {Path(ds.db).parent} ({time.perf_counter() - t0:.1f}s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,115 @@
+"""
+Benchmark de serialización para los listados de history/future (payload + tiempo).
+
+Compara, sobre filas sintéticas con la forma de list_draws_filtered (draw_date, white1..5, powerball):
+  - baseline  : dict por fila -> jsonable_encoder + JSONResponse.render (camino default de FastAPI)
+  - orjson    : dict por fila -> orjson (json_response de src/serialization.py)
+  - columnar  : un array por columna -> orjson (output=columnar)
+  - ndjson    : una línea por fila (output=ndjson; se mide el stream completo)
+  - lines     : output=lines -> orjson
+
+Usage:
+  python scripts/bench_listing_serialization.py                 # 5k y 50k filas
+  python scripts/bench_listing_serialization.py --rows 5000,50000,200000 --repeat 7
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import random
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+
+from src.export_first_position import _format_lines  # noqa: E402
+from src.serialization import HAVE_ORJSON, _ndjson_lines, dumps  # noqa: E402
+
+COLS = ("draw_date", "white1", "white2", "white3", "white4", "white5", "powerball")
+
+
+def synthetic_rows(n: int, seed: int = 7) -> List[Tuple[Any, ...]]:
+    rng = random.Random(seed)
+    d0 = date(1992, 4, 22)
+    rows = []
+    for i in range(n):
+        w = sorted(rng.sample(range(1, 70), 5))
+        rows.append(((d0 + timedelta(days=i)).isoformat(), *w, rng.randint(1, 26)))
+    return rows
+
+
+def _envelope(n: int) -> Dict[str, Any]:
+    return {"status": "ok", "count": n, "filters": {"complete": True, "sort": "draw_date"}, "meta": {"limit": n}}
+
+
+def _baseline(rows) -> bytes:
+    payload = {**_envelope(len(rows)), "data": [dict(zip(COLS, r)) for r in rows]}
+    return JSONResponse(content=jsonable_encoder(payload)).body
+
+
+def _orjson_rows(rows) -> bytes:
+    return dumps({**_envelope(len(rows)), "data": [dict(zip(COLS, r)) for r in rows]})
+
+
+def _columnar(rows) -> bytes:
+    by_col = list(zip(*rows))
+    return dumps({**_envelope(len(rows)), "columns": {c: list(v) for c, v in zip(COLS, by_col)}})
+
+
+def _ndjson(rows) -> bytes:
+    header = {k: v for k, v in _envelope(len(rows)).items() if k != "count"}
+    return b"".join(_ndjson_lines(header, (dict(zip(COLS, r)) for r in rows)))
+
+
+def _lines(rows) -> bytes:
+    return dumps({**_envelope(len(rows)), "lines": [_format_lines(dict(zip(COLS, r))) for r in rows]})
+
+
+MODES: Dict[str, Callable[[list], bytes]] = {
+    "baseline": _baseline,
+    "orjson": _orjson_rows,
+    "columnar": _columnar,
+    "ndjson": _ndjson,
+    "lines": _lines,
+}
+
+
+def _time(fn, rows, repeat: int) -> Tuple[float, bytes]:
+    times = []
+    body = b""
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        body = fn(rows)
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times) * 1000.0, body
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--rows", default="5000,50000", help="Tamaños a medir (coma-separados).")
+    ap.add_argument("--repeat", type=int, default=5, help="Repeticiones por modo (se usa la mediana).")
+    args = ap.parse_args()
+
+    print(f"orjson: {'yes' if HAVE_ORJSON else 'NO (fallback json)'}")
+    for n in (int(x) for x in args.rows.split(",") if x.strip()):
+        rows = synthetic_rows(n)
+        print(f"\n== {n} rows")
+        print(f"   {'mode':<10} {'ms':>9} {'vs base':>8} {'bytes':>12} {'gzip':>10}")
+        base_ms = None
+        for name, fn in MODES.items():
+            ms, body = _time(fn, rows, args.repeat)
+            base_ms = base_ms or ms
+            gz = len(gzip.compress(body, compresslevel=5))
+            print(f"   {name:<10} {ms:9.2f} {base_ms / ms:7.1f}x {len(body):12,d} {gz:10,d}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
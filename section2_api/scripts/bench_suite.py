@@ -0,0 +1,550 @@
+"""
+Suite de benchmarks reproducible para los caminos calientes de análisis y consultas.
+
+Micro-benchmarks (llamada directa a la función):
+  micro.build_context                 ai_assistants.assistants.build_context
+  micro.rescore_combo                 ai_assistants.rescore.rescore_combo
+  micro.is_near_duplicate_of_recent   ai_assistants.data.is_near_duplicate_of_recent (lookback 500)
+  micro.list_draws_filtered_atleast   export_first_position.list_draws_filtered_atleast
+  micro.create_future_quickpicks_unique  (las filas insertadas se borran al terminar)
+  micro.compare_multi_day_df          section1 app.main._compare_multi_day_df (modo CSV)
+End-to-end HTTP (ASGI en proceso con starlette TestClient, sin red):
+  http.history_filter_atleast, http.future_quickpick_unique, http.assistants_run   (section2)
+  http.compare_by_date_multi                                                        (section1)
+
+Datos: scripts/bench_data.py (sintéticos, esquema real, cacheados por tamaño/seed). Cada benchmark
+recorre un ciclo fijo de argumentos derivado de --seed: dos corridas con el mismo dataset miden lo mismo.
+Medición: warm-up (se guarda como cold_ms), calibración de llamadas por repetición (~--min-time s) y
+--repeats repeticiones; se reportan min/median/mean/stdev por llamada. Lo que no se puede importar
+en este árbol queda como "skipped" con el motivo, sin tumbar la suite.
+
+Historia: cada `run` agrega un registro (commit, máquina, dataset, resultados) a --history
+(default section2_api/bench_history.json). `compare` contrasta dos corridas con el mismo dataset y
+sale con 1 si alguna mediana empeoró más que --threshold (y más que --min-delta-ms en absoluto).
+
+Usage:
+  python scripts/bench_suite.py run                                   # perfil small
+  python scripts/bench_suite.py run --profile medium --filter micro. --label "antes del refactor"
+  python scripts/bench_suite.py run --draws 1000000 --tickets 10000000 --compare
+  python scripts/bench_suite.py compare                               # última vs anterior comparable
+  python scripts/bench_suite.py compare 3 -1 --threshold 0.05
+  python scripts/bench_suite.py list
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+import traceback
+import warnings
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+SECTION2 = Path(__file__).resolve().parents[1]
+REPO_ROOT = SECTION2.parent
+SECTION1 = REPO_ROOT / "section1_core"
+sys.path.insert(0, str(SECTION2 / "scripts"))
+
+import bench_data  # noqa: E402
+
+DEFAULT_HISTORY = SECTION2 / "bench_history.json"
+
+# perfil -> (draws, tickets)
+PROFILES: Dict[str, Tuple[int, int]] = {
+    "small": (3_000, 10_000),
+    "medium": (100_000, 1_000_000),
+    "large": (1_000_000, 10_000_000),
+}
+
+
+# ---------------------------------------------------------------------
+# Registro de benchmarks
+# ---------------------------------------------------------------------
+@dataclass
+class Env:
+    """Dataset + apps configuradas, compartidos por todos los benchmarks de una corrida."""
+    ds: bench_data.Dataset
+    seed: int
+    _clients: Dict[str, Any] = field(default_factory=dict)
+
+    def rng(self, name: str) -> random.Random:
+        return random.Random(f"{self.seed}:{name}")
+
+    def draw_dates(self, k: int, name: str) -> List[str]:
+        """k fechas de sorteo existentes, elegidas de forma determinista."""
+        conn = sqlite3.connect(self.ds.db)
+        try:
+            (n,) = conn.execute("SELECT COUNT(*) FROM draws").fetchone()
+            rng = self.rng(name)
+            ids = sorted(rng.randint(max(1, n // 2), n) for _ in range(k)) if n else []
+            return [conn.execute("SELECT draw_date FROM draws WHERE id = ?", (i,)).fetchone()[0] for i in ids]
+        finally:
+            conn.close()
+
+    def combos(self, k: int, name: str) -> List[Tuple[List[int], int]]:
+        rng = self.rng(name)
+        return [(sorted(rng.sample(range(1, 70), 5)), rng.randint(1, 26)) for _ in range(k)]
+
+    def client(self, section: str):
+        if section not in self._clients:
+            # starlette avisa que prefiere httpx2; el cliente con httpx sigue siendo el de requirements
+            warnings.filterwarnings("ignore", message=".*starlette.testclient.*")
+            from starlette.testclient import TestClient
+
+            if section == "section1":
+                from app import main as core_main
+                app = core_main.app
+            elif section == "assistants":
+                from fastapi import FastAPI
+
+                from src.ai_assistants.router import router as assistants_router
+                app = FastAPI()
+                app.include_router(assistants_router)
+            else:
+                import main as api_main
+                app = api_main.app
+            # sin `with`: no corre el lifespan (el dataset ya trae las tablas)
+            self._clients[section] = TestClient(app, raise_server_exceptions=True)
+        return self._clients[section]
+
+
+Setup = Callable[[Env], Tuple[Callable[[], Any], Optional[Callable[[], None]]]]
+
+
+@dataclass
+class Bench:
+    name: str
+    setup: Setup
+
+
+BENCHES: List[Bench] = []
+
+
+def bench(name: str) -> Callable[[Setup], Setup]:
+    def deco(fn: Setup) -> Setup:
+        BENCHES.append(Bench(name, fn))
+        return fn
+    return deco
+
+
+def _cycle(items: List[Any]) -> Callable[[], Any]:
+    state = {"i": -1}
+
+    def nxt() -> Any:
+        state["i"] = (state["i"] + 1) % len(items)
+        return items[state["i"]]
+    return nxt
+
+
+def _check(resp: Any) -> Any:
+    """Falla el benchmark si la llamada devolvió error: medir un error rápido no sirve."""
+    status = getattr(resp, "status_code", None)
+    if status is not None and status >= 400:
+        raise RuntimeError(f"HTTP {status}: {resp.text[:200]}")
+    if isinstance(resp, dict) and resp.get("status") == "error":
+        raise RuntimeError(f"{resp.get('error')}: {resp.get('message')}")
+    return resp
+
+
+def _future_cleanup(env: Env) -> Callable[[], None]:
+    """Borra lo que insertó quickpick/unique: la siguiente corrida ve la misma future_draws."""
+    conn = sqlite3.connect(env.ds.db)
+    try:
+        (max_id,) = conn.execute("SELECT COALESCE(MAX(id), 0) FROM future_draws").fetchone()
+    finally:
+        conn.close()
+
+    def cleanup() -> None:
+        c = sqlite3.connect(env.ds.db)
+        try:
+            c.execute("DELETE FROM future_draws WHERE id > ?", (max_id,))
+            c.commit()
+        finally:
+            c.close()
+    return cleanup
+
+
+# ---------- micro ----------
+
+@bench("micro.build_context")
+def _b_build_context(env: Env):
+    from src.ai_assistants.assistants import RunParams, build_context
+
+    dates = _cycle(env.draw_dates(16, "build_context"))
+    return (lambda: build_context(RunParams(draw_date=dates(), windows=[2, 5, 10, 15, 20], n_suggestions=10,
+                                            seed=None, assistant_ids=None))), None
+
+
+@bench("micro.rescore_combo")
+def _b_rescore_combo(env: Env):
+    from src.ai_assistants.rescore import rescore_combo
+
+    args = _cycle(list(zip(env.draw_dates(16, "rescore_combo"), env.combos(16, "rescore_combo"))))
+
+    def call():
+        d, (ws, pb) = args()
+        return _check(rescore_combo(d, [2, 5, 10, 15, 20], None, ws, pb))
+    return call, None
+
+
+@bench("micro.is_near_duplicate_of_recent")
+def _b_near_dup(env: Env):
+    from src.ai_assistants.data import is_near_duplicate_of_recent
+
+    combos = _cycle(env.combos(64, "near_dup"))
+
+    def call():
+        ws, pb = combos()
+        return is_near_duplicate_of_recent(ws, pb, lookback=500)
+    return call, None
+
+
+@bench("micro.list_draws_filtered_atleast")
+def _b_atleast(env: Env):
+    from src import export_first_position as efp
+
+    rng = env.rng("atleast")
+    args = _cycle([{"white1": rng.randint(1, 30), "white2": rng.randint(10, 45), "powerball": rng.randint(1, 26)}
+                   for _ in range(32)])
+    return (lambda: _check(efp.list_draws_filtered_atleast(**args(), min_match=2, sort="score", direction="desc",
+                                                           output="lines", limit=500))), None
+
+
+@bench("micro.create_future_quickpicks_unique")
+def _b_quickpick(env: Env):
+    from src import export_first_position as efp
+
+    seeds = iter(range(env.seed * 100_000, env.seed * 100_000 + 10_000_000))
+    return (lambda: _check(efp.create_future_quickpicks_unique(n=10, seed=next(seeds)))), _future_cleanup(env)
+
+
+@bench("micro.compare_multi_day_df")
+def _b_compare_multi(env: Env):
+    from app import main as core_main
+
+    days = _cycle([(int(d[5:7]), int(d[8:10])) for d in env.draw_dates(16, "compare_multi")])
+    return (lambda: core_main._compare_multi_day_df(*days())), None
+
+
+# ---------- http ----------
+
+@bench("http.history_filter_atleast")
+def _h_atleast(env: Env):
+    client = env.client("section2")
+    rng = env.rng("http_atleast")
+    args = _cycle([{"white1": rng.randint(1, 30), "white2": rng.randint(10, 45), "powerball": rng.randint(1, 26),
+                    "limit": 500} for _ in range(32)])
+    return (lambda: _check(client.get("/api/history/filter/atleast", params=args()))), None
+
+
+@bench("http.future_quickpick_unique")
+def _h_quickpick(env: Env):
+    client = env.client("section2")
+    seeds = iter(range(env.seed * 100_000 + 50_000_000, env.seed * 100_000 + 60_000_000))
+    return (lambda: _check(client.post("/api/future/quickpick/unique", params={"n": 10, "seed": next(seeds)}))), \
+        _future_cleanup(env)
+
+
+@bench("http.assistants_run")
+def _h_assistants_run(env: Env):
+    client = env.client("assistants")
+    # sin seed: /assistants/run no cachea, cada request calcula
+    dates = _cycle(env.draw_dates(16, "assistants_run"))
+    return (lambda: _check(client.post("/assistants/run", json={"draw_date": dates(), "n_suggestions": 10}))), None
+
+
+@bench("http.compare_by_date_multi")
+def _h_compare_multi(env: Env):
+    client = env.client("section1")
+    days = _cycle([{"month": int(d[5:7]), "day": int(d[8:10])} for d in env.draw_dates(16, "http_compare_multi")])
+    return (lambda: _check(client.get("/compare/by-date/multi", params=days()))), None
+
+
+# ---------------------------------------------------------------------
+# Medición
+# ---------------------------------------------------------------------
+def measure(fn: Callable[[], Any], repeats: int, min_time: float, warmup: int, max_calls: int) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    fn()
+    cold = time.perf_counter() - t0
+    for _ in range(max(0, warmup - 1)):
+        fn()
+    # calibración: ~min_time segundos por repetición, medido con una llamada ya en caliente
+    t0 = time.perf_counter()
+    fn()
+    one = max(time.perf_counter() - t0, 1e-7)
+    number = max(1, min(max_calls, int(min_time / one)))
+
+    per_call: List[float] = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        per_call.append((time.perf_counter() - t0) / number * 1000.0)
+    return {
+        "status": "ok",
+        "median_ms": statistics.median(per_call),
+        "min_ms": min(per_call),
+        "mean_ms": statistics.fmean(per_call),
+        "stdev_ms": statistics.stdev(per_call) if len(per_call) > 1 else 0.0,
+        "cold_ms": cold * 1000.0,
+        "calls": number,
+        "repeats": repeats,
+    }
+
+
+def configure(ds: bench_data.Dataset) -> None:
+    """Apunta las dos apps al dataset antes de importarlas."""
+    for p in (str(SECTION1), str(SECTION2)):
+        if p not in sys.path:
+            sys.path.insert(0, p)
+    # section1 crea su engine al importar app.database; section2 resuelve la ruta en cada consulta
+    os.environ["DATABASE_URL"] = f"sqlite:///{ds.db}"
+
+    from src import export_first_position as efp
+    efp.DB_PATH = Path(ds.db)
+    try:
+        from app import main as core_main
+    except Exception:
+        return  # los benchmarks de section1 quedan como skipped con el error real
+    core_main.POWERBALL_DRAWS_CSV = ds.draws_csv
+    core_main.TICKETS_CSV = ds.tickets_csv
+    core_main._init_db()  # lo que hace el lifespan: mismos índices que en producción
+
+
+def run_suite(env: Env, pattern: Optional[str], repeats: int, min_time: float, warmup: int,
+              max_calls: int) -> Dict[str, Dict[str, Any]]:
+    rx = re.compile(pattern) if pattern else None
+    results: Dict[str, Dict[str, Any]] = {}
+    for b in BENCHES:
+        if rx is not None and not rx.search(b.name):
+            continue
+        cleanup = None
+        try:
+            try:
+                fn, cleanup = b.setup(env)
+            except (ImportError, AttributeError) as e:
+                results[b.name] = {"status": "skipped", "reason": f"{type(e).__name__}: {e}"}
+            else:
+                results[b.name] = measure(fn, repeats, min_time, warmup, max_calls)
+        except Exception as e:
+            results[b.name] = {"status": "error", "reason": f"{type(e).__name__}: {e}",
+                               "trace": traceback.format_exc(limit=4)}
+        finally:
+            if cleanup is not None:
+                cleanup()
+        _print_result(b.name, results[b.name])
+    return results
+
+
+def _print_result(name: str, r: Dict[str, Any]) -> None:
+    if r["status"] != "ok":
+        print(f"   {name:<38} {r['status']:>9}  {r['reason'][:90]}")
+        return
+    print(f"   {name:<38} {r['median_ms']:9.3f} {r['min_ms']:9.3f} {r['stdev_ms']:8.3f} {r['cold_ms']:9.1f}"
+          f" {r['calls']:>6}x{r['repeats']}")
+
+
+# ---------------------------------------------------------------------
+# Historia
+# ---------------------------------------------------------------------
+def _git(*args: str) -> str:
+    try:
+        out = subprocess.run(["git", *args], cwd=str(REPO_ROOT), capture_output=True, text=True, timeout=30)
+        return out.stdout.strip() if out.returncode == 0 else ""
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+def load_history(path: Path) -> List[Dict[str, Any]]:
+    if not path.exists():
+        return []
+    return json.loads(path.read_text(encoding="utf-8")).get("runs", [])
+
+
+def save_run(path: Path, run: Dict[str, Any]) -> None:
+    runs = load_history(path)
+    runs.append(run)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps({"runs": runs}, indent=1), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def pick_run(runs: List[Dict[str, Any]], ref: str) -> Dict[str, Any]:
+    """ref: índice (negativos desde el final) o id de corrida."""
+    try:
+        return runs[int(ref)]
+    except ValueError:
+        pass
+    except IndexError:
+        raise SystemExit(f"no existe la corrida {ref} (hay {len(runs)})")
+    for r in runs:
+        if r["id"] == ref:
+            return r
+    raise SystemExit(f"no existe la corrida {ref!r}")
+
+
+def previous_comparable(runs: List[Dict[str, Any]], head: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    idx = next(i for i, r in enumerate(runs) if r["id"] == head["id"])
+    for r in reversed(runs[:idx]):
+        if r["dataset"] == head["dataset"]:
+            return r
+    return None
+
+
+def _cell(r: Optional[Dict[str, Any]]) -> str:
+    """Columna de compare: ms si corrió bien, el status si falló, "missing" si no está en esa corrida."""
+    if not r:
+        return "missing"
+    if r["status"] == "ok":
+        return f"{r['median_ms']:.3f}"
+    return str(r["status"])
+
+
+def compare_runs(base: Dict[str, Any], head: Dict[str, Any], threshold: float, min_delta_ms: float) -> int:
+    """Imprime la tabla base vs head y devuelve cuántos benchmarks empeoraron más del umbral."""
+    print(f"base {base['id']} ({base['git'].get('commit') or '?'}{'+' if base['git'].get('dirty') else ''})"
+          f"  ->  head {head['id']} ({head['git'].get('commit') or '?'}{'+' if head['git'].get('dirty') else ''})")
+    if base["dataset"] != head["dataset"]:
+        print(f"   aviso: datasets distintos {base['dataset']} vs {head['dataset']}")
+    if base.get("machine") != head.get("machine"):
+        print("   aviso: máquinas/pythons distintos")
+    print(f"   {'benchmark':<38} {'base ms':>10} {'head ms':>10} {'ratio':>7}")
+    regressions = 0
+    for name in sorted(set(base["results"]) | set(head["results"])):
+        b, h = base["results"].get(name), head["results"].get(name)
+        if not b or not h or b["status"] != "ok" or h["status"] != "ok":
+            print(f"   {name:<38} {_cell(b):>10} {_cell(h):>10}")
+            continue
+        ratio = h["median_ms"] / b["median_ms"] if b["median_ms"] else float("inf")
+        slower = ratio > 1.0 + threshold and (h["median_ms"] - b["median_ms"]) > min_delta_ms
+        faster = ratio < 1.0 - threshold and (b["median_ms"] - h["median_ms"]) > min_delta_ms
+        flag = "  REGRESSION" if slower else ("  faster" if faster else "")
+        regressions += int(slower)
+        print(f"   {name:<38} {b['median_ms']:10.3f} {h['median_ms']:10.3f} {ratio:6.2f}x{flag}")
+    print(f"   {regressions} regresión(es) > {threshold:.0%}")
+    return regressions
+
+
+# ---------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------
+def cmd_run(args) -> int:
+    draws, tickets = PROFILES[args.profile]
+    draws = args.draws or draws
+    tickets = args.tickets if args.tickets is not None else tickets
+    # antes de generar: bench_data importa app.models y section1 fija su engine con DATABASE_URL al importar
+    planned = bench_data.dataset_for(draws, tickets, args.future, args.data_seed, args.data_dir)
+    os.environ["DATABASE_URL"] = f"sqlite:///{planned.db}"
+    t0 = time.perf_counter()
+    ds = bench_data.ensure_dataset(draws, tickets, args.future, args.data_seed, args.data_dir)
+    print(f"dataset {ds.describe()} ({time.perf_counter() - t0:.1f}s) -> {Path(ds.db).parent}")
+
+    configure(ds)
+    env = Env(ds=ds, seed=args.seed)
+    print(f"   {'benchmark':<38} {'median ms':>9} {'min ms':>9} {'stdev':>8} {'cold ms':>9} {'calls':>8}")
+    results = run_suite(env, args.filter, args.repeats, args.min_time, args.warmup, args.max_calls)
+
+    run = {
+        "id": datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ"),
+        "at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "label": args.label,
+        "git": {"commit": _git("rev-parse", "--short", "HEAD"),
+                "dirty": bool(_git("status", "--porcelain", "--untracked-files=no"))},
+        "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                    "cpus": os.cpu_count()},
+        "dataset": ds.describe(),
+        "config": {"seed": args.seed, "repeats": args.repeats, "min_time": args.min_time, "filter": args.filter},
+        "results": {k: {kk: vv for kk, vv in v.items() if kk != "trace"} for k, v in results.items()},
+    }
+    failed = [k for k, v in results.items() if v["status"] == "error"]
+    for k in failed:
+        print(f"\n{k}:\n{results[k]['trace']}")
+    if args.no_save:
+        return 1 if failed else 0
+
+    save_run(args.history, run)
+    print(f"guardado {run['id']} en {args.history}")
+    if args.compare:
+        runs = load_history(args.history)
+        base = previous_comparable(runs, run)
+        if base is None:
+            print("sin corrida previa con el mismo dataset para comparar")
+        elif compare_runs(base, run, args.threshold, args.min_delta_ms):
+            return 1
+    return 1 if failed else 0
+
+
+def cmd_compare(args) -> int:
+    runs = load_history(args.history)
+    if not runs:
+        raise SystemExit(f"historia vacía: {args.history}")
+    head = pick_run(runs, args.head)
+    base = pick_run(runs, args.base) if args.base is not None else previous_comparable(runs, head)
+    if base is None:
+        raise SystemExit(f"no hay corrida anterior a {head['id']} con el dataset {head['dataset']}")
+    return 1 if compare_runs(base, head, args.threshold, args.min_delta_ms) else 0
+
+
+def cmd_list(args) -> int:
+    for i, r in enumerate(load_history(args.history)):
+        ok = sum(1 for v in r["results"].values() if v["status"] == "ok")
+        d = r["dataset"]
+        print(f"{i:>4}  {r['id']}  {r['git'].get('commit') or '-':<9}{'+' if r['git'].get('dirty') else ' '}"
+              f" d={d['draws']} t={d['tickets']}  {ok}/{len(r['results'])} ok  {r.get('label') or ''}")
+    return 0
+
+
+def main_cli() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--history", type=Path, default=DEFAULT_HISTORY, help="Archivo JSON de historia.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    def thresholds(p: argparse.ArgumentParser) -> None:
+        p.add_argument("--threshold", type=float, default=0.10, help="Empeoramiento relativo tolerado (0.10 = 10%%).")
+        p.add_argument("--min-delta-ms", type=float, default=0.05, help="Diferencia absoluta mínima para marcar.")
+
+    r = sub.add_parser("run", help="Correr la suite y guardar el resultado.")
+    r.add_argument("--profile", choices=sorted(PROFILES), default="small")
+    r.add_argument("--draws", type=int, default=None, help="Override del perfil (1k..1M).")
+    r.add_argument("--tickets", type=int, default=None, help="Override del perfil (10k..10M).")
+    r.add_argument("--future", type=int, default=20_000)
+    r.add_argument("--data-seed", type=int, default=7, help="Seed del dataset sintético.")
+    r.add_argument("--data-dir", type=Path, default=bench_data.DEFAULT_OUT)
+    r.add_argument("--seed", type=int, default=1, help="Seed de los argumentos de cada benchmark.")
+    r.add_argument("--filter", default=None, help="Regex sobre el nombre (p.ej. 'micro\\.' o 'compare').")
+    r.add_argument("--repeats", type=int, default=5)
+    r.add_argument("--min-time", type=float, default=0.2, help="Segundos por repetición (calibra las llamadas).")
+    r.add_argument("--warmup", type=int, default=2)
+    r.add_argument("--max-calls", type=int, default=10_000)
+    r.add_argument("--label", default="")
+    r.add_argument("--no-save", action="store_true")
+    r.add_argument("--compare", action="store_true", help="Comparar contra la corrida previa con el mismo dataset.")
+    thresholds(r)
+    r.set_defaults(fn=cmd_run)
+
+    c = sub.add_parser("compare", help="Comparar dos corridas; exit 1 si hay regresiones.")
+    c.add_argument("base", nargs="?", default=None, help="Índice o id (default: anterior comparable a head).")
+    c.add_argument("head", nargs="?", default="-1", help="Índice o id (default: la última).")
+    thresholds(c)
+    c.set_defaults(fn=cmd_compare)
+
+    ls = sub.add_parser("list", help="Listar corridas guardadas.")
+    ls.set_defaults(fn=cmd_list)
+
+    args = ap.parse_args()
+    return args.fn(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
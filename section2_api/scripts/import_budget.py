@@ -0,0 +1,118 @@
+"""
+Import-time budget check for the FastAPI apps (cold start).
+
+Runs `python -X importtime -c "import <module>"` in a fresh interpreter, reports the slowest imports and
+fails (exit 1) if the cumulative import time exceeds the budget or if a heavy library that should load
+lazily (pandas, openpyxl, reportlab, numpy) was imported.
+
+Usage:
+  python scripts/import_budget.py                      # section2 (main) + section1 (app.main)
+  python scripts/import_budget.py --target section1 --budget-ms 1200 --top 20
+  IMPORT_BUDGET_MS=800 python scripts/import_budget.py --target section2 --runs 5
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+# target -> (directorio de trabajo, módulo a importar, presupuesto por defecto en ms)
+TARGETS: Dict[str, Tuple[Path, str, float]] = {
+    "section2": (REPO_ROOT / "section2_api", "main", 800.0),
+    "section1": (REPO_ROOT / "section1_core", "app.main", 1200.0),
+}
+DEFAULT_FORBIDDEN = ("pandas", "openpyxl", "reportlab", "numpy")
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int, int]]:
+    """Líneas de -X importtime -> [(módulo, self_us, cumulative_us, profundidad)]."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            _, rest = line.split(":", 1)
+            self_us, cum_us, name = rest.split("|", 2)
+            depth = (len(name) - len(name.lstrip(" "))) // 2
+            rows.append((name.strip(), int(self_us), int(cum_us), depth))
+        except ValueError:
+            continue
+    return rows
+
+
+def measure(cwd: Path, module: str) -> List[Tuple[str, int, int, int]]:
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1", DISABLE_DB_INDEXES="1")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=str(cwd), env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        tail = "\n".join(l for l in proc.stderr.splitlines() if not l.startswith("import time:"))[-2000:]
+        raise RuntimeError(f"import {module} failed in {cwd}:\n{tail}")
+    return parse_importtime(proc.stderr)
+
+
+def check(target: str, budget_ms: float, runs: int, top: int, forbidden: Tuple[str, ...]) -> bool:
+    cwd, module, default_budget = TARGETS[target]
+    budget_ms = budget_ms or default_budget
+
+    totals = []
+    rows: List[Tuple[str, int, int, int]] = []
+    for _ in range(max(1, runs)):
+        rows = measure(cwd, module)
+        total = next((cum for name, _, cum, _ in reversed(rows) if name == module), 0)
+        totals.append(total / 1000.0)
+    total_ms = statistics.median(totals)
+
+    imported = {name for name, *_ in rows}
+    heavy = sorted(m for m in forbidden if m in imported)
+
+    print(f"== {target}: import {module} (cwd={cwd.name})")
+    print(f"   cumulative: {total_ms:.1f} ms (median of {len(totals)}; budget {budget_ms:.0f} ms)")
+
+    print(f"   slowest by cumulative (top {top}, excluding {module}):")
+    by_cum = sorted((r for r in rows if r[0] != module), key=lambda r: -r[2])[:top]
+    for name, self_us, cum_us, depth in by_cum:
+        print(f"     {cum_us / 1000:8.1f} ms  {'  ' * depth}{name}")
+
+    print(f"   slowest by self time (top {top}):")
+    for name, self_us, _, _ in sorted(rows, key=lambda r: -r[1])[:top]:
+        print(f"     {self_us / 1000:8.1f} ms  {name}")
+
+    ok = True
+    if heavy:
+        print(f"   FAIL: heavy modules imported at startup: {', '.join(heavy)}")
+        ok = False
+    if total_ms > budget_ms:
+        print(f"   FAIL: {total_ms:.1f} ms > budget {budget_ms:.0f} ms")
+        ok = False
+    if ok:
+        print("   OK")
+    return ok
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--target", choices=["all", *TARGETS], default="all")
+    ap.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_BUDGET_MS", "0") or 0),
+                    help="Presupuesto en ms (default: por target).")
+    ap.add_argument("--runs", type=int, default=3, help="Mediciones por target (se usa la mediana).")
+    ap.add_argument("--top", type=int, default=15)
+    ap.add_argument("--forbid", default=",".join(DEFAULT_FORBIDDEN),
+                    help="Módulos que no deben importarse al arrancar (coma-separados; vacío = ninguno).")
+    args = ap.parse_args()
+
+    forbidden = tuple(m.strip() for m in args.forbid.split(",") if m.strip())
+    targets = list(TARGETS) if args.target == "all" else [args.target]
+    results = [check(t, args.budget_ms, args.runs, args.top, forbidden) for t in targets]
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,222 @@
+"""
+Autopilot server-side (robot v5 "Autopilot" / v12 "Autopilot PRO").
+
+Antes: el navegador re-llamaba /assistants/run con otra seed (y luego filtros más laxos) hasta completar
+las jugadas; cada vuelta reconstruía el contexto y re-consultaba SQLite.
+
+Ahora, en una sola llamada acotada:
+- build_context() una vez (depende solo de draw_date / windows / recent_lookback, que no se relajan).
+- NearDupIndex una vez: los sorteos recientes del filtro V39 se cargan en una query y el chequeo se hace
+  en lote (numpy) para todas las jugadas de un intento.
+- Por intento: run_all_assistants(ctx, params) con otra seed; las jugadas que sobreviven se acumulan por
+  asistente (sin repetir combinación) y se corta apenas todos tienen n_suggestions.
+- Si faltan jugadas tras `seeds_per_level` seeds, se aplica el siguiente escalón de RELAX_LADDER.
+  Ningún escalón toca la regla dura (nunca una combinación histórica): eso vive en run_all_assistants.
+"""
+from __future__ import annotations
+
+import random
+import time
+from dataclasses import replace
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .assistants import RunParams, build_context, combo_key, run_all_assistants
+from .data import NearDupIndex
+from .engine import build_run_payload, no_data_payload, params_from_request
+
+# (nombre, descripción, aplicar(params, near_dup) -> (params, near_dup) | None si no cambia nada)
+RelaxStep = Tuple[str, str, Callable[[RunParams, Dict[str, Any]], Optional[Tuple[RunParams, Dict[str, Any]]]]]
+
+
+def _lower_similarity(p: RunParams, nd: Dict[str, Any]):
+    if p.similarity_level <= 1:
+        return None
+    return replace(p, similarity_level=p.similarity_level - 1), nd
+
+
+def _raise_overlap_block(p: RunParams, nd: Dict[str, Any]):
+    if not p.strict_mode or p.overlap_block >= 5:
+        return None
+    return replace(p, overlap_block=p.overlap_block + 1), nd
+
+
+def _raise_near_dup_soft(p: RunParams, nd: Dict[str, Any]):
+    if not nd["enabled"] or nd["overlap_soft"] >= nd["overlap_block"]:
+        return None
+    return p, {**nd, "overlap_soft": nd["overlap_soft"] + 1}
+
+
+def _raise_near_dup_block(p: RunParams, nd: Dict[str, Any]):
+    if not nd["enabled"] or nd["overlap_block"] >= 5:
+        return None
+    return p, {**nd, "overlap_block": nd["overlap_block"] + 1}
+
+
+def _drop_shape_minimums(p: RunParams, nd: Dict[str, Any]):
+    c = p.constraints
+    if c is None or (getattr(c, "min_high_50", None) is None and getattr(c, "min_low_20", None) is None):
+        return None
+    return replace(p, constraints=c.model_copy(update={"min_high_50": None, "min_low_20": None})), nd
+
+
+def _drop_pb_not_in_last_n(p: RunParams, nd: Dict[str, Any]):
+    c = p.constraints
+    if c is None or getattr(c, "pb_not_in_last_n", None) is None:
+        return None
+    return replace(p, constraints=c.model_copy(update={"pb_not_in_last_n": None})), nd
+
+
+def _strict_off(p: RunParams, nd: Dict[str, Any]):
+    if not p.strict_mode:
+        return None
+    return replace(p, strict_mode=False), nd
+
+
+# Orden "seguro": primero lo que menos cambia el carácter del pack; lo último es apagar anti-overlap.
+# El rango de blancas y max_overlap_last_draw son elección explícita del usuario: no se relajan.
+RELAX_LADDER: List[RelaxStep] = [
+    ("similarity_level_down", "Baja un nivel de anti-similares (mínimo 1).", _lower_similarity),
+    ("overlap_block_up", "Anti-overlap estricto: sube el umbral de similitud en 1 (máx 5).", _raise_overlap_block),
+    ("near_dup_soft_up", "V39: el bloqueo suave (blancas + mismo PB) pide 1 blanca más.", _raise_near_dup_soft),
+    ("near_dup_block_up", "V39: el bloqueo fuerte pide 1 blanca más (máx 5).", _raise_near_dup_block),
+    ("drop_shape_minimums", "Quita mínimos de altos 50+ / bajos 20-.", _drop_shape_minimums),
+    ("drop_pb_not_in_last_n", "Permite PB repetido en los últimos N.", _drop_pb_not_in_last_n),
+    ("strict_mode_off", "Desactiva modo estricto (anti-overlap con recientes).", _strict_off),
+]
+
+
+def _seed_stream(seed: Optional[int]):
+    rng = random.Random(seed)
+    while True:
+        yield rng.randrange(1, 1_000_000)
+
+
+def run_autopilot(req: Any) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    params = params_from_request(req)
+    want = params.n_suggestions
+    max_attempts = int(getattr(req, "max_attempts", 8))
+    seeds_per_level = int(getattr(req, "seeds_per_level", 2))
+    allow_relax = bool(getattr(req, "relax", True))
+    budget_s = float(getattr(req, "time_budget_ms", 8000)) / 1000.0
+
+    ctx = build_context(params)
+    if not ctx.last_draws_desc:
+        return no_data_payload(params.draw_date)
+
+    near_dup = {
+        "enabled": bool(getattr(req, "near_duplicate_block", True)),
+        "lookback": int(getattr(req, "near_dup_lookback", 500)),
+        "overlap_block": int(getattr(req, "near_dup_overlap_block", 4)),
+        "overlap_soft": int(getattr(req, "near_dup_overlap_soft", 3)),
+    }
+    index = NearDupIndex.from_recent(near_dup["lookback"]) if near_dup["enabled"] else None
+
+    pack: Dict[str, Dict[str, Any]] = {}
+    seen: Dict[str, set] = {}
+    trace: List[Dict[str, Any]] = []
+    applied: List[Dict[str, Any]] = []
+    removed_total = 0
+    seeds = _seed_stream(params.seed)
+    ladder = list(RELAX_LADDER) if allow_relax else []
+    level = 0
+    at_level = 0
+
+    def missing() -> Dict[str, int]:
+        ids = params.assistant_ids or list(pack.keys())
+        return {aid: want - len(pack.get(aid, {}).get("suggestions", [])) for aid in ids
+                if len(pack.get(aid, {}).get("suggestions", [])) < want}
+
+    attempt = 0
+    while attempt < max_attempts:
+        if attempt and time.perf_counter() - t0 > budget_s:
+            break
+        # ¿toca relajar? (sin jugadas suficientes tras seeds_per_level intentos en este nivel)
+        if at_level >= seeds_per_level:
+            step = None
+            while ladder and step is None:
+                name, desc, fn = ladder.pop(0)
+                res = fn(params, near_dup)
+                if res is not None:
+                    params, near_dup = res
+                    step = {"step": name, "description": desc, "from_attempt": attempt + 1}
+            # escalera agotada (step None): se siguen probando seeds hasta max_attempts
+            if step is not None:
+                level += 1
+                applied.append(step)
+            at_level = 0
+
+        attempt += 1
+        at_level += 1
+        seed = next(seeds)
+        t_try = time.perf_counter()
+        results = run_all_assistants(ctx, replace(params, seed=seed))
+
+        batch: List[Tuple[str, Dict[str, Any]]] = []
+        for aid, obj in (results or {}).items():
+            entry = pack.setdefault(aid, {k: v for k, v in obj.items() if k != "suggestions"})
+            entry.setdefault("suggestions", [])
+            for s in obj.get("suggestions", []) or []:
+                batch.append((aid, s))
+
+        infos: List[Optional[dict]] = [None] * len(batch)
+        if index is not None and batch:
+            infos = index.check_many(
+                [(s.get("whites", []), s.get("powerball", 0)) for _, s in batch],
+                overlap_whites_block=near_dup["overlap_block"],
+                overlap_whites_soft=near_dup["overlap_soft"],
+            )
+
+        added: Dict[str, int] = {}
+        removed = 0
+        for (aid, s), info in zip(batch, infos):
+            if info:
+                removed += 1
+                continue
+            bucket = pack[aid]["suggestions"]
+            if len(bucket) >= want:
+                continue
+            k = combo_key(s.get("whites", []), s.get("powerball", 0))
+            if k in seen.setdefault(aid, set()):
+                continue
+            seen[aid].add(k)
+            bucket.append({**s, "autopilot": {"attempt": attempt, "seed": seed, "relax_level": level}})
+            added[aid] = added.get(aid, 0) + 1
+        removed_total += removed
+
+        still = missing()
+        trace.append({
+            "attempt": attempt,
+            "seed": seed,
+            "level": level,
+            "relaxations": [a["step"] for a in applied],
+            "added": added,
+            "near_dup_removed": removed,
+            "missing": still,
+            "elapsed_ms": round((time.perf_counter() - t_try) * 1000.0, 1),
+        })
+        if not still:
+            break
+
+    still = missing()
+    out = build_run_payload(ctx, params, pack)
+    meta = out["meta"]
+    meta["seed"] = params.seed
+    meta.setdefault("filters", {})["near_duplicate"] = {**near_dup, "removed": removed_total}
+    out["autopilot"] = {
+        "completed": not still,
+        "attempts": attempt,
+        "max_attempts": max_attempts,
+        "relaxations_applied": applied,
+        "final_params": {
+            "strict_mode": params.strict_mode,
+            "similarity_level": params.similarity_level,
+            "overlap_block": params.overlap_block,
+            "constraints": params.constraints.model_dump() if params.constraints is not None else None,
+            "near_duplicate": near_dup,
+        },
+        "missing": still,
+        "trace": trace,
+        "elapsed_ms": round((time.perf_counter() - t0) * 1000.0, 1),
+    }
+    return out
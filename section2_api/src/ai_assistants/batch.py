@@ -0,0 +1,238 @@
+"""
+Batch multi-estrategia (robot v6 "ABC Compare" / v10 "Modo Torneo").
+
+Antes: el navegador lanzaba 3+ /assistants/run (uno por preset) y calculaba continuidad / diversidad en JS.
+
+Ahora, en una sola llamada:
+- build_context() una vez (draw_date / windows / recent_lookback son comunes a todos los presets) y
+  las mismas estadísticas por ventana (ctx.by_window) para todos.
+- Cada preset corre run_all_assistants() en un ThreadPoolExecutor: el contexto se comparte en memoria,
+  solo lectura (un ProcessPool tendría que serializarlo por preset).
+- Métricas server-side con matrices one-hot (k, 70):
+    continuity   = overlap medio de cada jugada con los últimos `metrics_window` sorteos (S @ D.T)
+    internal     = overlap medio entre pares de jugadas del preset (triángulo superior de S @ S.T)
+    score        = distribución (mean/std/min/p25/p50/p75/max)
+  más el ranking por asistente que usaba el torneo (score medio - overlap interno + bonus por cantidad).
+"""
+from __future__ import annotations
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from typing import Any, Dict, List, Optional, Sequence
+
+from .assistants import build_context, run_all_assistants
+from .data import NearDupIndex
+from .engine import build_run_payload, no_data_payload, params_from_request
+
+# Mismos presets que el ABC Compare del robot (PowerballRobotCoach.compareStrategies)
+ABC_PRESETS: List[Dict[str, Any]] = [
+    {"id": "continuity", "label": "A: Continuidad", "assistant_ids": ["sequence_hunter"]},
+    {"id": "diversity", "label": "B: Diversidad", "assistant_ids": ["diversity_optimizer"]},
+    {"id": "overdue", "label": "C: Overdue", "assistant_ids": ["hot_cold_statistician"]},
+]
+
+# Campos que un preset puede cambiar; el resto (contexto) es común al batch
+PRESET_FIELDS = ("assistant_ids", "n_suggestions", "seed", "strict_mode", "similarity_level", "overlap_block", "constraints")
+
+
+def _onehot(suggestions: Sequence[Dict[str, Any]]):
+    import numpy as np
+
+    m = np.zeros((len(suggestions), 70), dtype=np.int16)
+    for i, s in enumerate(suggestions):
+        ws = [int(x) for x in (s.get("whites") or []) if 0 < int(x) < 70]
+        m[i, ws] = 1
+    return m
+
+
+def _internal_overlap(onehot) -> Dict[str, float]:
+    import numpy as np
+
+    k = onehot.shape[0]
+    if k < 2:
+        return {"avg": 0.0, "max": 0}
+    ov = onehot @ onehot.T
+    iu = np.triu_indices(k, 1)
+    pairs = ov[iu]
+    return {"avg": round(float(pairs.mean()), 4), "max": int(pairs.max())}
+
+
+def _continuity(onehot, recent_onehot) -> Dict[str, float]:
+    if onehot.shape[0] == 0 or recent_onehot.shape[0] == 0:
+        return {"avg_overlap": 0.0, "avg_best_overlap": 0.0}
+    ov = onehot @ recent_onehot.T  # (k, window)
+    return {
+        "avg_overlap": round(float(ov.mean()), 4),
+        "avg_best_overlap": round(float(ov.max(axis=1).mean()), 4),
+    }
+
+
+def _score_distribution(suggestions: Sequence[Dict[str, Any]]) -> Dict[str, float]:
+    import numpy as np
+
+    scores = np.array([float(s.get("score") or 0.0) for s in suggestions], dtype=np.float64)
+    if scores.size == 0:
+        return {"count": 0}
+    p25, p50, p75 = np.percentile(scores, [25, 50, 75])
+    return {
+        "count": int(scores.size),
+        "mean": round(float(scores.mean()), 4),
+        "std": round(float(scores.std()), 4),
+        "min": round(float(scores.min()), 4),
+        "p25": round(float(p25), 4),
+        "p50": round(float(p50), 4),
+        "p75": round(float(p75), 4),
+        "max": round(float(scores.max()), 4),
+    }
+
+
+def _tournament_composite(avg_score: float, internal_overlap: float, count: int) -> float:
+    # Misma fórmula que section3_ui/src/ai/tournament.ts (rankAssistants): el bonus por cantidad satura en 10
+    return avg_score * 1.0 - internal_overlap * 1.0 + min(1.0, count / 10.0) * 0.5
+
+
+def _overall_score(m: Dict[str, Any]) -> float:
+    # Misma fórmula que section3_ui/src/ai/compareABC.ts (pickOverallWinner)
+    return (m["continuity"]["avg_overlap"] * 1.0 - m["internal_overlap"]["avg"] * 0.7
+            + min(1.0, m["count"] / 30.0) * 0.6)
+
+
+def _filter_near_duplicates(results: Dict[str, Any], index: Optional[NearDupIndex], nd: Dict[str, Any]) -> int:
+    """Mismo post-filtro V39 que /assistants/run, en lote sobre el índice compartido."""
+    if index is None:
+        return 0
+    flat = [(aid, s) for aid, obj in results.items() for s in (obj.get("suggestions") or [])]
+    infos = index.check_many([(s.get("whites", []), s.get("powerball", 0)) for _, s in flat],
+                             overlap_whites_block=nd["overlap_block"], overlap_whites_soft=nd["overlap_soft"])
+    blocked = {id(s) for (_, s), info in zip(flat, infos) if info}
+    for aid, obj in results.items():
+        obj["suggestions"] = [s for s in (obj.get("suggestions") or []) if id(s) not in blocked]
+    return len(blocked)
+
+
+def _run_preset(ctx, base_params, preset: Dict[str, Any], index, nd, recent_onehot) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    overrides = {k: preset[k] for k in PRESET_FIELDS if preset.get(k) is not None}
+    params = replace(base_params, **overrides)
+    out: Dict[str, Any] = {
+        "id": preset.get("id"),
+        "label": preset.get("label") or preset.get("id"),
+        "assistant_ids": params.assistant_ids,
+        "params": {k: getattr(params, k) for k in ("n_suggestions", "seed", "strict_mode", "similarity_level", "overlap_block")},
+    }
+    try:
+        results = run_all_assistants(ctx, params) or {}
+    except Exception as e:
+        out.update({"status": "error", "error": "RUN_FAILED", "message": str(e),
+                    "elapsed_ms": round((time.perf_counter() - t0) * 1000.0, 1)})
+        return out
+
+    removed = _filter_near_duplicates(results, index, nd)
+
+    by_assistant: Dict[str, Any] = {}
+    all_sugg: List[Dict[str, Any]] = []
+    for aid, obj in results.items():
+        sugg = obj.get("suggestions") or []
+        all_sugg.extend(sugg)
+        oh = _onehot(sugg)
+        dist = _score_distribution(sugg)
+        internal = _internal_overlap(oh)
+        by_assistant[aid] = {
+            "count": len(sugg),
+            "score": dist,
+            "internal_overlap": internal,
+            "continuity": _continuity(oh, recent_onehot),
+            "composite": round(_tournament_composite(dist.get("mean", 0.0), internal["avg"], len(sugg)), 4),
+        }
+
+    oh_all = _onehot(all_sugg)
+    out.update({
+        "status": "ok",
+        "metrics": {
+            "count": len(all_sugg),
+            "continuity": _continuity(oh_all, recent_onehot),
+            "internal_overlap": _internal_overlap(oh_all),
+            "score": _score_distribution(all_sugg),
+            "near_dup_removed": removed,
+        },
+        "by_assistant": by_assistant,
+        "results_by_assistant": results,
+        "elapsed_ms": round((time.perf_counter() - t0) * 1000.0, 1),
+    })
+    out["metrics"]["overall"] = round(_overall_score(out["metrics"]), 4)
+    return out
+
+
+def _comparison(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    ok = [r for r in runs if r.get("status") == "ok"]
+    if not ok:
+        return {"continuity_winner": None, "diversity_winner": None, "overall_winner": None, "ranking": [], "tournament": []}
+
+    # max()/min() se quedan con el primero en empate, igual que los reduce() del cliente
+    cont = max(ok, key=lambda r: r["metrics"]["continuity"]["avg_overlap"])
+    div = min(ok, key=lambda r: r["metrics"]["internal_overlap"]["avg"])
+    ranking = sorted(ok, key=lambda r: r["metrics"]["overall"], reverse=True)
+
+    tournament = sorted(
+        ({"run": r["id"], "assistant": aid, **{k: m[k] for k in ("count", "composite")},
+          "avg_score": m["score"].get("mean", 0.0), "internal_overlap": m["internal_overlap"]["avg"]}
+         for r in ok for aid, m in r["by_assistant"].items()),
+        key=lambda x: x["composite"], reverse=True,
+    )
+    return {
+        "continuity_winner": cont["id"],
+        "diversity_winner": div["id"],
+        "overall_winner": ranking[0]["id"],
+        "ranking": [r["id"] for r in ranking],
+        "tournament": tournament,
+    }
+
+
+def run_batch(req: Any) -> Dict[str, Any]:
+    import numpy as np
+
+    t0 = time.perf_counter()
+    base_params = params_from_request(req)
+    presets = [dict(p) for p in (getattr(req, "presets", None) or ABC_PRESETS)]
+    window = int(getattr(req, "metrics_window", 10))
+    include_results = bool(getattr(req, "include_results", True))
+
+    ctx = build_context(base_params)
+    if not ctx.last_draws_desc:
+        return no_data_payload(base_params.draw_date)
+
+    nd = {
+        "enabled": bool(getattr(req, "near_duplicate_block", True)),
+        "lookback": int(getattr(req, "near_dup_lookback", 500)),
+        "overlap_block": int(getattr(req, "near_dup_overlap_block", 4)),
+        "overlap_soft": int(getattr(req, "near_dup_overlap_soft", 3)),
+    }
+    index = NearDupIndex.from_recent(nd["lookback"]) if nd["enabled"] else None
+    recent_onehot = _onehot([{"whites": list(d.whites)} for d in ctx.last_draws_desc[:window]])
+
+    workers = max(1, min(int(getattr(req, "workers", 4)), len(presets)))
+    if workers == 1:
+        runs = [_run_preset(ctx, base_params, p, index, nd, recent_onehot) for p in presets]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            runs = list(pool.map(lambda p: _run_preset(ctx, base_params, p, index, nd, recent_onehot), presets))
+
+    comparison = _comparison(runs)
+    if not include_results:
+        for r in runs:
+            r.pop("results_by_assistant", None)
+
+    out = build_run_payload(ctx, base_params, {})
+    out.pop("results_by_assistant", None)
+    out["meta"]["filters"] = {"near_duplicate": nd}
+    out["meta"]["batch"] = {
+        "presets": len(presets),
+        "workers": workers,
+        "metrics_window": int(min(window, len(ctx.last_draws_desc))),
+        "sum_of_runs_ms": round(float(np.sum([r.get("elapsed_ms", 0.0) for r in runs])), 1),
+        "elapsed_ms": round((time.perf_counter() - t0) * 1000.0, 1),
+    }
+    out["runs"] = runs
+    out["comparison"] = comparison
+    return out
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 from typing import List, Set, Tuple, Optional
+from .. import profiling
 from .data_access import Draw, fetch_last_draws
 import sqlite3
 from pathlib import Path
@@ -65,3 +66,61 @@ def is_near_duplicate_of_recent(whites: List[int], powerball: int, lookback: int
             if best is None or info["overlap_whites"] > best["overlap_whites"]:
                 best = info
     return best
+
+
+class NearDupIndex:
+    """
+    Misma regla que is_near_duplicate_of_recent, pero con los sorteos recientes cargados una sola vez
+    (una query) y la comparación vectorizada: overlap = one-hot(candidatos) @ one-hot(recientes).T.
+    Pensado para filtrar muchas jugadas seguidas (autopilot, run) sin re-consultar SQLite por jugada.
+    """
+
+    def __init__(self, recent: List[Draw]):
+        import numpy as np
+
+        self._recent = recent
+        self._onehot = np.zeros((len(recent), 70), dtype=np.int8)
+        rows = np.repeat(np.arange(len(recent)), 5)
+        cols = np.array([n for d in recent for n in d.whites], dtype=np.intp)
+        if len(recent):
+            self._onehot[rows, cols] = 1
+        self._pb = np.array([int(d.powerball) for d in recent], dtype=np.int16)
+
+    @classmethod
+    @profiling.timed("near_dup_index")
+    def from_recent(cls, lookback: int = 500) -> "NearDupIndex":
+        return cls(fetch_last_draws(lookback, until_date=None, require_complete=True))
+
+    def __len__(self) -> int:
+        return len(self._recent)
+
+    def check_many(self, combos: List[Tuple[List[int], int]], overlap_whites_block: int = 4,
+                   overlap_whites_soft: int = 3, lookback: Optional[int] = None) -> List[Optional[dict]]:
+        """Un info dict (o None) por combo; `lookback` recorta a los N más recientes del índice."""
+        import numpy as np
+
+        profiling.count("near_dup.checked", len(combos))
+        n = len(self._recent) if lookback is None else min(int(lookback), len(self._recent))
+        if not combos or n == 0:
+            return [None] * len(combos)
+        cand = np.zeros((len(combos), 70), dtype=np.int8)
+        for i, (ws, _) in enumerate(combos):
+            cand[i, [int(x) for x in set(ws)]] = 1
+        pbs = np.array([int(pb) for _, pb in combos], dtype=np.int16)
+
+        overlap = cand.astype(np.int16) @ self._onehot[:n].T.astype(np.int16)  # (k, n)
+        same_pb = pbs[:, None] == self._pb[None, :n]
+        blocked = (overlap >= overlap_whites_block) | ((overlap >= overlap_whites_soft) & same_pb)
+
+        out: List[Optional[dict]] = []
+        for i in range(len(combos)):
+            if not blocked[i].any():
+                out.append(None)
+                continue
+            # el más fuerte; en empate, el más reciente (mismo orden que la versión por filas)
+            j = int(np.argmax(np.where(blocked[i], overlap[i], -1)))
+            d = self._recent[j]
+            out.append({"draw_date": d.draw_date, "overlap_whites": int(overlap[i, j]),
+                        "same_powerball": bool(same_pb[i, j]),
+                        "draw_whites": sorted(d.whites), "draw_powerball": int(d.powerball)})
+        return out
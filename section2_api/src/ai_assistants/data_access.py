@@ -4,9 +4,15 @@ import os
 import sqlite3
 from dataclasses import dataclass
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import Any, Callable, List, Optional, Tuple, TypeVar
 from urllib.parse import urlparse
 
+from .. import metrics, profiling
+
+T = TypeVar("T")
+
+_DB_QUERIES = metrics.counter("sqlite_queries_total", "Consultas síncronas de data_access (conexión por consulta).")
+
 
 @dataclass(frozen=True)
 class Draw:
@@ -49,162 +55,144 @@ def resolve_sqlite_path() -> Path:
     return Path("./powerball.db").resolve()
 
 
+def db_version() -> Tuple:
+    """Versión barata de los datos (stat del archivo + -wal): cambia con cada commit de sorteos."""
+    from ..draw_source import file_version
+
+    p = resolve_sqlite_path()
+    return file_version(p) if p.exists() else ()
+
+
 def _connect(db_path: Path) -> sqlite3.Connection:
     return sqlite3.connect(str(db_path))
 
 
+def _rows_to_draws(rows) -> List[Draw]:
+    return [
+        Draw(
+            draw_date=str(r[0]),
+            white1=int(r[1]), white2=int(r[2]), white3=int(r[3]),
+            white4=int(r[4]), white5=int(r[5]),
+            powerball=int(r[6]),
+        )
+        for r in rows
+    ]
+
+
+def _with_conn(query: Callable[..., T], *args: Any) -> T:
+    # span "db.last_draws", "db.same_weekday"...: dentro de build_context muestra cuánto es SQLite
+    with profiling.span("db." + query.__name__[3:]):
+        profiling.count("db.queries")
+        _DB_QUERIES.inc()
+        conn = _connect(resolve_sqlite_path())
+        try:
+            return query(conn, *args)
+        finally:
+            conn.close()
+
+
+# Cada fetch_* es un wrapper sobre su _q_*(conn, ...): src/async_db.py corre los mismos _q_* en sus
+# hilos lectores (conexión persistente) para los handlers async.
+
 def fetch_last_draws(n: int, until_date: Optional[str] = None, require_complete: bool = True) -> List[Draw]:
-    db_path = resolve_sqlite_path()
-    conn = _connect(db_path)
-    try:
-        where = []
-        params = []
-        if until_date:
-            where.append("draw_date <= ?")
-            params.append(until_date)
-
-        if require_complete:
-            where.extend([
-                "white1 IS NOT NULL", "white2 IS NOT NULL", "white3 IS NOT NULL",
-                "white4 IS NOT NULL", "white5 IS NOT NULL", "powerball IS NOT NULL",
-            ])
-
-        sql = """
-            SELECT draw_date, white1, white2, white3, white4, white5, powerball
-            FROM draws
-        """
-        if where:
-            sql += " WHERE " + " AND ".join(where)
-        sql += " ORDER BY draw_date DESC LIMIT ?"
-        params.append(int(n))
-
-        cur = conn.cursor()
-        cur.execute(sql, params)
-        rows = cur.fetchall()
-
-        return [
-            Draw(
-                draw_date=str(r[0]),
-                white1=int(r[1]), white2=int(r[2]), white3=int(r[3]),
-                white4=int(r[4]), white5=int(r[5]),
-                powerball=int(r[6]),
-            )
-            for r in rows
-        ]
-    finally:
-        conn.close()
+    return _with_conn(_q_last_draws, n, until_date, require_complete)
 
 
 def fetch_all_draws(require_complete: bool = True) -> List[Draw]:
-    db_path = resolve_sqlite_path()
-    conn = _connect(db_path)
-    try:
-        where = []
-        if require_complete:
-            where.extend([
-                "white1 IS NOT NULL", "white2 IS NOT NULL", "white3 IS NOT NULL",
-                "white4 IS NOT NULL", "white5 IS NOT NULL", "powerball IS NOT NULL",
-            ])
-
-        sql = """
-            SELECT draw_date, white1, white2, white3, white4, white5, powerball
-            FROM draws
-        """
-        if where:
-            sql += " WHERE " + " AND ".join(where)
-        sql += " ORDER BY draw_date ASC"
-
-        cur = conn.cursor()
-        cur.execute(sql)
-        rows = cur.fetchall()
-
-        return [
-            Draw(
-                draw_date=str(r[0]),
-                white1=int(r[1]), white2=int(r[2]), white3=int(r[3]),
-                white4=int(r[4]), white5=int(r[5]),
-                powerball=int(r[6]),
-            )
-            for r in rows
-        ]
-    finally:
-        conn.close()
+    return _with_conn(_q_all_draws, require_complete)
 
 
 def fetch_same_month_day(target_date: str, require_complete: bool = True) -> List[Draw]:
-    mmdd = target_date[5:10]  # "MM-DD"
-    db_path = resolve_sqlite_path()
-    conn = _connect(db_path)
-    try:
-        where = ["substr(draw_date, 6, 5) = ?"]
-        params = [mmdd]
-
-        if require_complete:
-            where.extend([
-                "white1 IS NOT NULL", "white2 IS NOT NULL", "white3 IS NOT NULL",
-                "white4 IS NOT NULL", "white5 IS NOT NULL", "powerball IS NOT NULL",
-            ])
-
-        sql = """
-            SELECT draw_date, white1, white2, white3, white4, white5, powerball
-            FROM draws
-            WHERE
-        """ + " AND ".join(where) + " ORDER BY draw_date ASC"
-
-        cur = conn.cursor()
-        cur.execute(sql, params)
-        rows = cur.fetchall()
-
-        return [
-            Draw(
-                draw_date=str(r[0]),
-                white1=int(r[1]), white2=int(r[2]), white3=int(r[3]),
-                white4=int(r[4]), white5=int(r[5]),
-                powerball=int(r[6]),
-            )
-            for r in rows
-        ]
-    finally:
-        conn.close()
+    return _with_conn(_q_same_month_day, target_date, require_complete)
 
 
 def fetch_same_weekday(target_date: str, require_complete: bool = True) -> List[Draw]:
+    return _with_conn(_q_same_weekday, target_date, require_complete)
+
+
+def _q_last_draws(conn: sqlite3.Connection, n: int, until_date: Optional[str], require_complete: bool) -> List[Draw]:
+    where = []
+    params = []
+    if until_date:
+        where.append("draw_date <= ?")
+        params.append(until_date)
+
+    if require_complete:
+        where.extend([
+            "white1 IS NOT NULL", "white2 IS NOT NULL", "white3 IS NOT NULL",
+            "white4 IS NOT NULL", "white5 IS NOT NULL", "powerball IS NOT NULL",
+        ])
+
+    sql = """
+        SELECT draw_date, white1, white2, white3, white4, white5, powerball
+        FROM draws
+    """
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY draw_date DESC LIMIT ?"
+    params.append(int(n))
+
+    return _rows_to_draws(conn.execute(sql, params).fetchall())
+
+
+def _q_all_draws(conn: sqlite3.Connection, require_complete: bool) -> List[Draw]:
+    where = []
+    if require_complete:
+        where.extend([
+            "white1 IS NOT NULL", "white2 IS NOT NULL", "white3 IS NOT NULL",
+            "white4 IS NOT NULL", "white5 IS NOT NULL", "powerball IS NOT NULL",
+        ])
+
+    sql = """
+        SELECT draw_date, white1, white2, white3, white4, white5, powerball
+        FROM draws
+    """
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY draw_date ASC"
+
+    return _rows_to_draws(conn.execute(sql).fetchall())
+
+
+def _q_same_month_day(conn: sqlite3.Connection, target_date: str, require_complete: bool) -> List[Draw]:
+    mmdd = target_date[5:10]  # "MM-DD"
+    where = ["substr(draw_date, 6, 5) = ?"]
+    params = [mmdd]
+
+    if require_complete:
+        where.extend([
+            "white1 IS NOT NULL", "white2 IS NOT NULL", "white3 IS NOT NULL",
+            "white4 IS NOT NULL", "white5 IS NOT NULL", "powerball IS NOT NULL",
+        ])
+
+    sql = """
+        SELECT draw_date, white1, white2, white3, white4, white5, powerball
+        FROM draws
+        WHERE
+    """ + " AND ".join(where) + " ORDER BY draw_date ASC"
+
+    return _rows_to_draws(conn.execute(sql, params).fetchall())
+
+
+def _q_same_weekday(conn: sqlite3.Connection, target_date: str, require_complete: bool) -> List[Draw]:
     """
     weekday SQLite: strftime('%w', date) -> 0=Sunday..6=Saturday
     """
-    db_path = resolve_sqlite_path()
-    conn = _connect(db_path)
-    try:
-        cur = conn.cursor()
-        cur.execute("SELECT strftime('%w', ?) as wd", (target_date,))
-        wd = cur.fetchone()[0]
-
-        where = ["strftime('%w', draw_date) = ?"]
-        params = [wd]
-
-        if require_complete:
-            where.extend([
-                "white1 IS NOT NULL", "white2 IS NOT NULL", "white3 IS NOT NULL",
-                "white4 IS NOT NULL", "white5 IS NOT NULL", "powerball IS NOT NULL",
-            ])
-
-        sql = """
-            SELECT draw_date, white1, white2, white3, white4, white5, powerball
-            FROM draws
-            WHERE
-        """ + " AND ".join(where) + " ORDER BY draw_date ASC"
-
-        cur.execute(sql, params)
-        rows = cur.fetchall()
-
-        return [
-            Draw(
-                draw_date=str(r[0]),
-                white1=int(r[1]), white2=int(r[2]), white3=int(r[3]),
-                white4=int(r[4]), white5=int(r[5]),
-                powerball=int(r[6]),
-            )
-            for r in rows
-        ]
-    finally:
-        conn.close()
+    wd = conn.execute("SELECT strftime('%w', ?) as wd", (target_date,)).fetchone()[0]
+
+    where = ["strftime('%w', draw_date) = ?"]
+    params = [wd]
+
+    if require_complete:
+        where.extend([
+            "white1 IS NOT NULL", "white2 IS NOT NULL", "white3 IS NOT NULL",
+            "white4 IS NOT NULL", "white5 IS NOT NULL", "powerball IS NOT NULL",
+        ])
+
+    sql = """
+        SELECT draw_date, white1, white2, white3, white4, white5, powerball
+        FROM draws
+        WHERE
+    """ + " AND ".join(where) + " ORDER BY draw_date ASC"
+
+    return _rows_to_draws(conn.execute(sql, params).fetchall())
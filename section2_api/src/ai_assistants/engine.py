@@ -4,6 +4,7 @@ from dataclasses import asdict
 from datetime import date
 from typing import Any, Dict
 
+from .. import profiling
 from .assistants import RunParams, assistants_catalog, build_context, run_all_assistants
 
 
@@ -11,57 +12,47 @@ def _today_iso() -> str:
     return date.today().isoformat()
 
 
-def run_engine(req: Any) -> Dict[str, Any]:
-    draw_date = getattr(req, "draw_date", None) or _today_iso()
-    windows = list(getattr(req, "windows", [2, 5, 10, 15, 20]))
-    n_suggestions = int(getattr(req, "n_suggestions", 10))
-    seed = getattr(req, "seed", None)
-    strict_mode = bool(getattr(req, "strict_mode", False))
-    similarity_level = int(getattr(req, "similarity_level", 1))
-    recent_lookback = int(getattr(req, "recent_lookback", 50))
-    overlap_block = int(getattr(req, "overlap_block", 4))
-    constraints = getattr(req, "constraints", None)
-    assistant_ids = getattr(req, "assistant_ids", None)
-
-    params = RunParams(
-        draw_date=draw_date,
-        windows=windows,
-        n_suggestions=n_suggestions,
-        seed=seed,
-        strict_mode=strict_mode,
-        recent_lookback=recent_lookback,
-        overlap_block=overlap_block,
-        similarity_level=similarity_level,
-        constraints=constraints,
-        assistant_ids=assistant_ids,
+def params_from_request(req: Any) -> RunParams:
+    return RunParams(
+        draw_date=getattr(req, "draw_date", None) or _today_iso(),
+        windows=list(getattr(req, "windows", [2, 5, 10, 15, 20])),
+        n_suggestions=int(getattr(req, "n_suggestions", 10)),
+        seed=getattr(req, "seed", None),
+        strict_mode=bool(getattr(req, "strict_mode", False)),
+        recent_lookback=int(getattr(req, "recent_lookback", 50)),
+        overlap_block=int(getattr(req, "overlap_block", 4)),
+        similarity_level=int(getattr(req, "similarity_level", 1)),
+        constraints=getattr(req, "constraints", None),
+        assistant_ids=getattr(req, "assistant_ids", None),
     )
 
-    ctx = build_context(params)
-    if not ctx.last_draws_desc:
-        return {
-            "status": "error",
-            "error": "NO_DATA",
-            "message": "No hay draws completos disponibles para analizar.",
-            "meta": {"draw_date": draw_date},
-        }
 
-    last_draw = ctx.last_draws_desc[0]
-    results = run_all_assistants(ctx, params)
+def no_data_payload(draw_date: str) -> Dict[str, Any]:
+    return {
+        "status": "error",
+        "error": "NO_DATA",
+        "message": "No hay draws completos disponibles para analizar.",
+        "meta": {"draw_date": draw_date},
+    }
+
 
+def build_run_payload(ctx: Any, params: RunParams, results: Dict[str, Any]) -> Dict[str, Any]:
+    """Respuesta estándar de /assistants/run a partir de un contexto ya construido."""
+    last_draw = ctx.last_draws_desc[0]
     return {
         "status": "ok",
         "meta": {
-            "draw_date": draw_date,
-            "windows": windows,
-            "n_suggestions": n_suggestions,
-            "seed": seed,
+            "draw_date": params.draw_date,
+            "windows": params.windows,
+            "n_suggestions": params.n_suggestions,
+            "seed": params.seed,
             "legal_note": "Salida basada en análisis histórico/heurístico. No es predicción ni garantía.",
             "hard_rule": "Ninguna sugerencia coincide con ninguna combinación del histórico (bloqueo total).",
             "anti_overlap": {
-                "enabled": strict_mode,
-                "recent_lookback": recent_lookback,
-                "overlap_block": overlap_block,
-                "level": similarity_level,
+                "enabled": params.strict_mode,
+                "recent_lookback": params.recent_lookback,
+                "overlap_block": params.overlap_block,
+                "level": params.similarity_level,
             },
         },
         "catalog": assistants_catalog(),
@@ -74,3 +65,21 @@ def run_engine(req: Any) -> Dict[str, Any]:
         },
         "results_by_assistant": results,
     }
+
+
+def run_engine(req: Any) -> Dict[str, Any]:
+    with profiling.span("run_engine"):
+        params = params_from_request(req)
+
+        with profiling.span("build_context"):
+            ctx = build_context(params)
+        if not ctx.last_draws_desc:
+            return no_data_payload(params.draw_date)
+
+        with profiling.span("run_all_assistants"):
+            results = run_all_assistants(ctx, params)
+        for aid, obj in (results or {}).items():
+            profiling.count(f"suggestions.{aid}", len(obj.get("suggestions") or []))
+
+        with profiling.span("build_payload"):
+            return build_run_payload(ctx, params, results)
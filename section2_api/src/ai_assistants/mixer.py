@@ -0,0 +1,302 @@
+"""
+Strategy Mixer (V37) en espacio de pesos.
+
+Todos los asistentes son mezclas de las mismas señales (rescore._build_models): base_freq, recency,
+markov, momentum, overdue, positional, same_mmdd, same_weekday (+ uniform). En vez de correr el motor
+completo por cada movimiento de slider:
+
+- Las señales se calculan una vez por contexto (draw_date, windows, versión de la DB) y quedan en caché
+  como matrices normalizadas W (S, 69) y PB (P, 26); cada fila suma 1.
+- El vector mezclado es un solo producto: w = sliders @ W (idem PB).
+- mode="sample": k jugadas de una vez con Gumbel-top-5 (equivale a muestrear 5 blancas sin reemplazo
+  con probabilidad w) + PB con rng.choice.
+- mode="top_k": las k combinaciones exactas de mayor probabilidad (enumeración best-first con heap).
+En ambos casos se descartan combinaciones históricas (regla dura) y repetidas.
+"""
+from __future__ import annotations
+
+import heapq
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .assistants import RunParams, build_context, combo_key
+from .data_access import db_version
+from .rescore import _build_models
+
+WHITE_SIGNALS = ("base_freq", "recency", "markov", "momentum", "overdue", "positional", "same_mmdd", "same_weekday", "uniform")
+PB_SIGNALS = ("base_freq", "recency", "same_mmdd", "same_weekday", "uniform")
+
+# Sliders de la página StrategyMixer.tsx (0..100) -> pesos por señal
+SLIDER_SIGNALS: Dict[str, Dict[str, float]] = {
+    "continuidad": {"markov": 0.5, "momentum": 0.3, "recency": 0.2},
+    "overdue": {"overdue": 0.7, "base_freq": 0.3},
+    "diversidad": {"uniform": 0.6, "positional": 0.4},
+    "calendario": {"same_mmdd": 0.6, "same_weekday": 0.4},
+}
+
+_CACHE_SIZE = 8
+_cache: "OrderedDict[Tuple, _Signals]" = OrderedDict()
+_lock = threading.Lock()
+
+
+class _Signals:
+    __slots__ = ("white", "pb", "historical", "last_draw")
+
+    def __init__(self, white, pb, historical, last_draw):
+        self.white = white            # (len(WHITE_SIGNALS), 69), filas normalizadas
+        self.pb = pb                  # (len(PB_SIGNALS), 26)
+        self.historical = historical  # set de combo_key
+        self.last_draw = last_draw
+
+
+def _as_matrix(vectors: Dict[str, Dict[int, float]], names: Sequence[str], size: int):
+    import numpy as np
+
+    m = np.ones((len(names), size), dtype=np.float64)
+    for i, name in enumerate(names):
+        vec = vectors.get(name)
+        if vec:
+            m[i] = [float(vec.get(n, 0.0)) for n in range(1, size + 1)]
+    m = np.clip(m, 0.0, None)
+    sums = m.sum(axis=1, keepdims=True)
+    sums[sums == 0] = 1.0
+    return m / sums
+
+
+def get_signals(draw_date: str, windows: List[int]) -> Tuple[Optional[_Signals], bool]:
+    """(señales, hit) para el contexto; None si no hay draws."""
+    key = (draw_date, tuple(windows), db_version())
+    with _lock:
+        hit = _cache.get(key)
+        if hit is not None:
+            _cache.move_to_end(key)
+            return hit, True
+
+    params = RunParams(draw_date=draw_date, windows=list(windows), n_suggestions=10, seed=None)
+    ctx = build_context(params)
+    if not ctx.last_draws_desc:
+        return None, False
+    # diversity_optimizer trae todas las señales sueltas (signals_w / signals_pb)
+    model = _build_models(ctx, params)["diversity_optimizer"]
+    sig = _Signals(
+        white=_as_matrix(model["signals_w"], WHITE_SIGNALS, 69),
+        pb=_as_matrix(model["signals_pb"], PB_SIGNALS, 26),
+        historical=ctx.historical_keys,
+        last_draw=ctx.last_draws_desc[0],
+    )
+    with _lock:
+        _cache[key] = sig
+        while len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+    return sig, False
+
+
+def clear_signal_cache() -> None:
+    with _lock:
+        _cache.clear()
+
+
+def resolve_weights(
+    weights: Optional[Dict[str, float]],
+    sliders: Optional[Dict[str, float]],
+) -> Dict[str, float]:
+    """weights (por señal) + sliders de la UI (0..100) -> pesos por señal. Lanza ValueError si algo no existe."""
+    out: Dict[str, float] = {}
+    for name, v in (weights or {}).items():
+        if name not in WHITE_SIGNALS:
+            raise ValueError(f"Señal desconocida: {name}. Válidas: {', '.join(WHITE_SIGNALS)}")
+        out[name] = out.get(name, 0.0) + float(v)
+    for name, v in (sliders or {}).items():
+        mapping = SLIDER_SIGNALS.get(name)
+        if mapping is None:
+            raise ValueError(f"Slider desconocido: {name}. Válidos: {', '.join(SLIDER_SIGNALS)}")
+        for sig, share in mapping.items():
+            out[sig] = out.get(sig, 0.0) + float(v) / 100.0 * share
+    if any(v < 0 for v in out.values()):
+        raise ValueError("Los pesos no pueden ser negativos.")
+    return out
+
+
+def _blend(matrix, names: Sequence[str], weights: Dict[str, float]):
+    import numpy as np
+
+    vec = np.array([weights.get(n, 0.0) for n in names], dtype=np.float64)
+    if vec.sum() <= 0:
+        vec = np.zeros(len(names))
+        vec[names.index("uniform")] = 1.0
+    vec = vec / vec.sum()
+    return vec, vec @ matrix
+
+
+def _sample(w, pb, k: int, rng, historical, max_rounds: int = 8) -> List[Tuple[Tuple[int, ...], int]]:
+    import numpy as np
+
+    out: List[Tuple[Tuple[int, ...], int]] = []
+    seen = set()
+    logw = np.log(np.clip(w, 1e-300, None))
+    for _ in range(max_rounds):
+        need = k - len(out)
+        if need <= 0:
+            break
+        m = need * 2 + 8
+        # Gumbel-top-5: argmax de log(w) + Gumbel, sin reemplazo, de una para las m jugadas
+        keys = logw[None, :] + rng.gumbel(size=(m, 69))
+        whites = np.sort(np.argpartition(-keys, 5, axis=1)[:, :5], axis=1) + 1
+        pbs = rng.choice(26, size=m, p=pb) + 1
+        for ws, p in zip(whites.tolist(), pbs.tolist()):
+            ck = combo_key(ws, p)
+            if ck in seen or ck in historical:
+                continue
+            seen.add(ck)
+            out.append((tuple(ws), int(p)))
+            if len(out) >= k:
+                break
+    return out
+
+
+def _best_subsets(logw_sorted: Sequence[float], size: int = 5) -> Iterator[Tuple[float, Tuple[int, ...]]]:
+    """Subconjuntos de `size` índices en orden decreciente de suma (logw_sorted ya viene ordenado desc)."""
+    n = len(logw_sorted)
+    start = tuple(range(size))
+    heap = [(-sum(logw_sorted[i] for i in start), start)]
+    visited = {start}
+    while heap:
+        neg, idx = heapq.heappop(heap)
+        yield -neg, idx
+        for pos in range(size):
+            nxt = idx[pos] + 1
+            if nxt >= n or (pos + 1 < size and nxt == idx[pos + 1]):
+                continue
+            cand = idx[:pos] + (nxt,) + idx[pos + 1:]
+            if cand in visited:
+                continue
+            visited.add(cand)
+            heapq.heappush(heap, (neg + logw_sorted[idx[pos]] - logw_sorted[nxt], cand))
+
+
+def _top_k(w, pb, k: int, historical, max_scan: int = 20000) -> List[Tuple[Tuple[int, ...], int]]:
+    """k combinaciones (blancas, PB) de mayor probabilidad: suma de dos listas ordenadas, best-first."""
+    import numpy as np
+
+    order_w = np.argsort(-w, kind="stable")
+    logw = np.log(np.clip(w[order_w], 1e-300, None)).tolist()
+    order_pb = np.argsort(-pb, kind="stable")
+    logpb = np.log(np.clip(pb[order_pb], 1e-300, None)).tolist()
+
+    subsets: List[Tuple[float, Tuple[int, ...]]] = []
+    gen = _best_subsets(logw)
+
+    def subset(i: int):
+        while len(subsets) <= i:
+            nxt = next(gen, None)
+            if nxt is None:
+                return None
+            subsets.append(nxt)
+        return subsets[i]
+
+    out: List[Tuple[Tuple[int, ...], int]] = []
+    s0 = subset(0)
+    heap = [(-(s0[0] + logpb[0]), 0, 0)]
+    scanned = 0
+    while heap and len(out) < k and scanned < max_scan:
+        _, i, j = heapq.heappop(heap)
+        scanned += 1
+        si = subsets[i]
+        ws = tuple(sorted(int(order_w[x]) + 1 for x in si[1]))
+        p = int(order_pb[j]) + 1
+        if combo_key(ws, p) not in historical:
+            out.append((ws, p))
+        # (i+1, 0) solo desde la columna 0 y (i, j+1) siempre: cada par entra una sola vez
+        if j == 0:
+            s_next = subset(i + 1)
+            if s_next is not None:
+                heapq.heappush(heap, (-(s_next[0] + logpb[0]), i + 1, 0))
+        if j + 1 < len(logpb):
+            heapq.heappush(heap, (-(si[0] + logpb[j + 1]), i, j + 1))
+    return out
+
+
+def _describe(combos, sig: _Signals, w, pb, wvec) -> List[Dict[str, Any]]:
+    import numpy as np
+
+    if not combos:
+        return []
+    idx = np.array([c[0] for c in combos], dtype=np.intp) - 1          # (k, 5)
+    pbi = np.array([c[1] for c in combos], dtype=np.intp) - 1          # (k,)
+    # log-lift vs. uniforme: > 0 = más probable que una jugada al azar bajo la mezcla
+    lift = np.log(w[idx] * 69).sum(axis=1) + np.log(pb[pbi] * 26)
+    # aporte de cada señal al peso mezclado de las 5 blancas
+    contrib = wvec[:, None] * sig.white[:, idx].sum(axis=2)            # (S, k)
+    share = contrib / np.clip(contrib.sum(axis=0, keepdims=True), 1e-300, None)
+    out = []
+    for c, (ws, p) in enumerate(combos):
+        out.append({
+            "whites": list(ws),
+            "powerball": int(p),
+            "score": round(float(lift[c]), 4),
+            "signals_used": {WHITE_SIGNALS[s]: round(float(share[s, c]), 4) for s in range(len(WHITE_SIGNALS)) if wvec[s] > 0},
+        })
+    return out
+
+
+def run_mix(
+    draw_date: str,
+    windows: List[int],
+    weights: Optional[Dict[str, float]] = None,
+    pb_weights: Optional[Dict[str, float]] = None,
+    sliders: Optional[Dict[str, float]] = None,
+    mode: str = "sample",
+    n_suggestions: int = 10,
+    seed: Optional[int] = None,
+) -> Dict[str, Any]:
+    import numpy as np
+
+    t0 = time.perf_counter()
+    try:
+        wmap = resolve_weights(weights, sliders)
+        pbmap = dict(pb_weights) if pb_weights is not None else {n: v for n, v in wmap.items() if n in PB_SIGNALS}
+        bad = [n for n in pbmap if n not in PB_SIGNALS]
+        if bad:
+            raise ValueError(f"Señal PB desconocida: {bad[0]}. Válidas: {', '.join(PB_SIGNALS)}")
+        if any(float(v) < 0 for v in pbmap.values()):
+            raise ValueError("Los pesos no pueden ser negativos.")
+    except ValueError as e:
+        return {"status": "error", "error": "INVALID_WEIGHTS", "message": str(e)}
+    if mode not in ("sample", "top_k"):
+        return {"status": "error", "error": "INVALID_MODE", "message": "mode debe ser 'sample' o 'top_k'."}
+
+    sig, cache_hit = get_signals(draw_date, windows)
+    if sig is None:
+        return {"status": "error", "error": "NO_DATA", "message": "No hay draws completos disponibles para analizar.",
+                "meta": {"draw_date": draw_date}}
+
+    wvec, w = _blend(sig.white, WHITE_SIGNALS, wmap)
+    pbvec, pb = _blend(sig.pb, PB_SIGNALS, pbmap)
+
+    if mode == "top_k":
+        combos = _top_k(w, pb, n_suggestions, sig.historical)
+    else:
+        combos = _sample(w, pb, n_suggestions, np.random.default_rng(seed), sig.historical)
+
+    return {
+        "status": "ok",
+        "meta": {
+            "draw_date": draw_date,
+            "windows": windows,
+            "mode": mode,
+            "n_suggestions": n_suggestions,
+            "seed": seed,
+            "cache": "hit" if cache_hit else "miss",
+            "elapsed_ms": round((time.perf_counter() - t0) * 1000.0, 2),
+            "hard_rule": "Ninguna sugerencia coincide con ninguna combinación del histórico (bloqueo total).",
+        },
+        "weights": {WHITE_SIGNALS[i]: round(float(v), 4) for i, v in enumerate(wvec) if v > 0},
+        "pb_weights": {PB_SIGNALS[i]: round(float(v), 4) for i, v in enumerate(pbvec) if v > 0},
+        "blended": {
+            "whites": [round(float(x), 6) for x in w],
+            "powerball": [round(float(x), 6) for x in pb],
+        },
+        "suggestions": _describe(combos, sig, w, pb, wvec),
+    }
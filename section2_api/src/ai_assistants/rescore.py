@@ -3,6 +3,7 @@ from __future__ import annotations
 from dataclasses import dataclass
 from typing import Any, Dict, List, Optional, Tuple
 
+from .. import profiling
 from .assistants import (
     RunParams,
     build_context,
@@ -35,6 +36,7 @@ class RescoreRequest:
     powerball: int
 
 
+@profiling.timed("build_models")
 def _build_models(ctx, params: RunParams):
     """
     Reproduce the same weight construction logic as run_all_assistants,
@@ -212,3 +214,149 @@ def rescore_combo(draw_date: str, windows: List[int], assistant_ids: Optional[Li
         "is_historical": is_historical,
         "rescore_by_assistant": by_assistant,
     }
+
+
+# ------------------------
+# Batch rescore
+# ------------------------
+
+def _prob_rows(vectors: Dict[str, Dict[int, float]], size: int):
+    """{nombre: {número: peso}} -> (nombres, matriz (S, size+1) normalizada por fila; columna 0 sin uso)."""
+    import numpy as np
+
+    names = list(vectors.keys())
+    m = np.zeros((len(names), size + 1), dtype=np.float64)
+    for i, name in enumerate(names):
+        vec = vectors[name] or {}
+        m[i, 1:] = [max(0.0, float(vec.get(n, 0.0))) for n in range(1, size + 1)]
+    sums = m.sum(axis=1, keepdims=True)
+    sums[sums == 0] = 1.0
+    return names, m / sums
+
+
+def _validate_many(combos: List[Tuple[List[int], int]]):
+    """(whites (N,5) ordenadas, pb (N,), error por fila o None); filas inválidas quedan en 0."""
+    import numpy as np
+
+    n = len(combos)
+    ws = np.zeros((n, 5), dtype=np.intp)
+    pb = np.zeros(n, dtype=np.intp)
+    errors: List[Optional[str]] = [None] * n
+    for i, (w, p) in enumerate(combos):
+        if len(w) != 5:
+            errors[i] = "INVALID_COMBO"
+            continue
+        ws[i] = sorted(int(x) for x in w)
+        pb[i] = int(p)
+    bad_range = (ws < WHITE_MIN).any(axis=1) | (ws > WHITE_MAX).any(axis=1) | (pb < PB_MIN) | (pb > PB_MAX)
+    dup = (np.diff(ws, axis=1) == 0).any(axis=1)
+    for i in range(n):
+        if errors[i] is None and bad_range[i]:
+            errors[i] = "OUT_OF_RANGE"
+        elif errors[i] is None and dup[i]:
+            errors[i] = "DUPLICATE_WHITE"
+    ok = np.array([e is None for e in errors], dtype=bool)
+    ws[~ok] = 0
+    pb[~ok] = 0
+    return ws, pb, errors
+
+
+def rescore_many(
+    draw_date: str,
+    windows: List[int],
+    assistant_ids: Optional[List[str]],
+    combos: List[Tuple[List[int], int]],
+    expand: Optional[List[int]] = None,
+) -> Dict[str, Any]:
+    """
+    Rescore de N combinaciones con un solo build_context + _build_models.
+
+    Por asistente, los pesos y cada señal se normalizan a probabilidades y se evalúan con gathers:
+      whites_lift = W[ws].sum(1) * 69/5   (1.0 = igual que una jugada al azar)
+      pb_lift     = P[pb] * 26
+      signals     = S[:, ws].sum(2) * 69/5 -> (señales, N) de una vez
+    score exacto (_score) y why (_explain_combo) solo para los índices de `expand` (caros, por combo).
+    """
+    import numpy as np
+
+    params = RunParams(draw_date=draw_date, windows=windows, n_suggestions=10, seed=None, assistant_ids=assistant_ids)
+    ctx = build_context(params)
+    if not ctx.last_draws_desc:
+        return {"status": "error", "error": "NO_DATA", "message": "No hay draws completos disponibles para analizar.",
+                "meta": {"draw_date": draw_date}}
+
+    models = _build_models(ctx, params)
+    ids = [aid for aid in (assistant_ids or list(models.keys())) if aid in models]
+
+    ws, pb, errors = _validate_many(combos)
+    ok = np.array([e is None for e in errors], dtype=bool)
+    keys = [combo_key(list(ws[i]), int(pb[i])) if ok[i] else None for i in range(len(combos))]
+    historical = [k is not None and k in ctx.historical_keys for k in keys]
+
+    results: List[Dict[str, Any]] = []
+    for i, (w, p) in enumerate(combos):
+        row: Dict[str, Any] = {"index": i, "whites": ws[i].tolist() if ok[i] else list(w), "powerball": int(p)}
+        if errors[i]:
+            row.update({"valid": False, "error": errors[i]})
+        else:
+            row.update({"valid": not historical[i], "is_historical": historical[i], "by_assistant": {}})
+        results.append(row)
+
+    best: Dict[str, Optional[int]] = {}
+    for aid in ids:
+        m = models[aid]
+        _, wmat = _prob_rows({"weights": m["weights_w"]}, WHITE_MAX)
+        _, pmat = _prob_rows({"weights": m["weights_pb"]}, PB_MAX)
+        sw_names, swmat = _prob_rows(m.get("signals_w", {}) or {}, WHITE_MAX)
+        sp_names, spmat = _prob_rows(m.get("signals_pb", {}) or {}, PB_MAX)
+
+        w_lift = wmat[0][ws].sum(axis=1) * (WHITE_MAX / 5.0)
+        pb_lift = pmat[0][pb] * PB_MAX
+        lift = w_lift * pb_lift
+        sig_w = swmat[:, ws].sum(axis=2) * (WHITE_MAX / 5.0)   # (S, N)
+        sig_pb = spmat[:, pb] * PB_MAX                          # (P, N)
+
+        valid_idx = np.flatnonzero(ok & ~np.array(historical, dtype=bool))
+        best[aid] = int(valid_idx[np.argmax(lift[valid_idx])]) if valid_idx.size else None
+
+        for i in np.flatnonzero(ok):
+            signals = {name: round(float(sig_w[s, i]), 4) for s, name in enumerate(sw_names)}
+            signals.update({f"pb_{name}": round(float(sig_pb[s, i]), 4) for s, name in enumerate(sp_names)})
+            results[i]["by_assistant"][aid] = {
+                "lift": round(float(lift[i]), 4),
+                "whites_lift": round(float(w_lift[i]), 4),
+                "pb_lift": round(float(pb_lift[i]), 4),
+                "signals": signals,
+            }
+
+    expanded = []
+    for i in sorted(set(expand or [])):
+        if not (0 <= i < len(results)) or errors[i]:
+            continue
+        combo_ws, combo_pb = tuple(int(x) for x in ws[i]), int(pb[i])
+        for aid in ids:
+            m = models[aid]
+            sig = _compute_signal_scores(combo_ws, combo_pb, m.get("signals_w", {}), m.get("signals_pb", {}))
+            results[i]["by_assistant"][aid].update({
+                "score": _score(combo_ws, combo_pb, normalize(m["weights_w"]), normalize(m["weights_pb"])),
+                "signals_used": {k: round(float(v), 4) for k, v in sig.items()},
+                "why": _explain_combo(ctx, combo_ws, combo_pb, aid, m.get("rationale_tags", []), sig, window_for_explain=10),
+                "rationale_tags": m.get("rationale_tags", []),
+            })
+        expanded.append(i)
+
+    return {
+        "status": "ok",
+        "meta": {
+            "draw_date": draw_date,
+            "windows": windows,
+            "count": len(combos),
+            "invalid": int((~ok).sum()),
+            "historical": int(sum(historical)),
+            "assistants": ids,
+            "expanded": expanded,
+            "note": "lift = masa de probabilidad del combo bajo los pesos del asistente vs. una jugada al azar (1.0).",
+        },
+        "best_by_assistant": best,
+        "results": results,
+    }
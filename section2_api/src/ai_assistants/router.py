@@ -1,16 +1,28 @@
 from __future__ import annotations
 
-from fastapi import APIRouter
+from datetime import date
+
+from fastapi import APIRouter, Query
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Dict, List, Literal, Optional
+
+from .. import profiling
+from ..single_flight import DEFAULT_STALE_SECONDS, DEFAULT_TTL_SECONDS, SingleFlight, make_key
 
 from .assistants import assistants_catalog
+from .autopilot import run_autopilot
+from .batch import run_batch
 from .engine import run_engine
-from .rescore import rescore_combo
-from .data import is_near_duplicate_of_recent
+from .mixer import run_mix
+from .rescore import rescore_combo, rescore_many
+from .data import NearDupIndex
+from .data_access import db_version
 
 router = APIRouter()
 
+# /assistants/run idénticos y concurrentes (p.ej. todos pidiendo "hoy" tras un sorteo) corren una vez
+_RUN_FLIGHT = SingleFlight("assistants_run")
+
 
 class Constraints(BaseModel):
     whites_min: int = Field(default=1, ge=1, le=69)
@@ -49,7 +61,35 @@ def catalog():
 
 
 @router.post("/assistants/run")
-def run(req: RunRequest):
+def run(req: RunRequest, debug_timing: int = Query(0, ge=0, le=1, description="1 = desglose de tiempos por etapa en meta.timing")):
+    if debug_timing:
+        # medición real: sin single-flight/cache (un resultado compartido no dice nada de esta request)
+        with profiling.collect() as timing:
+            out = _run_filtered(req)
+        if isinstance(out.get("meta"), dict):
+            out["meta"]["timing"] = timing.as_meta()
+        return out
+
+    params = req.model_dump()
+    params["draw_date"] = params.get("draw_date") or date.today().isoformat()
+    # Sin seed cada corrida es otro pack al azar: solo se comparte la ejecución en curso, no se cachea
+    seeded = req.seed is not None
+    return _RUN_FLIGHT.do(
+        make_key("run", params),
+        lambda: _run_filtered(req),
+        version=db_version(),
+        ttl=DEFAULT_TTL_SECONDS if seeded else 0.0,
+        stale=DEFAULT_STALE_SECONDS if seeded else 0.0,
+        cacheable=lambda out: out.get("status") == "ok",
+    )
+
+
+def _run_filtered(req: RunRequest):
+    with profiling.maybe_profile("assistants_run"):
+        return _run_filtered_impl(req)
+
+
+def _run_filtered_impl(req: RunRequest):
     out = run_engine(req)
 
     # V39 near-duplicate filter (post-proc): removes suggestions too similar to recent historical draws.
@@ -57,27 +97,95 @@ def run(req: RunRequest):
         lookback = int(getattr(req, "near_dup_lookback", 500))
         ob = int(getattr(req, "near_dup_overlap_block", 4))
         osf = int(getattr(req, "near_dup_overlap_soft", 3))
-        removed = 0
         by = out.get("results_by_assistant", {}) or {}
-        for aid, obj in by.items():
-            sugg = obj.get("suggestions", []) or []
-            keep = []
-            for s in sugg:
-                info = is_near_duplicate_of_recent(s.get("whites", []), s.get("powerball", 0), lookback=lookback,
-                                                   overlap_whites_block=ob, overlap_whites_soft=osf)
+        with profiling.span("near_dup_filter"):
+            # una query y una comparación vectorizada para todas las sugerencias (igual que autopilot/batch)
+            index = NearDupIndex.from_recent(lookback)
+            flat = [s for obj in by.values() for s in (obj.get("suggestions") or [])]
+            infos = index.check_many([(s.get("whites", []), s.get("powerball", 0)) for s in flat],
+                                     overlap_whites_block=ob, overlap_whites_soft=osf)
+            blocked = set()
+            for s, info in zip(flat, infos):
                 if info:
-                    removed += 1
                     # annotate for transparency
-                    s["blocked_reason"] = {"type":"near_duplicate", **info}
-                    continue
-                keep.append(s)
-            obj["suggestions"] = keep
+                    s["blocked_reason"] = {"type": "near_duplicate", **info}
+                    blocked.add(id(s))
+            removed = len(blocked)
+            for aid, obj in by.items():
+                sugg = obj.get("suggestions", []) or []
+                keep = [s for s in sugg if id(s) not in blocked]
+                obj["suggestions"] = keep
+                profiling.count(f"rejected.near_duplicate.{aid}", len(sugg) - len(keep))
+        profiling.count("near_dup.removed", removed)
         out.setdefault("meta", {}).setdefault("filters", {})["near_duplicate"] = {
             "enabled": True, "lookback": lookback, "overlap_block": ob, "overlap_soft": osf, "removed": removed
         }
     return out
 
 
+class AutopilotRequest(RunRequest):
+    max_attempts: int = Field(default=8, ge=1, le=32, description="Máximo de corridas (seeds) en total.")
+    seeds_per_level: int = Field(default=2, ge=1, le=10, description="Seeds a probar antes de relajar un escalón.")
+    relax: bool = Field(default=True, description="Autopilot PRO: relaja filtros en orden seguro si faltan jugadas.")
+    time_budget_ms: int = Field(default=8000, ge=100, le=60000, description="No inicia otro intento pasado este tiempo.")
+
+
+@router.post("/assistants/autopilot")
+def autopilot(req: AutopilotRequest):
+    return run_autopilot(req)
+
+
+class BatchPreset(BaseModel):
+    id: str = Field(..., min_length=1, max_length=40)
+    label: Optional[str] = Field(default=None, max_length=80)
+    assistant_ids: Optional[List[str]] = Field(default=None)
+    n_suggestions: Optional[int] = Field(default=None, ge=1, le=50)
+    seed: Optional[int] = Field(default=None)
+    strict_mode: Optional[bool] = Field(default=None)
+    similarity_level: Optional[int] = Field(default=None, ge=0, le=3)
+    overlap_block: Optional[int] = Field(default=None, ge=3, le=5)
+    constraints: Optional[Constraints] = Field(default=None)
+
+
+class BatchRunRequest(RunRequest):
+    presets: Optional[List[BatchPreset]] = Field(
+        default=None, max_items=12,
+        description="Presets a comparar (los campos vacíos heredan del request). Si no se envía: A/B/C.",
+    )
+    workers: int = Field(default=4, ge=1, le=12, description="Presets en paralelo.")
+    metrics_window: int = Field(default=10, ge=1, le=200, description="Últimos N sorteos para la métrica de continuidad.")
+    include_results: bool = Field(default=True, description="Si es False, solo métricas (sin las jugadas).")
+
+
+@router.post("/assistants/batch")
+def batch(req: BatchRunRequest):
+    return run_batch(req)
+
+
+class MixRequest(BaseModel):
+    draw_date: Optional[str] = Field(default=None, description="YYYY-MM-DD. Si no se envía, usa la fecha de hoy.")
+    windows: List[int] = Field(default_factory=lambda: [2, 5, 10, 15, 20])
+    weights: Optional[Dict[str, float]] = Field(
+        default=None,
+        description="Peso por señal: base_freq, recency, markov, momentum, overdue, positional, same_mmdd, same_weekday, uniform.",
+    )
+    pb_weights: Optional[Dict[str, float]] = Field(default=None, description="Peso por señal PB. Si no se envía, usa las de weights que apliquen.")
+    sliders: Optional[Dict[str, float]] = Field(default=None, description="Sliders de StrategyMixer (0..100): continuidad, overdue, diversidad, calendario.")
+    mode: Literal["sample", "top_k"] = Field(default="sample", description="sample = muestreo ponderado; top_k = las k más probables.")
+    n_suggestions: int = Field(default=10, ge=1, le=50)
+    seed: Optional[int] = Field(default=None)
+
+
+@router.post("/assistants/mix")
+def mix(req: MixRequest):
+    draw_date = req.draw_date
+    if not draw_date:
+        from datetime import date as _date
+        draw_date = _date.today().isoformat()
+    return run_mix(draw_date, req.windows, weights=req.weights, pb_weights=req.pb_weights, sliders=req.sliders,
+                   mode=req.mode, n_suggestions=req.n_suggestions, seed=req.seed)
+
+
 class RescoreRequest(BaseModel):
     draw_date: Optional[str] = Field(default=None, description="YYYY-MM-DD. Si no se envía, usa la fecha de hoy.")
     windows: List[int] = Field(default_factory=lambda: [2, 5, 10, 15, 20])
@@ -106,6 +214,29 @@ def rescore(req: RescoreRequest):
     return rescore_combo(draw_date, req.windows, req.assistant_ids, req.whites, req.powerball)
 
 
+class RescoreCombo(BaseModel):
+    whites: List[int] = Field(..., min_items=5, max_items=5)
+    powerball: int = Field(...)
+
+
+class RescoreBatchRequest(BaseModel):
+    draw_date: Optional[str] = Field(default=None, description="YYYY-MM-DD. Si no se envía, usa la fecha de hoy.")
+    windows: List[int] = Field(default_factory=lambda: [2, 5, 10, 15, 20])
+    assistant_ids: Optional[List[str]] = Field(default=None)
+    combos: List[RescoreCombo] = Field(..., min_items=1, max_items=5000)
+    expand: Optional[List[int]] = Field(default=None, max_items=50, description="Índices de combos con score exacto + why.")
+
+
+@router.post("/assistants/rescore/batch")
+def rescore_batch(req: RescoreBatchRequest):
+    draw_date = req.draw_date
+    if not draw_date:
+        from datetime import date as _date
+        draw_date = _date.today().isoformat()
+    return rescore_many(draw_date, req.windows, req.assistant_ids,
+                        [(c.whites, c.powerball) for c in req.combos], expand=req.expand)
+
+
 @router.post('/consensus')
 def consensus(req: RunRequest):
     return build_consensus(req)
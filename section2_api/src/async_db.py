@@ -0,0 +1,208 @@
+"""
+Acceso async a SQLite para los handlers `async def` (history/future filter).
+
+Con handlers `def` cada request ocupa un hilo del threadpool de Starlette (40 por defecto) durante
+todo el I/O y abre/cierra su propia conexión sqlite3. Aquí:
+
+- SQLiteReader: N hilos lectores (ASYNC_DB_READERS, default 4), cada uno con una conexión persistente
+  por archivo. Los handlers encolan el trabajo y esperan un Future del event loop: una request en
+  espera no retiene ningún hilo, y la concurrencia contra SQLite queda acotada a N.
+- La conexión se reabre si el archivo fue reemplazado (otro inode, p.ej. import_excel_to_sqlite.py).
+- Mismas consultas que la versión sync, sin duplicar SQL: data_access._q_* y los builders de los
+  list_* (export_first_position, vía .plan). Solo cambia quién ejecuta.
+
+aiosqlite no está en requirements; un hilo lector con cola hace lo mismo sin dependencia nueva.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import queue
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from src import export_first_position as efp
+from src.ai_assistants import data_access as da
+
+T = TypeVar("T")
+
+DEFAULT_READERS = 4
+
+
+def _resolve(fut: "asyncio.Future[Any]", value: Any, error: Optional[BaseException]) -> None:
+    if fut.cancelled():  # el cliente se fue: nadie espera el resultado
+        return
+    if error is not None:
+        fut.set_exception(error)
+    else:
+        fut.set_result(value)
+
+
+class SQLiteReader:
+    def __init__(self, workers: int = DEFAULT_READERS, name: str = "sqlite-reader") -> None:
+        self.workers = max(1, int(workers))
+        self.name = name
+        self._jobs: "queue.SimpleQueue[Optional[tuple]]" = queue.SimpleQueue()
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self.jobs = 0  # se incrementa en call(), desde el event loop: sin carreras
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                t = threading.Thread(target=self._worker, name=f"{self.name}-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def _worker(self) -> None:
+        conns: Dict[str, Tuple[int, sqlite3.Connection]] = {}
+        try:
+            while True:
+                job = self._jobs.get()
+                if job is None:
+                    return
+                path, fn, args, fut, loop = job
+                value, error = None, None
+                try:
+                    value = fn(self._conn(conns, path), *args)
+                except BaseException as e:
+                    error = e
+                loop.call_soon_threadsafe(_resolve, fut, value, error)
+        finally:
+            for _, conn in conns.values():
+                conn.close()
+
+    @staticmethod
+    def _conn(conns: Dict[str, Tuple[int, sqlite3.Connection]], path: str) -> sqlite3.Connection:
+        try:
+            ino = os.stat(path).st_ino
+        except OSError:
+            ino = -1
+        hit = conns.get(path)
+        if hit is not None and hit[0] == ino:
+            return hit[1]
+        if hit is not None:
+            hit[1].close()
+        conn = sqlite3.connect(path)
+        conns[path] = (ino, conn)
+        return conn
+
+    async def call(self, path: Path | str, fn: Callable[..., T], *args: Any) -> T:
+        """fn(conn, *args) en un hilo lector con la conexión de `path`."""
+        if not self._threads:
+            self._start()
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self.jobs += 1
+        self._jobs.put((str(path), fn, args, fut, loop))
+        return await fut
+
+    async def fetchall(self, path: Path | str, sql: str, params: Any = ()) -> Tuple[List[str], List[Tuple[Any, ...]]]:
+        return await self.call(path, _fetchall, sql, params)
+
+    def stats(self) -> Dict[str, int]:
+        return {"threads": len(self._threads), "queued": self._jobs.qsize(), "jobs": self.jobs}
+
+    def close(self) -> None:
+        with self._lock:
+            for _ in self._threads:
+                self._jobs.put(None)
+            self._threads = []
+
+
+def _fetchall(conn: sqlite3.Connection, sql: str, params: Any) -> Tuple[List[str], List[Tuple[Any, ...]]]:
+    cur = conn.execute(sql, params)
+    return [d[0] for d in cur.description], cur.fetchall()
+
+
+_READER: Optional[SQLiteReader] = None
+_READER_LOCK = threading.Lock()
+
+
+def get_reader() -> SQLiteReader:
+    global _READER
+    if _READER is None:
+        with _READER_LOCK:
+            if _READER is None:
+                _READER = SQLiteReader(int(os.getenv("ASYNC_DB_READERS", "") or DEFAULT_READERS))
+    return _READER
+
+
+# ---------------------------------------------------------------------
+# Espejo async de ai_assistants.data_access.fetch_*
+# ---------------------------------------------------------------------
+async def fetch_last_draws(n: int, until_date: Optional[str] = None, require_complete: bool = True):
+    return await get_reader().call(da.resolve_sqlite_path(), da._q_last_draws, n, until_date, require_complete)
+
+
+async def fetch_all_draws(require_complete: bool = True):
+    return await get_reader().call(da.resolve_sqlite_path(), da._q_all_draws, require_complete)
+
+
+async def fetch_same_month_day(target_date: str, require_complete: bool = True):
+    return await get_reader().call(da.resolve_sqlite_path(), da._q_same_month_day, target_date, require_complete)
+
+
+async def fetch_same_weekday(target_date: str, require_complete: bool = True):
+    return await get_reader().call(da.resolve_sqlite_path(), da._q_same_weekday, target_date, require_complete)
+
+
+# ---------------------------------------------------------------------
+# Espejo async de los list_* de export_first_position
+# ---------------------------------------------------------------------
+async def _run_plan(plan: Any) -> Dict[str, Any]:
+    if not isinstance(plan, efp._ListPlan):
+        return plan  # dict de error ya armado por el builder
+    fmt = (plan.output or "json").lower().strip()
+    if fmt == "ndjson":
+        # el stream se consume desde el threadpool de StreamingResponse, igual que en la versión sync
+        return efp._list_response(plan.sql, plan.params, plan.resp, plan.output, plan.line_fn,
+                                  limit=plan.limit, sort_col=plan.sort_col, direction=plan.direction)
+    # armar dicts/lines también en el hilo lector: el event loop solo despacha
+    return await get_reader().call(efp.DB_PATH, _exec_plan, plan, fmt)
+
+
+def _exec_plan(conn: sqlite3.Connection, plan: Any, fmt: str) -> Dict[str, Any]:
+    efp._ensure_keyset_indexes()  # una vez por archivo; DDL en el hilo lector, no en el event loop
+    cols_all, rows = _fetchall(conn, plan.sql, plan.params)
+    return efp._fill_list_response(plan.resp, fmt, cols_all, rows, plan.line_fn,
+                                   limit=plan.limit, sort_col=plan.sort_col, direction=plan.direction)
+
+
+def _exec_by_position(conn: sqlite3.Connection, position: int, number: int, limit: int) -> Dict[str, Any]:
+    rows = conn.execute(*efp._by_position_query(position, number, limit)).fetchall()
+    return efp._by_position_response(position, number, limit, rows)
+
+
+async def list_draws_by_position(position: int, number: int, limit: int = 5000) -> Dict[str, Any]:
+    if position not in (1, 2, 3, 4, 5):
+        return {"status": "error", "error": "INVALID_POSITION", "message": "position debe ser 1..5"}
+    return await get_reader().call(efp.DB_PATH, _exec_by_position, position, number, limit)
+
+
+async def list_draws_filtered(**kwargs: Any) -> Dict[str, Any]:
+    return await _run_plan(efp.list_draws_filtered.plan(**kwargs))
+
+
+async def list_draws_filtered_or(**kwargs: Any) -> Dict[str, Any]:
+    return await _run_plan(efp.list_draws_filtered_or.plan(**kwargs))
+
+
+async def list_draws_filtered_atleast(**kwargs: Any) -> Dict[str, Any]:
+    return await _run_plan(efp.list_draws_filtered_atleast.plan(**kwargs))
+
+
+async def list_future_filtered(**kwargs: Any) -> Dict[str, Any]:
+    return await _run_plan(efp.list_future_filtered.plan(**kwargs))
+
+
+async def list_future_filtered_or(**kwargs: Any) -> Dict[str, Any]:
+    return await _run_plan(efp.list_future_filtered_or.plan(**kwargs))
+
+
+async def list_future_filtered_atleast(**kwargs: Any) -> Dict[str, Any]:
+    return await _run_plan(efp.list_future_filtered_atleast.plan(**kwargs))
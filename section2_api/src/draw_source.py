@@ -0,0 +1,503 @@
+"""
+Fuente única de sorteos históricos (DATABASE_URL Postgres / SQLite / CSV) con caché columnar.
+
+- get_draw_columns(): prueba las fuentes en el orden de siempre (DATABASE_URL -> SQLite -> CSV) una
+  sola vez; la fuente elegida queda fija mientras siga respondiendo.
+- Cada fuente expone version() (barato: stat del archivo; en Postgres max(draw_date) + contadores de
+  escrituras de pg_stat_user_tables sobre una conexión persistente) y load() (todas las columnas de una
+  pasada). get_draw_columns() recarga solo si cambió la versión.
+- DrawColumns guarda white1..white5 y powerball como arrays NumPy (0 = faltante), así las frecuencias
+  por posición son un np.bincount sobre la columna cacheada.
+- Postgres: COPY (SELECT ...) TO STDOUT para la transferencia masiva; si COPY falla, cursor del lado
+  del servidor (named cursor) en lotes.
+
+NumPy se importa dentro de las funciones: importar este módulo (lo carga main.py) no debe pagar su costo.
+"""
+from __future__ import annotations
+
+import csv
+import io
+import os
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from urllib.parse import urlparse
+
+if TYPE_CHECKING:  # pragma: no cover
+    import numpy as np
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+DATA_DIR = PROJECT_ROOT / "data"
+SQLITE_PATH = DATA_DIR / "powerball.db"
+CSV_PATH = DATA_DIR / "powerball.csv"
+
+POSITIONS = ("white1", "white2", "white3", "white4", "white5")
+COLUMNS = ("draw_date",) + POSITIONS + ("powerball",)
+
+# Nombre canónico -> alias aceptados en tablas/CSV legacy (en orden de preferencia)
+_ALIASES: Dict[str, Tuple[str, ...]] = {
+    "draw_date": ("draw_date", "drawdate", "date"),
+    "white1": ("white1", "ball1", "n1"),
+    "white2": ("white2", "ball2", "n2"),
+    "white3": ("white3", "ball3", "n3"),
+    "white4": ("white4", "ball4", "n4"),
+    "white5": ("white5", "ball5", "n5"),
+    "powerball": ("powerball", "pb", "power_ball"),
+}
+
+_PG_BATCH = 5000
+
+# Firma de draws sin escanear la tabla: max(draw_date) (índice) + inserts/updates/deletes acumulados
+# (catálogo de estadísticas; cubre correcciones in-place que no mueven el máximo)
+_PG_VERSION_SQL = (
+    "SELECT (SELECT max(draw_date)::text FROM draws), "
+    "(SELECT n_tup_ins + n_tup_upd + n_tup_del FROM pg_stat_user_tables WHERE relid = 'draws'::regclass)"
+)
+
+
+@dataclass(frozen=True)
+class DrawColumns:
+    """
+    Sorteos en formato columnar. whites: (n, 5) int16; powerball: (n,) int16; 0 = faltante.
+    dates: (n,) "U10" YYYY-MM-DD ("" = sin fecha), para filtrar rangos con comparación vectorizada.
+    """
+
+    source: str
+    version: Tuple
+    draw_date: List[Optional[str]]
+    whites: "np.ndarray"
+    powerball: "np.ndarray"
+    dates: "np.ndarray"
+
+    def __len__(self) -> int:
+        return len(self.draw_date)
+
+    def column(self, name: str) -> "np.ndarray":
+        if name == "powerball":
+            return self.powerball
+        return self.whites[:, POSITIONS.index(name)]
+
+    def position_counts(self, position: int, minlength: int = 70) -> "np.ndarray":
+        """Frecuencia por número en white{position} (1..5); índice = número, [0] = faltantes."""
+        import numpy as np
+
+        return np.bincount(self.whites[:, int(position) - 1], minlength=minlength)
+
+    def powerball_counts(self, minlength: int = 27) -> "np.ndarray":
+        import numpy as np
+
+        return np.bincount(self.powerball, minlength=minlength)
+
+    def date_mask(self, date_from: Optional[str] = None, date_to: Optional[str] = None) -> Optional["np.ndarray"]:
+        """Máscara booleana del rango [date_from, date_to] (inclusive); None = sin filtro."""
+        if not date_from and not date_to:
+            return None
+        mask = self.dates != ""
+        if date_from:
+            mask &= self.dates >= str(date_from)[:10]
+        if date_to:
+            mask &= self.dates <= str(date_to)[:10]
+        return mask
+
+    def position_matrix(self, mask: Optional["np.ndarray"] = None) -> "np.ndarray":
+        """
+        Conteos (6, 70): filas white1..white5 + powerball, columna = número ([:, 0] = faltantes).
+        Un solo np.bincount: cada posición se desplaza 70 lugares y se cuenta todo junto.
+        """
+        import numpy as np
+
+        nums = np.concatenate([self.whites, self.powerball[:, None]], axis=1).astype(np.intp)
+        if mask is not None:
+            nums = nums[mask]
+        # Fuera de rango (dato corrupto) cuenta como faltante para no invadir la fila vecina
+        nums[(nums < 0) | (nums >= 70)] = 0
+        nums += np.arange(6, dtype=np.intp) * 70
+        return np.bincount(nums.ravel(), minlength=6 * 70)[: 6 * 70].reshape(6, 70)
+
+
+def _pick(available: Iterable[str], name: str) -> Optional[str]:
+    lower = {str(c).strip().lower(): c for c in available}
+    for alias in _ALIASES[name]:
+        if alias in lower:
+            return lower[alias]
+    return None
+
+
+def _to_int(v: Any) -> int:
+    if v is None or v == "":
+        return 0
+    try:
+        n = int(float(v))
+    except (TypeError, ValueError):
+        return 0
+    return n if 0 < n < 100 else 0
+
+
+def _norm_date(d: Any) -> Optional[str]:
+    """YYYY-MM-DD; acepta también MM/DD/YYYY (CSV oficial). None si viene vacío."""
+    if d is None or d == "":
+        return None
+    s = str(d).strip()
+    if len(s) >= 10 and s[4] == "-":
+        return s[:10]
+    parts = s.split(" ")[0].split("/")
+    if len(parts) == 3 and len(parts[2]) == 4:
+        try:
+            return f"{int(parts[2]):04d}-{int(parts[0]):02d}-{int(parts[1]):02d}"
+        except ValueError:
+            pass
+    return s[:10]
+
+
+def _build_columns(source: str, version: Tuple, rows: Iterable[Sequence[Any]]) -> DrawColumns:
+    """rows: (draw_date, w1..w5, pb) ya en orden canónico."""
+    import numpy as np
+
+    dates: List[Optional[str]] = []
+    nums: List[List[int]] = []
+    for r in rows:
+        dates.append(_norm_date(r[0]))
+        nums.append([_to_int(x) for x in r[1:7]])
+    arr = np.array(nums, dtype=np.int16).reshape(-1, 6)
+    return DrawColumns(
+        source=source,
+        version=version,
+        draw_date=dates,
+        whites=np.ascontiguousarray(arr[:, :5]),
+        powerball=np.ascontiguousarray(arr[:, 5]),
+        dates=np.array([d or "" for d in dates], dtype="U10"),
+    )
+
+
+def _select_list(mapping: Dict[str, Optional[str]]) -> str:
+    return ", ".join(mapping[c] if mapping[c] else "NULL" for c in COLUMNS)
+
+
+# ------------------------
+# Fuentes
+# ------------------------
+class DrawSource:
+    label: str = "none"
+
+    def available(self) -> bool:
+        raise NotImplementedError
+
+    def version(self) -> Tuple:
+        raise NotImplementedError
+
+    def load(self) -> DrawColumns:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+def file_version(path: Path) -> Tuple:
+    st = path.stat()
+    out: Tuple = (st.st_mtime_ns, st.st_size)
+    wal = path.with_name(path.name + "-wal")
+    if wal.exists():  # SQLite en WAL: los commits viven en -wal hasta el checkpoint
+        ws = wal.stat()
+        out += (ws.st_mtime_ns, ws.st_size)
+    return out
+
+
+class SqliteDrawSource(DrawSource):
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.label = f"sqlite:{self.path}"
+
+    def available(self) -> bool:
+        return self.path.exists()
+
+    def version(self) -> Tuple:
+        return ("sqlite",) + file_version(self.path)
+
+    def load(self) -> DrawColumns:
+        import sqlite3
+
+        version = self.version()
+        conn = sqlite3.connect(str(self.path))
+        try:
+            cols = [r[1] for r in conn.execute("PRAGMA table_info(draws);")]
+            mapping = {c: _pick(cols, c) for c in COLUMNS}
+            if not mapping["white1"]:
+                raise RuntimeError(f"SQLite: tabla 'draws' no tiene white1/ball1/n1. Tiene: {sorted(cols)}")
+            order = f" ORDER BY {mapping['draw_date']}" if mapping["draw_date"] else ""
+            rows = conn.execute(f"SELECT {_select_list(mapping)} FROM draws{order}").fetchall()
+        finally:
+            conn.close()
+        return _build_columns(self.label, version, rows)
+
+
+class CsvDrawSource(DrawSource):
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.label = f"csv:{self.path}"
+
+    def available(self) -> bool:
+        return self.path.exists()
+
+    def version(self) -> Tuple:
+        return ("csv",) + file_version(self.path)
+
+    def load(self) -> DrawColumns:
+        version = self.version()
+        with self.path.open("r", newline="", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if not header:
+                return _build_columns(self.label, version, [])
+            idx = {c: i for i, c in enumerate(header)}
+            mapping = {c: _pick(header, c) for c in COLUMNS}
+            if not mapping["white1"]:
+                raise RuntimeError(f"CSV: no tiene columnas white1/ball1/n1. Tiene: {header}")
+            pos = [idx[mapping[c]] if mapping[c] else None for c in COLUMNS]
+            rows = (
+                [(r[i] if i is not None and i < len(r) else None) for i in pos]
+                for r in reader
+            )
+            return _build_columns(self.label, version, rows)
+
+
+class PostgresDrawSource(DrawSource):
+    label = "DATABASE_URL"
+
+    def __init__(self, db_url: str):
+        self.db_url = db_url
+        self._conn = None  # conexión reutilizada por version(); get_draw_columns la usa bajo _LOCK
+
+    def available(self) -> bool:
+        return (urlparse(self.db_url).scheme or "").lower().startswith("postgres")
+
+    def _driver(self):
+        try:
+            import psycopg2  # type: ignore
+
+            return "psycopg2", psycopg2
+        except ImportError:
+            pass
+        try:
+            import psycopg  # type: ignore
+
+            return "psycopg", psycopg
+        except ImportError as e:
+            raise RuntimeError("DATABASE_URL es Postgres pero no tienes instalado psycopg2 o psycopg.") from e
+
+    def _connect(self):
+        _, mod = self._driver()
+        conn = mod.connect(self.db_url)
+        conn.autocommit = True  # sin transacción abierta entre requests: cada firma ve lo último
+        return conn
+
+    def version(self) -> Tuple:
+        for attempt in (0, 1):
+            if self._conn is None or getattr(self._conn, "closed", False):
+                self._conn = self._connect()
+            try:
+                cur = self._conn.cursor()
+                try:
+                    return _pg_version(cur)
+                finally:
+                    cur.close()
+            except Exception:
+                # conexión rota (reinicio del server, timeout): reconectar una vez
+                self.close()
+                if attempt:
+                    raise
+        raise AssertionError("unreachable")
+
+    def close(self) -> None:
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+    def load(self) -> DrawColumns:
+        name, _ = self._driver()
+        if name == "psycopg2":
+            return _load_from_postgres_psycopg2(self.db_url)
+        return _load_from_postgres_psycopg(self.db_url)
+
+
+def _pg_version(cur) -> Tuple:
+    cur.execute(_PG_VERSION_SQL)
+    last, writes = cur.fetchone()
+    return ("postgres", str(last or ""), int(writes or 0))
+
+
+def _pg_mapping(cur) -> Dict[str, Optional[str]]:
+    cur.execute(
+        "SELECT column_name FROM information_schema.columns "
+        "WHERE table_name = 'draws' AND table_schema = ANY(current_schemas(false))"
+    )
+    cols = [r[0] for r in cur.fetchall()]
+    mapping = {c: _pick(cols, c) for c in COLUMNS}
+    if not mapping["white1"]:
+        raise RuntimeError("Postgres: no encuentro columnas white1/ball1/n1 en draws.")
+    return mapping
+
+
+def _pg_select_sql(mapping: Dict[str, Optional[str]]) -> str:
+    cols = []
+    for c in COLUMNS:
+        src = mapping[c]
+        if not src:
+            cols.append("NULL")
+        elif c == "draw_date":
+            cols.append(f"{src}::text")
+        else:
+            cols.append(src)
+    order = f" ORDER BY {mapping['draw_date']}" if mapping["draw_date"] else ""
+    return f"SELECT {', '.join(cols)} FROM draws{order}"
+
+
+def _parse_copy_csv(buf: io.StringIO) -> List[List[Optional[str]]]:
+    buf.seek(0)
+    return [[v if v != "" else None for v in r] for r in csv.reader(buf)]
+
+
+def _load_from_postgres_psycopg2(db_url: str) -> DrawColumns:
+    import psycopg2  # type: ignore
+
+    src = PostgresDrawSource(db_url)
+    conn = psycopg2.connect(db_url)
+    try:
+        cur = conn.cursor()
+        version = _pg_version(cur)
+        sql = _pg_select_sql(_pg_mapping(cur))
+        try:
+            buf = io.StringIO()
+            cur.copy_expert(f"COPY ({sql}) TO STDOUT WITH (FORMAT csv)", buf)
+            rows: Iterable[Sequence[Any]] = _parse_copy_csv(buf)
+        except Exception:
+            conn.rollback()
+            # Fallback: cursor del lado del servidor, en lotes
+            named = conn.cursor(name="draw_source_load")
+            named.itersize = _PG_BATCH
+            named.execute(sql)
+            rows = list(named)
+            named.close()
+        return _build_columns(src.label, version, rows)
+    finally:
+        conn.close()
+
+
+def _load_from_postgres_psycopg(db_url: str) -> DrawColumns:
+    import psycopg  # type: ignore
+
+    src = PostgresDrawSource(db_url)
+    with psycopg.connect(db_url) as conn:
+        with conn.cursor() as cur:
+            version = _pg_version(cur)
+            sql = _pg_select_sql(_pg_mapping(cur))
+        try:
+            buf = io.StringIO()
+            with conn.cursor() as cur:
+                with cur.copy(f"COPY ({sql}) TO STDOUT WITH (FORMAT csv)") as copy:
+                    for chunk in copy:
+                        buf.write(bytes(chunk).decode("utf-8"))
+            rows: Iterable[Sequence[Any]] = _parse_copy_csv(buf)
+        except Exception:
+            conn.rollback()
+            # Fallback: cursor del lado del servidor, en lotes
+            with conn.cursor(name="draw_source_load") as named:
+                named.itersize = _PG_BATCH
+                named.execute(sql)
+                rows = list(named)
+    return _build_columns(src.label, version, rows)
+
+
+# ------------------------
+# Resolución + caché
+# ------------------------
+_SOURCE_ORDER = {
+    "auto": ("db", "sqlite", "csv"),
+    "db": ("db",),
+    "database": ("db",),
+    "database_url": ("db",),
+    "sqlite": ("sqlite",),
+    "csv": ("csv",),
+}
+
+
+def _candidates(source: str) -> List[DrawSource]:
+    out: List[DrawSource] = []
+    for kind in _SOURCE_ORDER.get(source, ()):
+        if kind == "db":
+            db_url = os.getenv("DATABASE_URL")
+            if db_url:
+                out.append(PostgresDrawSource(db_url))
+        elif kind == "sqlite":
+            out.append(SqliteDrawSource(SQLITE_PATH))
+        elif kind == "csv":
+            out.append(CsvDrawSource(CSV_PATH))
+    return out
+
+
+@dataclass
+class _Resolved:
+    src: DrawSource
+    columns: Optional[DrawColumns] = None
+    errors: List[str] = field(default_factory=list)
+
+
+_LOCK = threading.Lock()
+_RESOLVED: Dict[Tuple[str, str, str, str], _Resolved] = {}
+
+
+def _cache_key(source: str) -> Tuple[str, str, str, str]:
+    # Si cambian DATABASE_URL o las rutas (tests/config) se vuelve a resolver
+    return (source, os.getenv("DATABASE_URL") or "", str(SQLITE_PATH), str(CSV_PATH))
+
+
+def _try_load(src: DrawSource, errors: List[str]) -> Optional[DrawColumns]:
+    if not src.available():
+        return None
+    try:
+        cols = src.load()
+    except Exception as e:
+        errors.append(f"{src.label}: {e}")
+        return None
+    return cols if len(cols) else None
+
+
+def get_draw_columns(source: str = "auto") -> Tuple[Optional[DrawColumns], List[str]]:
+    """
+    Columnas de la primera fuente con datos (cacheadas por versión). -> (columns | None, errores).
+    Los errores de cada fuente probada se devuelven en vez de tragarse en silencio.
+    """
+    source = (source or "auto").lower().strip()
+    key = _cache_key(source)
+    with _LOCK:
+        hit = _RESOLVED.get(key)
+        if hit is not None and hit.columns is not None:
+            try:
+                if hit.src.available() and hit.src.version() == hit.columns.version:
+                    return hit.columns, []
+            except Exception as e:
+                hit.errors = [f"{hit.src.label}: {e}"]
+            cols = _try_load(hit.src, hit.errors)
+            if cols is not None:
+                hit.columns = cols
+                return cols, []
+            _RESOLVED.pop(key, None)  # la fuente resuelta dejó de servir: re-probar el orden completo
+            hit.src.close()
+
+        errors: List[str] = []
+        for src in _candidates(source):
+            cols = _try_load(src, errors)
+            if cols is not None:
+                _RESOLVED[key] = _Resolved(src=src, columns=cols)
+                return cols, errors
+        return None, errors
+
+
+def clear_draw_cache() -> None:
+    with _LOCK:
+        for r in _RESOLVED.values():
+            r.src.close()
+        _RESOLVED.clear()
@@ -5,9 +5,6 @@ from typing import Any, Dict, Optional
 from io import BytesIO
 from starlette.responses import StreamingResponse
 
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-
 router = APIRouter(prefix="/api/export", tags=["export"])
 
 class ExportPdfRequest(BaseModel):
@@ -17,6 +14,10 @@ class ExportPdfRequest(BaseModel):
 
 @router.post("/pdf")
 def export_pdf(req: ExportPdfRequest):
+    # reportlab solo se carga si alguien exporta un PDF
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
     buf = BytesIO()
     c = canvas.Canvas(buf, pagesize=letter)
     w, h = letter
@@ -1,28 +1,25 @@
 from __future__ import annotations
 
-import csv
+import base64
+import functools
 import json
 import os
 import random
 import sqlite3
+from dataclasses import dataclass
 from datetime import datetime
-from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
-from urllib.parse import urlparse
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 
-import pandas as pd
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill
-from openpyxl.utils import get_column_letter
+from src.draw_source import CSV_PATH, SQLITE_PATH, get_draw_columns
+
+# pandas/openpyxl se importan dentro de las funciones de Excel: el import de este módulo (que carga
+# main.py) no debe pagar su costo.
 
 # ------------------------
 # Paths / Defaults
 # ------------------------
 
-PROJECT_ROOT = Path(__file__).resolve().parents[1]  # .../powerball_api
-DATA_DIR = PROJECT_ROOT / "data"
-SQLITE_PATH = DATA_DIR / "powerball.db"
-CSV_PATH = DATA_DIR / "powerball.csv"
+# Rutas y carga de la fuente (DATABASE_URL / SQLite / CSV): src/draw_source.py
 DB_PATH = SQLITE_PATH  # canonical sqlite for this project
 
 
@@ -30,6 +27,26 @@ DB_PATH = SQLITE_PATH  # canonical sqlite for this project
 # EXPORT — First position
 # ------------------------
 
+def _no_data_error(errors: List[str]) -> Dict[str, Any]:
+    return {
+        "status": "error",
+        "error": "NO_DATA",
+        "message": (
+            "No encontré datos para exportar. Probé DATABASE_URL, SQLite y CSV.\n"
+            "Opciones:\n"
+            " - Coloca SQLite en ./data/powerball.db con una tabla 'draws'\n"
+            " - O coloca CSV en ./data/powerball.csv con columna white1/ball1\n"
+            " - O define DATABASE_URL para una DB."
+        ),
+        "meta": {
+            "expected_sqlite": str(SQLITE_PATH),
+            "expected_csv": str(CSV_PATH),
+            "database_url_set": bool(os.getenv("DATABASE_URL")),
+            "errors": errors,
+        },
+    }
+
+
 def export_by_first_position(
     limit: int = 69,
     source: str = "auto",
@@ -38,297 +55,458 @@ def export_by_first_position(
     Devuelve un resumen de frecuencia del "primer número" (white1/ball1)
     de los sorteos de Powerball.
 
-    Estrategia de carga (source="auto"):
+    Estrategia de carga (source="auto"), resuelta una vez y cacheada por versión (src/draw_source.py):
       1) DATABASE_URL (si existe)
       2) SQLite en ./data/powerball.db
       3) CSV en ./data/powerball.csv
     """
+    return export_by_position(1, limit=limit, source=source)
+
+
+def export_by_position(
+    position: int,
+    limit: int = 69,
+    source: str = "auto",
+) -> Dict[str, Any]:
+    """
+    Frecuencia de white{position} (1..5): np.bincount sobre la columna cacheada, sin releer la fuente.
+    """
+    if position not in (1, 2, 3, 4, 5):
+        return {"status": "error", "error": "INVALID_POSITION", "message": "position debe ser 1..5"}
     if limit <= 0:
         limit = 69
 
-    rows, used_source = _load_draw_rows(source)
-
-    if not rows:
-        return {
-            "status": "error",
-            "error": "NO_DATA",
-            "message": (
-                "No encontré datos para exportar. Probé DATABASE_URL, SQLite y CSV.\n"
-                "Opciones:\n"
-                " - Coloca SQLite en ./data/powerball.db con una tabla 'draws'\n"
-                " - O coloca CSV en ./data/powerball.csv con columna white1/ball1\n"
-                " - O define DATABASE_URL para una DB."
-            ),
-            "meta": {
-                "expected_sqlite": str(SQLITE_PATH),
-                "expected_csv": str(CSV_PATH),
-                "database_url_set": bool(os.getenv("DATABASE_URL")),
-            },
-        }
+    cols, errors = get_draw_columns(source)
 
-    counts: Dict[int, int] = {}
-    total = 0
+    if cols is None:
+        return _no_data_error(errors)
 
-    for (white1,) in rows:
-        if white1 is None:
-            continue
-        try:
-            n = int(white1)
-        except Exception:
-            continue
-        counts[n] = counts.get(n, 0) + 1
-        total += 1
+    counts = cols.position_counts(position)
+    counts[0] = 0  # faltantes
+    total = int(counts.sum())
 
     data = []
-    for number in sorted(counts.keys()):
-        c = counts[number]
+    for number in counts.nonzero()[0]:
+        c = int(counts[number])
         pct = round((c / total) * 100, 4) if total else 0.0
-        data.append({"number": number, "count": c, "pct": pct})
+        data.append({"number": int(number), "count": c, "pct": pct})
 
     data_sorted = sorted(data, key=lambda x: x["count"], reverse=True)[:limit]
 
+    if position == 1:
+        note = "Frecuencia del primer número blanco (white1/ball1)."
+    else:
+        note = f"Frecuencia del número blanco en posición {position} (white{position}/ball{position})."
     return {
         "status": "ok",
-        "source": used_source,
+        "source": cols.source,
         "total_draws": total,
         "data": data_sorted,
         "meta": {
             "limit": limit,
-            "note": "Frecuencia del primer número blanco (white1/ball1).",
+            "note": note,
+            "data_version": list(cols.version),
         },
     }
 
 
 # ------------------------
-# Load pipeline (auto)
+# EXPORT — All positions
 # ------------------------
 
-def _load_draw_rows(source: str) -> Tuple[List[Tuple[Optional[int]]], str]:
-    """
-    Retorna lista de tuplas (white1,) y un string con la fuente usada.
+WHITE_MAX = 69
+PB_MAX = 26
+POSITIONS_1_5 = (1, 2, 3, 4, 5)
+
+
+def export_all_positions(
+    source: str = "auto",
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+) -> Dict[str, Any]:
     """
-    source = (source or "auto").lower().strip()
+    Frecuencia de los 69 blancos en las 5 posiciones + powerball en una sola respuesta.
 
-    if source in ("auto", "db", "database", "database_url"):
-        db_url = os.getenv("DATABASE_URL")
-        if db_url:
-            try:
-                rows = _load_from_database_url(db_url)
-                if rows:
-                    return rows, "DATABASE_URL"
-            except Exception:
-                pass
+    matrix[p][n-1] = veces que salió el número n en white{p+1}; pct por posición (sobre los sorteos con
+    esa posición cargada). Un solo np.bincount sobre las columnas cacheadas (DrawColumns.position_matrix);
+    date_from/date_to (YYYY-MM-DD, inclusive) filtran con una máscara, sin volver a la fuente.
+    """
+    import numpy as np
 
-    if source in ("auto", "sqlite"):
-        if SQLITE_PATH.exists():
-            try:
-                rows = _load_from_sqlite(SQLITE_PATH)
-                if rows:
-                    return rows, f"sqlite:{SQLITE_PATH}"
-            except Exception:
-                pass
+    cols, errors = get_draw_columns(source)
+    if cols is None:
+        return _no_data_error(errors)
 
-    if source in ("auto", "csv"):
-        if CSV_PATH.exists():
-            try:
-                rows = _load_from_csv(CSV_PATH)
-                if rows:
-                    return rows, f"csv:{CSV_PATH}"
-            except Exception:
-                pass
+    mask = cols.date_mask(date_from, date_to)
+    counts = cols.position_matrix(mask)
+    whites = counts[:5, 1 : WHITE_MAX + 1]
+    pb = counts[5, 1 : PB_MAX + 1]
 
-    return [], "none"
+    totals = whites.sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pct = np.where(totals[:, None] > 0, whites * 100.0 / totals[:, None], 0.0).round(4)
+    pb_total = int(pb.sum())
+    pb_pct = (pb * 100.0 / pb_total).round(4) if pb_total else np.zeros(PB_MAX)
 
+    return {
+        "status": "ok",
+        "source": cols.source,
+        "total_draws": int(mask.sum()) if mask is not None else len(cols),
+        "positions": [f"white{i}" for i in POSITIONS_1_5],
+        "numbers": list(range(1, WHITE_MAX + 1)),
+        "matrix": whites.tolist(),
+        "pct": pct.tolist(),
+        "totals": totals.tolist(),
+        "powerball": {
+            "numbers": list(range(1, PB_MAX + 1)),
+            "counts": pb.tolist(),
+            "pct": pb_pct.tolist(),
+            "total": pb_total,
+        },
+        "meta": {
+            "date_from": date_from,
+            "date_to": date_to,
+            "note": "matrix[p][n-1] = frecuencia del número n en white{p+1}; pct por posición.",
+            "data_version": list(cols.version),
+        },
+    }
 
-def _sqlite_columns(conn: sqlite3.Connection, table: str) -> List[str]:
-    cur = conn.cursor()
-    cur.execute(f"PRAGMA table_info({table});")
-    return [row[1] for row in cur.fetchall()]
 
+# ------------------------
+# HISTORY — Read-only
+# ------------------------
 
-def _load_from_sqlite(path: Path) -> List[Tuple[Optional[int]]]:
+def list_draws_by_position(position: int, number: int, limit: int = 5000) -> Dict[str, Any]:
     """
-    Espera una tabla 'draws' con alguna columna de primer número:
-      - white1  (preferida)
-      - ball1
-      - n1
+    position: 1..5  (white1..white5)
+    number:   número a filtrar
     """
-    conn = sqlite3.connect(str(path))
-    try:
-        conn.row_factory = sqlite3.Row
-        cols = _sqlite_columns(conn, "draws")
-
-        first_col = None
-        for candidate in ("white1", "ball1", "n1"):
-            if candidate in cols:
-                first_col = candidate
-                break
-
-        if not first_col:
-            raise RuntimeError(
-                f"SQLite: tabla 'draws' no tiene white1/ball1/n1. Tiene: {sorted(cols)}"
-            )
+    if position not in (1, 2, 3, 4, 5):
+        return {"status": "error", "error": "INVALID_POSITION", "message": "position debe ser 1..5"}
 
-        cur = conn.cursor()
-        cur.execute(f"SELECT {first_col} AS white1 FROM draws WHERE {first_col} IS NOT NULL;")
-        rows = [(r["white1"],) for r in cur.fetchall()]
-        return rows
+    conn = sqlite3.connect(str(DB_PATH))
+    try:
+        rows = conn.execute(*_by_position_query(position, number, limit)).fetchall()
     finally:
         conn.close()
+    return _by_position_response(position, number, limit, rows)
 
 
-def _load_from_csv(path: Path) -> List[Tuple[Optional[int]]]:
-    """
-    CSV esperado con header y columna:
-      - white1 (preferida) o ball1 o n1
+def _by_position_query(position: int, number: int, limit: int) -> Tuple[str, Tuple[int, int]]:
+    col = f"white{position}"
+    sql = f"""
+        SELECT draw_date, white1, white2, white3, white4, white5, powerball
+        FROM draws
+        WHERE {col} = ?
+        ORDER BY draw_date ASC
+        LIMIT ?
     """
-    with path.open("r", newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        if not reader.fieldnames:
-            return []
-
-        cols = {c.strip().lower(): c for c in reader.fieldnames}
-        first_key = None
-        for candidate in ("white1", "ball1", "n1"):
-            if candidate in cols:
-                first_key = cols[candidate]
-                break
-
-        if not first_key:
-            raise RuntimeError(f"CSV: no tiene columnas white1/ball1/n1. Tiene: {reader.fieldnames}")
-
-        out: List[Tuple[Optional[int]]] = []
-        for row in reader:
-            raw = row.get(first_key)
-            if raw is None or raw == "":
-                continue
-            try:
-                out.append((int(raw),))
-            except Exception:
-                continue
-        return out
+    return sql, (int(number), int(limit))
+
+
+def _by_position_response(position: int, number: int, limit: int, rows: List[Tuple[Any, ...]]) -> Dict[str, Any]:
+    data: List[Dict[str, Any]] = []
+    for r in rows:
+        data.append({
+            "draw_date": r[0],
+            "white1": r[1],
+            "white2": r[2],
+            "white3": r[3],
+            "white4": r[4],
+            "white5": r[5],
+            "powerball": r[6],
+        })
 
+    return {
+        "status": "ok",
+        "position": position,
+        "number": int(number),
+        "count": len(data),
+        "data": data,
+        "meta": {"limit": int(limit), "db": str(DB_PATH)},
+    }
 
-def _load_from_database_url(db_url: str) -> List[Tuple[Optional[int]]]:
-    """
-    Soporta Postgres con psycopg2 o psycopg (si está instalado).
-    Espera tabla 'draws' con columna white1/ball1/n1.
-    """
-    parsed = urlparse(db_url)
-    scheme = (parsed.scheme or "").lower()
 
-    if scheme.startswith("postgres"):
-        try:
-            import psycopg2  # type: ignore
-            return _load_from_postgres_psycopg2(db_url)
-        except Exception:
-            try:
-                import psycopg  # type: ignore
-                return _load_from_postgres_psycopg(db_url)
-            except Exception as e:
-                raise RuntimeError(
-                    "DATABASE_URL es Postgres pero no tienes instalado psycopg2 o psycopg."
-                ) from e
+def _format_lines(item: Dict[str, Any]) -> str:
+    return (
+        f"{item['draw_date']} | "
+        f"{item['white1']}-{item['white2']}-{item['white3']}-{item['white4']}-{item['white5']} "
+        f"PB:{item['powerball']}"
+    )
 
-    raise RuntimeError(f"DATABASE_URL scheme no soportado: {scheme}")
 
+def _format_lines_score(item: Dict[str, Any]) -> str:
+    return _format_lines(item) + f" | score:{item['score']}"
 
-def _load_from_postgres_psycopg2(db_url: str) -> List[Tuple[Optional[int]]]:
-    import psycopg2  # type: ignore
 
-    conn = psycopg2.connect(db_url)
-    try:
-        cur = conn.cursor()
-        for col in ("white1", "ball1", "n1"):
-            try:
-                cur.execute(f"SELECT {col} AS white1 FROM draws WHERE {col} IS NOT NULL;")
-                rows = cur.fetchall()
-                if rows:
-                    return [(r[0],) for r in rows]
-            except Exception:
-                continue
-        raise RuntimeError("Postgres: no encuentro columnas white1/ball1/n1 en draws.")
-    finally:
-        conn.close()
+def _format_future_line(r: Dict[str, Any]) -> str:
+    return (
+        f"{r['draw_date'] or 'NULL'} | {r['white1']}-{r['white2']}-{r['white3']}-{r['white4']}-{r['white5']} "
+        f"PB:{r['powerball']} | id={r['id']}"
+    )
 
 
-def _load_from_postgres_psycopg(db_url: str) -> List[Tuple[Optional[int]]]:
-    import psycopg  # type: ignore
+def _format_future_line_score(r: Dict[str, Any]) -> str:
+    return f"score={r['score']} | " + _format_future_line(r)
 
-    with psycopg.connect(db_url) as conn:
-        with conn.cursor() as cur:
-            for col in ("white1", "ball1", "n1"):
-                try:
-                    cur.execute(f"SELECT {col} AS white1 FROM draws WHERE {col} IS NOT NULL;")
-                    rows = cur.fetchall()
-                    if rows:
-                        return [(r[0],) for r in rows]
-                except Exception:
-                    continue
-    raise RuntimeError("Postgres: no encuentro columnas white1/ball1/n1 en draws.")
 
+_STREAM_BATCH = 1000
 
 # ------------------------
-# HISTORY — Read-only
+# Keyset pagination
 # ------------------------
+# Orden total de los listados: (sort_col, draw_date, rowid). Cada SELECT agrega "rowid AS _rowid" como
+# última columna (oculta: _list_response la recorta) para poder armar el cursor de la siguiente página.
+# El cursor es opaco (base64url de JSON) y va atado a sort + direction; los filtros deben ser los mismos.
 
-def list_draws_by_position(position: int, number: int, limit: int = 5000) -> Dict[str, Any]:
+_KEYSET_INDEXES = {
+    "draws": ["draw_date", "white1", "white2", "white3", "white4", "white5", "powerball"],
+    # future_draws recibe inserts seguido: solo los órdenes por defecto
+    "future_draws": ["created_at", "draw_date"],
+}
+_KEYSET_INDEXED: set = set()
+
+
+def _ensure_keyset_indexes() -> None:
     """
-    position: 1..5  (white1..white5)
-    number:   número a filtrar
+    Índices (col, draw_date) para que cada página sea un seek; rowid va implícito al final.
+    Se llama donde se ejecuta el SQL (threadpool o hilo lector), no en los builders: la versión async
+    arma el plan en el event loop.
     """
-    if position not in (1, 2, 3, 4, 5):
-        return {"status": "error", "error": "INVALID_POSITION", "message": "position debe ser 1..5"}
+    db = str(DB_PATH)
+    if db in _KEYSET_INDEXED:
+        return
+    conn = sqlite3.connect(db)
+    try:
+        for table, cols in _KEYSET_INDEXES.items():
+            for col in cols:
+                on = col if col == "draw_date" else f"{col}, draw_date"
+                try:
+                    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_keyset_{col} ON {table} ({on})")
+                except sqlite3.OperationalError:
+                    break  # tabla inexistente (DB vacía/otra fuente)
+        conn.commit()
+    finally:
+        conn.close()
+    _KEYSET_INDEXED.add(db)
 
-    col = f"white{position}"
 
-    conn = sqlite3.connect(str(DB_PATH))
+class InvalidCursor(ValueError):
+    pass
+
+
+def _encode_cursor(sort_col: str, direction: str, key: List[Any]) -> str:
+    raw = json.dumps({"s": sort_col, "d": direction, "k": key}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str, sort_col: str, direction: str) -> List[Any]:
     try:
-        cur = conn.cursor()
-        cur.execute(
-            f"""
-            SELECT draw_date, white1, white2, white3, white4, white5, powerball
-            FROM draws
-            WHERE {col} = ?
-            ORDER BY draw_date ASC
-            LIMIT ?
-            """,
-            (int(number), int(limit)),
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        obj = json.loads(raw)
+        key = obj["k"]
+        if not isinstance(key, list) or len(key) != 3 or not isinstance(key[2], int):
+            raise ValueError
+    except Exception:
+        raise InvalidCursor("cursor inválido.")
+    if obj.get("s") != sort_col or obj.get("d") != direction:
+        raise InvalidCursor(
+            f"cursor generado con sort={obj.get('s')} direction={obj.get('d')}; "
+            f"esta consulta usa sort={sort_col} direction={direction}."
         )
-        rows = cur.fetchall()
+    return key
 
-        data: List[Dict[str, Any]] = []
-        for r in rows:
-            data.append({
-                "draw_date": r[0],
-                "white1": r[1],
-                "white2": r[2],
-                "white3": r[3],
-                "white4": r[4],
-                "white5": r[5],
-                "powerball": r[6],
-            })
 
-        return {
-            "status": "ok",
-            "position": position,
-            "number": int(number),
-            "count": len(data),
-            "data": data,
-            "meta": {"limit": int(limit), "db": str(DB_PATH)},
-        }
+def _keyset_cols(sort_col: str, rid: str) -> List[str]:
+    return [sort_col] + (["draw_date"] if sort_col != "draw_date" else []) + [rid]
+
+
+def _keyset_after(cols: List[str], vals: List[Any], desc: bool) -> Tuple[str, List[Any]]:
+    """
+    Condición "fila posterior a vals" en el orden (cols..., rowid), respetando NULLs de SQLite
+    (NULL primero en ASC, último en DESC). El término de rango sobre la primera columna permite el seek.
+    """
+    op = "<" if desc else ">"
+    expr = f"{cols[-1]} {op} ?"
+    params: List[Any] = [vals[-1]]
+    for col, val in zip(reversed(cols[:-1]), reversed(vals[:-1])):
+        if val is None:
+            expr = f"({col} IS NULL AND {expr})" if desc else f"({col} IS NOT NULL OR ({col} IS NULL AND {expr}))"
+        else:
+            null_tail = f" OR {col} IS NULL" if desc else ""
+            expr = f"({col} {op} ?{null_tail} OR ({col} = ? AND {expr}))"
+            params = [val, val] + params
+    lead, lead_val = cols[0], vals[0]
+    if lead_val is not None:
+        seek = f"({lead} <= ? OR {lead} IS NULL)" if desc else f"{lead} >= ?"
+        return f"{seek} AND {expr}", [lead_val] + params
+    return expr, params
+
+
+def _keyset_page(
+    cursor: Optional[str], sort_col: str, direction: str, rid: str = "rowid"
+) -> Tuple[Optional[str], List[Any], str]:
+    """-> (condición WHERE o None, params, "ORDER BY ..."). Lanza InvalidCursor."""
+    desc = direction.lower() == "desc"
+    cols = _keyset_cols(sort_col, rid)
+    d = "DESC" if desc else "ASC"
+    order_sql = "ORDER BY " + ", ".join(f"{c} {d}" for c in cols)
+    if not cursor:
+        return None, [], order_sql
+    sv, dd, rowid = _decode_cursor(cursor, sort_col, direction.lower())
+    vals = [sv] + ([dd] if sort_col != "draw_date" else []) + [rowid]
+    where, params = _keyset_after(cols, vals, desc)
+    return where, params, order_sql
+
+
+def _invalid_cursor(e: InvalidCursor) -> Dict[str, Any]:
+    return {"status": "error", "error": "INVALID_CURSOR", "message": str(e)}
+
+
+def _next_cursor(cols_all: List[str], row: Tuple[Any, ...], sort_col: str, direction: str) -> str:
+    sv = row[cols_all.index(sort_col)]
+    dd = row[cols_all.index("draw_date")]
+    return _encode_cursor(sort_col, direction.lower(), [sv, dd, int(row[-1])])
+
+
+class _RowStream:
+    """
+    Filas como dict leídas en lotes (fetchmany), hasta `limit`. La conexión se abre al empezar a iterar:
+    con StreamingResponse eso ocurre en el threadpool, por eso check_same_thread=False.
+    Al terminar, `trailer` trae has_more/next_cursor para la última línea del NDJSON.
+    """
+
+    def __init__(self, sql: str, params: List[Any], limit: int, sort_col: str, direction: str,
+                 batch: int = _STREAM_BATCH):
+        self._sql, self._params, self._limit = sql, params, int(limit)
+        self._sort_col, self._direction, self._batch = sort_col, direction, batch
+        self.trailer: Dict[str, Any] = {}
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        _ensure_keyset_indexes()
+        conn = sqlite3.connect(str(DB_PATH), check_same_thread=False)
+        try:
+            cur = conn.execute(self._sql, self._params)
+            cols_all = [d[0] for d in cur.description]
+            cols = cols_all[:-1]
+            sent = 0
+            last = None
+            has_more = False
+            while not has_more:
+                chunk = cur.fetchmany(self._batch)
+                if not chunk:
+                    break
+                for r in chunk:
+                    if sent >= self._limit:
+                        has_more = True
+                        break
+                    last = r
+                    sent += 1
+                    yield dict(zip(cols, r))
+            self.trailer = {
+                "has_more": has_more,
+                "next_cursor": _next_cursor(cols_all, last, self._sort_col, self._direction) if has_more else None,
+            }
+        finally:
+            conn.close()
+
+
+def _list_response(
+    sql: str,
+    params: List[Any],
+    resp: Dict[str, Any],
+    output: str,
+    line_fn: Callable[[Dict[str, Any]], str],
+    *,
+    limit: int,
+    sort_col: str,
+    direction: str,
+) -> Dict[str, Any]:
+    """
+    Ejecuta `sql` (que trae LIMIT limit+1 y _rowid como última columna) y completa `resp` según `output`:
+      json     -> data: [{col: val}, ...]
+      lines    -> lines: ["...", ...]  (solo las líneas; no arma data en paralelo)
+      columnar -> columns: {col: [val, ...]}  (un array por columna)
+      ndjson   -> stream: filas para StreamingResponse (sin count; has_more/next_cursor al final)
+    Siempre agrega has_more + next_cursor (keyset) salvo en ndjson.
+    """
+    fmt = (output or "json").lower().strip()
+    if fmt == "ndjson":
+        resp.pop("count", None)
+        resp["stream"] = _RowStream(sql, params, limit, sort_col, direction)
+        return resp
+
+    _ensure_keyset_indexes()
+    conn = sqlite3.connect(str(DB_PATH))
+    try:
+        cur = conn.execute(sql, params)
+        cols_all = [d[0] for d in cur.description]
+        rows = cur.fetchall()
     finally:
         conn.close()
+    return _fill_list_response(resp, fmt, cols_all, rows, line_fn, limit=limit, sort_col=sort_col, direction=direction)
+
+
+def _fill_list_response(
+    resp: Dict[str, Any],
+    fmt: str,
+    cols_all: List[str],
+    rows: List[Tuple[Any, ...]],
+    line_fn: Callable[[Dict[str, Any]], str],
+    *,
+    limit: int,
+    sort_col: str,
+    direction: str,
+) -> Dict[str, Any]:
+    has_more = len(rows) > int(limit)
+    if has_more:
+        rows = rows[: int(limit)]
+    cols = cols_all[:-1]  # sin _rowid
+
+    resp["count"] = len(rows)
+    if fmt == "lines":
+        resp["lines"] = [line_fn(dict(zip(cols, r))) for r in rows]
+    elif fmt == "columnar":
+        by_col = list(zip(*rows)) if rows else [()] * len(cols)
+        resp["columns"] = {c: list(v) for c, v in zip(cols, by_col)}
+    else:
+        resp["data"] = [dict(zip(cols, r)) for r in rows]
+    resp["has_more"] = has_more
+    resp["next_cursor"] = _next_cursor(cols_all, rows[-1], sort_col, direction) if has_more else None
+    return resp
 
 
-def _format_lines(item: Dict[str, Any]) -> str:
-    return (
-        f"{item['draw_date']} | "
-        f"{item['white1']}-{item['white2']}-{item['white3']}-{item['white4']}-{item['white5']} "
-        f"PB:{item['powerball']}"
-    )
+@dataclass
+class _ListPlan:
+    """Consulta ya armada por un list_*: la ejecuta _list_response (sync) o src/async_db.py (async)."""
+    sql: str
+    params: List[Any]
+    resp: Dict[str, Any]
+    output: str
+    line_fn: Callable[[Dict[str, Any]], str]
+    limit: int
+    sort_col: str
+    direction: str
 
 
+def _planned(build: Callable[..., Any]) -> Callable[..., Dict[str, Any]]:
+    """
+    list_* síncrono a partir de su builder (que devuelve _ListPlan o un dict de error).
+    El builder queda en .plan: la versión async arma la misma consulta y solo cambia quién la ejecuta.
+    """
+    @functools.wraps(build)
+    def run(*args: Any, **kwargs: Any) -> Dict[str, Any]:
+        plan = build(*args, **kwargs)
+        if not isinstance(plan, _ListPlan):
+            return plan
+        return _list_response(plan.sql, plan.params, plan.resp, plan.output, plan.line_fn,
+                              limit=plan.limit, sort_col=plan.sort_col, direction=plan.direction)
+
+    run.plan = build  # type: ignore[attr-defined]
+    return run
+
+
+@_planned
 def list_draws_filtered(
     white1: Optional[int] = None,
     white2: Optional[int] = None,
@@ -342,8 +520,9 @@ def list_draws_filtered(
     sort: str = "draw_date",
     direction: str = "asc",
     limit: int = 5000,
-    output: str = "json",  # "json" | "lines"
-) -> Dict[str, Any]:
+    output: str = "json",  # "json" | "lines" | "columnar" | "ndjson"
+    cursor: Optional[str] = None,
+) -> _ListPlan | Dict[str, Any]:
 
     where: List[str] = []
     params: List[Any] = []
@@ -390,68 +569,49 @@ def list_draws_filtered(
     order_col = allowed_sort.get((sort or "").lower(), "draw_date")
     dir_sql = "DESC" if (direction or "").lower() == "desc" else "ASC"
 
+    try:
+        keyset_where, keyset_params, order_sql = _keyset_page(cursor, order_col, dir_sql)
+    except InvalidCursor as e:
+        return _invalid_cursor(e)
+    if keyset_where:
+        where.append(keyset_where)
+        params.extend(keyset_params)
+
     sql = """
-        SELECT draw_date, white1, white2, white3, white4, white5, powerball
+        SELECT draw_date, white1, white2, white3, white4, white5, powerball, rowid AS _rowid
         FROM draws
     """
     if where:
         sql += " WHERE " + " AND ".join(where)
 
-    sql += f" ORDER BY {order_col} {dir_sql} LIMIT ?"
-    params.append(int(limit))
+    sql += f" {order_sql} LIMIT ?"
+    params.append(int(limit) + 1)
 
-    conn = sqlite3.connect(str(DB_PATH))
-    try:
-        cur = conn.cursor()
-        cur.execute(sql, params)
-        rows = cur.fetchall()
-
-        data: List[Dict[str, Any]] = []
-        lines: List[str] = []
-
-        for r in rows:
-            item = {
-                "draw_date": r[0],
-                "white1": r[1],
-                "white2": r[2],
-                "white3": r[3],
-                "white4": r[4],
-                "white5": r[5],
-                "powerball": r[6],
-            }
-            data.append(item)
-            lines.append(_format_lines(item))
-
-        resp: Dict[str, Any] = {
-            "status": "ok",
-            "count": len(data),
-            "filters": {
-                "white1": white1,
-                "white2": white2,
-                "white3": white3,
-                "white4": white4,
-                "white5": white5,
-                "powerball": powerball,
-                "date_from": date_from,
-                "date_to": date_to,
-                "complete": complete,
-                "sort": order_col,
-                "direction": dir_sql.lower(),
-                "output": output,
-            },
-            "meta": {"limit": int(limit), "db": str(DB_PATH)},
-        }
-
-        if (output or "").lower() == "lines":
-            resp["lines"] = lines
-        else:
-            resp["data"] = data
-
-        return resp
-    finally:
-        conn.close()
+    resp: Dict[str, Any] = {
+        "status": "ok",
+        "count": 0,
+        "filters": {
+            "white1": white1,
+            "white2": white2,
+            "white3": white3,
+            "white4": white4,
+            "white5": white5,
+            "powerball": powerball,
+            "date_from": date_from,
+            "date_to": date_to,
+            "complete": complete,
+            "sort": order_col,
+            "direction": dir_sql.lower(),
+            "output": output,
+        },
+        "meta": {"limit": int(limit), "db": str(DB_PATH)},
+    }
+    return _ListPlan(
+        sql, params, resp, output, _format_lines, limit=limit, sort_col=order_col, direction=dir_sql
+    )
 
 
+@_planned
 def list_draws_filtered_or(
     white1: Optional[int] = None,
     white2: Optional[int] = None,
@@ -465,8 +625,9 @@ def list_draws_filtered_or(
     sort: str = "draw_date",
     direction: str = "asc",
     limit: int = 5000,
-    output: str = "json",  # "json" | "lines"
-) -> Dict[str, Any]:
+    output: str = "json",  # "json" | "lines" | "columnar" | "ndjson"
+    cursor: Optional[str] = None,
+) -> _ListPlan | Dict[str, Any]:
 
     ors: List[str] = []
     params: List[Any] = []
@@ -517,69 +678,50 @@ def list_draws_filtered_or(
     order_col = allowed_sort.get((sort or "").lower(), "draw_date")
     dir_sql = "DESC" if (direction or "").lower() == "desc" else "ASC"
 
+    try:
+        keyset_where, keyset_params, order_sql = _keyset_page(cursor, order_col, dir_sql)
+    except InvalidCursor as e:
+        return _invalid_cursor(e)
+    if keyset_where:
+        where.append(keyset_where)
+        params.extend(keyset_params)
+
     sql = """
-        SELECT draw_date, white1, white2, white3, white4, white5, powerball
+        SELECT draw_date, white1, white2, white3, white4, white5, powerball, rowid AS _rowid
         FROM draws
     """
     if where:
         sql += " WHERE " + " AND ".join(where)
 
-    sql += f" ORDER BY {order_col} {dir_sql} LIMIT ?"
-    params.append(int(limit))
+    sql += f" {order_sql} LIMIT ?"
+    params.append(int(limit) + 1)
 
-    conn = sqlite3.connect(str(DB_PATH))
-    try:
-        cur = conn.cursor()
-        cur.execute(sql, params)
-        rows = cur.fetchall()
-
-        data: List[Dict[str, Any]] = []
-        lines: List[str] = []
-
-        for r in rows:
-            item = {
-                "draw_date": r[0],
-                "white1": r[1],
-                "white2": r[2],
-                "white3": r[3],
-                "white4": r[4],
-                "white5": r[5],
-                "powerball": r[6],
-            }
-            data.append(item)
-            lines.append(_format_lines(item))
-
-        resp: Dict[str, Any] = {
-            "status": "ok",
-            "count": len(data),
-            "mode": "or",
-            "filters": {
-                "white1": white1,
-                "white2": white2,
-                "white3": white3,
-                "white4": white4,
-                "white5": white5,
-                "powerball": powerball,
-                "date_from": date_from,
-                "date_to": date_to,
-                "complete": complete,
-                "sort": order_col,
-                "direction": dir_sql.lower(),
-                "output": output,
-            },
-            "meta": {"limit": int(limit), "db": str(DB_PATH)},
-        }
-
-        if (output or "").lower() == "lines":
-            resp["lines"] = lines
-        else:
-            resp["data"] = data
-
-        return resp
-    finally:
-        conn.close()
+    resp: Dict[str, Any] = {
+        "status": "ok",
+        "count": 0,
+        "mode": "or",
+        "filters": {
+            "white1": white1,
+            "white2": white2,
+            "white3": white3,
+            "white4": white4,
+            "white5": white5,
+            "powerball": powerball,
+            "date_from": date_from,
+            "date_to": date_to,
+            "complete": complete,
+            "sort": order_col,
+            "direction": dir_sql.lower(),
+            "output": output,
+        },
+        "meta": {"limit": int(limit), "db": str(DB_PATH)},
+    }
+    return _ListPlan(
+        sql, params, resp, output, _format_lines, limit=limit, sort_col=order_col, direction=dir_sql
+    )
 
 
+@_planned
 def list_draws_filtered_atleast(
     white1: Optional[int] = None,
     white2: Optional[int] = None,
@@ -594,8 +736,9 @@ def list_draws_filtered_atleast(
     sort: str = "score",
     direction: str = "desc",
     limit: int = 5000,
-    output: str = "json",  # "json" | "lines"
-) -> Dict[str, Any]:
+    output: str = "json",  # "json" | "lines" | "columnar" | "ndjson"
+    cursor: Optional[str] = None,
+) -> _ListPlan | Dict[str, Any]:
 
     checks: List[str] = []
     params_score: List[Any] = []
@@ -651,20 +794,25 @@ def list_draws_filtered_atleast(
     order_col = allowed_sort.get((sort or "").lower(), "score")
     dir_sql = "DESC" if (direction or "").lower() == "desc" else "ASC"
 
+    try:
+        keyset_where, keyset_params, order_sql = _keyset_page(cursor, order_col, dir_sql, rid="_rowid")
+    except InvalidCursor as e:
+        return _invalid_cursor(e)
+
     inner_sql = f"""
         SELECT
             draw_date, white1, white2, white3, white4, white5, powerball,
-            ({score_expr}) AS score
+            ({score_expr}) AS score, rowid AS _rowid
         FROM draws
     """
     if where:
         inner_sql += " WHERE " + " AND ".join(where)
 
     sql = f"""
-        SELECT draw_date, white1, white2, white3, white4, white5, powerball, score
+        SELECT draw_date, white1, white2, white3, white4, white5, powerball, score, _rowid
         FROM ({inner_sql})
-        WHERE score >= ?
-        ORDER BY {order_col} {dir_sql}
+        WHERE score >= ?{" AND " + keyset_where if keyset_where else ""}
+        {order_sql}
         LIMIT ?
     """
 
@@ -672,61 +820,33 @@ def list_draws_filtered_atleast(
     params.extend(params_score)
     params.extend(params_where)
     params.append(int(min_match))
-    params.append(int(limit))
-
-    conn = sqlite3.connect(str(DB_PATH))
-    try:
-        cur = conn.cursor()
-        cur.execute(sql, params)
-        rows = cur.fetchall()
+    params.extend(keyset_params)
+    params.append(int(limit) + 1)
 
-        data: List[Dict[str, Any]] = []
-        lines: List[str] = []
-
-        for r in rows:
-            item = {
-                "draw_date": r[0],
-                "white1": r[1],
-                "white2": r[2],
-                "white3": r[3],
-                "white4": r[4],
-                "white5": r[5],
-                "powerball": r[6],
-                "score": r[7],
-            }
-            data.append(item)
-            lines.append(_format_lines(item) + f" | score:{item['score']}")
-
-        resp: Dict[str, Any] = {
-            "status": "ok",
-            "count": len(data),
-            "mode": "atleast",
-            "filters": {
-                "white1": white1,
-                "white2": white2,
-                "white3": white3,
-                "white4": white4,
-                "white5": white5,
-                "powerball": powerball,
-                "min_match": int(min_match),
-                "date_from": date_from,
-                "date_to": date_to,
-                "complete": complete,
-                "sort": order_col,
-                "direction": dir_sql.lower(),
-                "output": output,
-            },
-            "meta": {"limit": int(limit), "db": str(DB_PATH)},
-        }
-
-        if (output or "").lower() == "lines":
-            resp["lines"] = lines
-        else:
-            resp["data"] = data
-
-        return resp
-    finally:
-        conn.close()
+    resp: Dict[str, Any] = {
+        "status": "ok",
+        "count": 0,
+        "mode": "atleast",
+        "filters": {
+            "white1": white1,
+            "white2": white2,
+            "white3": white3,
+            "white4": white4,
+            "white5": white5,
+            "powerball": powerball,
+            "min_match": int(min_match),
+            "date_from": date_from,
+            "date_to": date_to,
+            "complete": complete,
+            "sort": order_col,
+            "direction": dir_sql.lower(),
+            "output": output,
+        },
+        "meta": {"limit": int(limit), "db": str(DB_PATH)},
+    }
+    return _ListPlan(
+        sql, params, resp, output, _format_lines_score, limit=limit, sort_col=order_col, direction=dir_sql
+    )
 
 
 # ------------------------
@@ -811,6 +931,7 @@ def create_future_quickpicks(
     }
 
 
+@_planned
 def list_future_filtered(
     white1: Optional[int] = None,
     white2: Optional[int] = None,
@@ -825,7 +946,8 @@ def list_future_filtered(
     sort: str = "created_at",
     direction: str = "desc",
     limit: int = 200,
-) -> Dict[str, Any]:
+    cursor: Optional[str] = None,
+) -> _ListPlan | Dict[str, Any]:
     direction = _normalize_sort_direction(direction)
     sort = (sort or "created_at").strip()
     if sort not in _allowed_sort_fields_future():
@@ -856,41 +978,32 @@ def list_future_filtered(
     if int(complete) == 1:
         where.append("white1 IS NOT NULL AND white2 IS NOT NULL AND white3 IS NOT NULL AND white4 IS NOT NULL AND white5 IS NOT NULL AND powerball IS NOT NULL")
 
+    try:
+        keyset_where, keyset_params, order_sql = _keyset_page(cursor, sort, direction)
+    except InvalidCursor as e:
+        return _invalid_cursor(e)
+    if keyset_where:
+        where.append(keyset_where)
+        params.extend(keyset_params)
+
     where_sql = ("WHERE " + " AND ".join(where)) if where else ""
 
     sql = f"""
-    SELECT id, draw_date, white1, white2, white3, white4, white5, powerball, created_at, meta
+    SELECT id, draw_date, white1, white2, white3, white4, white5, powerball, created_at, meta, rowid AS _rowid
     FROM future_draws
     {where_sql}
-    ORDER BY {sort} {direction}
+    {order_sql}
     LIMIT ?
     """
-    params.append(int(limit))
+    params.append(int(limit) + 1)
 
-    con = sqlite3.connect(str(DB_PATH))
-    con.row_factory = sqlite3.Row
-    cur = con.cursor()
-    rows = cur.execute(sql, params).fetchall()
-    con.close()
-
-    data = [dict(r) for r in rows]
-
-    resp: Dict[str, Any] = {
-        "status": "ok",
-        "count": len(data),
-        "data": data,
-    }
-
-    if (output or "").lower() == "lines":
-        resp.pop("data", None)
-        resp["lines"] = [
-            f"{r['draw_date'] or 'NULL'} | {r['white1']}-{r['white2']}-{r['white3']}-{r['white4']}-{r['white5']} PB:{r['powerball']} | id={r['id']}"
-            for r in data
-        ]
-
-    return resp
+    resp: Dict[str, Any] = {"status": "ok", "count": 0}
+    return _ListPlan(
+        sql, params, resp, output, _format_future_line, limit=limit, sort_col=sort, direction=direction
+    )
 
 
+@_planned
 def list_future_filtered_or(
     white1: Optional[int] = None,
     white2: Optional[int] = None,
@@ -903,7 +1016,8 @@ def list_future_filtered_or(
     sort: str = "created_at",
     direction: str = "desc",
     limit: int = 200,
-) -> Dict[str, Any]:
+    cursor: Optional[str] = None,
+) -> _ListPlan | Dict[str, Any]:
     direction = _normalize_sort_direction(direction)
     sort = (sort or "created_at").strip()
     if sort not in _allowed_sort_fields_future():
@@ -932,37 +1046,32 @@ def list_future_filtered_or(
     if int(complete) == 1:
         where.append("white1 IS NOT NULL AND white2 IS NOT NULL AND white3 IS NOT NULL AND white4 IS NOT NULL AND white5 IS NOT NULL AND powerball IS NOT NULL")
 
+    try:
+        keyset_where, keyset_params, order_sql = _keyset_page(cursor, sort, direction)
+    except InvalidCursor as e:
+        return _invalid_cursor(e)
+    if keyset_where:
+        where.append(keyset_where)
+        params.extend(keyset_params)
+
     where_sql = "WHERE " + " AND ".join(where)
 
     sql = f"""
-    SELECT id, draw_date, white1, white2, white3, white4, white5, powerball, created_at, meta
+    SELECT id, draw_date, white1, white2, white3, white4, white5, powerball, created_at, meta, rowid AS _rowid
     FROM future_draws
     {where_sql}
-    ORDER BY {sort} {direction}
+    {order_sql}
     LIMIT ?
     """
-    params.append(int(limit))
-
-    con = sqlite3.connect(str(DB_PATH))
-    con.row_factory = sqlite3.Row
-    cur = con.cursor()
-    rows = cur.execute(sql, params).fetchall()
-    con.close()
-
-    data = [dict(r) for r in rows]
+    params.append(int(limit) + 1)
 
-    resp: Dict[str, Any] = {"status": "ok", "count": len(data), "data": data}
-
-    if (output or "").lower() == "lines":
-        resp.pop("data", None)
-        resp["lines"] = [
-            f"{r['draw_date'] or 'NULL'} | {r['white1']}-{r['white2']}-{r['white3']}-{r['white4']}-{r['white5']} PB:{r['powerball']} | id={r['id']}"
-            for r in data
-        ]
-
-    return resp
+    resp: Dict[str, Any] = {"status": "ok", "count": 0}
+    return _ListPlan(
+        sql, params, resp, output, _format_future_line, limit=limit, sort_col=sort, direction=direction
+    )
 
 
+@_planned
 def list_future_filtered_atleast(
     white1: Optional[int] = None,
     white2: Optional[int] = None,
@@ -976,7 +1085,8 @@ def list_future_filtered_atleast(
     sort: str = "score",
     direction: str = "desc",
     limit: int = 200,
-) -> Dict[str, Any]:
+    cursor: Optional[str] = None,
+) -> _ListPlan | Dict[str, Any]:
     direction = _normalize_sort_direction(direction)
     sort = (sort or "score").strip()
     if sort not in _allowed_sort_fields_future():
@@ -1017,40 +1127,32 @@ def list_future_filtered_atleast(
 
     base_where_sql = ("WHERE " + " AND ".join(base_where)) if base_where else ""
 
+    try:
+        keyset_where, keyset_params, order_sql = _keyset_page(cursor, sort, direction, rid="_rowid")
+    except InvalidCursor as e:
+        return _invalid_cursor(e)
+
     sql = f"""
     SELECT *
     FROM (
       SELECT
         id, draw_date, white1, white2, white3, white4, white5, powerball, created_at, meta,
-        ({score_expr}) AS score
+        ({score_expr}) AS score, rowid AS _rowid
       FROM future_draws
       {base_where_sql}
     ) t
-    WHERE score >= ?
-    ORDER BY {sort} {direction}
+    WHERE score >= ?{" AND " + keyset_where if keyset_where else ""}
+    {order_sql}
     LIMIT ?
     """
     params.append(int(min_match))
-    params.append(int(limit))
-
-    con = sqlite3.connect(str(DB_PATH))
-    con.row_factory = sqlite3.Row
-    cur = con.cursor()
-    rows = cur.execute(sql, params).fetchall()
-    con.close()
-
-    data = [dict(r) for r in rows]
-
-    resp: Dict[str, Any] = {"status": "ok", "count": len(data), "data": data}
+    params.extend(keyset_params)
+    params.append(int(limit) + 1)
 
-    if (output or "").lower() == "lines":
-        resp.pop("data", None)
-        resp["lines"] = [
-            f"score={r['score']} | {r['draw_date'] or 'NULL'} | {r['white1']}-{r['white2']}-{r['white3']}-{r['white4']}-{r['white5']} PB:{r['powerball']} | id={r['id']}"
-            for r in data
-        ]
-
-    return resp
+    resp: Dict[str, Any] = {"status": "ok", "count": 0}
+    return _ListPlan(
+        sql, params, resp, output, _format_future_line_score, limit=limit, sort_col=sort, direction=direction
+    )
 
 
 # ------------------------
@@ -1081,6 +1183,7 @@ def import_future_from_excel(
       - Canonicaliza whites (orden asc).
       - Reporta invalid_rows y errors_preview.
     """
+    import pandas as pd
 
     def _default_db_path() -> str:
         here = os.path.dirname(os.path.abspath(__file__))
@@ -1498,18 +1601,20 @@ def create_future_quickpicks_unique(
 # XLSX Export (Option B)
 # ------------------------
 
-_XLSX_HEADER_FONT = Font(bold=True)
-_XLSX_GRAY_FILL = PatternFill(start_color="EEEEEE", end_color="EEEEEE", fill_type="solid")
-
-
 def _xlsx_write_headers(ws, row: int, headers: List[str]) -> None:
+    from openpyxl.styles import Font, PatternFill
+
+    header_font = Font(bold=True)
+    gray_fill = PatternFill(start_color="EEEEEE", end_color="EEEEEE", fill_type="solid")
     for i, h in enumerate(headers, start=1):
         cell = ws.cell(row=row, column=i, value=h)
-        cell.font = _XLSX_HEADER_FONT
-        cell.fill = _XLSX_GRAY_FILL
+        cell.font = header_font
+        cell.fill = gray_fill
 
 
 def _xlsx_set_width(ws, col: int, width: int) -> None:
+    from openpyxl.utils import get_column_letter
+
     ws.column_dimensions[get_column_letter(col)].width = width
 
 
@@ -1522,6 +1627,8 @@ def export_first_position_xlsx(
     Builds an XLSX export for First Position Frequency.
     Returns: output_path
     """
+    from openpyxl import Workbook
+
     if limit <= 0:
         limit = 69
 
@@ -1585,3 +1692,88 @@ def export_first_position_xlsx(
     out = output_path or "powerball_first_position_export.xlsx"
     wb.save(out)
     return out
+
+
+def _xlsx_header_row(ws, headers: List[str]) -> List[Any]:
+    """Fila de encabezados para hojas write_only (no hay ws.cell(); se estiliza con WriteOnlyCell)."""
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font, PatternFill
+
+    header_font = Font(bold=True)
+    gray_fill = PatternFill(start_color="EEEEEE", end_color="EEEEEE", fill_type="solid")
+    row = []
+    for h in headers:
+        cell = WriteOnlyCell(ws, value=h)
+        cell.font = header_font
+        cell.fill = gray_fill
+        row.append(cell)
+    return row
+
+
+def export_all_positions_xlsx(
+    source: str = "auto",
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    output_path: Optional[str] = None,
+) -> str:
+    """
+    XLSX multi-hoja de export_all_positions: COUNTS, PCT, POWERBALL, META.
+    Workbook(write_only=True): las filas se escriben en streaming a un temp file, sin árbol de celdas en memoria.
+    Returns: output_path
+    """
+    from openpyxl import Workbook
+
+    payload = export_all_positions(source=source, date_from=date_from, date_to=date_to)
+    out = output_path or "powerball_all_positions_export.xlsx"
+
+    wb = Workbook(write_only=True)
+
+    if payload.get("status") != "ok":
+        ws = wb.create_sheet("ERROR")
+        _xlsx_set_width(ws, 1, 14)
+        _xlsx_set_width(ws, 2, 18)
+        _xlsx_set_width(ws, 3, 90)
+        ws.append(_xlsx_header_row(ws, ["status", "error", "message"]))
+        ws.append([str(payload.get("status")), str(payload.get("error")), str(payload.get("message"))])
+        wb.save(out)
+        return out
+
+    numbers = payload["numbers"]
+    pos_headers = [f"W{i}" for i in POSITIONS_1_5]
+
+    # En write_only los anchos se fijan antes de la primera fila
+    for title, key in (("COUNTS", "matrix"), ("PCT", "pct")):
+        ws = wb.create_sheet(title)
+        for c in range(1, len(pos_headers) + 2):
+            _xlsx_set_width(ws, c, 12)
+        ws.append(_xlsx_header_row(ws, ["Number", *pos_headers]))
+        by_pos = payload[key]
+        for i, n in enumerate(numbers):
+            ws.append([n, *(by_pos[p][i] for p in range(len(pos_headers)))])
+        if key == "matrix":
+            ws.append(["Total", *payload["totals"]])
+
+    pb = payload["powerball"]
+    ws = wb.create_sheet("POWERBALL")
+    for c in (1, 2, 3):
+        _xlsx_set_width(ws, c, 12)
+    ws.append(_xlsx_header_row(ws, ["Number", "Count", "Pct"]))
+    for n, c, p in zip(pb["numbers"], pb["counts"], pb["pct"]):
+        ws.append([n, c, p])
+
+    meta = payload.get("meta", {}) or {}
+    ws = wb.create_sheet("META")
+    _xlsx_set_width(ws, 1, 22)
+    _xlsx_set_width(ws, 2, 90)
+    ws.append(_xlsx_header_row(ws, ["Key", "Value"]))
+    for k, v in (
+        ("source", payload.get("source", "unknown")),
+        ("total_draws", payload.get("total_draws", 0)),
+        ("date_from", meta.get("date_from") or ""),
+        ("date_to", meta.get("date_to") or ""),
+        ("note", meta.get("note", "")),
+    ):
+        ws.append([str(k), str(v)])
+
+    wb.save(out)
+    return out
@@ -0,0 +1,180 @@
+"""
+Instrumentación por request: spans por etapa, contadores y profiler por muestreo.
+
+Spans / contadores (contextvars, seguros entre requests concurrentes):
+    with profiling.collect() as timing:        # activa la medición para esta request
+        with profiling.span("build_context"):
+            ...
+        profiling.count("near_dup.removed", 3)
+    timing.as_meta()  -> {"total_ms", "stages": {nombre: {"ms", "calls"}}, "counters": {...}}
+
+Sin collect() activo, span()/count() solo miran un ContextVar y salen: se pueden dejar en el camino
+caliente. Las etapas anidadas se nombran por ruta ("run_engine/build_context/db.last_draws").
+Los hilos de un ThreadPoolExecutor no heredan el contexto: lo que corre ahí no se mide.
+
+Profiler por muestreo (opt-in por env):
+    PROFILE_SAMPLE_RATE   fracción de requests perfiladas (0 = apagado, default)
+    PROFILE_DIR           destino (default <proyecto>/profiles)
+    PROFILE_ENGINE        "cprofile" (default, .prof para pstats/snakeviz) | "pyinstrument" (.html)
+Un solo perfil a la vez por proceso: si ya hay uno corriendo, la request se ejecuta sin perfilar.
+"""
+from __future__ import annotations
+
+import contextvars
+import functools
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+PROFILE_DIR = Path(__file__).resolve().parents[1] / "profiles"
+
+
+class Timing:
+    __slots__ = ("t0", "stages", "counters", "_stack")
+
+    def __init__(self) -> None:
+        self.t0 = time.perf_counter()
+        self.stages: Dict[str, List[float]] = {}  # ruta -> [ms, calls]
+        self.counters: Dict[str, float] = {}
+        self._stack: List[str] = []
+
+    def as_meta(self) -> Dict[str, Any]:
+        return {
+            "total_ms": round((time.perf_counter() - self.t0) * 1000.0, 2),
+            "stages": {k: {"ms": round(v[0], 2), "calls": int(v[1])} for k, v in self.stages.items()},
+            "counters": {k: (int(v) if float(v).is_integer() else v) for k, v in self.counters.items()},
+        }
+
+
+_CURRENT: contextvars.ContextVar[Optional[Timing]] = contextvars.ContextVar("profiling_timing", default=None)
+
+
+@contextmanager
+def collect() -> Iterator[Timing]:
+    timing = Timing()
+    token = _CURRENT.set(timing)
+    try:
+        yield timing
+    finally:
+        _CURRENT.reset(token)
+
+
+def active() -> bool:
+    return _CURRENT.get() is not None
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    timing = _CURRENT.get()
+    if timing is None:
+        yield
+        return
+    # la etapa se registra al entrar: en meta.timing los padres quedan antes que sus hijos
+    slot = timing.stages.setdefault("/".join(timing._stack + [name]), [0.0, 0])
+    timing._stack.append(name)
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        slot[0] += (time.perf_counter() - t0) * 1000.0
+        slot[1] += 1
+        timing._stack.pop()
+
+
+def timed(name: str) -> Callable[[F], F]:
+    """Decorador: la función entera como un span."""
+    def deco(fn: F) -> F:
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper  # type: ignore[return-value]
+    return deco
+
+
+def count(name: str, n: float = 1) -> None:
+    timing = _CURRENT.get()
+    if timing is not None:
+        timing.counters[name] = timing.counters.get(name, 0) + n
+
+
+# ---------------------------------------------------------------------
+# Profiler por muestreo
+# ---------------------------------------------------------------------
+_PROFILE_LOCK = threading.Lock()
+
+
+def _sample_rate() -> float:
+    try:
+        return max(0.0, min(1.0, float(os.getenv("PROFILE_SAMPLE_RATE", "") or 0.0)))
+    except ValueError:
+        return 0.0
+
+
+def _profile_path(name: str, ext: str) -> Path:
+    out = Path(os.getenv("PROFILE_DIR", "") or PROFILE_DIR)
+    out.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+    return out / f"{name}-{stamp}-{random.randrange(16 ** 4):04x}.{ext}"
+
+
+@contextmanager
+def maybe_profile(name: str, force: bool = False) -> Iterator[Optional[Path]]:
+    """
+    Perfila el bloque con probabilidad PROFILE_SAMPLE_RATE (o siempre con force=True) y escribe el
+    perfil a disco al salir. Devuelve la ruta (o None si no se perfiló).
+    """
+    rate = _sample_rate()
+    if not force and (rate <= 0.0 or random.random() >= rate):
+        yield None
+        return
+    if not _PROFILE_LOCK.acquire(blocking=False):
+        yield None
+        return
+    try:
+        engine = (os.getenv("PROFILE_ENGINE", "") or "cprofile").strip().lower()
+        if engine == "pyinstrument":
+            try:
+                from pyinstrument import Profiler
+            except ImportError:
+                engine = "cprofile"
+        if engine == "pyinstrument":
+            path = _profile_path(name, "html")
+            prof = Profiler()
+            prof.start()
+            try:
+                yield path
+            finally:
+                prof.stop()
+                _write(path, lambda p: p.write_text(prof.output_html(), encoding="utf-8"))
+        else:
+            import cProfile
+
+            path = _profile_path(name, "prof")
+            prof = cProfile.Profile()
+            prof.enable()
+            try:
+                yield path
+            finally:
+                prof.disable()
+                _write(path, lambda p: prof.dump_stats(str(p)))
+    finally:
+        _PROFILE_LOCK.release()
+
+
+def _write(path: Path, fn: Callable[[Path], None]) -> None:
+    try:
+        fn(path)
+    except Exception:
+        # un perfil que no se pudo escribir no rompe la request
+        logger.exception("no pude escribir el perfil %s", path)
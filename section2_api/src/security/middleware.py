@@ -1,17 +1,46 @@
 from __future__ import annotations
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
+import math
+from typing import Dict, Optional
+import anyio
 from starlette.responses import JSONResponse
-from .rate_limit import allow
+from starlette.types import ASGIApp, Receive, Scope, Send
+from .rate_limit import RateLimiterBackend, get_backend, route_cost
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app, rate_per_minute: float = 180.0, burst: float = 90.0):
-        super().__init__(app)
+class RateLimitMiddleware:
+    """
+    Pure ASGI (sin BaseHTTPMiddleware): no envuelve request/response ni crea tareas extra;
+    solo consulta el bucket y deja pasar el scope tal cual. Los backends que bloquean (SQLite)
+    se consultan en un hilo del threadpool de anyio.
+    """
+
+    def __init__(self, app: ASGIApp, rate_per_minute: float = 180.0, burst: float = 90.0,
+                 backend: Optional[RateLimiterBackend] = None, route_costs: Optional[Dict[str, float]] = None):
+        self.app = app
         self.rate_per_minute = rate_per_minute
         self.burst = burst
+        self.backend = backend
+        self.route_costs = route_costs
 
-    async def dispatch(self, request: Request, call_next):
-        ip = request.client.host if request.client else "unknown"
-        if not allow(ip, self.rate_per_minute, self.burst):
-            return JSONResponse({"status":"error","message":"rate_limited"}, status_code=429)
-        return await call_next(request)
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        client = scope.get("client")
+        ip = client[0] if client else "unknown"
+        cost = route_cost(scope.get("path", ""), self.route_costs)
+        backend = self.backend or get_backend()
+        if backend.blocking:
+            # SQLite compartido: BEGIN IMMEDIATE puede esperar el lock; fuera del event loop
+            ok, retry_after = await anyio.to_thread.run_sync(
+                backend.take, ip, cost, self.rate_per_minute, self.burst)
+        else:
+            ok, retry_after = backend.take(ip, cost, self.rate_per_minute, self.burst)
+        if not ok:
+            response = JSONResponse(
+                {"status":"error","message":"rate_limited"},
+                status_code=429,
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+            )
+            await response(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
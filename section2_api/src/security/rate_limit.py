@@ -1,16 +1,198 @@
 from __future__ import annotations
-import time
-from typing import Dict, Tuple
-
-_BUCKETS: Dict[str, Tuple[float, float]] = {}
-
-def allow(ip: str, rate_per_minute: float = 120.0, burst: float = 60.0) -> bool:
-    now = time.time()
-    tokens, last = _BUCKETS.get(ip, (burst, now))
-    refill = (now - last) * (rate_per_minute / 60.0)
-    tokens = min(burst, tokens + refill)
-    if tokens < 1.0:
-        _BUCKETS[ip] = (tokens, now)
-        return False
-    _BUCKETS[ip] = (tokens - 1.0, now)
-    return True
+import os, sqlite3, threading, time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+# Prefijo con el que se monta el router de ai_assistants (la UI llama /api/ai/assistants/...)
+AI_PREFIX = "/api/ai"
+
+# Costo en tokens por ruta (prefijo de la ruta montada, tal como llega en scope["path"]).
+# Las rutas que corren el motor completo pesan más.
+DEFAULT_ROUTE_COSTS: Dict[str, float] = {
+    "/api/backtest/run": 10.0,
+    "/api/jobs/start": 10.0,
+    "/api/simulate/portfolio": 10.0,
+    "/api/export/pdf": 5.0,
+    AI_PREFIX + "/assistants/run": 3.0,
+    AI_PREFIX + "/assistants/autopilot": 10.0,
+    AI_PREFIX + "/assistants/batch": 10.0,
+    AI_PREFIX + "/consensus": 3.0,
+    AI_PREFIX + "/assistants/rescore": 2.0,
+    AI_PREFIX + "/assistants/rescore/batch": 4.0,
+    AI_PREFIX + "/assistants/mix": 0.5,
+    AI_PREFIX + "/assistants/catalog": 0.5,
+    "/api/telemetry/": 0.25,
+}
+
+
+def route_cost(path: str, costs: Optional[Dict[str, float]] = None, default: float = 1.0) -> float:
+    """Costo del prefijo más largo que coincide con `path` por segmentos (/assistants no cubre /assistantsX)."""
+    best_len = -1
+    cost = default
+    for prefix, c in (costs if costs is not None else DEFAULT_ROUTE_COSTS).items():
+        p = prefix.rstrip("/")
+        if len(p) > best_len and (path == p or path.startswith(p + "/")):
+            best_len = len(p)
+            cost = c
+    return cost
+
+
+def _refill(tokens: float, last: float, now: float, rate_per_minute: float, burst: float) -> float:
+    return min(burst, tokens + max(0.0, now - last) * (rate_per_minute / 60.0))
+
+
+def _retry_after(tokens: float, cost: float, rate_per_minute: float) -> float:
+    return max(0.0, (cost - tokens) * 60.0 / rate_per_minute) if rate_per_minute > 0 else 60.0
+
+
+class RateLimiterBackend:
+    """Token bucket por clave. take() devuelve (permitido, segundos hasta poder reintentar)."""
+
+    # True si take() puede bloquear (I/O, locks de otro proceso): el middleware lo corre en un hilo
+    blocking = False
+
+    def take(self, key: str, cost: float, rate_per_minute: float, burst: float) -> Tuple[bool, float]:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, float]:
+        return {}
+
+
+class MemoryBackend(RateLimiterBackend):
+    """
+    In-process, acotado: OrderedDict LRU con a lo sumo `max_keys` buckets.
+    Expiración perezosa: un bucket inactivo el tiempo suficiente para rellenarse entero equivale a uno
+    nuevo, así que se descarta al tocarlo; al superar max_keys se expulsa el menos reciente.
+    """
+
+    def __init__(self, max_keys: int = 10_000):
+        self.max_keys = max(1, int(max_keys))
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.denied = 0
+
+    def take(self, key: str, cost: float, rate_per_minute: float, burst: float) -> Tuple[bool, float]:
+        now = time.time()
+        cost = min(cost, burst)
+        with self._lock:
+            tokens, last = self._buckets.pop(key, (burst, now))
+            tokens = _refill(tokens, last, now, rate_per_minute, burst)
+            if tokens < cost:
+                self._buckets[key] = (tokens, now)
+                self.denied += 1
+                ok = False
+            else:
+                tokens -= cost
+                if tokens < burst:
+                    self._buckets[key] = (tokens, now)
+                ok = True
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+                self.evictions += 1
+        return ok, (0.0 if ok else _retry_after(tokens, cost, rate_per_minute))
+
+    def stats(self) -> Dict[str, float]:
+        return {"keys": len(self._buckets), "max_keys": self.max_keys,
+                "evictions": self.evictions, "denied": self.denied}
+
+
+class SQLiteBackend(RateLimiterBackend):
+    """
+    Compartido entre workers de uvicorn: los buckets viven en una tabla SQLite (WAL) y cada take()
+    es un read-modify-write dentro de BEGIN IMMEDIATE, así que N procesos comparten un solo límite.
+    Las filas ya rellenas se barren cada `sweep_every` llamadas.
+    take() puede esperar hasta 1 s por el lock de escritura: blocking=True.
+    """
+
+    blocking = True
+
+    def __init__(self, path: Path, sweep_every: int = 1000, max_idle_seconds: float = 3600.0):
+        self.path = Path(path)
+        self.sweep_every = max(1, int(sweep_every))
+        self.max_idle_seconds = float(max_idle_seconds)
+        self._local = threading.local()
+        self._calls = 0
+        self.denied = 0
+        self.errors = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        con = getattr(self._local, "con", None)
+        if con is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            con = sqlite3.connect(str(self.path), timeout=1.0, isolation_level=None, check_same_thread=False)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS rate_buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, ts REAL NOT NULL)"
+            )
+            self._local.con = con
+        return con
+
+    def take(self, key: str, cost: float, rate_per_minute: float, burst: float) -> Tuple[bool, float]:
+        now = time.time()
+        cost = min(cost, burst)
+        try:
+            con = self._conn()
+            con.execute("BEGIN IMMEDIATE")
+            try:
+                row = con.execute("SELECT tokens, ts FROM rate_buckets WHERE key = ?", (key,)).fetchone()
+                tokens = _refill(row[0], row[1], now, rate_per_minute, burst) if row else burst
+                ok = tokens >= cost
+                if ok:
+                    tokens -= cost
+                else:
+                    self.denied += 1
+                con.execute(
+                    "INSERT INTO rate_buckets (key, tokens, ts) VALUES (?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, ts = excluded.ts",
+                    (key, tokens, now),
+                )
+                con.execute("COMMIT")
+            except Exception:
+                con.execute("ROLLBACK")
+                raise
+        except sqlite3.Error:
+            # fail-open: un problema del almacén no debe tumbar la API
+            self.errors += 1
+            return True, 0.0
+
+        self._calls += 1
+        if self._calls % self.sweep_every == 0:
+            self._sweep(now)
+        return ok, (0.0 if ok else _retry_after(tokens, cost, rate_per_minute))
+
+    def _sweep(self, now: float) -> None:
+        try:
+            self._conn().execute("DELETE FROM rate_buckets WHERE ts < ?", (now - self.max_idle_seconds,))
+        except sqlite3.Error:
+            self.errors += 1
+
+    def stats(self) -> Dict[str, float]:
+        try:
+            keys = self._conn().execute("SELECT COUNT(*) FROM rate_buckets").fetchone()[0]
+        except sqlite3.Error:
+            keys = -1
+        return {"keys": keys, "denied": self.denied, "errors": self.errors}
+
+
+_BACKEND: Optional[RateLimiterBackend] = None
+
+
+def get_backend() -> RateLimiterBackend:
+    """RATE_LIMIT_BACKEND=memory (default) | sqlite (RATE_LIMIT_DB=ruta, compartido entre workers)."""
+    global _BACKEND
+    if _BACKEND is None:
+        kind = os.getenv("RATE_LIMIT_BACKEND", "memory").strip().lower()
+        if kind == "sqlite":
+            default_db = Path(__file__).resolve().parents[2] / "data" / "rate_limit.db"
+            _BACKEND = SQLiteBackend(Path(os.getenv("RATE_LIMIT_DB", "") or default_db))
+        else:
+            _BACKEND = MemoryBackend(max_keys=int(os.getenv("RATE_LIMIT_MAX_KEYS", "10000") or 10000))
+    return _BACKEND
+
+
+def allow(ip: str, rate_per_minute: float = 120.0, burst: float = 60.0, cost: float = 1.0) -> bool:
+    ok, _ = get_backend().take(ip, cost, rate_per_minute, burst)
+    return ok
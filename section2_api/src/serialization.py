@@ -0,0 +1,71 @@
+"""
+Serialización rápida para respuestas grandes (listados de history/future).
+
+- dumps(): orjson si está instalado (bytes directo, ~5-10x más rápido); si no, json con separadores
+  compactos. Los valores ya vienen de sqlite (str/int/float/None), no hace falta jsonable_encoder.
+- json_response(): Response ya serializada; FastAPI la devuelve tal cual, sin pasar por
+  jsonable_encoder ni por la validación del response_model.
+- ndjson_response(): StreamingResponse application/x-ndjson. Primera línea = cabecera (status, filtros,
+  meta), luego una fila por línea y al final {"status": "ok", "done": true, "count": N, ...trailer}.
+"""
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, Iterable, Iterator
+
+from fastapi.responses import Response, StreamingResponse
+
+try:  # opcional: requirements.txt lo incluye, pero el fallback mantiene la API funcionando
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+HAVE_ORJSON = orjson is not None
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+_NDJSON_CHUNK_ROWS = 500
+
+
+def dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def json_response(payload: Any, status_code: int = 200) -> Response:
+    return Response(content=dumps(payload), status_code=status_code, media_type="application/json")
+
+
+def _ndjson_lines(header: Dict[str, Any], rows: Iterable[Dict[str, Any]]) -> Iterator[bytes]:
+    yield dumps(header) + b"\n"
+    count = 0
+    buf = []
+    try:
+        for row in rows:
+            buf.append(dumps(row))
+            count += 1
+            if len(buf) >= _NDJSON_CHUNK_ROWS:
+                yield b"\n".join(buf) + b"\n"
+                buf = []
+        if buf:
+            yield b"\n".join(buf) + b"\n"
+    except Exception as e:
+        # El status HTTP ya salió (200): el error va como última línea
+        if buf:
+            yield b"\n".join(buf) + b"\n"
+        yield dumps({"status": "error", "error": "STREAM_FAILED", "message": str(e), "count": count}) + b"\n"
+        return
+    # Fuentes paginadas (p.ej. _RowStream) dejan has_more/next_cursor en .trailer al terminar
+    yield dumps({"status": "ok", "done": True, "count": count, **getattr(rows, "trailer", {})}) + b"\n"
+
+
+def ndjson_response(header: Dict[str, Any], rows: Iterable[Dict[str, Any]]) -> StreamingResponse:
+    return StreamingResponse(_ndjson_lines(header, rows), media_type=NDJSON_MEDIA_TYPE)
+
+
+def list_response(result: Dict[str, Any]) -> Response:
+    """Resultado de list_*_filtered*: con "stream" -> NDJSON; si no, JSON pre-serializado."""
+    if "stream" in result:
+        header = {k: v for k, v in result.items() if k != "stream"}
+        return ndjson_response(header, result["stream"])
+    return json_response(result)
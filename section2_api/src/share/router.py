@@ -1,27 +1,47 @@
 from __future__ import annotations
-from fastapi import APIRouter
+from contextlib import asynccontextmanager
+from fastapi import APIRouter, Request
+from fastapi.responses import Response
 from pydantic import BaseModel, Field
 from typing import Any, Dict, Optional
-import time, uuid
+import json
+from .store import DEFAULT_TTL_SECONDS, get_store
 
-router = APIRouter(prefix="/api/share", tags=["share"])
+@asynccontextmanager
+async def _lifespan(_app):
+    # el sweeper de expirados corre desde el arranque, no desde el primer create
+    get_store().ensure_sweeper()
+    yield
 
-# Dev/prototype store (memory). For production, persist in DB.
-_STORE: Dict[str, Dict[str, Any]] = {}
+router = APIRouter(prefix="/api/share", tags=["share"], lifespan=_lifespan)
 
 class ShareCreateRequest(BaseModel):
     payload: Dict[str, Any]
     note: Optional[str] = Field(default=None, max_length=140)
+    ttl_days: Optional[int] = Field(default=None, ge=1, le=365, description="Expira tras N días (default 30).")
 
 @router.post("/create")
 def create(req: ShareCreateRequest):
-    sid = uuid.uuid4().hex[:10]
-    _STORE[sid] = {"id": sid, "created_at": time.time(), "note": req.note, "payload": req.payload}
-    return {"status":"ok","share_id": sid}
+    ttl = req.ttl_days * 86400.0 if req.ttl_days else DEFAULT_TTL_SECONDS
+    out = get_store().create(req.payload, note=req.note, ttl_seconds=ttl)
+    return {"status":"ok","share_id": out["id"], "expires_at": out["expires_at"], "deduplicated": out["deduplicated"]}
+
+def _etag(obj: Dict[str, Any]) -> str:
+    # share id -> blob es inmutable, así que el hash del blob identifica la representación
+    return f'"{obj["blob_hash"][:32]}"'
 
 @router.get("/{share_id}")
-def get_share(share_id: str):
-    obj = _STORE.get(share_id)
+def get_share(share_id: str, request: Request):
+    obj = get_store().get_raw(share_id)
     if not obj:
         return {"status":"error","message":"not_found"}
-    return {"status":"ok","share": obj}
+    etag = _etag(obj)
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=300"}
+    inm = request.headers.get("if-none-match", "")
+    if inm and (inm.strip() == "*" or etag in [t.strip().removeprefix("W/") for t in inm.split(",")]):
+        return Response(status_code=304, headers=headers)
+
+    # El payload ya está en JSON canónico: se empalma tal cual en vez de json.loads + re-serializar.
+    head = json.dumps({"id": obj["id"], "created_at": obj["created_at"], "note": obj["note"]}, ensure_ascii=False)
+    body = b'{"status":"ok","share":' + head[:-1].encode("utf-8") + b',"payload":' + obj["payload_json"] + b"}}"
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,174 @@
+from __future__ import annotations
+import hashlib, json, os, sqlite3, threading, time, uuid, zlib
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+try:  # zstd si está instalado; zlib (stdlib) si no
+    import zstandard as _zstd  # type: ignore
+except Exception:  # pragma: no cover
+    _zstd = None
+
+DB_PATH = Path(__file__).resolve().parents[2] / "data" / "shares.db"
+DEFAULT_TTL_SECONDS = 30 * 24 * 3600.0
+
+
+def canonical_json(payload: Dict[str, Any]) -> bytes:
+    return json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+
+def _compress(raw: bytes) -> tuple[str, bytes]:
+    if _zstd is not None:
+        return "zstd", _zstd.ZstdCompressor(level=10).compress(raw)
+    return "zlib", zlib.compress(raw, 6)
+
+
+def _decompress(codec: str, data: bytes) -> bytes:
+    if codec == "zstd":
+        if _zstd is None:
+            raise RuntimeError("share blob is zstd-compressed but zstandard is not installed")
+        return _zstd.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+class ShareStore:
+    """
+    Share store persistente (SQLite, WAL; visible para todos los workers).
+
+    - share_blobs: hash sha256 del JSON canónico -> blob comprimido. Packs idénticos se guardan una vez.
+    - shares: id corto -> hash del blob, nota, created_at, expires_at.
+    - sweep(): borra shares expirados y blobs huérfanos.
+    """
+
+    def __init__(self, path: Path = DB_PATH):
+        self.path = Path(path)
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._ready = False
+        self._sweeper: Optional[threading.Thread] = None
+
+    def _conn(self) -> sqlite3.Connection:
+        con = getattr(self._local, "con", None)
+        if con is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            con = sqlite3.connect(str(self.path), timeout=5.0, check_same_thread=False)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            self._local.con = con
+            if not self._ready:
+                with self._init_lock:
+                    if not self._ready:
+                        self._init_schema(con)
+                        self._ready = True
+        return con
+
+    def _init_schema(self, con: sqlite3.Connection) -> None:
+        con.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS share_blobs (
+                hash TEXT PRIMARY KEY,
+                codec TEXT NOT NULL,
+                data BLOB NOT NULL,
+                raw_size INTEGER NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS shares (
+                id TEXT PRIMARY KEY,
+                blob_hash TEXT NOT NULL REFERENCES share_blobs(hash),
+                note TEXT,
+                created_at REAL NOT NULL,
+                expires_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_shares_expires_at ON shares(expires_at);
+            CREATE INDEX IF NOT EXISTS idx_shares_blob_hash ON shares(blob_hash);
+            """
+        )
+        con.commit()
+
+    def create(self, payload: Dict[str, Any], note: Optional[str] = None,
+               ttl_seconds: Optional[float] = DEFAULT_TTL_SECONDS) -> Dict[str, Any]:
+        raw = canonical_json(payload)
+        h = hashlib.sha256(raw).hexdigest()
+        now = time.time()
+        expires_at = (now + float(ttl_seconds)) if ttl_seconds else None
+        con = self._conn()
+        with con:
+            # BEGIN IMMEDIATE: toma el lock de escritura antes del SELECT, así el sweeper no puede borrar
+            # el blob "huérfano" entre la comprobación y el INSERT de shares (201 seguido de 404).
+            con.execute("BEGIN IMMEDIATE")
+            exists = con.execute("SELECT 1 FROM share_blobs WHERE hash = ?", (h,)).fetchone()
+            if not exists:
+                codec, data = _compress(raw)
+                con.execute(
+                    "INSERT OR IGNORE INTO share_blobs (hash, codec, data, raw_size, created_at) VALUES (?, ?, ?, ?, ?)",
+                    (h, codec, data, len(raw), now),
+                )
+            while True:
+                sid = uuid.uuid4().hex[:10]
+                try:
+                    con.execute(
+                        "INSERT INTO shares (id, blob_hash, note, created_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+                        (sid, h, note, now, expires_at),
+                    )
+                    break
+                except sqlite3.IntegrityError:
+                    continue
+        self.ensure_sweeper()
+        return {"id": sid, "blob_hash": h, "deduplicated": bool(exists), "expires_at": expires_at}
+
+    def get_raw(self, share_id: str) -> Optional[Dict[str, Any]]:
+        """Metadatos + payload como JSON canónico (bytes), sin re-serializar."""
+        row = self._conn().execute(
+            """
+            SELECT s.id, s.note, s.created_at, s.expires_at, b.hash, b.codec, b.data
+            FROM shares s JOIN share_blobs b ON b.hash = s.blob_hash
+            WHERE s.id = ?
+            """,
+            (share_id,),
+        ).fetchone()
+        if not row:
+            return None
+        sid, note, created_at, expires_at, h, codec, data = row
+        if expires_at is not None and expires_at < time.time():
+            return None
+        return {"id": sid, "note": note, "created_at": created_at, "expires_at": expires_at,
+                "blob_hash": h, "payload_json": _decompress(codec, data)}
+
+    def sweep(self) -> Dict[str, int]:
+        con = self._conn()
+        with con:
+            n_shares = con.execute(
+                "DELETE FROM shares WHERE expires_at IS NOT NULL AND expires_at < ?", (time.time(),)
+            ).rowcount
+            n_blobs = con.execute(
+                "DELETE FROM share_blobs WHERE hash NOT IN (SELECT blob_hash FROM shares)"
+            ).rowcount
+        return {"shares": n_shares, "blobs": n_blobs}
+
+    def ensure_sweeper(self, interval: Optional[float] = None) -> None:
+        if self._sweeper is not None:
+            return
+        every = float(interval or os.getenv("SHARE_SWEEP_SECONDS", "") or 3600.0)
+
+        def _loop():
+            # primera pasada al arrancar: tras un reinicio los expirados no esperan a un create()
+            while True:
+                try:
+                    self.sweep()
+                except Exception:
+                    pass
+                time.sleep(every)
+
+        with self._init_lock:
+            if self._sweeper is None:
+                self._sweeper = threading.Thread(target=_loop, name="share-sweeper", daemon=True)
+                self._sweeper.start()
+
+
+_STORE: Optional[ShareStore] = None
+
+
+def get_store() -> ShareStore:
+    global _STORE
+    if _STORE is None:
+        _STORE = ShareStore(Path(os.getenv("SHARE_DB_PATH", "") or DB_PATH))
+    return _STORE
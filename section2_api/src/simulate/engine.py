@@ -0,0 +1,243 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+WHITE_MAX = 69
+PB_MAX = 26
+N_TIERS = 12  # (0..5 blancas) x (PB si/no)
+
+# Tabla estándar de premios (sin Power Play), en dólares enteros para que las sumas sean exactas.
+# Índice = whites * 2 + pb_hit. El jackpot (5+PB) se inyecta por parámetro (0 por defecto,
+# igual que get_prize en section1_core).
+_PRIZES = np.array(
+    [
+        0, 4,          # 0 blancas
+        0, 4,          # 1 blanca
+        0, 7,          # 2 blancas
+        7, 100,        # 3 blancas
+        100, 50_000,   # 4 blancas
+        1_000_000, 0,  # 5 blancas
+    ],
+    dtype=np.int64,
+)
+
+DEFAULT_CHUNK_SIZE = 50_000
+DEFAULT_BATCH_SIZE = 10_000
+# Presupuesto de memoria por worker para las matrices (B,T) de un batch. Bytes por celda:
+# matmul float32 (4) + matches int8 (1) + pb_hit bool (1) + tier int8 (1) + won int64 (8) ≈ 16.
+BATCH_BYTES = int(os.getenv("SIMULATE_BATCH_BYTES", "") or 64 * 1024 * 1024)
+_BYTES_PER_CELL = 16
+
+_POOL: Optional[ProcessPoolExecutor] = None
+_POOL_LOCK = threading.Lock()
+
+
+def prize_table(jackpot: int = 0) -> np.ndarray:
+    table = _PRIZES.copy()
+    table[11] = int(jackpot)
+    return table
+
+
+def tickets_matrix(tickets: Sequence[Tuple[Sequence[int], int]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    tickets: [(whites, powerball), ...]
+    Returns (T,69) one-hot float32 matrix (BLAS-friendly, valores exactos 0/1) and (T,) pb indices 0..25.
+    """
+    onehot = np.zeros((len(tickets), WHITE_MAX), dtype=np.float32)
+    pbs = np.empty(len(tickets), dtype=np.int16)
+    for i, (whites, pb) in enumerate(tickets):
+        onehot[i, [int(n) - 1 for n in whites]] = 1.0
+        pbs[i] = int(pb) - 1
+    return onehot, pbs
+
+
+def _draw_batch(rng: np.random.Generator, size: int) -> Tuple[np.ndarray, np.ndarray]:
+    """(size,69) boolean draw matrix (argpartition of uniforms = 5 distinct whites) + (size,) pb indices."""
+    picks = np.argpartition(rng.random((size, WHITE_MAX)), 5, axis=1)[:, :5]
+    draws = np.zeros((size, WHITE_MAX), dtype=bool)
+    np.put_along_axis(draws, picks, True, axis=1)
+    pbs = rng.integers(0, PB_MAX, size=size, dtype=np.int16)
+    return draws, pbs
+
+
+def batch_rows(n_tickets: int, batch_size: int = DEFAULT_BATCH_SIZE, budget: int = BATCH_BYTES) -> int:
+    """Sorteos por batch acotados para que las (B,T) intermedias quepan en `budget` bytes."""
+    return max(1, min(int(batch_size), int(budget) // (max(1, n_tickets) * _BYTES_PER_CELL)))
+
+
+def _simulate_chunk(args) -> Dict[str, Any]:
+    seed_seq, n, onehot, ticket_pbs, prizes, batch_size = args
+    rng = np.random.default_rng(seed_seq)
+
+    tiers = np.zeros(N_TIERS, dtype=np.int64)
+    won_by_ticket = np.zeros(onehot.shape[0], dtype=np.int64)
+    dist: Dict[int, int] = {}
+
+    done = 0
+    while done < n:
+        b = min(batch_size, n - done)
+        draws, pbs = _draw_batch(rng, b)
+
+        # (B,69) @ (69,T) -> coincidencias de blancas por sorteo y ticket (0..5)
+        matches = (draws.astype(np.float32) @ onehot.T).astype(np.int8)
+        pb_hit = pbs[:, None] == ticket_pbs[None, :]
+        tier = matches * 2 + pb_hit
+
+        tiers += np.bincount(tier.ravel(), minlength=N_TIERS)
+
+        won = prizes[tier]  # (B,T)
+        won_by_ticket += won.sum(axis=0)
+
+        vals, cnts = np.unique(won.sum(axis=1), return_counts=True)
+        for v, c in zip(vals.tolist(), cnts.tolist()):
+            dist[v] = dist.get(v, 0) + c
+
+        done += b
+
+    return {"tiers": tiers, "won_by_ticket": won_by_ticket, "dist": dist}
+
+
+def _simulate_chunks(jobs) -> List[Dict[str, Any]]:
+    # Un task del pool procesa varios chunks en serie: así `workers` limita el paralelismo
+    # aunque el pool compartido tenga más procesos.
+    return [_simulate_chunk(j) for j in jobs]
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = ProcessPoolExecutor(max_workers=os.cpu_count() or 1)
+        return _POOL
+
+
+def _reset_pool() -> None:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is not None:
+            _POOL.shutdown(wait=False, cancel_futures=True)
+        _POOL = None
+
+
+def _run_parallel(jobs, workers: int) -> List[Dict[str, Any]]:
+    groups = [jobs[i::workers] for i in range(workers)]
+    try:
+        futures = [_get_pool().submit(_simulate_chunks, g) for g in groups]
+        return [p for f in futures for p in f.result()]
+    except BrokenProcessPool:
+        # Un worker murió (OOM, kill): se recrea el pool para la siguiente petición.
+        _reset_pool()
+        raise
+
+
+def _chunk_sizes(n_sims: int, chunk_size: int) -> List[int]:
+    full, rest = divmod(n_sims, chunk_size)
+    return [chunk_size] * full + ([rest] if rest else [])
+
+
+def simulate_portfolio(
+    tickets: Sequence[Tuple[Sequence[int], int]],
+    n_sims: int,
+    seed: Optional[int] = None,
+    workers: int = 1,
+    ticket_cost: float = 2.0,
+    jackpot: int = 0,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> Dict[str, Any]:
+    """
+    Monte Carlo vectorizado de un portafolio de tickets contra N sorteos aleatorios.
+
+    Reproducibilidad: n_sims se parte en chunks de tamaño fijo y cada chunk recibe su propio
+    stream SeedSequence(seed).spawn(...)[i]. El reparto chunk→worker no cambia los números
+    generados y los agregados son sumas enteras, así que el resultado es idéntico para
+    cualquier valor de `workers`.
+    """
+    if not tickets:
+        return {"status": "error", "error": "NO_TICKETS", "message": "Debes enviar al menos un ticket."}
+    n_sims = int(n_sims)
+    if n_sims < 1:
+        return {"status": "error", "error": "INVALID_N_SIMS", "message": "n_sims debe ser >= 1."}
+
+    t0 = time.perf_counter()
+
+    root = np.random.SeedSequence(seed)
+    sizes = _chunk_sizes(n_sims, max(1, int(chunk_size)))
+    streams = root.spawn(len(sizes))
+
+    onehot, ticket_pbs = tickets_matrix(tickets)
+    prizes = prize_table(jackpot)
+    rows = batch_rows(len(tickets), batch_size)
+    jobs = [(ss, n, onehot, ticket_pbs, prizes, rows) for ss, n in zip(streams, sizes)]
+
+    workers = max(1, min(int(workers or 1), len(jobs), os.cpu_count() or 1))
+    if workers == 1:
+        parts = [_simulate_chunk(j) for j in jobs]
+    else:
+        parts = _run_parallel(jobs, workers)
+
+    tiers = np.zeros(N_TIERS, dtype=np.int64)
+    won_by_ticket = np.zeros(len(tickets), dtype=np.int64)
+    dist: Dict[int, int] = {}
+    for p in parts:
+        tiers += p["tiers"]
+        won_by_ticket += p["won_by_ticket"]
+        for v, c in p["dist"].items():
+            dist[v] = dist.get(v, 0) + c
+
+    total_plays = n_sims * len(tickets)
+    total_won = int(won_by_ticket.sum())
+    cost_per_draw = float(ticket_cost) * len(tickets)
+    total_cost = cost_per_draw * n_sims
+
+    mean_won = total_won / n_sims
+    var_won = sum(c * (v - mean_won) ** 2 for v, c in dist.items()) / n_sims
+
+    tier_rows = []
+    for whites in range(5, -1, -1):
+        for pb_hit in (1, 0):
+            idx = whites * 2 + pb_hit
+            c = int(tiers[idx])
+            if not c:
+                continue
+            tier_rows.append({
+                "whites": whites,
+                "powerball": bool(pb_hit),
+                "count": c,
+                "pct": round(c / total_plays * 100.0, 6),
+                "prize": int(prizes[idx]),
+            })
+
+    return {
+        "status": "ok",
+        "n_sims": n_sims,
+        "n_tickets": len(tickets),
+        "tiers": tier_rows,
+        "prize": {
+            "ticket_cost": float(ticket_cost),
+            "total_cost": total_cost,
+            "total_won": total_won,
+            "roi": (total_won - total_cost) / total_cost if total_cost else 0.0,
+            "mean_won_per_draw": mean_won,
+            "std_won_per_draw": var_won ** 0.5,
+            "distribution": [{"won": v, "draws": dist[v]} for v in sorted(dist)],
+            "won_by_ticket": won_by_ticket.tolist(),
+        },
+        "meta": {
+            "seed": seed,
+            "entropy": str(root.entropy),
+            "workers": workers,
+            "chunks": len(sizes),
+            "chunk_size": int(chunk_size),
+            "batch_size": rows,
+            "jackpot": int(jackpot),
+            "elapsed_ms": round((time.perf_counter() - t0) * 1000.0, 2),
+        },
+    }
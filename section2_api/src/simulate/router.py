@@ -0,0 +1,32 @@
+from __future__ import annotations
+from fastapi import APIRouter
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+router = APIRouter(prefix="/api/simulate", tags=["simulate"])
+
+class Ticket(BaseModel):
+    whites: List[int] = Field(..., min_items=5, max_items=5)
+    powerball: int = Field(..., ge=1, le=26)
+
+class SimulateRequest(BaseModel):
+    tickets: List[Ticket] = Field(..., min_items=1, max_items=5000)
+    n_sims: int = Field(default=100_000, ge=1, le=50_000_000)
+    seed: Optional[int] = Field(default=None, description="Seed para reproducibilidad (independiente de workers).")
+    workers: int = Field(default=1, ge=1, le=32)
+    ticket_cost: float = Field(default=2.0, ge=0.0)
+    jackpot: int = Field(default=0, ge=0, description="Premio 5+PB; 0 = igual que get_prize.")
+
+@router.post("/portfolio")
+def portfolio(req: SimulateRequest):
+    for t in req.tickets:
+        if len(set(t.whites)) != 5 or any(n < 1 or n > 69 for n in t.whites):
+            return {"status":"error","error":"INVALID_TICKET","message":"Blancas deben ser 5 únicas en 1..69.",
+                    "ticket": t.model_dump()}
+    from .engine import simulate_portfolio  # numpy solo al simular
+
+    return simulate_portfolio(
+        [(t.whites, t.powerball) for t in req.tickets],
+        n_sims=req.n_sims, seed=req.seed, workers=req.workers,
+        ticket_cost=req.ticket_cost, jackpot=req.jackpot,
+    )
@@ -0,0 +1,155 @@
+"""
+Single-flight para endpoints caros (protección contra cache stampede).
+
+Tras un sorteo nuevo o al expirar un cache, muchos clientes piden a la vez lo mismo (/assistants/run
+de hoy, el export por posición...). Con SingleFlight.do(key, fn, version=...):
+
+- Peticiones idénticas concurrentes (misma key) esperan a UNA ejecución en curso y comparten su
+  resultado (o su excepción).
+- ttl > 0: el resultado se reutiliza mientras la versión de datos no cambie y no haya expirado.
+- stale > 0 (stale-while-revalidate): si expiró o la versión cambió, se sirve el resultado anterior
+  (hasta ttl + stale segundos de antigüedad) y un solo hilo lo recalcula en segundo plano.
+
+Los resultados compartidos no se deben mutar después de devolverse: todo el post-proceso va dentro de fn.
+Copia de section1_core/app/single_flight.py (paquetes independientes, sin imports cruzados): cualquier
+cambio aquí hay que replicarlo allá y viceversa.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Defaults de los endpoints que usan single-flight; stale-while-revalidate apagado salvo que se configure
+DEFAULT_TTL_SECONDS = float(os.getenv("SINGLE_FLIGHT_TTL_SECONDS", "") or 30.0)
+DEFAULT_STALE_SECONDS = float(os.getenv("SINGLE_FLIGHT_STALE_SECONDS", "") or 0.0)
+
+
+# Instancias vivas, para exponer sus stats en /metrics
+_INSTANCES: "weakref.WeakSet[SingleFlight]" = weakref.WeakSet()
+
+
+def all_flights() -> List["SingleFlight"]:
+    return sorted(_INSTANCES, key=lambda sf: sf.name)
+
+
+def make_key(name: str, params: Dict[str, Any]) -> str:
+    """Key estable: mismo dict de parámetros (en cualquier orden) -> misma key."""
+    return name + ":" + json.dumps(params, sort_keys=True, separators=(",", ":"), default=str)
+
+
+class _Flight:
+    __slots__ = ("event", "value", "error")
+
+    def __init__(self) -> None:
+        self.event = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class _Entry:
+    __slots__ = ("value", "version", "at")
+
+    def __init__(self, value: Any, version: Hashable, at: float) -> None:
+        self.value = value
+        self.version = version
+        self.at = at
+
+
+class SingleFlight:
+    def __init__(self, name: str, max_entries: int = 256) -> None:
+        self.name = name
+        self.max_entries = int(max_entries)
+        self._lock = threading.Lock()
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._cache: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._stats = {"computed": 0, "coalesced": 0, "hits": 0, "stale": 0, "errors": 0}
+        _INSTANCES.add(self)
+
+    def do(
+        self,
+        key: Hashable,
+        fn: Callable[[], Any],
+        *,
+        version: Hashable = None,
+        ttl: float = 0.0,
+        stale: float = 0.0,
+        cacheable: Optional[Callable[[Any], bool]] = None,
+        timeout: Optional[float] = None,
+    ) -> Any:
+        keep = ttl > 0 or stale > 0
+        with self._lock:
+            entry = self._cache.get(key) if keep else None
+            if entry is not None:
+                age = time.monotonic() - entry.at
+                if entry.version == version and age <= ttl:
+                    self._cache.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return entry.value
+                if stale > 0 and age <= ttl + stale:
+                    self._stats["stale"] += 1
+                    if key not in self._flights:
+                        flight = self._flights[key] = _Flight()
+                        threading.Thread(
+                            target=self._refresh, args=(key, flight, fn, version, cacheable),
+                            name=f"single-flight-{self.name}", daemon=True,
+                        ).start()
+                    return entry.value
+
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self._stats["coalesced"] += 1
+
+        if not leader:
+            if not flight.event.wait(timeout):
+                raise TimeoutError(f"single-flight {self.name}: timeout esperando {key!r}")
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        self._run(key, flight, fn, version, cacheable, keep)
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+
+    def _run(self, key, flight: _Flight, fn, version, cacheable, keep: bool) -> None:
+        try:
+            flight.value = fn()
+        except BaseException as e:
+            flight.error = e
+        with self._lock:
+            self._flights.pop(key, None)
+            if flight.error is not None:
+                self._stats["errors"] += 1
+            else:
+                self._stats["computed"] += 1
+                if keep and (cacheable is None or cacheable(flight.value)):
+                    self._cache[key] = _Entry(flight.value, version, time.monotonic())
+                    self._cache.move_to_end(key)
+                    while len(self._cache) > self.max_entries:
+                        self._cache.popitem(last=False)
+        flight.event.set()
+
+    def _refresh(self, key, flight: _Flight, fn, version, cacheable) -> None:
+        self._run(key, flight, fn, version, cacheable, True)
+        if flight.error is not None:
+            # se sigue sirviendo el valor anterior hasta que venza `stale`
+            logger.warning("single-flight %s: refresh de %r falló: %s", self.name, key, flight.error)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"name": self.name, "entries": len(self._cache), "in_flight": len(self._flights), **self._stats}
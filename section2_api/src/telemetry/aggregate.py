@@ -0,0 +1,292 @@
+from __future__ import annotations
+import gzip, hashlib, json, math, os, threading, time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from .writer import LOG_PATH, rotated_segments
+
+# ------------------------
+# Latency histogram (HDR-style, fixed buckets)
+# ------------------------
+# bucket 0 = [0, 1ms); luego 4 sub-buckets lineales por octava desde 1ms hasta 2^20 ms (~17 min).
+LAT_SUB = 4
+LAT_OCTAVES = 20
+LAT_BUCKETS = 1 + LAT_SUB * LAT_OCTAVES
+LATENCY_KEYS = ("latency_ms", "duration_ms", "elapsed_ms", "ms")
+
+
+def latency_bucket(ms: float) -> int:
+    if ms < 1.0:
+        return 0
+    k = min(int(math.log2(ms)), LAT_OCTAVES - 1)
+    j = min(int((ms / (1 << k) - 1.0) * LAT_SUB), LAT_SUB - 1)
+    return 1 + k * LAT_SUB + j
+
+
+def bucket_upper_ms(idx: int) -> float:
+    if idx <= 0:
+        return 1.0
+    k, j = divmod(idx - 1, LAT_SUB)
+    return float(1 << k) * (1.0 + (j + 1) / LAT_SUB)
+
+
+def _percentiles(hist: Dict[int, int], qs=(0.5, 0.9, 0.99)) -> Dict[str, Optional[float]]:
+    total = sum(hist.values())
+    out: Dict[str, Optional[float]] = {}
+    for q in qs:
+        key = f"p{int(q * 100)}"
+        if not total:
+            out[key] = None
+            continue
+        rank = q * total
+        acc = 0
+        for idx in sorted(hist):
+            acc += hist[idx]
+            if acc >= rank:
+                out[key] = bucket_upper_ms(idx)
+                break
+    return out
+
+
+def _event_latency(obj: Dict[str, Any]) -> Optional[float]:
+    data = obj.get("data")
+    if not isinstance(data, dict):
+        return None
+    for k in LATENCY_KEYS:
+        v = data.get(k)
+        if isinstance(v, (int, float)) and v >= 0:
+            return float(v)
+    return None
+
+
+# ------------------------
+# Incremental aggregator
+# ------------------------
+
+def _fingerprint(head: bytes) -> str:
+    return hashlib.sha1(head).hexdigest()
+
+
+def _open_segment(path: Path):
+    return gzip.open(path, "rb") if path.suffix == ".gz" else path.open("rb")
+
+
+class TelemetryAggregator:
+    """
+    Agrega el log de telemetría por minuto: {minute_ts: {event: {"count": n, "lat": {bucket: n}}}}.
+
+    Es incremental: guarda en un checkpoint el offset leído del log vivo (más una huella de sus primeros
+    bytes) y los segmentos rotados ya procesados. Si el log vivo rota, el segmento cuyo inicio coincide con
+    la huella se retoma desde el offset guardado en lugar de re-escanearse.
+    """
+
+    FINGERPRINT_BYTES = 256
+
+    def __init__(self, log_path: Path = LOG_PATH, checkpoint_path: Optional[Path] = None,
+                 retention_minutes: int = 7 * 24 * 60):
+        self.log_path = Path(log_path)
+        self.checkpoint_path = Path(checkpoint_path or self.log_path.with_name(self.log_path.stem + ".agg.json"))
+        self.retention_minutes = int(retention_minutes)
+        self._lock = threading.Lock()
+        self._minutes: Dict[int, Dict[str, Dict[str, Any]]] = {}
+        self._segments_done: List[str] = []
+        self._live: Dict[str, Any] = {"fingerprint": None, "offset": 0, "head_len": 0}
+        self._lines = 0
+        self._bad_lines = 0
+        self._load_checkpoint()
+
+    # ---------- checkpoint ----------
+
+    def _load_checkpoint(self) -> None:
+        try:
+            obj = json.loads(self.checkpoint_path.read_text(encoding="utf-8"))
+        except Exception:
+            return
+        self._segments_done = list(obj.get("segments_done", []))
+        self._live = obj.get("live") or self._live
+        self._lines = int(obj.get("lines", 0))
+        self._bad_lines = int(obj.get("bad_lines", 0))
+        for m, events in (obj.get("minutes") or {}).items():
+            self._minutes[int(m)] = {
+                ev: {"count": int(v["count"]), "lat": {int(k): int(c) for k, c in v.get("lat", {}).items()}}
+                for ev, v in events.items()
+            }
+
+    def _save_checkpoint(self) -> None:
+        obj = {
+            "segments_done": self._segments_done,
+            "live": self._live,
+            "lines": self._lines,
+            "bad_lines": self._bad_lines,
+            "minutes": {str(m): ev for m, ev in self._minutes.items()},
+        }
+        tmp = self.checkpoint_path.with_name(self.checkpoint_path.name + ".tmp")
+        try:
+            tmp.write_text(json.dumps(obj, separators=(",", ":")), encoding="utf-8")
+            os.replace(tmp, self.checkpoint_path)
+        except Exception:
+            pass
+
+    # ---------- ingestion ----------
+
+    def _ingest_line(self, raw: bytes) -> None:
+        try:
+            obj = json.loads(raw)
+            ev = str(obj["event"])
+            ts = float(obj.get("ts") or 0.0)
+        except Exception:
+            self._bad_lines += 1
+            return
+        self._lines += 1
+        minute = int(ts // 60) * 60
+        slot = self._minutes.setdefault(minute, {}).setdefault(ev, {"count": 0, "lat": {}})
+        slot["count"] += 1
+        lat = _event_latency(obj)
+        if lat is not None:
+            b = latency_bucket(lat)
+            slot["lat"][b] = slot["lat"].get(b, 0) + 1
+
+    def _consume(self, fh, start: int) -> int:
+        """Lee líneas completas desde `start`; devuelve el offset tras la última línea completa."""
+        if start:
+            fh.seek(start)
+        pos = start
+        for raw in fh:
+            if not raw.endswith(b"\n"):
+                break  # línea parcial: el escritor aún no terminó el lote
+            pos += len(raw)
+            if raw.strip():
+                self._ingest_line(raw)
+        return pos
+
+    def _resume_offset(self, fh) -> int:
+        """Offset guardado si `fh` es el mismo archivo que el log vivo del checkpoint; 0 si no."""
+        fp = self._live.get("fingerprint")
+        head_len = int(self._live.get("head_len", 0))
+        if not fp or not head_len:
+            return 0
+        fh.seek(0)
+        return int(self._live.get("offset", 0)) if _fingerprint(fh.read(head_len)) == fp else 0
+
+    def _process_segments(self) -> None:
+        done = set(self._segments_done)
+        for seg in rotated_segments(self.log_path):
+            if seg.name in done:
+                continue
+            try:
+                with _open_segment(seg) as fh:
+                    start = self._resume_offset(fh)
+                    if start:
+                        self._live = {"fingerprint": None, "offset": 0, "head_len": 0}
+                    fh.seek(0)
+                    self._consume(fh, start)
+            except Exception:
+                continue
+            self._segments_done.append(seg.name)
+        # solo recordar segmentos que aún existen en disco
+        alive = {s.name for s in rotated_segments(self.log_path)}
+        self._segments_done = [s for s in self._segments_done if s in alive]
+
+    def _live_inode(self) -> Optional[int]:
+        try:
+            return self.log_path.stat().st_ino
+        except OSError:
+            return None
+
+    def _process_live(self, expected_ino: Optional[int]) -> None:
+        """
+        `expected_ino`: inodo del log vivo antes de procesar los segmentos. Si cambió, el log rotó a mitad
+        del refresh y esos bytes pueden estar (o no) ya contados desde el segmento: se deja para el
+        próximo refresh, que los retoma por huella desde el segmento rotado.
+        """
+        if expected_ino is None:
+            return
+        try:
+            fh = self.log_path.open("rb")
+        except OSError:
+            return
+        with fh:
+            if os.fstat(fh.fileno()).st_ino != expected_ino:
+                return
+            start = self._resume_offset(fh)
+            fh.seek(0)
+            end = self._consume(fh, start)
+            fh.seek(0)
+            head = fh.read(min(end, self.FINGERPRINT_BYTES))
+        if not head:
+            return
+        self._live = {"fingerprint": _fingerprint(head), "offset": end, "head_len": len(head)}
+
+    def _evict(self) -> int:
+        if self.retention_minutes <= 0 or not self._minutes:
+            return 0
+        cutoff = (int(time.time() // 60) - self.retention_minutes) * 60
+        old = [m for m in self._minutes if m < cutoff]
+        for m in old:
+            del self._minutes[m]
+        return len(old)
+
+    def _progress(self) -> tuple:
+        return (tuple(self._segments_done), self._live.get("fingerprint"), self._live.get("offset"),
+                self._lines, self._bad_lines)
+
+    def refresh(self) -> None:
+        with self._lock:
+            before = self._progress()
+            live_ino = self._live_inode()
+            self._process_segments()
+            self._process_live(live_ino)
+            evicted = self._evict()
+            # sin líneas nuevas ni rotación ni minutos expirados, el checkpoint en disco ya está al día
+            if evicted or self._progress() != before:
+                self._save_checkpoint()
+
+    # ---------- query ----------
+
+    def summary(self, since: Optional[float] = None, event: Optional[str] = None,
+                series: bool = False) -> Dict[str, Any]:
+        self.refresh()
+        since_min = int((since if since is not None else time.time() - 3600) // 60) * 60
+        totals: Dict[str, Dict[str, Any]] = {}
+        per_minute: List[Dict[str, Any]] = []
+        with self._lock:
+            for minute in sorted(m for m in self._minutes if m >= since_min):
+                for ev, slot in self._minutes[minute].items():
+                    if event and ev != event:
+                        continue
+                    t = totals.setdefault(ev, {"count": 0, "lat": {}})
+                    t["count"] += slot["count"]
+                    for b, c in slot["lat"].items():
+                        t["lat"][b] = t["lat"].get(b, 0) + c
+                    if series:
+                        per_minute.append({"minute": minute, "event": ev, "count": slot["count"],
+                                           "latency_ms": _percentiles(slot["lat"])})
+            lines, bad = self._lines, self._bad_lines
+
+        events = {
+            ev: {"count": t["count"], "latency_samples": sum(t["lat"].values()), "latency_ms": _percentiles(t["lat"])}
+            for ev, t in sorted(totals.items(), key=lambda kv: -kv[1]["count"])
+        }
+        out: Dict[str, Any] = {
+            "status": "ok",
+            "since": since_min,
+            "event": event,
+            "events": events,
+            "meta": {"lines_processed": lines, "bad_lines": bad, "buckets": LAT_BUCKETS},
+        }
+        if series:
+            out["series"] = per_minute
+        return out
+
+
+_AGG: Optional[TelemetryAggregator] = None
+_AGG_LOCK = threading.Lock()
+
+
+def get_aggregator() -> TelemetryAggregator:
+    global _AGG
+    if _AGG is None:
+        with _AGG_LOCK:
+            if _AGG is None:
+                from .writer import get_writer
+                _AGG = TelemetryAggregator(log_path=get_writer().path)
+    return _AGG
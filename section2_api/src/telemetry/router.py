@@ -1,12 +1,15 @@
 from __future__ import annotations
-from fastapi import APIRouter
+from fastapi import APIRouter, Query
 from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any
-import time, json
-from pathlib import Path
+from typing import Optional, Dict, Any, List
+from datetime import datetime
+import time
+from .aggregate import get_aggregator
+from .writer import get_writer
 
 router = APIRouter(prefix="/api/telemetry", tags=["telemetry"])
-LOG_PATH = Path(__file__).resolve().parents[2] / "telemetry.log"
+
+MAX_BATCH_EVENTS = 1000
 
 class TelemetryEvent(BaseModel):
     event: str = Field(..., min_length=1, max_length=80)
@@ -14,13 +17,46 @@ class TelemetryEvent(BaseModel):
     data: Optional[Dict[str, Any]] = None
     session_id: Optional[str] = Field(default=None, max_length=64)
 
-@router.post("/event")
-def post_event(evt: TelemetryEvent):
+def _payload(evt: TelemetryEvent, now: float) -> Dict[str, Any]:
     payload = evt.model_dump()
-    payload["ts"] = payload.get("ts") or time.time()
+    payload["ts"] = payload.get("ts") or now
+    return payload
+
+@router.post("/event")
+async def post_event(evt: TelemetryEvent):
+    # Non-blocking: encola en el ring buffer; el hilo escritor hace el I/O por lotes.
+    accepted = get_writer().submit(_payload(evt, time.time()))
+    return {"status":"ok","accepted": int(accepted), "dropped": int(not accepted)}
+
+@router.post("/batch")
+async def post_batch(events: List[TelemetryEvent]):
+    if len(events) > MAX_BATCH_EVENTS:
+        return {"status":"error","error":"BATCH_TOO_LARGE","message":f"Máximo {MAX_BATCH_EVENTS} eventos por lote."}
+    now = time.time()
+    accepted, dropped = get_writer().submit_many(_payload(e, now) for e in events)
+    return {"status":"ok","accepted": accepted, "dropped": dropped}
+
+@router.get("/stats")
+async def stats():
+    return {"status":"ok","writer": get_writer().stats()}
+
+def _parse_since(since: Optional[str]) -> Optional[float]:
+    if not since:
+        return None
     try:
-        with LOG_PATH.open("a", encoding="utf-8") as f:
-            f.write(json.dumps(payload, ensure_ascii=False) + "\n")
-    except Exception:
+        return float(since)
+    except ValueError:
         pass
-    return {"status":"ok"}
+    return datetime.fromisoformat(since.replace("Z", "+00:00")).timestamp()
+
+@router.get("/summary")
+def summary(
+    since: Optional[str] = Query(None, description="Epoch (s) o ISO-8601. Default: última hora."),
+    event: Optional[str] = Query(None, max_length=80),
+    series: int = Query(0, ge=0, le=1, description="1 = incluir serie por minuto."),
+):
+    try:
+        since_ts = _parse_since(since)
+    except ValueError:
+        return {"status":"error","error":"INVALID_SINCE","message":"since debe ser epoch o ISO-8601."}
+    return get_aggregator().summary(since=since_ts, event=event, series=bool(series))
@@ -0,0 +1,364 @@
+from __future__ import annotations
+import atexit, gzip, json, os, re, shutil, threading, time
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:  # flock entre workers; sin fcntl (Windows) se asume un solo proceso escritor
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+LOG_PATH = Path(__file__).resolve().parents[2] / "telemetry.log"
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, "") or default)
+    except ValueError:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, "") or default)
+    except ValueError:
+        return default
+
+
+_SEGMENT_RE = re.compile(r"\.\d{8}T\d{9}Z(\.gz)?$")
+
+
+def rotated_segments(path: Path = LOG_PATH) -> List[Path]:
+    """Rotated segments for `path`, oldest first (names sort chronologically)."""
+    return sorted(p for p in path.parent.glob(path.name + ".*") if _SEGMENT_RE.search(p.name[len(path.name):]))
+
+
+class _LogLock:
+    """
+    flock sobre `<log>.lock`, compartido entre los workers que escriben el mismo log: cada lote se escribe
+    con lock compartido y la rotación (rename del log vivo) se hace con lock exclusivo.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._fd: Optional[int] = None
+
+    @contextmanager
+    def hold(self, exclusive: bool) -> Iterator[None]:
+        if fcntl is None:
+            yield
+            return
+        if self._fd is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._fd = os.open(str(self.path), os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(self._fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def close(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+class TelemetryWriter:
+    """
+    Ring buffer en memoria + hilo escritor en background.
+
+    - submit() nunca toca disco: encola el evento o lo descarta (contador `dropped`) si el buffer está lleno.
+    - El hilo drena en lotes (batch_size o cada flush_interval), serializa y hace un solo write por lote
+      sobre un archivo que se mantiene abierto.
+    - Rotación por tamaño (max_bytes) o por tiempo (rotate_interval, medido desde el inicio del archivo y
+      revisado también en los ticks sin eventos); los segmentos rotados se renombran a
+      `<log>.<UTC timestamp>` y opcionalmente se comprimen a `.gz`. Se conservan `backup_count` segmentos.
+    - Varios workers pueden compartir el log: antes de cada lote se comprueba (bajo _LogLock) que el archivo
+      abierto siga siendo el log vivo y se reabre si otro worker lo rotó.
+    """
+
+    def __init__(
+        self,
+        path: Path = LOG_PATH,
+        capacity: int = 10_000,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        max_bytes: int = 64 * 1024 * 1024,
+        rotate_interval: float = 24 * 3600.0,
+        backup_count: int = 14,
+        compress: bool = True,
+    ):
+        self.path = Path(path)
+        self.capacity = max(1, int(capacity))
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = max(0.01, float(flush_interval))
+        self.max_bytes = int(max_bytes)
+        self.rotate_interval = float(rotate_interval)
+        self.backup_count = int(backup_count)
+        self.compress = bool(compress)
+
+        self._buf: Deque[Dict[str, Any]] = deque()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self._pending_flush = 0
+        self._inflight = 0
+
+        self._fh = None
+        self._opened_at = 0.0
+        self._log_lock = _LogLock(self.path.with_name(self.path.name + ".lock"))
+
+        self.accepted = 0
+        self.dropped = 0
+        self.written = 0
+        self.batches = 0
+        self.rotations = 0
+        self.write_errors = 0
+
+    # ---------- producer side ----------
+
+    def submit(self, payload: Dict[str, Any]) -> bool:
+        with self._cond:
+            if self._closed or len(self._buf) >= self.capacity:
+                self.dropped += 1
+                return False
+            self._buf.append(payload)
+            self.accepted += 1
+            if len(self._buf) >= self.batch_size:
+                self._cond.notify()
+        self._ensure_started()
+        return True
+
+    def submit_many(self, payloads: Iterable[Dict[str, Any]]) -> Tuple[int, int]:
+        ok = 0
+        dropped = 0
+        with self._cond:
+            for p in payloads:
+                if self._closed or len(self._buf) >= self.capacity:
+                    dropped += 1
+                    continue
+                self._buf.append(p)
+                ok += 1
+            self.accepted += ok
+            self.dropped += dropped
+            if len(self._buf) >= self.batch_size:
+                self._cond.notify()
+        if ok:
+            self._ensure_started()
+        return ok, dropped
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Bloquea hasta que lo encolado hasta ahora esté en disco (para tests/shutdown)."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._pending_flush += 1
+            self._cond.notify()
+            try:
+                while (self._buf or self._inflight) and self._thread is not None and self._thread.is_alive():
+                    left = deadline - time.monotonic()
+                    if left <= 0:
+                        return False
+                    self._cond.wait(min(left, 0.05))
+            finally:
+                self._pending_flush -= 1
+        return not (self._buf or self._inflight)
+
+    def close(self, timeout: float = 5.0) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        t = self._thread
+        if t is not None:
+            t.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            buffered = len(self._buf)
+        return {
+            "path": str(self.path),
+            "capacity": self.capacity,
+            "buffered": buffered,
+            "accepted": self.accepted,
+            "dropped": self.dropped,
+            "written": self.written,
+            "batches": self.batches,
+            "rotations": self.rotations,
+            "write_errors": self.write_errors,
+        }
+
+    # ---------- writer thread ----------
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._cond:
+            if self._thread is None and not self._closed:
+                self._thread = threading.Thread(target=self._run, name="telemetry-writer", daemon=True)
+                self._thread.start()
+
+    def _take_batch(self) -> List[Dict[str, Any]]:
+        with self._cond:
+            if len(self._buf) < self.batch_size and not self._closed and not self._pending_flush:
+                self._cond.wait(self.flush_interval)
+            n = min(len(self._buf), self.batch_size)
+            self._inflight = n
+            return [self._buf.popleft() for _ in range(n)]
+
+    def _run(self) -> None:
+        while True:
+            batch = self._take_batch()
+            if batch:
+                self._write(batch)
+            else:
+                self._idle_rotate()
+            with self._cond:
+                self._inflight = 0
+                if not self._buf:
+                    self._cond.notify_all()  # despierta a flush()
+                    if self._closed:
+                        break
+        self._close_file()
+        self._log_lock.close()
+
+    def _open(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fh = self.path.open("a", encoding="utf-8")
+        self._opened_at = self._segment_started()
+
+    def _segment_started(self) -> float:
+        """
+        Inicio del log vivo, para rotar por tiempo aunque el proceso reabra el archivo: birthtime si el
+        filesystem lo expone; si no, el ts de la primera línea (acotado por mtime); si no, mtime.
+        """
+        try:
+            st = self.path.stat()
+        except OSError:
+            return time.time()
+        birth = getattr(st, "st_birthtime", None)
+        if birth:
+            return float(birth)
+        try:
+            with self.path.open("rb") as fh:
+                ts = json.loads(fh.readline()).get("ts")
+            if isinstance(ts, (int, float)) and ts > 0:
+                return min(float(ts), st.st_mtime)
+        except Exception:
+            pass
+        return st.st_mtime
+
+    def _is_live(self) -> bool:
+        """True si el archivo abierto sigue siendo `path` (otro worker no lo rotó)."""
+        try:
+            return os.fstat(self._fh.fileno()).st_ino == self.path.stat().st_ino
+        except (OSError, ValueError):
+            return False
+
+    def _close_file(self) -> None:
+        if self._fh is not None:
+            try:
+                self._fh.close()
+            except Exception:
+                pass
+            self._fh = None
+
+    def _write(self, batch: List[Dict[str, Any]]) -> None:
+        lines = []
+        for p in batch:
+            try:
+                lines.append(json.dumps(p, ensure_ascii=False))
+            except (TypeError, ValueError):
+                self.write_errors += 1
+        if not lines:
+            return
+        try:
+            with self._log_lock.hold(exclusive=False):
+                if self._fh is not None and not self._is_live():
+                    self._close_file()
+                if self._fh is None:
+                    self._open()
+                self._fh.write("\n".join(lines) + "\n")
+                self._fh.flush()
+            self.written += len(lines)
+            self.batches += 1
+            self._maybe_rotate()
+        except Exception:
+            self.write_errors += 1
+            self._close_file()
+
+    def _idle_rotate(self) -> None:
+        """Tick sin eventos: la rotación por tiempo no debe esperar a la próxima escritura."""
+        if self.rotate_interval <= 0:
+            return
+        try:
+            if self._fh is None:
+                if not self.path.exists() or not self.path.stat().st_size:
+                    return
+                self._open()
+            self._maybe_rotate()
+        except Exception:
+            self.write_errors += 1
+            self._close_file()
+
+    def _rotation_due(self, size: int) -> bool:
+        too_big = self.max_bytes > 0 and size >= self.max_bytes
+        too_old = self.rotate_interval > 0 and (time.time() - self._opened_at) >= self.rotate_interval
+        return bool(size) and (too_big or too_old)
+
+    def _maybe_rotate(self) -> None:
+        if not self._rotation_due(self._fh.tell()):
+            return
+        with self._log_lock.hold(exclusive=True):
+            # mientras esperábamos el lock otro worker pudo rotar: entonces solo hay que reabrir
+            if not self._is_live():
+                self._close_file()
+                return
+            if not self._rotation_due(self.path.stat().st_size):
+                return
+            self._close_file()
+            now = time.time()
+            stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime(now)) + f"{int((now % 1) * 1000):03d}Z"
+            target = self.path.with_name(f"{self.path.name}.{stamp}")
+            os.replace(self.path, target)
+        # nadie escribe ya en `target` (todos comprueban el inodo bajo el lock): comprimir sin bloquear
+        if self.compress:
+            gz = target.with_name(target.name + ".gz")
+            with target.open("rb") as src, gzip.open(gz, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            target.unlink()
+        self.rotations += 1
+        self._prune()
+
+    def _prune(self) -> None:
+        if self.backup_count <= 0:
+            return
+        segs = rotated_segments(self.path)
+        for old in segs[: max(0, len(segs) - self.backup_count)]:
+            try:
+                old.unlink()
+            except OSError:
+                pass
+
+
+_WRITER: Optional[TelemetryWriter] = None
+_WRITER_LOCK = threading.Lock()
+
+
+def get_writer() -> TelemetryWriter:
+    global _WRITER
+    if _WRITER is None:
+        with _WRITER_LOCK:
+            if _WRITER is None:
+                _WRITER = TelemetryWriter(
+                    path=Path(os.getenv("TELEMETRY_LOG_PATH", "") or LOG_PATH),
+                    capacity=_env_int("TELEMETRY_BUFFER_CAPACITY", 10_000),
+                    batch_size=_env_int("TELEMETRY_BATCH_SIZE", 500),
+                    flush_interval=_env_float("TELEMETRY_FLUSH_INTERVAL", 1.0),
+                    max_bytes=_env_int("TELEMETRY_MAX_BYTES", 64 * 1024 * 1024),
+                    rotate_interval=_env_float("TELEMETRY_ROTATE_SECONDS", 24 * 3600.0),
+                    backup_count=_env_int("TELEMETRY_BACKUP_COUNT", 14),
+                    compress=os.getenv("TELEMETRY_GZIP", "1").strip() not in ("0", "false", "no"),
+                )
+                atexit.register(_WRITER.close)
+    return _WRITER
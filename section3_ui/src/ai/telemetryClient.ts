@@ -1,4 +1,10 @@
 const KEY = "powerball_telemetry_buffer_v1";
+const BATCH_URL = "http://localhost:8000/api/telemetry/batch";
+const FLUSH_MS = 2000;
+const MAX_BATCH = 50;
+
+let pending: any[] = [];
+let timer: ReturnType<typeof setTimeout> | null = null;
 
 export function track(event: string, data?: any) {
   try {
@@ -7,13 +13,39 @@ export function track(event: string, data?: any) {
     localStorage.setItem(KEY, JSON.stringify(buf.slice(0, 200)));
   } catch {}
 
-  fetch("http://localhost:8000/api/telemetry/event", {
+  pending.push({ event, data, ts: Date.now() / 1000 });
+  if (pending.length >= MAX_BATCH) {
+    flush();
+  } else if (!timer) {
+    timer = setTimeout(flush, FLUSH_MS);
+  }
+}
+
+export function flush(useBeacon = false) {
+  if (timer) {
+    clearTimeout(timer);
+    timer = null;
+  }
+  if (!pending.length) return;
+  const body = JSON.stringify(pending);
+  pending = [];
+
+  if (useBeacon && typeof navigator !== "undefined" && navigator.sendBeacon) {
+    navigator.sendBeacon(BATCH_URL, new Blob([body], { type: "application/json" }));
+    return;
+  }
+  fetch(BATCH_URL, {
     method: "POST",
     headers: { "Content-Type": "application/json" },
-    body: JSON.stringify({ event, data, ts: Date.now() / 1000 }),
+    body,
+    keepalive: true,
   }).catch(() => {});
 }
 
+if (typeof window !== "undefined") {
+  window.addEventListener("pagehide", () => flush(true));
+}
+
 export function load() {
   const raw = localStorage.getItem(KEY);
   if (!raw) return [];
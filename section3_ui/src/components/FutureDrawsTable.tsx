@@ -1,7 +1,7 @@
-import React from "react";
+import React, { useEffect, useRef } from "react";
 
 export type FutureDrawItem = {
-  id?: string;
+  id?: string | number;
   draw_date?: string;
   white1?: number | string;
   white2?: number | string;
@@ -22,8 +22,15 @@ export type FutureDrawsTableProps = {
 
   // Placeholder hooks de UI (no implementan nada aquí):
   onRefresh?: () => void;
+
+  // Infinite scroll (cursor/keyset): useFutureDraws() -> hasMore / loadingMore / loadMore
+  hasMore?: boolean;
+  loadingMore?: boolean;
+  onLoadMore?: () => void;
 };
 
+const COLS: (keyof FutureDrawItem)[] = ["white1", "white2", "white3", "white4", "white5"];
+
 export default function FutureDrawsTable({
   title = "Future Draws (Pro)",
   subtitle = "Tabla Pro (placeholder). No mezcla con histórico oficial.",
@@ -31,7 +38,27 @@ export default function FutureDrawsTable({
   error = null,
   items = [],
   onRefresh,
+  hasMore = false,
+  loadingMore = false,
+  onLoadMore,
 }: FutureDrawsTableProps) {
+  const scrollRef = useRef<HTMLDivElement | null>(null);
+  const sentinelRef = useRef<HTMLDivElement | null>(null);
+
+  // Cuando el sentinel (final de la tabla) entra en vista, pide la siguiente página
+  useEffect(() => {
+    const el = sentinelRef.current;
+    if (!el || !onLoadMore || !hasMore) return;
+    const io = new IntersectionObserver(
+      (entries) => {
+        if (entries.some((e) => e.isIntersecting)) onLoadMore();
+      },
+      { root: scrollRef.current, rootMargin: "200px" }
+    );
+    io.observe(el);
+    return () => io.disconnect();
+  }, [onLoadMore, hasMore, items.length]);
+
   return (
     <div className="border rounded-2xl bg-white shadow-sm overflow-hidden">
       <div className="p-4 border-b bg-gradient-to-b from-white to-gray-50">
@@ -59,9 +86,29 @@ export default function FutureDrawsTable({
         ) : items.length === 0 ? (
           <div className="text-sm text-gray-500">No hay future draws todavía. (Placeholder)</div>
         ) : (
-          <div className="text-sm text-gray-700">
-            Items listos para renderizar: <span className="font-semibold">{items.length}</span>{" "}
-            (Placeholder)
+          <div ref={scrollRef} className="max-h-[60vh] overflow-auto border rounded-xl">
+            <table className="w-full text-sm">
+              <thead className="sticky top-0 bg-gray-50 text-xs text-gray-500">
+                <tr>
+                  <th className="text-left px-3 py-2">Draw date</th>
+                  <th className="text-left px-3 py-2">Whites</th>
+                  <th className="text-left px-3 py-2">PB</th>
+                </tr>
+              </thead>
+              <tbody>
+                {items.map((it, i) => (
+                  <tr key={it.id ?? i} className="border-t">
+                    <td className="px-3 py-1.5 text-gray-600">{it.draw_date || "—"}</td>
+                    <td className="px-3 py-1.5 font-mono">{COLS.map((c) => it[c] ?? "·").join(" - ")}</td>
+                    <td className="px-3 py-1.5 font-mono font-semibold">{it.powerball ?? "·"}</td>
+                  </tr>
+                ))}
+              </tbody>
+            </table>
+
+            <div ref={sentinelRef} className="px-3 py-2 text-xs text-gray-500">
+              {loadingMore ? "Cargando más…" : hasMore ? "" : `${items.length} items`}
+            </div>
           </div>
         )}
       </div>
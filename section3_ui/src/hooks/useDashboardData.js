@@ -1,8 +1,8 @@
 // src/hooks/useDashboardData.js
 
-import { useEffect, useMemo, useState } from "react";
+import { useCallback, useEffect, useMemo, useRef, useState } from "react";
 import useAsync from "./useAsync";
-import { fetchFutureDraws } from "../lib/powerballApi";
+import { fetchFutureDraws, fetchTable1 } from "../lib/powerballApi";
 
 /**
  * Temporary dashboard loader.
@@ -42,43 +42,97 @@ function normalizeFutureDrawsResponse(r) {
 }
 
 /**
- * Future Draws hook with filters.
- * Uses JSON key to avoid refetch loops when parent passes a new object each render.
+ * Keyset (cursor) pager for the /api/{history,future}/filter* endpoints.
+ * - First page loads whenever the filters change (JSON key avoids refetch loops).
+ * - loadMore() requests the next page with the last next_cursor and appends it.
+ * - fetchPage must be stable (module function or useCallback): a new fetchPage also resets to page one,
+ *   e.g. when useHistoryDraws switches operator.
+ * Stale responses (filters changed mid-flight) are discarded.
  */
-export function useFutureDraws(filters = {}) {
+function useKeysetPages(fetchPage, filters, pageSize, errorLabel) {
   const [data, setData] = useState([]);
   const [loading, setLoading] = useState(false);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [error, setError] = useState("");
+  const [cursor, setCursor] = useState(null);
 
   const filtersKey = useMemo(() => JSON.stringify(filters || {}), [filters]);
+  const genRef = useRef(0);
+  const busyRef = useRef(false);
+
+  const load = useCallback(
+    (nextCursor) => {
+      const gen = genRef.current;
+      const params = { ...JSON.parse(filtersKey), limit: pageSize };
+      if (nextCursor) params.cursor = nextCursor;
+
+      busyRef.current = true;
+      if (nextCursor) setLoadingMore(true);
+      else setLoading(true);
+      setError("");
+
+      return fetchPage(params)
+        .then((r) => {
+          if (gen !== genRef.current) return;
+          const rows = normalizeFutureDrawsResponse(r);
+          setData((prev) => (nextCursor ? prev.concat(rows) : rows));
+          setCursor(r?.hasMore ? r.nextCursor : null);
+        })
+        .catch((e) => {
+          if (gen !== genRef.current) return;
+          if (!nextCursor) setData([]);
+          setError(e?.message || errorLabel);
+        })
+        .finally(() => {
+          if (gen !== genRef.current) return;
+          busyRef.current = false;
+          setLoading(false);
+          setLoadingMore(false);
+        });
+    },
+    [fetchPage, filtersKey, pageSize, errorLabel]
+  );
 
   useEffect(() => {
-    let cancelled = false;
+    genRef.current += 1;
+    busyRef.current = false;
+    setCursor(null);
+    load(null);
+    return () => {
+      genRef.current += 1;
+    };
+  }, [load]);
 
-    setLoading(true);
-    setError("");
+  const loadMore = useCallback(() => {
+    if (!cursor || busyRef.current) return;
+    load(cursor);
+  }, [cursor, load]);
 
-    fetchFutureDraws({ limit: 200, ...filters })
-      .then((r) => {
-        if (cancelled) return;
-        setData(normalizeFutureDrawsResponse(r));
-      })
-      .catch((e) => {
-        if (cancelled) return;
-        setData([]);
-        setError(e?.message || "Failed to load future draws");
-      })
-      .finally(() => {
-        if (cancelled) return;
-        setLoading(false);
-      });
+  const reload = useCallback(() => {
+    genRef.current += 1;
+    busyRef.current = false;
+    setCursor(null);
+    load(null);
+  }, [load]);
 
-    return () => {
-      cancelled = true;
-    };
-  }, [filtersKey]);
+  return { data, loading, loadingMore, error, hasMore: Boolean(cursor), loadMore, reload };
+}
 
-  return { data, loading, error };
+/**
+ * Future Draws hook with filters (infinite scroll via cursor pages).
+ * Returns { data, loading, error, hasMore, loadingMore, loadMore, reload }.
+ */
+export function useFutureDraws(filters = {}, { pageSize = 200 } = {}) {
+  return useKeysetPages(fetchFutureDraws, filters, pageSize, "Failed to load future draws");
+}
+
+/**
+ * History draws (AND | OR | ATLEAST) with the same cursor paging as useFutureDraws.
+ * Keep sort/direction inside `filters`: a cursor is only valid for the sort that produced it.
+ */
+export function useHistoryDraws(operator = "AND", filters = {}, { pageSize = 500 } = {}) {
+  const fetchPage = useCallback((params) => fetchTable1("history", operator, { output: "json", ...params }), [operator]);
+  return useKeysetPages(fetchPage, filters, pageSize, "Failed to load history draws");
 }
 
 /**
@@ -96,20 +96,30 @@ async function fetchJson(url, { signal } = {}) {
   }
 }
 
+/**
+ * Keyset pagination fields from a filter response.
+ * Backend returns { has_more, next_cursor }; pass next_cursor back as `cursor`
+ * with the SAME filters/sort/direction to get the next page.
+ */
+function pageInfo(json) {
+  const nextCursor = typeof json?.next_cursor === "string" ? json.next_cursor : null;
+  return { nextCursor, hasMore: Boolean(json?.has_more && nextCursor) };
+}
+
 /**
  * Main function used by Table1.
- * Returns: { raw, data, count, url }
+ * Returns: { raw, data, count, url, nextCursor, hasMore }
  */
-export async function fetchTable1(scope, operator, params) {
+export async function fetchTable1(scope, operator, params, { signal } = {}) {
   const endpoint = getEndpoint(scope, operator);
   const url = buildUrl(endpoint, params);
 
-  const json = await fetchJson(url);
+  const json = await fetchJson(url, { signal });
 
   const data = Array.isArray(json) ? json : json?.data || [];
   const count = typeof json?.count === "number" ? json.count : data.length;
 
-  return { raw: json, data, count, url };
+  return { raw: json, data, count, url, ...pageInfo(json) };
 }
 
 /**
@@ -124,13 +134,14 @@ export async function apiGet(path, params = {}) {
 /**
  * Future Draws (Pro placeholder)
  * Returns same envelope style as fetchTable1 to keep callers consistent.
+ * Pass `cursor` (from a previous nextCursor) to fetch the next page.
  */
-export async function fetchFutureDraws(params = {}) {
+export async function fetchFutureDraws(params = {}, { signal } = {}) {
   const url = buildUrl("/api/future/filter", params);
-  const json = await fetchJson(url);
+  const json = await fetchJson(url, { signal });
 
   const data = Array.isArray(json) ? json : json?.data || [];
   const count = typeof json?.count === "number" ? json.count : data.length;
 
-  return { raw: json, data, count, url };
+  return { raw: json, data, count, url, ...pageInfo(json) };
 }
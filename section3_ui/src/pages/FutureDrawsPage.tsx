@@ -1,11 +1,12 @@
 import React from "react";
-import FutureDrawsTable, { FutureDrawItem } from "../components/FutureDrawsTable";
+import FutureDrawsTable from "../components/FutureDrawsTable";
+import { useFutureDraws } from "../hooks/useDashboardData";
+
+const FILTERS = { sort: "created_at", direction: "desc" };
 
 export default function FutureDrawsPage() {
-  // Placeholder Pro: la data se conectará desde el hook/API cuando toque.
-  const loading = false;
-  const error: string | null = null;
-  const items: FutureDrawItem[] = [];
+  // Páginas por cursor (keyset): la tabla pide la siguiente al llegar al final del scroll.
+  const { data, loading, error, hasMore, loadingMore, loadMore, reload } = useFutureDraws(FILTERS);
 
   return (
     <div className="p-6">
@@ -16,7 +17,15 @@ export default function FutureDrawsPage() {
         </p>
       </div>
 
-      <FutureDrawsTable loading={loading} error={error} items={items} />
+      <FutureDrawsTable
+        loading={loading}
+        error={error || null}
+        items={data}
+        onRefresh={reload}
+        hasMore={hasMore}
+        loadingMore={loadingMore}
+        onLoadMore={loadMore}
+      />
     </div>
   );
 }
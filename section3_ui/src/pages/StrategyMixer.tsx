@@ -1,4 +1,4 @@
-import React, { useMemo, useState } from "react";
+import React, { useEffect, useMemo, useState } from "react";
 import { track } from "../ai/telemetryClient";
 
 export default function StrategyMixer({ form, setForm }: any) {
@@ -16,6 +16,38 @@ export default function StrategyMixer({ form, setForm }: any) {
     return ids.length ? ids : ["sequence_hunter", "diversity_optimizer"];
   }, [continuidad, overdue, diversidad, calendario]);
 
+  // Vista previa: /assistants/mix mezcla en espacio de pesos (sin correr el motor), ~ms por slider
+  const [preview, setPreview] = useState<any[]>([]);
+  const [previewErr, setPreviewErr] = useState<string | null>(null);
+  useEffect(() => {
+    const ctrl = new AbortController();
+    const t = setTimeout(async () => {
+      try {
+        const res = await fetch("http://localhost:8000/api/ai/assistants/mix", {
+          method: "POST",
+          headers: { "Content-Type": "application/json" },
+          body: JSON.stringify({
+            windows: form?.windows,
+            sliders: { continuidad, overdue, diversidad, calendario },
+            mode: "top_k",
+            n_suggestions: 5,
+          }),
+          signal: ctrl.signal,
+        });
+        const json = await res.json();
+        if (json.status !== "ok") throw new Error(json.message || json.error || "error");
+        setPreview(json.suggestions || []);
+        setPreviewErr(null);
+      } catch (e: any) {
+        if (e?.name !== "AbortError") setPreviewErr(String(e?.message || e));
+      }
+    }, 120);
+    return () => {
+      clearTimeout(t);
+      ctrl.abort();
+    };
+  }, [continuidad, overdue, diversidad, calendario, form?.windows]);
+
   function apply() {
     setForm({ ...form, assistant_ids: assistants, calendar_pro: calendario >= 35 });
     track("strategy_mixer_apply", { continuidad, overdue, diversidad, calendario, assistants });
@@ -35,6 +67,21 @@ export default function StrategyMixer({ form, setForm }: any) {
         <b>Asistentes resultantes:</b> {assistants.join(", ")}
       </div>
 
+      <div style={{ marginTop: 12 }}>
+        <b>Vista previa (top 5 de la mezcla):</b>
+        {previewErr ? (
+          <div style={{ opacity: 0.7 }}>{previewErr}</div>
+        ) : (
+          <ol style={{ fontFamily: "monospace", marginTop: 6 }}>
+            {preview.map((s: any, i: number) => (
+              <li key={i}>
+                {s.whites.join(" - ")} | PB {s.powerball}
+              </li>
+            ))}
+          </ol>
+        )}
+      </div>
+
       <button onClick={apply} style={btn()}>Aplicar al formulario</button>
     </div>
   );
@@ -1,8 +1,10 @@
 import json
 import os
 import random
+import sys
 from datetime import datetime
 from collections import Counter
+from pathlib import Path
 
 DATA_FILE = "powerball_data.json"
 
@@ -491,15 +493,68 @@ def simular_sorteos(combinaciones):
         print("❌ Número inválido.")
         return
 
+    semilla_str = input("Semilla para reproducir la simulación (o deja vacío para aleatoria): ").strip()
+    try:
+        semilla = int(semilla_str) if semilla_str else None
+    except ValueError:
+        print("❌ Semilla inválida.")
+        return
+
     print(f"\nSimulando {n_sims} sorteos aleatorios con {desc}...")
 
+    motor = _motor_simulacion()
+    if motor is None:
+        _simular_sorteos_python(lista_sim, n_sims, semilla)
+        return
+
+    res = motor(
+        [(c["blancos"], c["powerball"]) for c in lista_sim],
+        n_sims=n_sims,
+        seed=semilla,
+        workers=os.cpu_count() or 1,
+    )
+
+    print("\n=== RESULTADOS DE LA SIMULACIÓN ===")
+    for t in res["tiers"]:
+        texto_pb = "con Powerball acertado" if t["powerball"] else "sin Powerball acertado"
+        print(
+            f"{t['count']} veces hubo combinaciones con {t['whites']} blancos {texto_pb} "
+            f"({t['pct']:.6f}% de todas las jugadas simuladas)"
+        )
+    premio = res["prize"]
+    print(
+        f"\nCosto total: ${premio['total_cost']:,.2f} | Ganado: ${premio['total_won']:,} | "
+        f"ROI: {premio['roi'] * 100:.2f}%"
+    )
+    print(f"Semilla usada: {res['meta']['entropy']} ({res['meta']['elapsed_ms']} ms)")
+    print("====================================\n")
+
+
+def _motor_simulacion():
+    """
+    Motor vectorizado (NumPy) compartido con la API: section2_api/src/simulate/engine.py.
+    Devuelve None si NumPy o el módulo no están disponibles.
+    """
+    api_dir = Path(__file__).resolve().parents[2] / "section2_api"
+    if api_dir.exists() and str(api_dir) not in sys.path:
+        sys.path.insert(0, str(api_dir))
+    try:
+        from src.simulate.engine import simulate_portfolio
+    except ImportError:
+        return None
+    return simulate_portfolio
+
+
+def _simular_sorteos_python(lista_sim, n_sims, semilla=None):
+    rng = random.Random(semilla)
+
     # stats[(coincidencias_blancos, coincide_powerball)] = cantidad_de_veces
     stats = Counter()
 
     for _ in range(n_sims):
         # Generar resultado aleatorio (reglas estándar Powerball)
-        blancos_ganadores = set(random.sample(range(1, 70), 5))
-        powerball_ganador = random.randint(1, 26)
+        blancos_ganadores = set(rng.sample(range(1, 70), 5))
+        powerball_ganador = rng.randint(1, 26)
 
         for comb in lista_sim:
             coincidencias_blancos = len(blancos_ganadores.intersection(comb["blancos"]))